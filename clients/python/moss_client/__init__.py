@@ -0,0 +1,13 @@
+"""
+M.O.S.S. REST API client
+
+Keep-alive (pooled) sync and async clients with API token auth, automatic
+pagination clamped to each endpoint's limit cap, 429 Retry-After handling
+and bulk create helpers.
+"""
+from .async_client import AsyncMossClient
+from .client import MossClient
+from .endpoints import ENDPOINTS, Endpoint
+from .errors import MossAPIError, RateLimitError
+
+__all__ = ['AsyncMossClient', 'ENDPOINTS', 'Endpoint', 'MossAPIError', 'MossClient', 'RateLimitError']
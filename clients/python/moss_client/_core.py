@@ -0,0 +1,131 @@
+"""
+Request/response handling shared by the sync and async clients
+"""
+import random
+
+from .endpoints import endpoint
+from .errors import MossAPIError, RateLimitError
+
+SESSION_COOKIE = 'next-auth.session-token'
+USER_AGENT = 'moss-client-python/0.1'
+RETRY_STATUSES = {502, 503, 504}
+
+
+def client_options(base_url, api_token, session_token, headers, timeout, max_connections, http2):
+    """Keyword arguments for httpx.Client / httpx.AsyncClient with keep-alive pooling"""
+    import httpx
+
+    merged = {'Accept': 'application/json', 'User-Agent': USER_AGENT}
+    if api_token:
+        merged['Authorization'] = f'Bearer {api_token}'
+    merged.update(headers or {})
+    return {
+        'base_url': base_url.rstrip('/'),
+        'headers': merged,
+        'cookies': {SESSION_COOKIE: session_token} if session_token else None,
+        'timeout': timeout,
+        'http2': http2,
+        'limits': httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections,
+                               keepalive_expiry=60),
+    }
+
+
+def retry_delay(response, method, attempt, max_retries, max_retry_wait):
+    """Seconds to wait before retrying, or None when the response should be returned/raised"""
+    if attempt >= max_retries:
+        return None
+    if response.status_code == 429:
+        try:
+            wait = float(response.headers.get('retry-after', '1'))
+        except ValueError:
+            wait = 1.0
+        return wait if wait <= max_retry_wait else None
+    if response.status_code in RETRY_STATUSES and method == 'GET':
+        return min(2 ** attempt + random.random(), max_retry_wait)
+    return None
+
+
+def unwrap(response, method, path):
+    """Return the decoded { success, data } body, raising MossAPIError for errors"""
+    try:
+        body = response.json()
+    except ValueError:
+        body = {'success': response.is_success, 'data': response.text}
+    if not isinstance(body, dict):
+        body = {'success': response.is_success, 'data': body}
+
+    if response.status_code == 429:
+        raise RateLimitError(429, body.get('message') or body.get('error') or 'Rate limit exceeded',
+                             retry_after=response.headers.get('retry-after'), details=body.get('details'),
+                             method=method, path=path)
+    if not response.is_success or body.get('success') is False:
+        message = body.get('error') or body.get('message') or response.reason_phrase
+        raise MossAPIError(response.status_code, message, body.get('details'), method, path)
+    return body
+
+
+def page_params(resource, index, page_size, filters):
+    """Query parameters for page `index` (0-based) of a resource, clamped to its limit cap"""
+    ep = endpoint(resource)
+    limit = min(page_size or ep.max_limit, ep.max_limit)
+    params = dict(filters)
+    params['limit'] = limit
+    if ep.paging == 'page':
+        params['page'] = index + 1
+    else:
+        params['offset'] = index * limit
+    return params, limit
+
+
+def rows(resource, body):
+    data = body.get('data')
+    if isinstance(data, list):
+        return data
+    key = endpoint(resource).key
+    if isinstance(data, dict) and key and isinstance(data.get(key), list):
+        return data[key]
+    raise MossAPIError(200, f'Unexpected list response shape for {resource}')
+
+
+def has_more(body, page_rows, limit, index):
+    """Whether another page exists, from whichever pagination metadata the endpoint returns"""
+    data = body.get('data')
+    pagination = body.get('pagination') or (data.get('pagination') if isinstance(data, dict) else None)
+    if pagination:
+        if 'hasMore' in pagination:
+            return bool(pagination['hasMore'])
+        if 'has_next' in pagination:
+            return bool(pagination['has_next'])
+        total_pages = pagination.get('total_pages', pagination.get('totalPages'))
+        if total_pages is not None:
+            return index + 1 < total_pages
+    return len(page_rows) >= limit
+
+
+def bulk_batches(resource, items, batch_size):
+    """(path, body) per batch for a resource's bulk create endpoint"""
+    ep = endpoint(resource)
+    if not ep.bulk_path:
+        raise ValueError(f'{resource} has no bulk create endpoint; use create() per item')
+    size = min(batch_size or ep.bulk_max, ep.bulk_max)
+    items = list(items)
+    for start in range(0, len(items), size):
+        batch = items[start:start + size]
+        yield ep.bulk_path, ({ep.bulk_wrapper: batch} if ep.bulk_wrapper else batch)
+
+
+def bulk_result(results):
+    """Merge per-batch bulk responses into {created, items, ids, batches}"""
+    merged = {'created': 0, 'items': [], 'ids': [], 'batches': len(results)}
+    for data in results:
+        if isinstance(data, dict):
+            merged['created'] += data.get('created', data.get('created_count', 0))
+            merged['items'].extend(data.get('items', []))
+            merged['ids'].extend(data.get('created_ids', []))
+    merged['ids'] = merged['ids'] or [item['id'] for item in merged['items'] if 'id' in item]
+    return merged
+
+
+def resource_path(resource, item_id=None):
+    path = endpoint(resource).path
+    return f'{path}/{item_id}' if item_id is not None else path
@@ -0,0 +1,99 @@
+"""
+Asynchronous client
+"""
+import asyncio
+
+from . import _core
+
+
+class AsyncMossClient:
+    """
+    asyncio variant of MossClient; bulk batches can be sent concurrently
+
+    Usage:
+        async with AsyncMossClient('https://moss.example.com', api_token='moss_...') as moss:
+            async for person in moss.iter('people', status='active'):
+                ...
+            await moss.bulk_create('devices', rows, concurrency=4)
+    """
+
+    def __init__(self, base_url, api_token=None, session_token=None, headers=None, timeout=30.0,
+                 max_connections=20, max_retries=3, max_retry_wait=60.0, http2=False):
+        import httpx
+
+        self._http = httpx.AsyncClient(**_core.client_options(base_url, api_token, session_token, headers, timeout,
+                                                              max_connections, http2))
+        self.max_retries = max_retries
+        self.max_retry_wait = max_retry_wait
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        await self._http.aclose()
+
+    async def request(self, method, path, params=None, json=None):
+        """Send a request and return the full { success, data, ... } body; retries 429 and 5xx GETs"""
+        attempt = 0
+        while True:
+            response = await self._http.request(method, path, params=params, json=json)
+            delay = _core.retry_delay(response, method, attempt, self.max_retries, self.max_retry_wait)
+            if delay is None:
+                return _core.unwrap(response, method, path)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    # ------------------------------------------------------------------
+    # Resources
+    # ------------------------------------------------------------------
+
+    async def list(self, resource, page=0, page_size=None, **filters):
+        """One page of rows (page is 0-based; page_size is clamped to the endpoint's cap)"""
+        params, _ = _core.page_params(resource, page, page_size, filters)
+        return _core.rows(resource, await self.request('GET', _core.resource_path(resource), params=params))
+
+    async def iter(self, resource, page_size=None, max_items=None, **filters):
+        """Yield every row across pages, using the largest page each endpoint accepts"""
+        index = count = 0
+        while True:
+            params, limit = _core.page_params(resource, index, page_size, filters)
+            body = await self.request('GET', _core.resource_path(resource), params=params)
+            page_rows = _core.rows(resource, body)
+            for row in page_rows:
+                yield row
+                count += 1
+                if max_items is not None and count >= max_items:
+                    return
+            if not page_rows or not _core.has_more(body, page_rows, limit, index):
+                return
+            index += 1
+
+    async def all(self, resource, **kwargs):
+        return [row async for row in self.iter(resource, **kwargs)]
+
+    async def get(self, resource, item_id):
+        return (await self.request('GET', _core.resource_path(resource, item_id)))['data']
+
+    async def create(self, resource, body):
+        return (await self.request('POST', _core.resource_path(resource), json=body))['data']
+
+    async def update(self, resource, item_id, body):
+        return (await self.request('PATCH', _core.resource_path(resource, item_id), json=body))['data']
+
+    async def delete(self, resource, item_id):
+        return (await self.request('DELETE', _core.resource_path(resource, item_id))).get('data')
+
+    async def bulk_create(self, resource, items, batch_size=None, concurrency=1):
+        """Create items through the bulk endpoint; up to `concurrency` batches (transactions) in flight"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(path, body):
+            async with semaphore:
+                return (await self.request('POST', path, json=body))['data']
+
+        results = await asyncio.gather(*(send(path, body)
+                                         for path, body in _core.bulk_batches(resource, items, batch_size)))
+        return _core.bulk_result(results)
@@ -0,0 +1,93 @@
+"""
+Synchronous client
+"""
+import time
+
+from . import _core
+
+
+class MossClient:
+    """
+    Keep-alive client for the M.O.S.S. REST API
+
+    Usage:
+        with MossClient('https://moss.example.com', api_token='moss_...') as moss:
+            for device in moss.iter('devices', status='active'):
+                ...
+            moss.bulk_create('people', rows)
+    """
+
+    def __init__(self, base_url, api_token=None, session_token=None, headers=None, timeout=30.0,
+                 max_connections=10, max_retries=3, max_retry_wait=60.0, http2=False):
+        import httpx
+
+        self._http = httpx.Client(**_core.client_options(base_url, api_token, session_token, headers, timeout,
+                                                         max_connections, http2))
+        self.max_retries = max_retries
+        self.max_retry_wait = max_retry_wait
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._http.close()
+
+    def request(self, method, path, params=None, json=None):
+        """Send a request and return the full { success, data, ... } body; retries 429 and 5xx GETs"""
+        attempt = 0
+        while True:
+            response = self._http.request(method, path, params=params, json=json)
+            delay = _core.retry_delay(response, method, attempt, self.max_retries, self.max_retry_wait)
+            if delay is None:
+                return _core.unwrap(response, method, path)
+            attempt += 1
+            time.sleep(delay)
+
+    # ------------------------------------------------------------------
+    # Resources
+    # ------------------------------------------------------------------
+
+    def list(self, resource, page=0, page_size=None, **filters):
+        """One page of rows (page is 0-based; page_size is clamped to the endpoint's cap)"""
+        params, _ = _core.page_params(resource, page, page_size, filters)
+        return _core.rows(resource, self.request('GET', _core.resource_path(resource), params=params))
+
+    def iter(self, resource, page_size=None, max_items=None, **filters):
+        """Yield every row across pages, using the largest page each endpoint accepts"""
+        index = count = 0
+        while True:
+            params, limit = _core.page_params(resource, index, page_size, filters)
+            body = self.request('GET', _core.resource_path(resource), params=params)
+            page_rows = _core.rows(resource, body)
+            for row in page_rows:
+                yield row
+                count += 1
+                if max_items is not None and count >= max_items:
+                    return
+            if not page_rows or not _core.has_more(body, page_rows, limit, index):
+                return
+            index += 1
+
+    def all(self, resource, **kwargs):
+        return list(self.iter(resource, **kwargs))
+
+    def get(self, resource, item_id):
+        return self.request('GET', _core.resource_path(resource, item_id))['data']
+
+    def create(self, resource, body):
+        return self.request('POST', _core.resource_path(resource), json=body)['data']
+
+    def update(self, resource, item_id, body):
+        return self.request('PATCH', _core.resource_path(resource, item_id), json=body)['data']
+
+    def delete(self, resource, item_id):
+        return self.request('DELETE', _core.resource_path(resource, item_id)).get('data')
+
+    def bulk_create(self, resource, items, batch_size=None):
+        """Create items through the resource's bulk endpoint, one transaction per batch of up to 100"""
+        results = [self.request('POST', path, json=body)['data']
+                   for path, body in _core.bulk_batches(resource, items, batch_size)]
+        return _core.bulk_result(results)
@@ -0,0 +1,48 @@
+"""
+Endpoint registry
+
+Each list endpoint validates its own limit cap and pages either by page
+number or by offset, and wraps its rows differently (a bare list in `data`,
+or `data.<resource>` next to a pagination object). The registry records that
+per resource so pagination and bulk helpers do not have to guess.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    path: str
+    max_limit: int = 100
+    paging: str = 'offset'  # 'page' (page/limit) or 'offset' (offset/limit)
+    key: Optional[str] = None  # rows live in data[key]; None when data is the list
+    bulk_path: Optional[str] = None
+    bulk_wrapper: Optional[str] = None  # body is {wrapper: [...]} instead of a bare array
+    bulk_max: int = 100
+
+
+ENDPOINTS = {
+    'companies': Endpoint('/api/companies', 200, 'page', 'companies', '/api/companies/bulk'),
+    'contracts': Endpoint('/api/contracts'),
+    'devices': Endpoint('/api/devices', 100, 'page', 'devices', '/api/devices/bulk'),
+    'documents': Endpoint('/api/documents'),
+    'external_documents': Endpoint('/api/external-documents'),
+    'groups': Endpoint('/api/groups'),
+    'installed_applications': Endpoint('/api/installed-applications'),
+    'ios': Endpoint('/api/ios', 100, 'page', None, '/api/ios/bulk-create', 'items'),
+    'ip_addresses': Endpoint('/api/ip-addresses'),
+    'locations': Endpoint('/api/locations', 100, 'page', 'locations', '/api/locations/bulk'),
+    'networks': Endpoint('/api/networks', 100, 'page', None, '/api/networks/bulk'),
+    'people': Endpoint('/api/people', 200, 'page', 'people', '/api/people/bulk'),
+    'rooms': Endpoint('/api/rooms', 200, 'page', 'rooms', '/api/rooms/bulk'),
+    'saas_services': Endpoint('/api/saas-services'),
+    'software': Endpoint('/api/software'),
+    'software_licenses': Endpoint('/api/software-licenses'),
+}
+
+
+def endpoint(resource):
+    try:
+        return ENDPOINTS[resource]
+    except KeyError:
+        raise ValueError(f"Unknown resource '{resource}' (known: {', '.join(sorted(ENDPOINTS))})") from None
@@ -0,0 +1,23 @@
+"""
+Client errors
+"""
+
+
+class MossAPIError(Exception):
+    """Non-2xx response, or a 2xx body with success: false"""
+
+    def __init__(self, status, message, details=None, method=None, path=None):
+        super().__init__(f'{method} {path} -> {status}: {message}' if method else f'{status}: {message}')
+        self.status = status
+        self.message = message
+        self.details = details
+        self.method = method
+        self.path = path
+
+
+class RateLimitError(MossAPIError):
+    """429 that outlasted the client's retry budget"""
+
+    def __init__(self, status, message, retry_after=None, **kwargs):
+        super().__init__(status, message, **kwargs)
+        self.retry_after = retry_after
@@ -0,0 +1,538 @@
+#!/usr/bin/env python3
+"""
+M.O.S.S. parallel backup / restore
+
+Parallel replacement for backup.sh / restore.sh. The database is dumped with
+pg_dump directory format (one compressed file per table, --jobs workers) and
+restored with pg_restore --jobs; file attachments (migration 008, local
+storage backend) are streamed through gzip into attachments.tar.gz while the
+database dump runs. Every run writes a manifest with per-table row counts,
+sizes, timings and SHA-256 checksums, and appends a line to
+backups/history.jsonl so backup window and restore RTO can be tracked as the
+inventory grows.
+
+Commands:
+  backup                 dump database + attachments into backups/moss_backup_<timestamp>/
+  verify <backup>        re-hash files, read the dump TOC and the attachment archive
+  restore <backup>       recreate the database, pg_restore in parallel, restore attachments,
+                         then compare row counts with the manifest
+
+By default pg_dump/pg_restore/psql run inside the compose "postgres" service
+and attachments are read from the "app" service (/app/uploads), like the
+shell scripts. --local uses local client tools against DATABASE_URL and a
+local --attachments-dir instead.
+
+Usage:
+  python3 scripts/deployment/backup.py backup --jobs 4
+  python3 scripts/deployment/backup.py backup --local --attachments-dir /var/moss/uploads --compress zstd:3
+  python3 scripts/deployment/backup.py verify backups/moss_backup_20251012_143000
+  python3 scripts/deployment/backup.py restore backups/moss_backup_20251012_143000 --jobs 8
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tarfile
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlparse, urlunparse
+
+CHUNK = 1024 * 1024
+BACKUP_PREFIX = 'moss_backup_'
+CONTAINER_TMP = '/tmp'
+ATTACHMENTS_ARCHIVE = 'attachments.tar.gz'
+
+# pg_dump / pg_restore --verbose progress lines used for per-table timings
+TABLE_START = [
+    re.compile(r'dumping contents of table "(?:[^".]+\.)?([^"]+)"'),
+    re.compile(r'launching item \d+ TABLE DATA (?:\S+ )?(\S+)'),
+    re.compile(r'processing data for table "(?:[^".]+\.)?([^"]+)"'),
+]
+TABLE_DONE = re.compile(r'finished item \d+ TABLE DATA (?:\S+ )?(\S+)')
+TOC_TABLE_DATA = re.compile(r'^(\d+); \d+ \d+ TABLE DATA (\S+) (\S+)')
+
+
+def load_env_file(path='.env.production'):
+    """Same as backup.sh: export KEY=VALUE lines that are not already set"""
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#') and '=' in line:
+                key, _, value = line.partition('=')
+                os.environ.setdefault(key.strip(), value.strip().strip('"\''))
+
+
+def mb(size):
+    return round(size / 1024 / 1024, 2)
+
+
+def rate(size, seconds):
+    return round(size / 1024 / 1024 / seconds, 2) if seconds > 0 else None
+
+
+def log(message):
+    print(message, flush=True)
+
+
+# ----------------------------------------------------------------------------
+# Where the tools run
+# ----------------------------------------------------------------------------
+
+class Target:
+    """Builds pg tool / tar commands for either the compose services or the local host"""
+
+    def __init__(self, args):
+        self.local = args.local
+        self.db_service = args.db_service
+        self.app_service = args.app_service
+        self.attachments_dir = args.attachments_dir or ('/var/moss/uploads' if args.local else '/app/uploads')
+        if self.local:
+            self.database_url = args.database_url or os.environ.get('DATABASE_URL')
+            if not self.database_url:
+                raise SystemExit('DATABASE_URL is not set (pass --database-url or export DATABASE_URL)')
+            self.database = urlparse(self.database_url).path.lstrip('/')
+        else:
+            self.user = os.environ.get('POSTGRES_USER', 'moss')
+            self.database = os.environ.get('POSTGRES_DB', 'moss')
+
+    def pg(self, tool, *args, database=None):
+        database = database or self.database
+        if self.local:
+            url = urlunparse(urlparse(self.database_url)._replace(path=f'/{database}'))
+            return [tool, '--dbname', url, *args]
+        return ['docker', 'compose', 'exec', '-T', self.db_service, tool, '-U', self.user, '--dbname', database, *args]
+
+    def pg_restore_list(self, dump_dir):
+        if self.local:
+            return ['pg_restore', '--list', dump_dir]
+        return ['docker', 'compose', 'exec', '-T', self.db_service, 'pg_restore', '--list', dump_dir]
+
+    def in_db_container(self, *args):
+        return ['docker', 'compose', 'exec', '-T', self.db_service, *args]
+
+    def tar_create(self):
+        command = ['tar', 'cf', '-', '-C', self.attachments_dir, '.']
+        return command if self.local else ['docker', 'compose', 'exec', '-T', self.app_service, *command]
+
+    def tar_extract(self):
+        command = ['tar', 'xf', '-', '-C', self.attachments_dir]
+        if self.local:
+            os.makedirs(self.attachments_dir, exist_ok=True)
+            return command
+        return ['docker', 'compose', 'exec', '-T', self.app_service, *command]
+
+    def psql(self, sql, database=None):
+        proc = subprocess.run(self.pg('psql', '-Atq', '-v', 'ON_ERROR_STOP=1', '-c', sql, database=database),
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise SystemExit(f'psql failed: {proc.stderr.strip()}')
+        return [line.split('|') for line in proc.stdout.splitlines() if line]
+
+
+def table_stats(target):
+    """Exact row counts and on-disk size for every table in the public schema"""
+    tables = [row[0] for row in target.psql(
+        "SELECT tablename FROM pg_tables WHERE schemaname = 'public' ORDER BY tablename")]
+    if not tables:
+        return {}
+    counts = ' UNION ALL '.join(
+        f"SELECT '{name}', count(*), pg_total_relation_size('public.\"{name}\"') FROM public.\"{name}\""
+        for name in tables)
+    return {name: {'rows': int(rows), 'size_bytes': int(size)} for name, rows, size in target.psql(counts)}
+
+
+def run_timed(command, label):
+    """Run a pg tool with --verbose, timing TABLE DATA items from its progress lines"""
+    started, tables, tail = {}, {}, []
+    start = time.monotonic()
+    proc = subprocess.Popen(command, stderr=subprocess.PIPE, text=True)
+    for line in proc.stderr:
+        now = time.monotonic() - start
+        tail = (tail + [line.rstrip()])[-20:]
+        for pattern in TABLE_START:
+            match = pattern.search(line)
+            if match:
+                started.setdefault(match.group(1), now)
+        match = TABLE_DONE.search(line)
+        if match and match.group(1) in started:
+            tables[match.group(1)] = round(now - started[match.group(1)], 3)
+    proc.wait()
+    elapsed = time.monotonic() - start
+    if proc.returncode != 0:
+        raise SystemExit(f'{label} failed (exit {proc.returncode}):\n' + '\n'.join(tail))
+    # Serial runs print no "finished item" lines; a table ends when the next starts
+    if not tables and started:
+        ordered = sorted(started.items(), key=lambda item: item[1])
+        for (name, at), (_, following) in zip(ordered, ordered[1:] + [(None, elapsed)]):
+            tables[name] = round(following - at, 3)
+    return elapsed, tables
+
+
+def dump_files(dump_dir, toc_listing):
+    """Map table name -> compressed bytes of its data file in a directory-format dump"""
+    ids = {}
+    for line in toc_listing.splitlines():
+        match = TOC_TABLE_DATA.match(line)
+        if match:
+            ids[match.group(1)] = match.group(3)
+    sizes = {}
+    for name in os.listdir(dump_dir):
+        dump_id = name.split('.', 1)[0]
+        if dump_id in ids:
+            sizes[ids[dump_id]] = sizes.get(ids[dump_id], 0) + os.path.getsize(os.path.join(dump_dir, name))
+    return sizes
+
+
+def sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def checksums(backup_dir):
+    files = {}
+    for root, _, names in os.walk(backup_dir):
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, backup_dir)
+            if relative != 'manifest.json':
+                files[relative] = {'bytes': os.path.getsize(path), 'sha256': sha256(path)}
+    return files
+
+
+def append_history(backup_root, entry):
+    with open(os.path.join(backup_root, 'history.jsonl'), 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+
+
+# ----------------------------------------------------------------------------
+# Attachments
+# ----------------------------------------------------------------------------
+
+def backup_attachments(target, archive_path, result):
+    """Stream a tar of the uploads directory through gzip; runs on a thread next to pg_dump"""
+    start = time.monotonic()
+    proc = subprocess.Popen(target.tar_create(), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    raw = 0
+    with gzip.open(archive_path, 'wb', compresslevel=6) as out:
+        for chunk in iter(lambda: proc.stdout.read(CHUNK), b''):
+            out.write(chunk)
+            raw += len(chunk)
+    stderr = proc.stderr.read().decode(errors='replace')
+    proc.wait()
+    elapsed = time.monotonic() - start
+    result.update({
+        'ok': proc.returncode == 0,
+        'error': stderr.strip()[-500:] if proc.returncode else None,
+        'raw_bytes': raw,
+        'archive_bytes': os.path.getsize(archive_path),
+        'seconds': round(elapsed, 2),
+        'mb_per_s': rate(raw, elapsed),
+    })
+
+
+def restore_attachments(target, archive_path):
+    start = time.monotonic()
+    proc = subprocess.Popen(target.tar_extract(), stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    raw = 0
+    with gzip.open(archive_path, 'rb') as source:
+        for chunk in iter(lambda: source.read(CHUNK), b''):
+            proc.stdin.write(chunk)
+            raw += len(chunk)
+    proc.stdin.close()
+    stderr = proc.stderr.read().decode(errors='replace')
+    proc.wait()
+    if proc.returncode != 0:
+        raise SystemExit(f'Attachment restore failed: {stderr.strip()[-500:]}')
+    elapsed = time.monotonic() - start
+    return {'raw_bytes': raw, 'seconds': round(elapsed, 2), 'mb_per_s': rate(raw, elapsed)}
+
+
+# ----------------------------------------------------------------------------
+# Commands
+# ----------------------------------------------------------------------------
+
+def backup(args, target):
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    name = f'{BACKUP_PREFIX}{timestamp}'
+    backup_dir = os.path.join(args.backup_dir, name)
+    dump_dir = os.path.join(backup_dir, 'db')
+    os.makedirs(backup_dir)
+
+    log(f'Backing up {target.database} to {backup_dir} ({args.jobs} jobs, compression {args.compress})')
+    stats = table_stats(target)
+    database_bytes = int(target.psql('SELECT pg_database_size(current_database())')[0][0])
+
+    attachments = {}
+    thread = None
+    if not args.skip_attachments:
+        thread = threading.Thread(target=backup_attachments,
+                                  args=(target, os.path.join(backup_dir, ATTACHMENTS_ARCHIVE), attachments))
+        thread.start()
+
+    start = time.monotonic()
+    remote_dir = f'{CONTAINER_TMP}/{name}'
+    output = dump_dir if target.local else remote_dir
+    elapsed, table_seconds = run_timed(
+        target.pg('pg_dump', '--format=directory', f'--jobs={args.jobs}', f'--compress={args.compress}',
+                  '--verbose', '--file', output), 'pg_dump')
+    toc = subprocess.run(target.pg_restore_list(output), capture_output=True, text=True)
+    if not target.local:
+        subprocess.run(['docker', 'compose', 'cp', f'{target.db_service}:{remote_dir}', dump_dir], check=True)
+        subprocess.run(target.in_db_container('rm', '-rf', remote_dir), check=True)
+    file_sizes = dump_files(dump_dir, toc.stdout) if toc.returncode == 0 else {}
+
+    if thread:
+        thread.join()
+        if not attachments.get('ok'):
+            log(f"WARNING: attachment backup failed: {attachments.get('error')}")
+    total = time.monotonic() - start
+
+    tables = {
+        table: {
+            'rows': stat['rows'],
+            'size_bytes': stat['size_bytes'],
+            'dump_bytes': file_sizes.get(table),
+            'dump_seconds': table_seconds.get(table),
+            'mb_per_s': rate(stat['size_bytes'], table_seconds.get(table) or 0),
+        } for table, stat in stats.items()
+    }
+    dump_bytes = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(dump_dir)
+                     for name in names)
+    manifest = {
+        'name': name,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'database': target.database,
+        'database_bytes': database_bytes,
+        'jobs': args.jobs,
+        'compress': args.compress,
+        'dump_seconds': round(elapsed, 2),
+        'dump_mb_per_s': rate(database_bytes, elapsed),
+        'dump_bytes': dump_bytes,
+        'total_seconds': round(total, 2),
+        'tables': tables,
+        'attachments': attachments or None,
+        'files': checksums(backup_dir),
+    }
+    with open(os.path.join(backup_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    print_tables(tables, 'dump_seconds', args.top)
+    log(f'\nDatabase: {mb(database_bytes)} MB in {elapsed:.1f}s ({manifest["dump_mb_per_s"]} MB/s), '
+        f'dump {mb(dump_bytes)} MB')
+    if attachments:
+        log(f"Attachments: {mb(attachments['raw_bytes'])} MB -> {mb(attachments['archive_bytes'])} MB "
+            f"in {attachments['seconds']}s ({attachments['mb_per_s']} MB/s)")
+    log(f'Backup window: {total:.1f}s')
+
+    append_history(args.backup_dir, {
+        'action': 'backup', 'name': name, 'at': manifest['created_at'], 'jobs': args.jobs,
+        'database_mb': mb(database_bytes), 'attachments_mb': mb(attachments.get('raw_bytes', 0)),
+        'seconds': round(total, 2), 'db_mb_per_s': manifest['dump_mb_per_s'],
+    })
+    prune(args.backup_dir, args.retention_days)
+    return backup_dir
+
+
+def prune(backup_root, retention_days):
+    cutoff = datetime.now() - timedelta(days=retention_days)
+    removed = 0
+    for name in os.listdir(backup_root):
+        path = os.path.join(backup_root, name)
+        if name.startswith(BACKUP_PREFIX) and datetime.fromtimestamp(os.path.getmtime(path)) < cutoff:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+            removed += 1
+    if removed:
+        log(f'Removed {removed} backups older than {retention_days} days')
+
+
+def load_manifest(backup_dir):
+    path = os.path.join(backup_dir, 'manifest.json')
+    if not os.path.exists(path):
+        raise SystemExit(f'No manifest.json in {backup_dir} (was it written by backup.py?)')
+    with open(path) as f:
+        return json.load(f)
+
+
+def verify(args, target, backup_dir=None):
+    backup_dir = backup_dir or args.backup
+    manifest = load_manifest(backup_dir)
+    problems = []
+
+    start = time.monotonic()
+    for relative, expected in manifest['files'].items():
+        path = os.path.join(backup_dir, relative)
+        if not os.path.exists(path):
+            problems.append(f'missing {relative}')
+        elif os.path.getsize(path) != expected['bytes'] or sha256(path) != expected['sha256']:
+            problems.append(f'checksum mismatch {relative}')
+    log(f"Checksums: {len(manifest['files'])} files in {time.monotonic() - start:.1f}s")
+
+    dump_dir = os.path.join(backup_dir, 'db')
+    if shutil.which('pg_restore'):
+        toc = subprocess.run(['pg_restore', '--list', dump_dir], capture_output=True, text=True)
+        if toc.returncode != 0:
+            problems.append(f'pg_restore cannot read the dump: {toc.stderr.strip()[-300:]}')
+        else:
+            in_dump = {match.group(3) for match in map(TOC_TABLE_DATA.match, toc.stdout.splitlines()) if match}
+            missing = sorted(set(manifest['tables']) - in_dump)
+            if missing:
+                problems.append(f'tables without data in the dump: {", ".join(missing)}')
+    else:
+        log('pg_restore not found locally; skipping the TOC check')
+
+    archive = os.path.join(backup_dir, ATTACHMENTS_ARCHIVE)
+    if os.path.exists(archive):
+        try:
+            with tarfile.open(archive, 'r|gz') as tar:
+                members = sum(1 for member in tar if member.isfile())
+            log(f'Attachments archive: {members} files readable')
+        except (tarfile.TarError, OSError, EOFError) as e:
+            problems.append(f'attachment archive unreadable: {e}')
+
+    for problem in problems:
+        log(f'FAIL: {problem}')
+    log('Verification passed' if not problems else f'Verification failed ({len(problems)} problems)')
+    return not problems
+
+
+def restore(args, target):
+    backup_dir = args.backup
+    manifest = load_manifest(backup_dir)
+    if not verify(args, target, backup_dir) and not args.force:
+        raise SystemExit('Refusing to restore an unverified backup (use --force to override)')
+
+    log(f"\nWARNING: this will OVERWRITE database '{target.database}' with {manifest['name']}")
+    if not args.yes and input('Are you sure you want to continue? (yes/no): ') != 'yes':
+        log('Restore cancelled.')
+        return
+
+    stop_app = not target.local and not args.keep_app_running
+    if stop_app:
+        log('Stopping application...')
+        subprocess.run(['docker', 'compose', 'stop', target.app_service], check=True)
+    try:
+        start = time.monotonic()
+        log('Recreating database...')
+        target.psql(f'DROP DATABASE IF EXISTS "{target.database}" WITH (FORCE)', database='postgres')
+        target.psql(f'CREATE DATABASE "{target.database}"', database='postgres')
+
+        dump_dir = os.path.join(backup_dir, 'db')
+        source = dump_dir
+        if not target.local:
+            source = f"{CONTAINER_TMP}/{manifest['name']}"
+            subprocess.run(['docker', 'compose', 'cp', dump_dir, f'{target.db_service}:{source}'], check=True)
+        log(f'Restoring with {args.jobs} jobs...')
+        elapsed, table_seconds = run_timed(
+            target.pg('pg_restore', f'--jobs={args.jobs}', '--no-owner', '--exit-on-error', '--verbose', source),
+            'pg_restore')
+        if not target.local:
+            subprocess.run(target.in_db_container('rm', '-rf', source), check=True)
+        target.psql('ANALYZE')
+
+        attachments = None
+        archive = os.path.join(backup_dir, ATTACHMENTS_ARCHIVE)
+        if os.path.exists(archive) and not args.skip_attachments:
+            log(f'Restoring attachments to {target.attachments_dir}...')
+            attachments = restore_attachments(target, archive)
+        total = time.monotonic() - start
+    finally:
+        if stop_app:
+            log('Restarting application...')
+            subprocess.run(['docker', 'compose', 'start', target.app_service], check=False)
+
+    restored = table_stats(target)
+    mismatches = {table: {'expected': expected['rows'], 'restored': restored.get(table, {}).get('rows')}
+                  for table, expected in manifest['tables'].items()
+                  if restored.get(table, {}).get('rows') != expected['rows']}
+    tables = {table: {**expected, 'restore_seconds': table_seconds.get(table),
+                      'mb_per_s': rate(expected['size_bytes'], table_seconds.get(table) or 0)}
+              for table, expected in manifest['tables'].items()}
+    print_tables(tables, 'restore_seconds', args.top)
+    log(f"\nDatabase: {mb(manifest['database_bytes'])} MB restored in {elapsed:.1f}s "
+        f"({rate(manifest['database_bytes'], elapsed)} MB/s)")
+    if attachments:
+        log(f"Attachments: {mb(attachments['raw_bytes'])} MB in {attachments['seconds']}s "
+            f"({attachments['mb_per_s']} MB/s)")
+    log(f'RTO (drop to verified data): {total:.1f}s')
+    for table, counts in sorted(mismatches.items()):
+        log(f"FAIL: {table} has {counts['restored']} rows, manifest says {counts['expected']}")
+    log('Row counts match the manifest' if not mismatches else f'{len(mismatches)} tables differ')
+
+    append_history(os.path.dirname(os.path.abspath(backup_dir)), {
+        'action': 'restore', 'name': manifest['name'], 'at': datetime.now().isoformat(timespec='seconds'),
+        'jobs': args.jobs, 'database_mb': mb(manifest['database_bytes']),
+        'attachments_mb': mb(attachments['raw_bytes']) if attachments else 0, 'seconds': round(total, 2),
+        'db_mb_per_s': rate(manifest['database_bytes'], elapsed), 'row_mismatches': len(mismatches),
+    })
+    if mismatches:
+        sys.exit(1)
+
+
+def print_tables(tables, seconds_key, top):
+    rows = sorted(tables.items(), key=lambda item: -(item[1].get(seconds_key) or 0))[:top]
+    log(f"\n{'table':<40} {'rows':>12} {'size MB':>10} {'seconds':>9} {'MB/s':>8}")
+    for table, stat in rows:
+        seconds = stat.get(seconds_key)
+        log(f"{table:<40} {stat['rows']:>12,} {mb(stat['size_bytes']):>10} "
+            f"{seconds if seconds is not None else '-':>9} {stat['mb_per_s'] or '-':>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['backup', 'verify', 'restore'])
+    parser.add_argument('backup', nargs='?', help='Backup directory (verify / restore)')
+    parser.add_argument('--backup-dir', default=os.environ.get('BACKUP_DIR', './backups'),
+                        help='Where backups are written (env BACKUP_DIR)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 4, help='Parallel dump/restore workers')
+    parser.add_argument('--compress', default='6',
+                        help='pg_dump --compress value, e.g. 6 or zstd:3 (PostgreSQL 16 client tools)')
+    parser.add_argument('--retention-days', type=int, default=int(os.environ.get('RETENTION_DAYS', '30')),
+                        help='Delete backups older than this (env RETENTION_DAYS)')
+    parser.add_argument('--local', action='store_true', help='Use local client tools and DATABASE_URL')
+    parser.add_argument('--database-url', help='Connection string for --local (default: DATABASE_URL)')
+    parser.add_argument('--db-service', default='postgres', help='Compose service running PostgreSQL')
+    parser.add_argument('--app-service', default='app', help='Compose service holding the uploads volume')
+    parser.add_argument('--attachments-dir',
+                        help='Local storage path (default /app/uploads in the app service, /var/moss/uploads locally)')
+    parser.add_argument('--skip-attachments', action='store_true', help='Database only')
+    parser.add_argument('--top', type=int, default=20, help='Tables to list in the timing table')
+    parser.add_argument('--yes', action='store_true', help='Restore without the confirmation prompt')
+    parser.add_argument('--force', action='store_true', help='Restore even if verification fails')
+    parser.add_argument('--keep-app-running', action='store_true', help='Do not stop the app service during restore')
+    args = parser.parse_args()
+
+    load_env_file()
+    if args.command != 'backup' and not args.backup:
+        parser.error(f'{args.command} needs a backup directory')
+    target = Target(args)
+
+    if args.command == 'backup':
+        os.makedirs(args.backup_dir, exist_ok=True)
+        backup_dir = backup(args, target)
+        log('')
+        if not verify(args, target, backup_dir):
+            sys.exit(1)
+    elif args.command == 'verify':
+        if not verify(args, target):
+            sys.exit(1)
+    else:
+        restore(args, target)
+
+
+if __name__ == '__main__':
+    main()
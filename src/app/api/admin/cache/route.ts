@@ -0,0 +1,112 @@
+/**
+ * API Route: /api/admin/cache
+ * In-memory API cache statistics and controls
+ * Requires admin or super_admin role
+ */
+
+import { NextRequest, NextResponse } from 'next/server'
+import { z } from 'zod'
+import { auth, hasRole } from '@/lib/auth'
+import { cache } from '@/lib/cache'
+import { logAdminAction, getIPAddress, getUserAgent } from '@/lib/adminAuth'
+import { parseRequestBody } from '@/lib/api'
+
+const CacheActionSchema = z.object({
+  action: z.enum(['reset_stats', 'clear', 'enable', 'disable']),
+})
+
+/**
+ * GET /api/admin/cache
+ * Returns hit/miss/eviction/expiry counters per key prefix
+ * Pass ?keys=true to include the list of cached keys
+ */
+export async function GET(request: NextRequest) {
+  try {
+    const session = await auth()
+    if (!session?.user) {
+      return NextResponse.json({ success: false, message: 'Unauthorized' }, { status: 401 })
+    }
+    if (!hasRole(session.user.role, 'admin')) {
+      return NextResponse.json(
+        { success: false, message: 'Admin access required' },
+        { status: 403 }
+      )
+    }
+
+    const stats = cache.stats()
+    const includeKeys = request.nextUrl.searchParams.get('keys') === 'true'
+
+    return NextResponse.json({
+      success: true,
+      data: { ...stats, keys: includeKeys ? stats.keys : undefined },
+    })
+  } catch (error) {
+    console.error('Error getting cache stats:', error)
+    return NextResponse.json(
+      { success: false, message: 'Failed to get cache stats' },
+      { status: 500 }
+    )
+  }
+}
+
+/**
+ * POST /api/admin/cache
+ * Body: { action: 'reset_stats' | 'clear' | 'enable' | 'disable' }
+ */
+export async function POST(request: NextRequest) {
+  try {
+    const session = await auth()
+    if (!session?.user) {
+      return NextResponse.json({ success: false, message: 'Unauthorized' }, { status: 401 })
+    }
+    if (!hasRole(session.user.role, 'admin')) {
+      return NextResponse.json(
+        { success: false, message: 'Admin access required' },
+        { status: 403 }
+      )
+    }
+
+    const parseResult = await parseRequestBody(request)
+    if (!parseResult.success) {
+      return parseResult.response
+    }
+
+    const validation = CacheActionSchema.safeParse(parseResult.data)
+    if (!validation.success) {
+      return NextResponse.json(
+        { success: false, message: 'Validation failed', details: validation.error.format() },
+        { status: 400 }
+      )
+    }
+
+    const { action } = validation.data
+    switch (action) {
+      case 'reset_stats':
+        cache.resetStats()
+        break
+      case 'clear':
+        cache.clear()
+        break
+      case 'enable':
+        cache.setEnabled(true)
+        break
+      case 'disable':
+        cache.setEnabled(false)
+        break
+    }
+
+    await logAdminAction({
+      user_id: session.user.id,
+      action: `cache_${action}`,
+      category: 'system',
+      details: { action },
+      ip_address: getIPAddress(request.headers),
+      user_agent: getUserAgent(request.headers),
+    })
+
+    return NextResponse.json({ success: true, data: { ...cache.stats(), keys: undefined } })
+  } catch (error) {
+    console.error('Error updating cache:', error)
+    return NextResponse.json({ success: false, message: 'Failed to update cache' }, { status: 500 })
+  }
+}
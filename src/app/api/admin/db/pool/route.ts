@@ -0,0 +1,85 @@
+/**
+ * API Route: /api/admin/db/pool
+ * Database connection pool telemetry
+ * Requires admin or super_admin role
+ */
+
+import { NextRequest, NextResponse } from 'next/server'
+import { z } from 'zod'
+import { auth, hasRole } from '@/lib/auth'
+import { getPool } from '@/lib/db'
+import { getPoolTelemetry, resetPoolTelemetry } from '@/lib/dbTelemetry'
+import { parseRequestBody } from '@/lib/api'
+
+const PoolActionSchema = z.object({
+  action: z.enum(['reset_stats']),
+})
+
+/**
+ * GET /api/admin/db/pool
+ * Returns in-use/idle/waiting gauges, acquire-wait and hold-time histograms,
+ * and acquisition timeouts/errors since the last reset
+ */
+export async function GET(_request: NextRequest) {
+  try {
+    const session = await auth()
+    if (!session?.user) {
+      return NextResponse.json({ success: false, message: 'Unauthorized' }, { status: 401 })
+    }
+    if (!hasRole(session.user.role, 'admin')) {
+      return NextResponse.json(
+        { success: false, message: 'Admin access required' },
+        { status: 403 }
+      )
+    }
+
+    return NextResponse.json({ success: true, data: getPoolTelemetry(getPool()) })
+  } catch (error) {
+    console.error('Error getting pool telemetry:', error)
+    return NextResponse.json(
+      { success: false, message: 'Failed to get pool telemetry' },
+      { status: 500 }
+    )
+  }
+}
+
+/**
+ * POST /api/admin/db/pool
+ * Body: { action: 'reset_stats' }
+ */
+export async function POST(request: NextRequest) {
+  try {
+    const session = await auth()
+    if (!session?.user) {
+      return NextResponse.json({ success: false, message: 'Unauthorized' }, { status: 401 })
+    }
+    if (!hasRole(session.user.role, 'admin')) {
+      return NextResponse.json(
+        { success: false, message: 'Admin access required' },
+        { status: 403 }
+      )
+    }
+
+    const parseResult = await parseRequestBody(request)
+    if (!parseResult.success) {
+      return parseResult.response
+    }
+
+    const validation = PoolActionSchema.safeParse(parseResult.data)
+    if (!validation.success) {
+      return NextResponse.json(
+        { success: false, message: 'Validation failed', details: validation.error.format() },
+        { status: 400 }
+      )
+    }
+
+    resetPoolTelemetry()
+    return NextResponse.json({ success: true, data: getPoolTelemetry(getPool()) })
+  } catch (error) {
+    console.error('Error resetting pool telemetry:', error)
+    return NextResponse.json(
+      { success: false, message: 'Failed to reset pool telemetry' },
+      { status: 500 }
+    )
+  }
+}
@@ -1,11 +1,22 @@
 /**
  * Dashboard Stats API Route
  * Returns quick stats for dashboard widgets
+ *
+ * Count modes (DASHBOARD_COUNT_MODE, or ?mode= per request):
+ * - exact: COUNT(*) per table (default; cost grows with table size)
+ * - estimated: planner statistics (pg_class.reltuples scaled to the current
+ *   relation size), one catalog query regardless of table size. Tables that
+ *   have never been analyzed fall back to COUNT(*)
+ * - cached: exact counts reused for DASHBOARD_STATS_TTL seconds (default 30)
+ *
+ * The X-Count-Mode response header reports the mode used; cached responses
+ * also carry X-Count-Age (seconds since the counts were taken).
  */
 
 import { NextRequest, NextResponse } from 'next/server'
 import { auth } from '@/lib/auth'
 import { getPool } from '@/lib/db'
+import { cache } from '@/lib/cache'
 
 interface DashboardStats {
   devices: number
@@ -18,48 +29,93 @@ interface DashboardStats {
   contracts: number
 }
 
-export async function GET(_request: NextRequest) {
+type CountMode = 'exact' | 'estimated' | 'cached'
+
+const COUNT_MODES: CountMode[] = ['exact', 'estimated', 'cached']
+
+const STATS_TABLES: (keyof DashboardStats)[] = [
+  'devices',
+  'people',
+  'locations',
+  'networks',
+  'software',
+  'saas_services',
+  'documents',
+  'contracts',
+]
+
+const CACHE_KEY = 'dashboard:stats'
+
+function resolveMode(request: NextRequest): CountMode {
+  const requested = request.nextUrl.searchParams.get('mode') || process.env.DASHBOARD_COUNT_MODE
+  return COUNT_MODES.includes(requested as CountMode) ? (requested as CountMode) : 'exact'
+}
+
+function toStats(counts: number[]): DashboardStats {
+  return Object.fromEntries(
+    STATS_TABLES.map((table, i) => [table, counts[i]])
+  ) as unknown as DashboardStats
+}
+
+async function exactCount(table: keyof DashboardStats): Promise<number> {
+  const result = await getPool().query(`SELECT COUNT(*) as count FROM ${table}`)
+  return parseInt(result.rows[0].count)
+}
+
+async function exactCounts(): Promise<DashboardStats> {
+  // Query all counts in parallel for better performance
+  const counts = await Promise.all(STATS_TABLES.map(exactCount))
+  return toStats(counts)
+}
+
+async function estimatedCounts(): Promise<DashboardStats> {
+  // Same extrapolation the planner uses: tuples per page at the last ANALYZE times current pages
+  const result = await getPool().query<{ relname: keyof DashboardStats; estimate: string | null }>(
+    `SELECT relname,
+       CASE WHEN reltuples < 0 OR relpages = 0 THEN NULL
+            ELSE (reltuples / relpages
+                  * (pg_relation_size(oid) / current_setting('block_size')::int))::bigint
+       END AS estimate
+     FROM pg_class
+     WHERE oid = ANY($1::regclass[])`,
+    [STATS_TABLES]
+  )
+  const estimates = new Map(result.rows.map((row) => [row.relname, row.estimate]))
+  const counts = await Promise.all(
+    STATS_TABLES.map((table) => {
+      const estimate = estimates.get(table)
+      return estimate === null || estimate === undefined ? exactCount(table) : parseInt(estimate)
+    })
+  )
+  return toStats(counts)
+}
+
+export async function GET(request: NextRequest) {
   try {
     const session = await auth()
     if (!session?.user) {
       return NextResponse.json({ error: 'Unauthorized' }, { status: 401 })
     }
 
-    const pool = getPool()
-
-    // Query all counts in parallel for better performance
-    const [
-      devicesResult,
-      peopleResult,
-      locationsResult,
-      networksResult,
-      softwareResult,
-      saasResult,
-      documentsResult,
-      contractsResult,
-    ] = await Promise.all([
-      pool.query('SELECT COUNT(*) as count FROM devices'),
-      pool.query('SELECT COUNT(*) as count FROM people'),
-      pool.query('SELECT COUNT(*) as count FROM locations'),
-      pool.query('SELECT COUNT(*) as count FROM networks'),
-      pool.query('SELECT COUNT(*) as count FROM software'),
-      pool.query('SELECT COUNT(*) as count FROM saas_services'),
-      pool.query('SELECT COUNT(*) as count FROM documents'),
-      pool.query('SELECT COUNT(*) as count FROM contracts'),
-    ])
+    const mode = resolveMode(request)
+    const headers: Record<string, string> = { 'X-Count-Mode': mode }
+    let stats: DashboardStats
 
-    const stats: DashboardStats = {
-      devices: parseInt(devicesResult.rows[0].count),
-      people: parseInt(peopleResult.rows[0].count),
-      locations: parseInt(locationsResult.rows[0].count),
-      networks: parseInt(networksResult.rows[0].count),
-      software: parseInt(softwareResult.rows[0].count),
-      saas_services: parseInt(saasResult.rows[0].count),
-      documents: parseInt(documentsResult.rows[0].count),
-      contracts: parseInt(contractsResult.rows[0].count),
+    if (mode === 'estimated') {
+      stats = await estimatedCounts()
+    } else if (mode === 'cached') {
+      let entry = cache.get<{ stats: DashboardStats; takenAt: number }>(CACHE_KEY)
+      if (!entry) {
+        entry = { stats: await exactCounts(), takenAt: Date.now() }
+        cache.set(CACHE_KEY, entry, parseInt(process.env.DASHBOARD_STATS_TTL || '30'))
+      }
+      stats = entry.stats
+      headers['X-Count-Age'] = ((Date.now() - entry.takenAt) / 1000).toFixed(1)
+    } else {
+      stats = await exactCounts()
     }
 
-    return NextResponse.json(stats)
+    return NextResponse.json(stats, { headers })
   } catch (error) {
     console.error('Error fetching dashboard stats:', error)
     return NextResponse.json({ error: 'Failed to fetch dashboard stats' }, { status: 500 })
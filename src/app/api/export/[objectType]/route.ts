@@ -5,10 +5,67 @@
  */
 
 import { NextRequest, NextResponse } from 'next/server'
-import { query } from '@/lib/db'
-import { exportToCSV, ExportColumn, formatDate, formatDateTime } from '@/lib/bulk/csvExport'
+import { getClient } from '@/lib/db'
+import { createCSVStream, ExportColumn, formatDate, formatDateTime } from '@/lib/bulk/csvExport'
 import { errorResponse } from '@/lib/api'
 
+/**
+ * Rows fetched per cursor round trip while streaming an export
+ */
+const EXPORT_BATCH_SIZE = 1000
+
+/**
+ * Fetch query results in batches through a server-side cursor
+ * Holds one pooled client for the duration of the export and releases it when
+ * the generator finishes, fails, or is closed early by a cancelled stream
+ */
+async function* fetchInBatches(
+  sql: string,
+  params: unknown[]
+): AsyncGenerator<Record<string, unknown>[]> {
+  const client = await getClient()
+  let open = false
+
+  try {
+    await client.query('BEGIN')
+    open = true
+    await client.query(`DECLARE export_cursor NO SCROLL CURSOR FOR ${sql}`, params)
+
+    while (true) {
+      const batch = await client.query(`FETCH ${EXPORT_BATCH_SIZE} FROM export_cursor`)
+      if (batch.rows.length === 0) break
+      yield batch.rows
+    }
+
+    await client.query('COMMIT')
+    open = false
+  } finally {
+    // Reached on errors and on early return() when the client disconnects
+    if (open) {
+      await client.query('ROLLBACK').catch(() => undefined)
+    }
+    client.release()
+  }
+}
+
+/**
+ * Re-attach an already fetched first batch in front of the remaining batches
+ * Closing this generator early (a cancelled stream) also closes `rest`, even
+ * while paused on the first batch, so its cursor and client are released
+ */
+async function* withFirstBatch(
+  first: IteratorResult<Record<string, unknown>[]>,
+  rest: AsyncGenerator<Record<string, unknown>[]>
+): AsyncGenerator<Record<string, unknown>[]> {
+  try {
+    if (first.done) return
+    yield first.value
+    yield* rest
+  } finally {
+    await rest.return(undefined)
+  }
+}
+
 /**
  * Object type configuration for exports
  * Defines table names, columns, and formatters
@@ -147,7 +204,7 @@ const EXPORT_CONFIGS: Record<
  * Export object data to CSV with optional filtering
  *
  * Query params: Same as list endpoints (search, filters, etc.)
- * Response: CSV file download
+ * Response: CSV file download, streamed from a cursor in EXPORT_BATCH_SIZE batches
  */
 export async function GET(
   request: NextRequest,
@@ -206,16 +263,18 @@ export async function GET(
     const whereClause = whereConditions.length > 0 ? `WHERE ${whereConditions.join(' AND ')}` : ''
     const sql = `SELECT * FROM ${config.table} ${whereClause} ORDER BY created_at DESC`
 
-    const result = await query(sql, queryParams)
+    // Fetch the first batch before responding so query errors still return a 500
+    const batches = fetchInBatches(sql, queryParams)
+    const firstBatch = await batches.next()
 
-    // 4. Convert to CSV
-    const csv = exportToCSV(result.rows, {
+    // 4. Stream CSV batch by batch instead of buffering the whole result
+    const stream = createCSVStream(withFirstBatch(firstBatch, batches), {
       columns: config.columns,
       filename: config.defaultFilename,
     })
 
     // 5. Return CSV as downloadable file
-    return new NextResponse(csv, {
+    return new NextResponse(stream, {
       status: 200,
       headers: {
         'Content-Type': 'text/csv;charset=utf-8;',
@@ -104,6 +104,59 @@ export function exportToCSV(data: Record<string, unknown>[], config: ExportConfi
   return csv
 }
 
+/**
+ * Streams CSV from batches of rows
+ *
+ * Each batch is encoded with exportToCSV() as it arrives, so memory stays
+ * bounded by the batch size rather than the full result set. The header row is
+ * written once, ahead of the first batch. Cancelling the stream (e.g. the client
+ * disconnects) closes the batch source so cursors and connections are released.
+ *
+ * @param batches - Async generator yielding arrays of rows
+ * @param config - Export configuration
+ * @returns ReadableStream of UTF-8 encoded CSV
+ *
+ * @example
+ * const stream = createCSVStream(fetchInBatches(sql, params), { columns, filename: 'devices' })
+ * return new NextResponse(stream, { headers: { 'Content-Type': 'text/csv' } })
+ */
+export function createCSVStream(
+  batches: AsyncGenerator<Record<string, unknown>[]>,
+  config: ExportConfig
+): ReadableStream<Uint8Array> {
+  const { includeHeaders = true } = config
+  const encoder = new TextEncoder()
+  let started = false
+
+  return new ReadableStream<Uint8Array>({
+    async pull(controller) {
+      try {
+        const { value, done } = await batches.next()
+
+        if (done) {
+          // Empty export still gets its header row
+          if (!started && includeHeaders) {
+            controller.enqueue(encoder.encode(exportToCSV([], config)))
+          }
+          controller.close()
+          return
+        }
+
+        if (value.length === 0) return
+
+        const chunk = exportToCSV(value, { ...config, includeHeaders: includeHeaders && !started })
+        controller.enqueue(encoder.encode((started ? '\n' : '') + chunk))
+        started = true
+      } catch (error) {
+        controller.error(error)
+      }
+    },
+    async cancel() {
+      await batches.return(undefined)
+    },
+  })
+}
+
 /**
  * Triggers a browser download of CSV data
  *
@@ -13,6 +13,10 @@
  * const data = await fetchFromDatabase();
  * cache.set('companies:list:page=1', data, 60); // Cache for 60 seconds
  * ```
+ *
+ * Hits, misses, evictions, expirations and invalidations are counted per key
+ * prefix (the first two key segments, e.g. `devices:list`) and reported by
+ * stats() so maxSize and TTLs can be sized from real traffic.
  */
 
 interface CacheEntry<T> {
@@ -21,15 +25,66 @@ interface CacheEntry<T> {
   lastAccessed: number
 }
 
+export interface CacheCounters {
+  hits: number
+  misses: number
+  sets: number
+  evictions: number
+  expirations: number
+  invalidations: number
+}
+
+export interface CachePrefixStats extends CacheCounters {
+  size: number
+  hitRate: number
+}
+
+/**
+ * Counter bucket for a key: `devices:list:page=1` -> `devices:list`
+ */
+export function cacheKeyPrefix(key: string): string {
+  return key.split(':', 2).join(':')
+}
+
+function emptyCounters(): CacheCounters {
+  return { hits: 0, misses: 0, sets: 0, evictions: 0, expirations: 0, invalidations: 0 }
+}
+
+function hitRate(counters: CacheCounters): number {
+  const lookups = counters.hits + counters.misses
+  return lookups === 0 ? 0 : counters.hits / lookups
+}
+
 class MemoryCache {
   private cache: Map<string, CacheEntry<unknown>>
   private maxSize: number
   private defaultTTL: number // seconds
+  private counters: Map<string, CacheCounters>
+  private countersSince: number
+  private enabled: boolean
 
   constructor(maxSize = 1000, defaultTTL = 60) {
     this.cache = new Map()
     this.maxSize = maxSize
     this.defaultTTL = defaultTTL
+    this.counters = new Map()
+    this.countersSince = Date.now()
+    this.enabled = true
+  }
+
+  /**
+   * Turn caching on or off at runtime (used to measure uncached latency)
+   * Disabling also clears the cache so re-enabling starts cold
+   */
+  setEnabled(enabled: boolean): void {
+    this.enabled = enabled
+    if (!enabled) {
+      this.cache.clear()
+    }
+  }
+
+  isEnabled(): boolean {
+    return this.enabled
   }
 
   /**
@@ -37,20 +92,29 @@ class MemoryCache {
    * Returns null if not found or expired
    */
   get<T>(key: string): T | null {
+    if (!this.enabled) {
+      return null
+    }
+
     const entry = this.cache.get(key) as CacheEntry<T> | undefined
+    const counters = this.countersFor(key)
 
     if (!entry) {
+      counters.misses++
       return null
     }
 
     // Check if expired
     if (Date.now() > entry.expiresAt) {
       this.cache.delete(key)
+      counters.expirations++
+      counters.misses++
       return null
     }
 
     // Update last accessed time for LRU
     entry.lastAccessed = Date.now()
+    counters.hits++
     return entry.value
   }
 
@@ -61,8 +125,12 @@ class MemoryCache {
    * @param ttl Time to live in seconds (optional, uses default if not provided)
    */
   set<T>(key: string, value: T, ttl?: number): void {
-    // Enforce max size with LRU eviction
-    if (this.cache.size >= this.maxSize) {
+    if (!this.enabled) {
+      return
+    }
+
+    // Enforce max size with LRU eviction (overwriting an existing key needs no room)
+    if (this.cache.size >= this.maxSize && !this.cache.has(key)) {
       this.evictLRU()
     }
 
@@ -73,13 +141,16 @@ class MemoryCache {
       expiresAt,
       lastAccessed: Date.now(),
     })
+    this.countersFor(key).sets++
   }
 
   /**
    * Delete a specific key from the cache
    */
   delete(key: string): void {
-    this.cache.delete(key)
+    if (this.cache.delete(key)) {
+      this.countersFor(key).invalidations++
+    }
   }
 
   /**
@@ -103,26 +174,70 @@ class MemoryCache {
       }
     }
 
-    keysToDelete.forEach((key) => this.cache.delete(key))
+    keysToDelete.forEach((key) => this.delete(key))
   }
 
   /**
    * Get cache statistics
+   * Counters cover the period since the last resetStats() (or process start)
    */
   stats(): {
+    enabled: boolean
     size: number
     maxSize: number
+    defaultTTL: number
     hitRate: number
+    totals: CacheCounters
+    prefixes: Record<string, CachePrefixStats>
+    since: string
     keys: string[]
   } {
+    const totals = emptyCounters()
+    const prefixes: Record<string, CachePrefixStats> = {}
+
+    for (const [prefix, counters] of this.counters.entries()) {
+      prefixes[prefix] = { ...counters, size: 0, hitRate: hitRate(counters) }
+      for (const name of Object.keys(totals) as (keyof CacheCounters)[]) {
+        totals[name] += counters[name]
+      }
+    }
+    for (const key of this.cache.keys()) {
+      const prefix = cacheKeyPrefix(key)
+      prefixes[prefix] = prefixes[prefix] || { ...emptyCounters(), size: 0, hitRate: 0 }
+      prefixes[prefix].size++
+    }
+
     return {
+      enabled: this.enabled,
       size: this.cache.size,
       maxSize: this.maxSize,
-      hitRate: 0, // Would need hit/miss tracking for this
+      defaultTTL: this.defaultTTL,
+      hitRate: hitRate(totals),
+      totals,
+      prefixes,
+      since: new Date(this.countersSince).toISOString(),
       keys: Array.from(this.cache.keys()),
     }
   }
 
+  /**
+   * Zero all counters (cached entries are kept)
+   */
+  resetStats(): void {
+    this.counters.clear()
+    this.countersSince = Date.now()
+  }
+
+  private countersFor(key: string): CacheCounters {
+    const prefix = cacheKeyPrefix(key)
+    let counters = this.counters.get(prefix)
+    if (!counters) {
+      counters = emptyCounters()
+      this.counters.set(prefix, counters)
+    }
+    return counters
+  }
+
   /**
    * Evict least recently used entry
    */
@@ -139,6 +254,7 @@ class MemoryCache {
 
     if (oldestKey) {
       this.cache.delete(oldestKey)
+      this.countersFor(oldestKey).evictions++
     }
   }
 
@@ -155,7 +271,10 @@ class MemoryCache {
       }
     }
 
-    keysToDelete.forEach((key) => this.cache.delete(key))
+    keysToDelete.forEach((key) => {
+      this.cache.delete(key)
+      this.countersFor(key).expirations++
+    })
   }
 }
 
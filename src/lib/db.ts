@@ -4,6 +4,8 @@
  */
 
 import { Pool, PoolClient, QueryResult } from 'pg'
+import { instrumentPool } from './dbTelemetry'
+import { instrumentSlowQueries } from './slowQueryLog'
 
 // Singleton pool instance
 let pool: Pool | null = null
@@ -21,12 +23,16 @@ export function getPool(): Pool {
 
     console.log('[DB] Creating new pool with DATABASE_URL:', dbUrl.replace(/:[^:@]+@/, ':****@'))
 
-    pool = new Pool({
-      connectionString: dbUrl,
-      max: 20, // Maximum number of clients in the pool
+    const config = {
+      max: parseInt(process.env.DB_POOL_MAX || '20', 10), // Maximum number of clients in the pool
       idleTimeoutMillis: 30000, // Close idle clients after 30 seconds
-      connectionTimeoutMillis: 2000, // Return an error after 2 seconds if connection cannot be established
-    })
+      // Return an error after 2 seconds if connection cannot be established
+      connectionTimeoutMillis: parseInt(process.env.DB_POOL_CONNECTION_TIMEOUT_MS || '2000', 10),
+    }
+
+    pool = new Pool({ connectionString: dbUrl, ...config })
+    instrumentPool(pool, config)
+    instrumentSlowQueries(pool)
 
     // Log pool errors
     pool.on('error', (err) => {
@@ -39,22 +45,14 @@ export function getPool(): Pool {
 
 /**
  * Execute a SQL query with parameters
+ * Queries slower than SLOW_QUERY_MS are logged by slowQueryLog.ts
  */
 export async function query<T extends object = Record<string, unknown>>(
   text: string,
   params?: unknown[]
 ): Promise<QueryResult<T>> {
   const pool = getPool()
-  const start = Date.now()
-  const result = await pool.query<T>(text, params)
-  const duration = Date.now() - start
-
-  // Log slow queries (> 100ms)
-  if (duration > 100) {
-    console.warn(`Slow query (${duration}ms):`, text)
-  }
-
-  return result
+  return await pool.query<T>(text, params)
 }
 
 /**
@@ -0,0 +1,183 @@
+/**
+ * Database Pool Telemetry
+ * Tracks connection acquisition on the shared pg Pool (see getPool in db.ts)
+ *
+ * Records how long callers wait for a client, how long clients are held, and
+ * how many acquisitions time out (connectionTimeoutMillis) or fail, alongside
+ * the pool's own in-use/idle/waiting gauges.
+ */
+
+import type { Pool, PoolClient } from 'pg'
+
+// Upper bounds (ms) of the histogram buckets; the last bucket is open-ended
+export const POOL_HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2000, 5000]
+
+export interface Histogram {
+  buckets: { le: number | '+Inf'; count: number }[]
+  count: number
+  sumMs: number
+  maxMs: number
+}
+
+export interface PoolConfig {
+  max: number
+  connectionTimeoutMillis: number
+  idleTimeoutMillis: number
+}
+
+export interface PoolTelemetry {
+  config: PoolConfig
+  gauges: { total: number; inUse: number; idle: number; waiting: number }
+  peaks: { inUse: number; waiting: number }
+  acquisitions: number
+  timeouts: number
+  errors: number
+  acquireWaitMs: Histogram
+  holdMs: Histogram
+  since: string
+}
+
+type ConnectCallback = (
+  err: Error | undefined,
+  client: PoolClient | undefined,
+  done: (release?: unknown) => void
+) => void
+
+class HistogramRecorder {
+  private counts = new Array<number>(POOL_HISTOGRAM_BUCKETS_MS.length + 1).fill(0)
+  private count = 0
+  private sumMs = 0
+  private maxMs = 0
+
+  record(ms: number): void {
+    let index = POOL_HISTOGRAM_BUCKETS_MS.findIndex((bound) => ms <= bound)
+    if (index === -1) {
+      index = POOL_HISTOGRAM_BUCKETS_MS.length
+    }
+    this.counts[index]++
+    this.count++
+    this.sumMs += ms
+    this.maxMs = Math.max(this.maxMs, ms)
+  }
+
+  snapshot(): Histogram {
+    return {
+      buckets: this.counts.map((count, i) => ({
+        le: i < POOL_HISTOGRAM_BUCKETS_MS.length ? POOL_HISTOGRAM_BUCKETS_MS[i] : '+Inf',
+        count,
+      })),
+      count: this.count,
+      sumMs: Math.round(this.sumMs * 100) / 100,
+      maxMs: Math.round(this.maxMs * 100) / 100,
+    }
+  }
+}
+
+let acquireWait = new HistogramRecorder()
+let hold = new HistogramRecorder()
+let acquisitions = 0
+let timeouts = 0
+let errors = 0
+let peakInUse = 0
+let peakWaiting = 0
+let since = Date.now()
+let poolConfig: PoolConfig | null = null
+const checkedOutAt = new WeakMap<PoolClient, number>()
+
+function recordAcquire(pool: Pool, waitMs: number, err?: Error): void {
+  if (err) {
+    // pg-pool reports connectionTimeoutMillis expiry with this message
+    if (/timeout exceeded when trying to connect/i.test(err.message)) {
+      timeouts++
+    } else {
+      errors++
+    }
+    return
+  }
+  acquisitions++
+  acquireWait.record(waitMs)
+  peakInUse = Math.max(peakInUse, pool.totalCount - pool.idleCount)
+}
+
+/**
+ * Wrap pool.connect() so every acquisition is timed
+ * pool.query() goes through connect() as well, so this covers all callers
+ */
+export function instrumentPool(pool: Pool, config: PoolConfig): void {
+  const connect = pool.connect.bind(pool) as (callback?: ConnectCallback) => Promise<PoolClient>
+  poolConfig = config
+
+  const instrumented = (callback?: ConnectCallback) => {
+    const start = performance.now()
+
+    const result = callback
+      ? connect((err, client, done) => {
+          recordAcquire(pool, performance.now() - start, err)
+          callback(err, client, done)
+        })
+      : connect().then(
+          (client) => {
+            recordAcquire(pool, performance.now() - start)
+            return client
+          },
+          (err: Error) => {
+            recordAcquire(pool, performance.now() - start, err)
+            throw err
+          }
+        )
+
+    // connect() queues the request synchronously when no client is free
+    peakWaiting = Math.max(peakWaiting, pool.waitingCount)
+    return result
+  }
+  pool.connect = instrumented as Pool['connect']
+
+  pool.on('acquire', (client) => {
+    checkedOutAt.set(client, performance.now())
+  })
+  pool.on('release', (_err, client) => {
+    const start = checkedOutAt.get(client)
+    if (start !== undefined) {
+      hold.record(performance.now() - start)
+      checkedOutAt.delete(client)
+    }
+  })
+}
+
+/**
+ * Current gauges plus counters since the last reset
+ */
+export function getPoolTelemetry(pool: Pool): PoolTelemetry {
+  const inUse = pool.totalCount - pool.idleCount
+
+  return {
+    config: poolConfig ?? { max: 10, connectionTimeoutMillis: 0, idleTimeoutMillis: 10000 },
+    gauges: {
+      total: pool.totalCount,
+      inUse,
+      idle: pool.idleCount,
+      waiting: pool.waitingCount,
+    },
+    peaks: { inUse: Math.max(peakInUse, inUse), waiting: peakWaiting },
+    acquisitions,
+    timeouts,
+    errors,
+    acquireWaitMs: acquireWait.snapshot(),
+    holdMs: hold.snapshot(),
+    since: new Date(since).toISOString(),
+  }
+}
+
+/**
+ * Zero counters, histograms and peaks (gauges are live values)
+ */
+export function resetPoolTelemetry(): void {
+  acquireWait = new HistogramRecorder()
+  hold = new HistogramRecorder()
+  acquisitions = 0
+  timeouts = 0
+  errors = 0
+  peakInUse = 0
+  peakWaiting = 0
+  since = Date.now()
+}
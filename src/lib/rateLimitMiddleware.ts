@@ -57,18 +57,36 @@ interface RateLimitStore {
 
 const store: RateLimitStore = {}
 
+/**
+ * Remove expired entries from the store
+ * @returns Number of entries removed
+ */
+export function cleanupRateLimitStore(): number {
+  const now = Date.now()
+  let removed = 0
+  Object.keys(store).forEach((key) => {
+    if (store[key].resetAt < now) {
+      delete store[key]
+      removed++
+    }
+  })
+  return removed
+}
+
+/**
+ * Size of the in-memory store (used by testing/perf/rate-limit-runner.ts)
+ */
+export function getRateLimitStoreStats(): { entries: number; expired: number } {
+  const now = Date.now()
+  const keys = Object.keys(store)
+  return {
+    entries: keys.length,
+    expired: keys.filter((key) => store[key].resetAt < now).length,
+  }
+}
+
 // Cleanup expired entries every 5 minutes
-setInterval(
-  () => {
-    const now = Date.now()
-    Object.keys(store).forEach((key) => {
-      if (store[key].resetAt < now) {
-        delete store[key]
-      }
-    })
-  },
-  5 * 60 * 1000
-)
+setInterval(cleanupRateLimitStore, 5 * 60 * 1000)
 
 /**
  * Custom rate limiter for Next.js API routes
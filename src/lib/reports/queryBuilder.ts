@@ -571,11 +571,14 @@ export async function executeReport(
     ${whereClause ? `WHERE ${whereClause}` : ''}
   `.trim()
 
+  // The count query has no LIMIT/OFFSET placeholders
+  const filterParams = params.slice(0, params.length - (pagination ? 2 : 0))
+
   try {
     // Execute both queries in parallel
     const [dataResult, countResult] = await Promise.all([
-      pool.query(query, params.slice(0, params.length - (pagination ? 2 : 0))),
-      pool.query(countQuery, params.slice(0, params.length - (pagination ? 2 : 0))),
+      pool.query(query, params),
+      pool.query(countQuery, filterParams),
     ])
 
     const executionTime = Date.now() - startTime
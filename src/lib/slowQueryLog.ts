@@ -0,0 +1,120 @@
+/**
+ * Slow Query Log
+ * Emits a structured record for every pool query slower than SLOW_QUERY_MS
+ *
+ * Records are written as single-line JSON prefixed with "[slow-query]" to the
+ * server log, and appended as JSON lines to SLOW_QUERY_LOG when that is set.
+ * testing/perf/slow_query_report.py aggregates them by fingerprint.
+ */
+
+import { createHash } from 'crypto'
+import { appendFile } from 'fs'
+import type { Pool, QueryResult } from 'pg'
+
+export const SLOW_QUERY_THRESHOLD_MS = parseInt(process.env.SLOW_QUERY_MS || '100', 10)
+const SLOW_QUERY_LOG = process.env.SLOW_QUERY_LOG
+const MAX_SQL_LENGTH = 2000
+
+export interface SlowQueryRecord {
+  type: 'slow_query'
+  timestamp: string
+  fingerprint: string
+  durationMs: number
+  rows: number | null
+  route: string | null
+  paramCount: number
+  sql: string
+}
+
+/**
+ * Reduce a statement to its shape: literals and bind parameters become ?,
+ * IN/VALUES lists collapse, whitespace and comments are removed
+ */
+export function normalizeSql(text: string): string {
+  return text
+    .replace(/--[^\n]*/g, ' ')
+    .replace(/\/\*[\s\S]*?\*\//g, ' ')
+    .replace(/'(?:[^']|'')*'/g, '?')
+    .replace(/\$\d+/g, '?')
+    .replace(/\b\d+(?:\.\d+)?\b/g, '?')
+    .replace(/\(\s*\?(?:\s*,\s*\?)+\s*\)/g, '(?+)')
+    .replace(/(\(\?\+\)\s*,\s*)+\(\?\+\)/g, '(?+)+')
+    .replace(/\s+/g, ' ')
+    .trim()
+    .toLowerCase()
+}
+
+export function queryFingerprint(text: string): string {
+  return createHash('sha1').update(normalizeSql(text)).digest('hex').slice(0, 16)
+}
+
+/**
+ * Find the API route in a stack trace, e.g. src/app/api/devices/[id]/route.ts -> /api/devices/[id]
+ */
+export function routeFromStack(stack: string | undefined): string | null {
+  const match = stack?.match(/app(\/api\/[^\s:)]*?)\/route\.[jt]s/)
+  return match ? match[1] : null
+}
+
+function rowCount(result: QueryResult | QueryResult[]): number | null {
+  if (Array.isArray(result)) {
+    return result.reduce((sum, r) => sum + (r.rowCount ?? 0), 0)
+  }
+  return result.rowCount ?? result.rows?.length ?? null
+}
+
+function writeRecord(record: SlowQueryRecord): void {
+  const line = JSON.stringify(record)
+  console.warn(`[slow-query] ${line}`)
+  if (SLOW_QUERY_LOG) {
+    appendFile(SLOW_QUERY_LOG, line + '\n', (err) => {
+      if (err) {
+        console.error('Failed to write slow query log:', err.message)
+      }
+    })
+  }
+}
+
+/**
+ * Time every promise-style pool.query() call and log the slow ones
+ * Callback and Submittable (cursor) forms pass through untimed
+ */
+export function instrumentSlowQueries(pool: Pool): void {
+  const poolQuery = pool.query.bind(pool) as (...args: unknown[]) => unknown
+
+  // Async so the stack captured after the await still shows the calling route
+  const timedQuery = async (text: string, values: unknown[] | undefined, args: unknown[]) => {
+    const start = performance.now()
+    const result = (await poolQuery(...args)) as QueryResult | QueryResult[]
+    const durationMs = performance.now() - start
+
+    if (durationMs > SLOW_QUERY_THRESHOLD_MS) {
+      writeRecord({
+        type: 'slow_query',
+        timestamp: new Date().toISOString(),
+        fingerprint: queryFingerprint(text),
+        durationMs: Math.round(durationMs * 10) / 10,
+        rows: rowCount(result),
+        route: routeFromStack(new Error().stack),
+        paramCount: values?.length ?? 0,
+        sql: text.replace(/\s+/g, ' ').trim().slice(0, MAX_SQL_LENGTH),
+      })
+    }
+    return result
+  }
+
+  pool.query = ((...args: unknown[]) => {
+    const [first, second] = args
+    if (typeof args[args.length - 1] === 'function') {
+      return poolQuery(...args)
+    }
+    if (typeof first === 'string') {
+      return timedQuery(first, Array.isArray(second) ? second : undefined, args)
+    }
+    if (first && typeof first === 'object' && !('submit' in first) && 'text' in first) {
+      const config = first as { text: string; values?: unknown[] }
+      return timedQuery(config.text, config.values ?? (second as unknown[] | undefined), args)
+    }
+    return poolQuery(...args)
+  }) as Pool['query']
+}
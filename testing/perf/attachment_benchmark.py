@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Attachment storage throughput benchmark
+
+Uploads files from a few KB to hundreds of MB through POST
+/api/attachments/upload and reads them back through
+/api/attachments/:id/download, at several concurrency levels, once per storage
+backend:
+  - local: LocalStorageAdapter writing under a scratch directory
+  - s3:    S3StorageAdapter against an S3-compatible endpoint; by default the
+           built-in stand-in from s3_standin.py, or MinIO etc. via --s3-endpoint
+For every backend / size / concurrency it reports MB/s per transfer and in
+aggregate, time to response headers and to the first body byte, and server
+RSS. An upload or download is classed as buffered when server RSS grows by at
+least --buffered-ratio of the bytes in flight (or, for downloads, when the
+first body byte only arrives after half the transfer time); small transfers
+are reported as inconclusive.
+
+S3 downloads return a presigned URL; the object is then fetched from the
+endpoint directly and the timings include both steps. With the stand-in, the
+S3 leg of each request (app -> stand-in) is also reported separately.
+
+The tool switches the storage.* system settings for the run (backend, local
+path, S3 endpoint/bucket/keys, max file size) and restores them afterwards.
+StorageFactory only strips the storage. prefix, so it reads storage.local_path,
+storage.s3_bucket, ... rather than the dotted keys migration 003 seeds; the
+tool writes the keys the factory reads.
+StorageFactory caches its adapter per backend name, so a server already on
+'local' keeps writing to its old path and one already on 's3' keeps its old
+endpoint; restart the server before benchmarking either backend. For local
+runs a probe upload checks that files land under the scratch directory and
+the run stops if they do not. The server must run on this host for RSS
+sampling and the scratch directory.
+
+Usage:
+  python3 testing/perf/attachment_benchmark.py
+  python3 testing/perf/attachment_benchmark.py --sizes 64KB,8MB,256MB --concurrency 1,4,16
+  python3 testing/perf/attachment_benchmark.py --backends s3 --s3-endpoint http://localhost:9000 \\
+      --s3-bucket moss --s3-access-key minioadmin --s3-secret-key minioadmin
+  python3 testing/perf/attachment_benchmark.py --cleanup
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+
+from common import (
+    PERF_TAG,
+    ServerMemorySampler,
+    async_http_client,
+    base_parser,
+    client_ip,
+    connect,
+    copy_rows,
+    print_table,
+    session_login,
+    summarize,
+    write_report,
+)
+from fixtures import DEVICE_COLUMNS, delete_tagged, device_rows
+from s3_standin import start_standin
+
+NAME_PREFIX = f'{PERF_TAG}attach-'
+UPLOAD_ENDPOINT = '/api/attachments/upload'
+MIME_TYPE = 'application/zip'
+MB = 1024 * 1024
+UNITS = {'B': 1, 'KB': 1024, 'MB': MB, 'GB': 1024 * MB}
+
+SETTING_KEYS = [
+    'storage.backend',
+    'storage.max_file_size_mb',
+    'storage.local_path',
+    'storage.s3_endpoint',
+    'storage.s3_bucket',
+    'storage.s3_region',
+    'storage.s3_access_key',
+    'storage.s3_secret_key',
+]
+
+
+def size_list(text):
+    """Parse '4KB,1MB,256MB' into byte counts"""
+    sizes = []
+    for part in text.split(','):
+        match = re.fullmatch(r'([\d.]+)\s*(B|KB|MB|GB)?', part.strip().upper())
+        if not match:
+            raise argparse.ArgumentTypeError(f'bad size: {part}')
+        sizes.append(int(float(match.group(1)) * UNITS[match.group(2) or 'B']))
+    return sizes
+
+
+def size_label(nbytes):
+    for unit in ('GB', 'MB', 'KB'):
+        if nbytes >= UNITS[unit]:
+            return f'{nbytes / UNITS[unit]:g}{unit}'
+    return f'{nbytes}B'
+
+
+# ----------------------------------------------------------------------------
+# Settings and fixtures
+# ----------------------------------------------------------------------------
+
+def read_settings(conn):
+    with conn.cursor() as cur:
+        cur.execute('SELECT key, value::text FROM system_settings WHERE key = ANY(%s)', (SETTING_KEYS,))
+        return dict(cur.fetchall())
+
+
+def write_settings(conn, values):
+    with conn.cursor() as cur:
+        for key, value in values.items():
+            cur.execute(
+                """INSERT INTO system_settings (key, value, category) VALUES (%s, %s::jsonb, 'storage')
+                   ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value""",
+                (key, json.dumps(value)),
+            )
+    conn.commit()
+
+
+def restore_settings(conn, saved):
+    with conn.cursor() as cur:
+        for key in SETTING_KEYS:
+            if key in saved:
+                cur.execute('UPDATE system_settings SET value = %s::jsonb WHERE key = %s', (saved[key], key))
+            else:
+                cur.execute('DELETE FROM system_settings WHERE key = %s', (key,))
+    conn.commit()
+
+
+def backend_settings(backend, args, local_path, s3_endpoint, max_size):
+    values = {'storage.backend': backend, 'storage.max_file_size_mb': math.ceil(max_size / MB) + 1}
+    if backend == 'local':
+        values['storage.local_path'] = local_path
+    else:
+        values.update({
+            'storage.s3_endpoint': s3_endpoint,
+            'storage.s3_bucket': args.s3_bucket,
+            'storage.s3_region': args.s3_region,
+            'storage.s3_access_key': args.s3_access_key,
+            'storage.s3_secret_key': args.s3_secret_key,
+        })
+    return values
+
+
+def create_parent(conn, rng):
+    row = next(device_rows(f'{NAME_PREFIX}parent-', 0, 1, rng))
+    copy_rows(conn, 'devices', DEVICE_COLUMNS, [row])
+    conn.commit()
+    return row[0]
+
+
+def cleanup(conn):
+    with conn.cursor() as cur:
+        cur.execute('DELETE FROM file_attachments WHERE original_filename LIKE %s', (f'{NAME_PREFIX}%',))
+        attachments = cur.rowcount
+    conn.commit()
+    return {'attachments': attachments, 'devices': delete_tagged(conn, 'devices', 'hostname', NAME_PREFIX)}
+
+
+# ----------------------------------------------------------------------------
+# Transfers
+# ----------------------------------------------------------------------------
+
+async def upload(client, parent_id, payload, name, ip_index):
+    started = time.perf_counter()
+    files = {'file': (name, payload, MIME_TYPE)}
+    data = {'object_type': 'device', 'object_id': parent_id}
+    async with client.stream('POST', UPLOAD_ENDPOINT, files=files, data=data,
+                             headers={'X-Forwarded-For': client_ip(ip_index)}) as response:
+        headers_at = time.perf_counter()
+        body = await response.aread()
+    total = time.perf_counter() - started
+    result = {'status': response.status_code, 'bytes': len(payload), 'total_ms': total * 1000,
+              'headers_ms': (headers_at - started) * 1000}
+    if response.status_code == 201:
+        result['id'] = json.loads(body)['data']['attachment_id']
+    else:
+        result['error'] = body[:300].decode(errors='replace')
+    return result
+
+
+async def download(client, object_client, attachment_id, expected, ip_index):
+    """Fetch one attachment (following the presigned URL for S3) and check its length and digest"""
+    started = time.perf_counter()
+    headers = {'X-Forwarded-For': client_ip(ip_index)}
+    result = {'via': 'route'}
+    async with client.stream('GET', f'/api/attachments/{attachment_id}/download', headers=headers) as response:
+        result['headers_ms'] = (time.perf_counter() - started) * 1000
+        result['status'] = response.status_code
+        if response.headers.get('content-type', '').startswith('application/json'):
+            body = json.loads(await response.aread())
+            url = (body.get('data') or {}).get('url')
+            if response.status_code != 200 or not url:
+                return {**result, 'error': str(body)[:300]}
+            result['via'] = 'presigned'
+        else:
+            digest, nbytes = await consume(response, started, result)
+    if result['via'] == 'presigned':
+        async with object_client.stream('GET', url) as response:
+            result['status'] = response.status_code
+            digest, nbytes = await consume(response, started, result)
+    result['total_ms'] = (time.perf_counter() - started) * 1000
+    result['bytes'] = nbytes
+    if (nbytes, digest) != expected:
+        result['error'] = f'content mismatch: {nbytes} bytes received, {expected[0]} expected'
+    return result
+
+
+async def consume(response, started, result):
+    digest, nbytes = hashlib.md5(), 0
+    async for chunk in response.aiter_bytes():
+        if nbytes == 0:
+            result['first_byte_ms'] = (time.perf_counter() - started) * 1000
+        digest.update(chunk)
+        nbytes += len(chunk)
+    return digest.hexdigest(), nbytes
+
+
+async def run_level(args, token, parent_id, payload, concurrency, seq):
+    """Upload files_per_worker files per worker, then download every uploaded file, both at concurrency"""
+    expected = (len(payload), hashlib.md5(payload).hexdigest())
+    async with async_http_client(args.base_url, args.api_token, token, max_connections=concurrency,
+                                 timeout=args.timeout) as client, \
+            async_http_client('', max_connections=concurrency, timeout=args.timeout) as object_client:
+        async def phase(jobs, sampler):
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def bounded(job):
+                async with semaphore:
+                    return await job
+
+            started = time.perf_counter()
+            results = await asyncio.gather(*(bounded(job) for job in jobs))
+            return results, time.perf_counter() - started, sampler.summary()
+
+        count = concurrency * args.files_per_worker
+        label = size_label(len(payload))
+        with ServerMemorySampler(args.server_pid) as sampler:
+            uploads = await phase([upload(client, parent_id, payload, f'{NAME_PREFIX}{label}-{seq}-{n}.zip',
+                                          seq * 10000 + n) for n in range(count)], sampler)
+        downloads = None
+        ids = [r['id'] for r in uploads[0] if 'id' in r]
+        if ids and not args.skip_download:
+            with ServerMemorySampler(args.server_pid) as sampler:
+                downloads = await phase([download(client, object_client, i, expected, seq * 10000 + n)
+                                         for n, i in enumerate(ids)], sampler)
+    return uploads, downloads
+
+
+async def probe_upload(args, token, parent_id):
+    async with async_http_client(args.base_url, args.api_token, token, timeout=args.timeout) as client:
+        return await upload(client, parent_id, b'local path probe', f'{NAME_PREFIX}probe.zip', 0)
+
+
+def check_local_path(conn, args, token, parent_id, local_path):
+    """Stop if the server's cached local adapter still writes somewhere other than local_path"""
+    result = asyncio.run(probe_upload(args, token, parent_id))
+    if 'id' not in result:
+        raise SystemExit(f"Probe upload failed ({result['status']}): {result.get('error')}")
+    storage_path = conn.execute('SELECT storage_path FROM file_attachments WHERE id = %s',
+                                (result['id'],)).fetchone()[0]
+    conn.commit()
+    if not os.path.exists(os.path.join(local_path, storage_path)):
+        raise SystemExit(f'Probe upload {storage_path} is not under {local_path}: the server reuses a cached '
+                         'local adapter with another path. Restart the server and run again '
+                         '(the probe file stays at the old path).')
+
+
+def phase_summary(args, results, elapsed, memory, size, concurrency, standin_ops=None):
+    ok = [r for r in results if 'error' not in r and r.get('status') in (200, 201)]
+    inflight_mb = size * min(concurrency, len(results)) / MB
+    growth = memory.get('growth_mb')
+    ratio = round(growth / inflight_mb, 2) if growth is not None and inflight_mb else None
+    first_byte = [r['first_byte_ms'] for r in ok if 'first_byte_ms' in r]
+    ttfb_fraction = (round(sum(first_byte) / sum(r['total_ms'] for r in ok), 2)
+                     if first_byte and len(first_byte) == len(ok) else None)
+    if inflight_mb < args.min_verdict_mb or (ratio is None and ttfb_fraction is None):
+        verdict = 'inconclusive'
+    elif (ratio is not None and ratio >= args.buffered_ratio) or (ttfb_fraction or 0) > 0.5:
+        verdict = 'buffered'
+    else:
+        verdict = 'streamed'
+    summary = {
+        'transfers': len(results),
+        'errors': len(results) - len(ok),
+        'first_error': next((r.get('error') or r.get('status') for r in results if r not in ok), None),
+        'aggregate_mb_s': round(sum(r['bytes'] for r in ok) / MB / elapsed, 2) if elapsed else None,
+        'per_transfer_mb_s': summarize([r['bytes'] / MB / (r['total_ms'] / 1000) for r in ok]),
+        'total_ms': summarize([r['total_ms'] for r in ok]),
+        'headers_ms': summarize([r['headers_ms'] for r in ok]),
+        'first_byte_ms': summarize(first_byte) if first_byte else None,
+        'ttfb_fraction': ttfb_fraction,
+        'server_memory': memory,
+        'inflight_mb': round(inflight_mb, 2),
+        'rss_growth_per_inflight_mb': ratio,
+        'verdict': verdict,
+    }
+    if standin_ops:
+        summary['s3_leg'] = {
+            'requests': len(standin_ops),
+            'ms': summarize([op['ms'] for op in standin_ops]),
+            'mb_s': summarize([op['bytes'] / MB / (op['ms'] / 1000) for op in standin_ops if op['ms']]),
+        }
+    return summary
+
+
+def standin_ops(standin, op):
+    if standin is None:
+        return None
+    with standin.lock:
+        ops, standin.requests = [r for r in standin.requests if r['op'] == op], []
+    return ops
+
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+def main():
+    parser = base_parser(__doc__.split('\n')[1])
+    parser.add_argument('--backends', default='local,s3', help='Storage backends to benchmark (local, s3)')
+    parser.add_argument('--sizes', type=size_list, default=size_list('4KB,256KB,4MB,32MB,256MB'),
+                        help='File sizes (KB/MB/GB suffixes)')
+    parser.add_argument('--concurrency', default='1,4,16', help='Concurrent transfers per level')
+    parser.add_argument('--files-per-worker', type=int, default=2, help='Uploads per concurrent worker')
+    parser.add_argument('--max-inflight-mb', type=int, default=2048,
+                        help='Lower concurrency for large files so size x concurrency stays under this')
+    parser.add_argument('--skip-download', action='store_true')
+    parser.add_argument('--buffered-ratio', type=float, default=0.5,
+                        help='RSS growth per MB in flight at or above which a transfer counts as buffered')
+    parser.add_argument('--min-verdict-mb', type=float, default=32,
+                        help='Minimum MB in flight before streamed/buffered is judged')
+    parser.add_argument('--local-path', help='Storage directory for the local backend (default: a temp dir)')
+    parser.add_argument('--s3-endpoint', help='S3-compatible endpoint (default: start the built-in stand-in)')
+    parser.add_argument('--s3-port', type=int, default=9000, help='Port for the built-in stand-in')
+    parser.add_argument('--s3-bucket', default='moss-perf-attachments')
+    parser.add_argument('--s3-region', default='us-east-1')
+    parser.add_argument('--s3-access-key', default='perf')
+    parser.add_argument('--s3-secret-key', default='perf-secret')
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--seed', type=int, default=5)
+    parser.add_argument('--keep', action='store_true', help='Leave attachments and stored files in place')
+    parser.add_argument('--cleanup', action='store_true', help='Remove tagged attachments and exit')
+    args = parser.parse_args()
+    backends = [b for b in args.backends.split(',') if b in ('local', 's3')]
+    levels = [int(c) for c in args.concurrency.split(',')]
+    rng = random.Random(args.seed)
+
+    scratch = []
+    local_path = args.local_path
+    if 'local' in backends and not local_path:
+        local_path = tempfile.mkdtemp(prefix='moss-attachments-')
+        scratch.append(local_path)
+    standin, s3_endpoint = None, args.s3_endpoint
+    if 's3' in backends and not s3_endpoint:
+        root = tempfile.mkdtemp(prefix='moss-s3-')
+        scratch.append(root)
+        standin = start_standin(root, port=args.s3_port)
+        s3_endpoint = standin.endpoint
+
+    results = []
+    with connect(args.database_url) as conn:
+        print(f'Removed {cleanup(conn)}')
+        if args.cleanup:
+            return
+        saved = read_settings(conn)
+        token = session_login(args.base_url, args.email, args.password)
+        parent_id = create_parent(conn, rng)
+        try:
+            for backend in backends:
+                write_settings(conn, backend_settings(backend, args, local_path, s3_endpoint, max(args.sizes)))
+                if backend == 'local':
+                    check_local_path(conn, args, token, parent_id, local_path)
+                for size in args.sizes:
+                    payload = rng.randbytes(size)
+                    for level in levels:
+                        concurrency = max(1, min(level, args.max_inflight_mb * MB // size))
+                        print(f'{backend:<6} {size_label(size):>8} x{concurrency}...', flush=True)
+                        (up, up_s, up_mem), down = asyncio.run(
+                            run_level(args, token, parent_id, payload, concurrency, len(results)))
+                        step = {'backend': backend, 'size': size, 'size_label': size_label(size),
+                                'concurrency': concurrency, 'requested_concurrency': level,
+                                'upload': phase_summary(args, up, up_s, up_mem, size, concurrency,
+                                                        standin_ops(standin, 'put'))}
+                        if down:
+                            step['download'] = phase_summary(args, *down, size, concurrency,
+                                                             standin_ops(standin, 'get'))
+                        results.append(step)
+        finally:
+            restore_settings(conn, saved)
+            if not args.keep:
+                cleanup(conn)
+    if standin:
+        standin.shutdown()
+    if not args.keep:
+        for path in scratch:
+            shutil.rmtree(path, ignore_errors=True)
+
+    print()
+    rows = []
+    for step in results:
+        for phase in ('upload', 'download'):
+            if phase not in step:
+                continue
+            s = step[phase]
+            rows.append({
+                'backend': step['backend'], 'size': step['size_label'], 'conc': step['concurrency'], 'phase': phase,
+                'agg_mb_s': s['aggregate_mb_s'], 'p50_mb_s': s['per_transfer_mb_s']['p50'],
+                'p95_ms': s['total_ms']['p95'], 'ttfb_p50_ms': (s['first_byte_ms'] or {}).get('p50'),
+                'rss_peak_mb': s['server_memory'].get('peak_mb'), 'rss_per_inflight': s['rss_growth_per_inflight_mb'],
+                's3_leg_p50_ms': s.get('s3_leg', {}).get('ms', {}).get('p50'),
+                'verdict': s['verdict'], 'errors': s['errors'],
+            })
+    print_table(rows, ['backend', 'size', 'conc', 'phase', 'agg_mb_s', 'p50_mb_s', 'p95_ms', 'ttfb_p50_ms',
+                       'rss_peak_mb', 'rss_per_inflight', 's3_leg_p50_ms', 'verdict', 'errors'])
+
+    write_report(args.output_dir, 'attachment-benchmark', {
+        'parameters': {k: v for k, v in vars(args).items()
+                       if k not in ('password', 'api_token', 'database_url', 's3_secret_key')},
+        'results': results,
+    }, args.label)
+
+
+if __name__ == '__main__':
+    main()
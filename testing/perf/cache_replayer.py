@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+API cache workload replayer
+
+Replays a read/write workload against the list and detail endpoints that use
+the in-memory cache (src/lib/cache.ts) twice: once with the cache enabled and
+once with it disabled through POST /api/admin/cache. Reports per key prefix:
+  - hit rate (server counters from GET /api/admin/cache, plus client-side
+    '(cached)' responses)
+  - latency with and without the cache
+  - evictions/expirations, distinct keys and key reuse gaps, to size maxSize
+    and per-prefix TTLs
+  - stale-read windows: after every write the tool polls the affected detail
+    and list reads until the new value shows up. Invalidation makes this 0 for
+    sequential traffic; with --concurrency > 1 a read that misses before a write
+    and fills the cache after it can serve old data until the TTL expires.
+
+The workload is JSON lines, one request per line:
+  {"op": "read", "path": "/api/devices", "params": {"page": 2}}
+  {"op": "write", "path": "/api/devices/<id>", "json": {"notes": "..."},
+   "verify": [{"path": "/api/devices/<id>"}, {"path": "/api/devices", "params": {...}}]}
+Write bodies containing '{marker}' get a unique value per replay, which the
+verify reads must return before the write counts as visible.
+
+Usage:
+  python3 testing/perf/cache_replayer.py --generate 5000 --write-ratio 0.05
+  python3 testing/perf/cache_replayer.py --workload recorded.jsonl --concurrency 8
+  python3 testing/perf/cache_replayer.py --generate 2000 --save-workload mix.jsonl
+  python3 testing/perf/cache_replayer.py --cleanup
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from common import (
+    PERF_TAG,
+    base_parser,
+    connect,
+    copy_rows,
+    default_headers,
+    http_client,
+    print_table,
+    session_login,
+    summarize,
+    timed,
+    write_report,
+)
+from fixtures import DEVICE_COLUMNS, DEVICE_STATUSES, DEVICE_TYPES, count_tagged, delete_tagged, device_rows
+
+NAME_PREFIX = f'{PERF_TAG}cache-'
+ADMIN_ENDPOINT = '/api/admin/cache'
+
+# TTLs the routes pass to cache.set() (see docs/CACHING-STATUS.md)
+ROUTE_TTLS = {'list': 30, 'detail': 60}
+
+# Other list endpoints that go through src/lib/cache.ts, mixed into generated workloads at default params
+EXTRA_LISTS = ['/api/people', '/api/companies']
+
+
+# ----------------------------------------------------------------------------
+# Workload
+# ----------------------------------------------------------------------------
+
+def key_prefix(path):
+    """Cache key prefix the route uses for a request path: devices:list / devices:detail"""
+    parts = path.strip('/').split('/')[1:]
+    return f"{parts[0]}:{'detail' if len(parts) > 1 else 'list'}"
+
+
+def request_key(entry):
+    params = '&'.join(f'{k}={v}' for k, v in sorted((entry.get('params') or {}).items()))
+    return f"{entry['path']}?{params}"
+
+
+def zipf_index(rng, n, skew):
+    """Index in [0, n) with a Zipf-like bias towards small values"""
+    return min(n - 1, int(n * rng.random() ** skew))
+
+
+def generate_workload(device_ids, count, args, rng):
+    """Synthetic mix: skewed list queries, hot-set detail reads and note updates"""
+    list_queries = [{'page': page, 'limit': 50} for page in range(1, 21)]
+    list_queries += [{'device_type': t} for t in DEVICE_TYPES]
+    list_queries += [{'status': s} for s in sorted(set(DEVICE_STATUSES))]
+    list_queries += [{'search': f'{NAME_PREFIX}{n:04d}'} for n in range(0, 200, 7)]
+    list_queries += [{'sort_by': s, 'sort_order': 'asc'} for s in ('hostname', 'purchase_date', 'manufacturer')]
+    hot = device_ids[:max(1, int(len(device_ids) * args.hot_fraction))]
+
+    workload = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < args.write_ratio:
+            device_id, hostname = rng.choice(hot)
+            workload.append({
+                'op': 'write',
+                'path': f'/api/devices/{device_id}',
+                'json': {'notes': '{marker}'},
+                'verify': [
+                    {'path': f'/api/devices/{device_id}'},
+                    {'path': '/api/devices', 'params': {'search': hostname}},
+                ],
+            })
+        elif roll < args.write_ratio + args.detail_ratio:
+            device_id, _ = hot[zipf_index(rng, len(hot), args.skew)]
+            workload.append({'op': 'read', 'path': f'/api/devices/{device_id}'})
+        elif roll < args.write_ratio + args.detail_ratio + 0.1:
+            workload.append({'op': 'read', 'path': rng.choice(EXTRA_LISTS)})
+        else:
+            params = list_queries[zipf_index(rng, len(list_queries), args.skew)]
+            workload.append({'op': 'read', 'path': '/api/devices', 'params': params})
+    return workload
+
+
+def load_workload(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def seed(conn, target, rng):
+    existing = count_tagged(conn, 'devices', 'hostname', NAME_PREFIX)
+    if existing < target:
+        copy_rows(conn, 'devices', DEVICE_COLUMNS, device_rows(NAME_PREFIX, existing, target - existing, rng))
+        conn.commit()
+    with conn.cursor() as cur:
+        cur.execute('SELECT id::text, hostname FROM devices WHERE hostname LIKE %s ORDER BY hostname',
+                    (f'{NAME_PREFIX}%',))
+        return cur.fetchall()
+
+
+# ----------------------------------------------------------------------------
+# Replay
+# ----------------------------------------------------------------------------
+
+class Replayer:
+    def __init__(self, client, args):
+        self.client = client
+        self.args = args
+        self.sequence = 0
+        self.lock = threading.Lock()
+
+    def headers(self):
+        # A fresh client address per request keeps the per-IP rate limiter out of the numbers
+        with self.lock:
+            self.sequence += 1
+            index = self.sequence
+        return default_headers(self.args.api_token, ip_index=index)
+
+    def read(self, entry):
+        with timed() as t:
+            response = self.client.get(entry['path'], params=entry.get('params'), headers=self.headers())
+        message = response.json().get('message', '') if response.status_code == 200 else ''
+        return response, {
+            'op': 'read',
+            'prefix': key_prefix(entry['path']),
+            'key': request_key(entry),
+            'status': response.status_code,
+            'ms': t['ms'],
+            'cached': message.endswith('(cached)'),
+            'at': time.perf_counter(),
+        }
+
+    def write(self, entry):
+        marker = f'{NAME_PREFIX}{uuid.uuid4().hex[:12]}'
+        body = json.loads(json.dumps(entry.get('json') or {}).replace('{marker}', marker))
+        with timed() as t:
+            response = self.client.request(entry.get('method', 'PATCH'), entry['path'], json=body,
+                                           headers=self.headers())
+        result = {
+            'op': 'write',
+            'prefix': key_prefix(entry['path']),
+            'status': response.status_code,
+            'ms': t['ms'],
+            'at': time.perf_counter(),
+            'stale': [],
+        }
+        if response.status_code == 200:
+            for check in entry.get('verify', []):
+                result['stale'].append(self.stale_window(check, marker))
+        return result
+
+    def stale_window(self, check, marker):
+        """Poll a read until it returns marker; window is the time from write commit to first fresh read"""
+        start = time.perf_counter()
+        reads = stale_hits = 0
+        while True:
+            response, result = self.read(check)
+            reads += 1
+            fresh = marker in response.text
+            timed_out = not fresh and time.perf_counter() - start >= self.args.stale_timeout
+            if fresh or timed_out:
+                return {
+                    'prefix': result['prefix'],
+                    'window_ms': 0.0 if fresh and reads == 1 else (time.perf_counter() - start) * 1000,
+                    'reads': reads,
+                    'stale_cached_reads': stale_hits,
+                    'timed_out': timed_out,
+                }
+            stale_hits += result['cached']
+            time.sleep(self.args.stale_poll_ms / 1000)
+
+    def run(self, entry):
+        try:
+            if entry['op'] == 'write':
+                return self.write(entry)
+            return self.read(entry)[1]
+        except Exception as e:  # noqa: BLE001 - a failed request is a data point, not a crash
+            return {'op': entry['op'], 'prefix': key_prefix(entry['path']), 'status': type(e).__name__,
+                    'ms': None, 'at': time.perf_counter()}
+
+
+def cache_admin(client, action=None):
+    if action:
+        response = client.post(ADMIN_ENDPOINT, json={'action': action})
+    else:
+        response = client.get(ADMIN_ENDPOINT)
+    if response.status_code != 200:
+        raise SystemExit(f'{ADMIN_ENDPOINT} returned {response.status_code}: {response.text[:200]} '
+                         '(an admin session is required)')
+    return response.json()['data']
+
+
+def replay(client, workload, args, enabled):
+    cache_admin(client, 'enable' if enabled else 'disable')
+    cache_admin(client, 'clear')
+    cache_admin(client, 'reset_stats')
+    replayer = Replayer(client, args)
+    start = time.perf_counter()
+    if args.concurrency > 1:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(replayer.run, workload))
+    else:
+        results = [replayer.run(entry) for entry in workload]
+    elapsed = time.perf_counter() - start
+    return results, cache_admin(client), elapsed
+
+
+# ----------------------------------------------------------------------------
+# Analysis
+# ----------------------------------------------------------------------------
+
+def reuse_gaps(results):
+    """Seconds between successive reads of the same key, grouped by prefix"""
+    last_seen, gaps = {}, defaultdict(list)
+    for r in sorted((r for r in results if r['op'] == 'read' and 'key' in r), key=lambda r: r['at']):
+        if r['key'] in last_seen:
+            gaps[r['prefix']].append(r['at'] - last_seen[r['key']])
+        last_seen[r['key']] = r['at']
+    return gaps
+
+
+def analyse(cached_results, uncached_results, server_stats, args):
+    prefixes = sorted({r['prefix'] for r in cached_results + uncached_results})
+    gaps = reuse_gaps(cached_results)
+    rows, details = [], {}
+    for prefix in prefixes:
+        with_cache = [r for r in cached_results if r['prefix'] == prefix and r['op'] == 'read']
+        without = [r for r in uncached_results if r['prefix'] == prefix and r['op'] == 'read']
+        stale = [s for r in cached_results if r['op'] == 'write' for s in r['stale'] if s['prefix'] == prefix]
+        server = server_stats['prefixes'].get(prefix, {})
+        on = summarize([r['ms'] for r in with_cache if r['status'] == 200])
+        off = summarize([r['ms'] for r in without if r['status'] == 200])
+        gap_s = summarize([g * 1000 for g in gaps.get(prefix, [])])
+        ttl = ROUTE_TTLS.get(prefix.split(':')[-1])
+        details[prefix] = {
+            'reads': len(with_cache),
+            'errors': sum(1 for r in with_cache + without if r['status'] != 200),
+            'distinct_keys': len({r['key'] for r in with_cache}),
+            'client_hit_rate': round(sum(r['cached'] for r in with_cache) / len(with_cache), 3) if with_cache else 0,
+            'server': server,
+            'latency_cached_ms': on,
+            'latency_uncached_ms': off,
+            'speedup_p50': round(off['p50'] / on['p50'], 2) if on['p50'] else None,
+            'reuse_gap_ms': gap_s,
+            'route_ttl_s': ttl,
+            'stale_reads': {
+                'checks': len(stale),
+                'stale': sum(1 for s in stale if s['window_ms'] > 0),
+                'timed_out': sum(1 for s in stale if s['timed_out']),
+                'window_ms': summarize([s['window_ms'] for s in stale if s['window_ms'] > 0]),
+            },
+        }
+        details[prefix]['advice'] = advice(details[prefix], server_stats, args)
+        rows.append({
+            'prefix': prefix,
+            'reads': len(with_cache),
+            'keys': details[prefix]['distinct_keys'],
+            'hit_rate': round(server.get('hitRate', 0), 3),
+            'evictions': server.get('evictions', 0),
+            'expirations': server.get('expirations', 0),
+            'p50_cached': on['p50'],
+            'p50_uncached': off['p50'],
+            'p95_cached': on['p95'],
+            'p95_uncached': off['p95'],
+            'stale': details[prefix]['stale_reads']['stale'],
+            'stale_max_ms': details[prefix]['stale_reads']['window_ms']['max'],
+        })
+    return rows, details
+
+
+def advice(detail, server_stats, args):
+    """Turn the counters into maxSize/TTL suggestions for one prefix"""
+    notes = []
+    server = detail['server']
+    if server.get('evictions'):
+        notes.append(f"{server['evictions']} LRU evictions: maxSize {server_stats['maxSize']} is too small "
+                     f"for the working set ({server_stats['size']} live keys at end)")
+    ttl = detail['route_ttl_s']
+    gap_p50 = detail['reuse_gap_ms']['p50'] / 1000
+    if ttl and detail['reuse_gap_ms']['count'] and gap_p50 > ttl:
+        notes.append(f'median key reuse gap {gap_p50:.1f}s exceeds the {ttl}s TTL: most entries expire unused')
+    if server.get('expirations', 0) > server.get('hits', 0):
+        notes.append('more expirations than hits: raise the TTL or stop caching this prefix')
+    if detail['speedup_p50'] is not None and detail['speedup_p50'] < args.min_speedup:
+        notes.append(f"cache saves little (p50 speedup {detail['speedup_p50']}x)")
+    if detail['stale_reads']['stale']:
+        notes.append(f"{detail['stale_reads']['stale']} stale reads after writes "
+                     f"(max {detail['stale_reads']['window_ms']['max']:.0f}ms): TTL bounds the staleness window")
+    return notes or ['ok']
+
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+def main():
+    parser = base_parser(__doc__.split('\n')[1])
+    parser.add_argument('--workload', help='Replay a recorded JSON-lines workload instead of generating one')
+    parser.add_argument('--generate', type=int, default=3000, help='Requests in a generated workload')
+    parser.add_argument('--save-workload', help='Write the generated workload to this file')
+    parser.add_argument('--devices', type=int, default=5000, help='Tagged devices to seed for generated workloads')
+    parser.add_argument('--write-ratio', type=float, default=0.02, help='Fraction of requests that are writes')
+    parser.add_argument('--detail-ratio', type=float, default=0.4, help='Fraction of requests that are detail reads')
+    parser.add_argument('--hot-fraction', type=float, default=0.05, help='Fraction of devices that receive traffic')
+    parser.add_argument('--skew', type=float, default=2.0, help='Popularity skew (1 = uniform, higher = hotter head)')
+    parser.add_argument('--concurrency', type=int, default=1, help='Parallel clients')
+    parser.add_argument('--stale-poll-ms', type=float, default=50, help='Poll interval when checking writes')
+    parser.add_argument('--stale-timeout', type=float, default=65, help='Give up on a stale check after this many s')
+    parser.add_argument('--min-speedup', type=float, default=1.5, help='Flag prefixes where caching helps less')
+    parser.add_argument('--skip-uncached', action='store_true', help='Only replay with the cache enabled')
+    parser.add_argument('--seed', type=int, default=30, help='Random seed')
+    parser.add_argument('--cleanup', action='store_true', help='Remove seeded devices and exit')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.cleanup:
+        with connect(args.database_url) as conn:
+            print(f"Removed {delete_tagged(conn, 'devices', 'hostname', NAME_PREFIX)} devices")
+        return
+
+    if args.workload:
+        workload = load_workload(args.workload)
+    else:
+        with connect(args.database_url) as conn:
+            devices = seed(conn, args.devices, rng)
+        workload = generate_workload(devices, args.generate, args, rng)
+        if args.save_workload:
+            with open(args.save_workload, 'w') as f:
+                f.writelines(json.dumps(entry) + '\n' for entry in workload)
+    writes = sum(1 for entry in workload if entry['op'] == 'write')
+    print(f'Workload: {len(workload)} requests ({writes} writes), concurrency {args.concurrency}')
+
+    token = session_login(args.base_url, args.email, args.password)
+    with http_client(args.base_url, args.api_token, token, max_connections=max(20, args.concurrency * 2)) as client:
+        initial = cache_admin(client)
+        try:
+            cached_results, server_stats, cached_s = replay(client, workload, args, enabled=True)
+            print(f'  cache on:  {cached_s:.1f}s, hit rate {server_stats["hitRate"]:.1%}')
+            uncached_results, uncached_s = [], None
+            if not args.skip_uncached:
+                uncached_results, _, uncached_s = replay(client, workload, args, enabled=False)
+                print(f'  cache off: {uncached_s:.1f}s')
+        finally:
+            cache_admin(client, 'enable' if initial['enabled'] else 'disable')
+
+    rows, details = analyse(cached_results, uncached_results, server_stats, args)
+    print()
+    print_table(rows, ['prefix', 'reads', 'keys', 'hit_rate', 'evictions', 'expirations', 'p50_cached',
+                       'p50_uncached', 'p95_cached', 'p95_uncached', 'stale', 'stale_max_ms'])
+    print()
+    for prefix, detail in details.items():
+        print(f"{prefix}: {'; '.join(detail['advice'])}")
+
+    write_report(args.output_dir, 'cache-replay', {
+        'parameters': {k: v for k, v in vars(args).items() if k not in ('password', 'api_token', 'database_url')},
+        'requests': len(workload),
+        'writes': writes,
+        'elapsed_s': {'cached': cached_s, 'uncached': uncached_s},
+        'server_stats': server_stats,
+        'prefixes': details,
+    }, args.label)
+
+
+if __name__ == '__main__':
+    main()
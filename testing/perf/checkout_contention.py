@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Equipment checkout/reservation contention test (migration 022)
+
+Simulates event-day and semester-start bursts: many people checking out and
+reserving the same handful of devices at once. Each worker thread holds its
+own database connection; all workers are released together at the start of
+every burst and issue a mix of
+  - checkouts (device busy from now until the expected return),
+  - reservations (approved, for a window within --horizon-hours), and
+  - returns,
+optionally for kits of several devices booked all-or-nothing. A booking is
+refused when any device in it has an active checkout or an overlapping
+pending/approved/active reservation.
+
+The tables in 022_equipment_checkout.sql carry no constraint that prevents
+double booking, so correctness depends on how the booking transaction is
+written. The test runs the same workload under each strategy:
+  naive            check, then insert (READ COMMITTED, no locks)
+  row_lock         SELECT ... FOR NO KEY UPDATE on the devices rows, in request order
+  row_lock_sorted  the same, in device-id order (no lock-order deadlocks for kits)
+  advisory         pg_advisory_xact_lock per device, in device-id order
+  serializable     check, then insert under SERIALIZABLE, retrying 40001 failures
+Returns take the same locks as bookings so a return cannot interleave with a
+check. Deadlocks (40P01) and serialization failures are retried up to
+--max-retries times.
+
+For every strategy and concurrency level it reports throughput, latency,
+client-side lock-wait time, waiting locks sampled from pg_locks, retries,
+deadlocks (caught, and the pg_stat_database counter) and double-booking
+violations found afterwards (overlapping checkouts, reservations, or a
+checkout overlapping a reservation of the same device). Exits non-zero when a
+locking strategy produces a violation.
+
+Usage:
+  python3 testing/perf/checkout_contention.py
+  python3 testing/perf/checkout_contention.py --concurrency 8,32,128 --devices 3 --kit-size 2
+  python3 testing/perf/checkout_contention.py --strategies naive,row_lock_sorted --bursts 20
+  python3 testing/perf/checkout_contention.py --cleanup
+"""
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from common import PERF_TAG, base_parser, connect, copy_rows, int_list, print_table, summarize, write_report
+from fixtures import DEVICE_COLUMNS, PEOPLE_COLUMNS, delete_tagged, device_rows, people_rows
+
+NAME_PREFIX = f'{PERF_TAG}checkout-'
+STRATEGIES = ['naive', 'row_lock', 'row_lock_sorted', 'advisory', 'serializable']
+BLOCKING_RESERVATION = "('pending', 'approved', 'active')"
+
+BUSY_SQL = f"""
+    SELECT EXISTS (
+        SELECT 1 FROM equipment_checkouts
+        WHERE device_id = %(device)s AND status IN ('checked_out', 'overdue')
+          AND (status = 'overdue' OR expected_return_date > %(start)s)
+    ) OR EXISTS (
+        SELECT 1 FROM equipment_reservations
+        WHERE device_id = %(device)s AND status IN {BLOCKING_RESERVATION}
+          AND tstzrange(reservation_start, reservation_end) && tstzrange(%(start)s, %(end)s)
+    )"""
+
+VIOLATION_SQL = {
+    'checkout_overlaps': """
+        SELECT COUNT(*) FROM equipment_checkouts a JOIN equipment_checkouts b
+          ON a.device_id = b.device_id AND a.id < b.id
+        WHERE a.notes = %(tag)s AND b.notes = %(tag)s
+          AND tstzrange(a.checked_out_at, COALESCE(a.actual_return_date, 'infinity'))
+           && tstzrange(b.checked_out_at, COALESCE(b.actual_return_date, 'infinity'))""",
+    'reservation_overlaps': f"""
+        SELECT COUNT(*) FROM equipment_reservations a JOIN equipment_reservations b
+          ON a.device_id = b.device_id AND a.id < b.id
+        WHERE a.notes = %(tag)s AND b.notes = %(tag)s
+          AND a.status IN {BLOCKING_RESERVATION} AND b.status IN {BLOCKING_RESERVATION}
+          AND tstzrange(a.reservation_start, a.reservation_end) && tstzrange(b.reservation_start, b.reservation_end)""",
+    'checkout_reservation_overlaps': f"""
+        SELECT COUNT(*) FROM equipment_checkouts c JOIN equipment_reservations r ON c.device_id = r.device_id
+        WHERE c.notes = %(tag)s AND r.notes = %(tag)s AND r.status IN {BLOCKING_RESERVATION}
+          AND tstzrange(c.checked_out_at, COALESCE(c.actual_return_date, c.expected_return_date))
+           && tstzrange(r.reservation_start, r.reservation_end)""",
+}
+
+
+# ----------------------------------------------------------------------------
+# Fixtures
+# ----------------------------------------------------------------------------
+
+def seed(conn, devices, people, rng):
+    device_list = list(device_rows(NAME_PREFIX, 0, devices, rng))
+    person_list = list(people_rows(NAME_PREFIX, 0, people, rng))
+    copy_rows(conn, 'devices', DEVICE_COLUMNS, device_list)
+    copy_rows(conn, 'people', PEOPLE_COLUMNS, person_list)
+    conn.commit()
+    return [row[0] for row in device_list], [row[0] for row in person_list]
+
+
+def clear_bookings(conn):
+    with conn.cursor() as cur:
+        for table in ('equipment_checkouts', 'equipment_reservations'):
+            cur.execute(f'DELETE FROM {table} WHERE device_id IN (SELECT id FROM devices WHERE hostname LIKE %s)',
+                        (f'{NAME_PREFIX}%',))
+    conn.commit()
+
+
+def cleanup(conn):
+    clear_bookings(conn)
+    return {
+        'devices': delete_tagged(conn, 'devices', 'hostname', NAME_PREFIX),
+        'people': delete_tagged(conn, 'people', 'full_name', NAME_PREFIX),
+    }
+
+
+# ----------------------------------------------------------------------------
+# Booking transactions
+# ----------------------------------------------------------------------------
+
+def make_op(rng, args, device_ids, person_ids):
+    """One request: a checkout, a reservation or a return for a kit of devices"""
+    kind = rng.choices(['checkout', 'reserve', 'return'], weights=[args.checkout_weight, args.reserve_weight,
+                                                                  args.return_weight])[0]
+    op = {'kind': kind, 'person': rng.choice(person_ids)}
+    if kind == 'return':
+        op['devices'] = [rng.choice(device_ids)]
+        return op
+    op['devices'] = rng.sample(device_ids, min(args.kit_size, len(device_ids)))
+    op['minutes'] = rng.randint(30, 240)
+    if kind == 'reserve':
+        # Starts at least 5 minutes out so a reservation never begins before it was booked
+        offset = rng.randint(5, max(5, int(args.horizon_hours * 60)))
+        op['start'] = datetime.now(timezone.utc) + timedelta(minutes=offset)
+        op['end'] = op['start'] + timedelta(minutes=op['minutes'])
+    return op
+
+
+def lock_devices(cur, strategy, devices):
+    """Take the strategy's locks; returns the time spent waiting for them (ms)"""
+    if strategy in ('naive', 'serializable'):
+        return 0.0
+    ordered = devices if strategy == 'row_lock' else sorted(devices)
+    started = time.perf_counter()
+    for device in ordered:
+        if strategy == 'advisory':
+            cur.execute('SELECT pg_advisory_xact_lock(hashtextextended(%s::text, 0))', (device,))
+        else:
+            # NO KEY UPDATE serializes bookings without blocking the FOR KEY SHARE locks taken by FK inserts
+            cur.execute('SELECT 1 FROM devices WHERE id = %s FOR NO KEY UPDATE', (device,))
+    return (time.perf_counter() - started) * 1000
+
+
+def perform(cur, op, tag):
+    if op['kind'] == 'return':
+        cur.execute(
+            """UPDATE equipment_checkouts SET status = 'returned', actual_return_date = clock_timestamp(),
+                      updated_at = clock_timestamp()
+               WHERE device_id = %s AND status = 'checked_out' AND notes = %s""",
+            (op['devices'][0], tag),
+        )
+        return 'returned' if cur.rowcount else 'nothing_to_return'
+
+    if op['kind'] == 'checkout':
+        cur.execute('SELECT clock_timestamp()')
+        start = cur.fetchone()[0]
+        window = {'start': start, 'end': start + timedelta(minutes=op['minutes'])}
+    else:
+        window = {'start': op['start'], 'end': op['end']}
+    for device in op['devices']:
+        cur.execute(BUSY_SQL, {'device': device, **window})
+        if cur.fetchone()[0]:
+            return 'conflict'
+    for device in op['devices']:
+        if op['kind'] == 'checkout':
+            cur.execute(
+                """INSERT INTO equipment_checkouts
+                       (device_id, checked_out_by, checked_out_at, expected_return_date, notes)
+                   VALUES (%s, %s, clock_timestamp(), clock_timestamp() + %s * INTERVAL '1 minute', %s)""",
+                (device, op['person'], op['minutes'], tag),
+            )
+        else:
+            cur.execute(
+                """INSERT INTO equipment_reservations
+                       (device_id, reserved_by, reservation_start, reservation_end, status, approved_at, notes)
+                   VALUES (%s, %s, %s, %s, 'approved', clock_timestamp(), %s)""",
+                (device, op['person'], window['start'], window['end'], tag),
+            )
+    return 'booked'
+
+
+def run_op(conn, strategy, op, tag, max_retries, rng):
+    import psycopg
+
+    outcome = {'lock_ms': 0.0, 'retries': 0, 'deadlocks': 0, 'serialization_failures': 0}
+    started = time.perf_counter()
+    for attempt in range(max_retries + 1):
+        try:
+            with conn.transaction(), conn.cursor() as cur:
+                outcome['lock_ms'] += lock_devices(cur, strategy, op['devices'])
+                outcome['result'] = perform(cur, op, tag)
+            break
+        except psycopg.errors.DeadlockDetected:
+            outcome['deadlocks'] += 1
+        except psycopg.errors.SerializationFailure:
+            outcome['serialization_failures'] += 1
+        except psycopg.Error as exc:
+            outcome['result'] = 'error'
+            outcome['error'] = str(exc).splitlines()[0]
+            break
+        if attempt == max_retries:
+            outcome['result'] = 'failed'
+        else:
+            outcome['retries'] += 1
+            time.sleep(rng.uniform(0.001, 0.01) * (attempt + 1))
+    outcome['ms'] = (time.perf_counter() - started) * 1000
+    return outcome
+
+
+# ----------------------------------------------------------------------------
+# Measurement
+# ----------------------------------------------------------------------------
+
+class LockSampler:
+    """Polls pg_locks for ungranted locks in this database on a separate connection"""
+
+    def __init__(self, database_url, interval=0.05):
+        self.database_url = database_url
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        with connect(self.database_url, autocommit=True) as conn, conn.cursor() as cur:
+            while not self._stop.is_set():
+                cur.execute("""SELECT COUNT(*) FROM pg_locks l JOIN pg_database d ON d.oid = l.database
+                               WHERE NOT l.granted AND d.datname = current_database()""")
+                self.samples.append(cur.fetchone()[0])
+                self._stop.wait(self.interval)
+
+    def summary(self):
+        if not self.samples:
+            return {'peak_waiting': 0, 'mean_waiting': 0.0}
+        return {'peak_waiting': max(self.samples),
+                'mean_waiting': round(sum(self.samples) / len(self.samples), 2)}
+
+
+def deadlock_counter(conn):
+    with conn.cursor() as cur:
+        cur.execute('SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()')
+        value = cur.fetchone()[0]
+    conn.commit()
+    return value
+
+
+def violations(conn, tag):
+    found = {}
+    with conn.cursor() as cur:
+        for name, sql in VIOLATION_SQL.items():
+            cur.execute(sql, {'tag': tag})
+            found[name] = cur.fetchone()[0]
+    conn.commit()
+    return found
+
+
+def run_level(args, strategy, concurrency, device_ids, person_ids, seed):
+    """All workers start each burst together; returns per-op outcomes and wall time"""
+    import psycopg
+
+    tag = f'{NAME_PREFIX}{strategy}-{concurrency}'
+    connections = []
+    for _ in range(concurrency):
+        conn = connect(args.database_url, autocommit=True)
+        if strategy == 'serializable':
+            conn.isolation_level = psycopg.IsolationLevel.SERIALIZABLE
+        connections.append(conn)
+    barrier = threading.Barrier(concurrency)
+    outcomes = [[] for _ in range(concurrency)]
+
+    def worker(index):
+        rng = random.Random(seed * 100003 + index)
+        for _ in range(args.bursts):
+            barrier.wait()
+            for _ in range(args.ops_per_burst):
+                op = make_op(rng, args, device_ids, person_ids)
+                outcomes[index].append({'kind': op['kind'], 'kit': len(op['devices']),
+                                        **run_op(connections[index], strategy, op, tag, args.max_retries, rng)})
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    for conn in connections:
+        conn.close()
+    return tag, [o for per_worker in outcomes for o in per_worker], elapsed
+
+
+def level_summary(outcomes, elapsed):
+    by_result = {}
+    for o in outcomes:
+        by_result[o['result']] = by_result.get(o['result'], 0) + 1
+    bookings = [o for o in outcomes if o['kind'] != 'return']
+    return {
+        'ops': len(outcomes),
+        'ops_per_s': round(len(outcomes) / elapsed, 1) if elapsed else None,
+        'results': by_result,
+        'booked': by_result.get('booked', 0),
+        'conflicts': by_result.get('conflict', 0),
+        'failed': by_result.get('failed', 0) + by_result.get('error', 0),
+        'first_error': next((o['error'] for o in outcomes if 'error' in o), None),
+        'latency_ms': summarize([o['ms'] for o in outcomes]),
+        'booking_latency_ms': summarize([o['ms'] for o in bookings]),
+        'lock_wait_ms': summarize([o['lock_ms'] for o in outcomes]),
+        'retries': sum(o['retries'] for o in outcomes),
+        'deadlocks_caught': sum(o['deadlocks'] for o in outcomes),
+        'serialization_failures': sum(o['serialization_failures'] for o in outcomes),
+    }
+
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+def main():
+    parser = base_parser(__doc__.split('\n')[1], http=False)
+    parser.add_argument('--strategies', default=','.join(STRATEGIES), help='Booking strategies to compare')
+    parser.add_argument('--concurrency', type=int_list, default=int_list('4,16,64'), help='Concurrent workers')
+    parser.add_argument('--devices', type=int, default=5, help='Hot devices everyone competes for')
+    parser.add_argument('--people', type=int, default=200, help='People making requests')
+    parser.add_argument('--kit-size', type=int, default=1, help='Devices booked together in one request')
+    parser.add_argument('--bursts', type=int, default=10, help='Synchronized bursts per level')
+    parser.add_argument('--ops-per-burst', type=int, default=5, help='Requests per worker per burst')
+    parser.add_argument('--horizon-hours', type=float, default=8, help='Reservations start within this window')
+    parser.add_argument('--checkout-weight', type=float, default=45)
+    parser.add_argument('--reserve-weight', type=float, default=40)
+    parser.add_argument('--return-weight', type=float, default=15)
+    parser.add_argument('--max-retries', type=int, default=5, help='Retries after a deadlock or 40001 failure')
+    parser.add_argument('--seed', type=int, default=22)
+    parser.add_argument('--keep', action='store_true', help='Leave devices, people and bookings in place')
+    parser.add_argument('--cleanup', action='store_true', help='Remove tagged rows and exit')
+    args = parser.parse_args()
+    strategies = [s for s in args.strategies.split(',') if s in STRATEGIES]
+    rng = random.Random(args.seed)
+
+    results = []
+    with connect(args.database_url) as conn:
+        removed = cleanup(conn)
+        if args.cleanup:
+            print(f'Removed {removed}')
+            return
+        device_ids, person_ids = seed(conn, args.devices, args.people, rng)
+        print(f'{len(device_ids)} hot devices, {len(person_ids)} people, kit size {args.kit_size}')
+        try:
+            for strategy in strategies:
+                for concurrency in args.concurrency:
+                    clear_bookings(conn)
+                    print(f'{strategy:<16} x{concurrency}...', flush=True)
+                    deadlocks_before = deadlock_counter(conn)
+                    with LockSampler(args.database_url) as sampler:
+                        tag, outcomes, elapsed = run_level(args, strategy, concurrency, device_ids, person_ids,
+                                                           len(results) + args.seed)
+                    found = violations(conn, tag)
+                    results.append({
+                        'strategy': strategy,
+                        'concurrency': concurrency,
+                        'elapsed_s': round(elapsed, 3),
+                        **level_summary(outcomes, elapsed),
+                        'waiting_locks': sampler.summary(),
+                        'deadlocks_server': deadlock_counter(conn) - deadlocks_before,
+                        'violations': found,
+                        'violation_total': sum(found.values()),
+                    })
+        finally:
+            if args.keep:
+                conn.commit()
+            else:
+                cleanup(conn)
+
+    print()
+    print_table([{**r, 'p50_ms': r['latency_ms']['p50'], 'p95_ms': r['latency_ms']['p95'],
+                  'lock_wait_p95_ms': r['lock_wait_ms']['p95'], 'peak_waiting': r['waiting_locks']['peak_waiting'],
+                  'deadlocks': r['deadlocks_server'], 'violations': r['violation_total']} for r in results],
+                ['strategy', 'concurrency', 'ops_per_s', 'booked', 'conflicts', 'failed', 'p50_ms', 'p95_ms',
+                 'lock_wait_p95_ms', 'peak_waiting', 'retries', 'deadlocks', 'violations'])
+
+    unsafe = sorted({r['strategy'] for r in results if r['violation_total'] and r['strategy'] != 'naive'})
+    naive = [r for r in results if r['strategy'] == 'naive' and r['violation_total']]
+    if naive:
+        print(f'\nnaive check-then-insert double-booked at concurrency '
+              f"{', '.join(str(r['concurrency']) for r in naive)} (expected without locking)")
+    if unsafe:
+        print(f"\nFAIL: double bookings under {', '.join(unsafe)}")
+
+    write_report(args.output_dir, 'checkout-contention', {
+        'parameters': {k: v for k, v in vars(args).items() if k != 'database_url'},
+        'results': results,
+        'unsafe_strategies': unsafe,
+    }, args.label)
+    if unsafe:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the M.O.S.S. performance tooling in testing/perf.
+
+Connection settings follow the app's own environment variables:
+  DATABASE_URL     PostgreSQL connection string (same value as .env.local)
+  MOSS_BASE_URL    Base URL of a running server (default http://localhost:3001)
+  MOSS_API_TOKEN   Optional Bearer token (see migration 020_api_tokens)
+  MOSS_EMAIL       Login for routes that require a NextAuth session
+  MOSS_PASSWORD    Password for MOSS_EMAIL
+  MOSS_SERVER_PID  Optional PID of the Next.js server for RSS sampling
+
+Synthetic rows created by these tools are tagged with PERF_TAG in a name
+column so they can be found and removed again without touching real data.
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+DEFAULT_BASE_URL = 'http://localhost:3001'
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+PERF_TAG = 'perf-'
+SESSION_COOKIE = 'next-auth.session-token'
+
+# Runs the .ts helpers in this directory against src/ (same override as npm run db:migrate)
+NODE_RUNNER = [
+    'npx', 'ts-node', '--transpile-only',
+    '--compiler-options', '{"module":"commonjs","moduleResolution":"node"}',
+]
+
+
+# ----------------------------------------------------------------------------
+# Command line
+# ----------------------------------------------------------------------------
+
+def base_parser(description, database=True, http=True):
+    """Create an argument parser with the connection options every tool shares"""
+    parser = argparse.ArgumentParser(description=description)
+    if http:
+        parser.add_argument('--base-url', default=os.environ.get('MOSS_BASE_URL', DEFAULT_BASE_URL),
+                            help='M.O.S.S. server URL (env MOSS_BASE_URL)')
+        parser.add_argument('--api-token', default=os.environ.get('MOSS_API_TOKEN'),
+                            help='Bearer token for API requests (env MOSS_API_TOKEN)')
+        parser.add_argument('--email', default=os.environ.get('MOSS_EMAIL'),
+                            help='Login email for session-protected routes (env MOSS_EMAIL)')
+        parser.add_argument('--password', default=os.environ.get('MOSS_PASSWORD'),
+                            help='Login password (env MOSS_PASSWORD)')
+        parser.add_argument('--server-pid', type=int,
+                            default=int(os.environ['MOSS_SERVER_PID']) if os.environ.get('MOSS_SERVER_PID') else None,
+                            help='PID of the Next.js server for RSS sampling (env MOSS_SERVER_PID)')
+    if database:
+        parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'),
+                            help='PostgreSQL connection string (env DATABASE_URL)')
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR,
+                        help='Directory for JSON reports (default testing/perf/results)')
+    parser.add_argument('--label', default=None, help='Free-form label stored with the report')
+    return parser
+
+
+def int_list(text):
+    """Parse a comma-separated size list such as '1000,10000,100000'"""
+    return [int(part.replace('_', '')) for part in text.split(',') if part.strip()]
+
+
+# ----------------------------------------------------------------------------
+# Database
+# ----------------------------------------------------------------------------
+
+def connect(database_url, autocommit=False):
+    """Open a psycopg connection (psycopg 3 is required for database access)"""
+    if not database_url:
+        raise SystemExit('DATABASE_URL is not set (pass --database-url or export DATABASE_URL)')
+    import psycopg
+
+    return psycopg.connect(database_url, autocommit=autocommit)
+
+
+def copy_rows(conn, table, columns, rows):
+    """Bulk load rows with COPY; returns the number of rows written"""
+    count = 0
+    with conn.cursor() as cur:
+        with cur.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row(row)
+                count += 1
+    return count
+
+
+# ----------------------------------------------------------------------------
+# HTTP
+# ----------------------------------------------------------------------------
+
+def client_ip(index):
+    """
+    Deterministic fake client address for X-Forwarded-For
+
+    API routes rate limit per client IP + path (see rateLimitMiddleware.ts),
+    so load generators spread requests over distinct addresses unless they are
+    measuring the limiter itself.
+    """
+    index = index % (256 ** 3)
+    return f'10.{(index >> 16) & 0xff}.{(index >> 8) & 0xff}.{index & 0xff}'
+
+
+def default_headers(api_token=None, ip_index=None):
+    headers = {'Accept': 'application/json'}
+    if api_token:
+        headers['Authorization'] = f'Bearer {api_token}'
+    if ip_index is not None:
+        headers['X-Forwarded-For'] = client_ip(ip_index)
+    return headers
+
+
+def http_client(base_url, api_token=None, session_token=None, max_connections=20, timeout=60.0):
+    """Keep-alive httpx client bound to the server base URL"""
+    import httpx
+
+    return httpx.Client(
+        base_url=base_url,
+        headers=default_headers(api_token),
+        cookies={SESSION_COOKIE: session_token} if session_token else None,
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=timeout,
+    )
+
+
+def async_http_client(base_url, api_token=None, session_token=None, max_connections=100, timeout=60.0):
+    """Async variant of http_client for concurrency sweeps"""
+    import httpx
+
+    return httpx.AsyncClient(
+        base_url=base_url,
+        headers=default_headers(api_token),
+        cookies={SESSION_COOKIE: session_token} if session_token else None,
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=timeout,
+    )
+
+
+def session_login(base_url, email, password):
+    """
+    Sign in through the NextAuth credentials provider and return the session token
+
+    Routes such as /api/topology/network call auth() and do not accept API
+    tokens, so tools that hit them need a browser-style session.
+    """
+    if not email or not password:
+        raise SystemExit('This tool needs a session: pass --email/--password (env MOSS_EMAIL/MOSS_PASSWORD)')
+    with http_client(base_url) as client:
+        csrf = client.get('/api/auth/csrf').json()['csrfToken']
+        client.post(
+            '/api/auth/callback/credentials',
+            data={'csrfToken': csrf, 'email': email, 'password': password, 'json': 'true'},
+            follow_redirects=False,
+        )
+        token = client.cookies.get(SESSION_COOKIE)
+    if not token:
+        raise SystemExit(f'Login failed for {email}: no {SESSION_COOKIE} cookie returned')
+    return token
+
+
+# ----------------------------------------------------------------------------
+# Timing and statistics
+# ----------------------------------------------------------------------------
+
+@contextmanager
+def timed():
+    """Context manager yielding a dict whose 'ms' key is set on exit"""
+    result = {'ms': 0.0}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result['ms'] = (time.perf_counter() - start) * 1000
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(values):
+    """Latency summary (values in milliseconds)"""
+    if not values:
+        return {'count': 0, 'min': 0.0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+    return {
+        'count': len(values),
+        'min': round(min(values), 3),
+        'mean': round(sum(values) / len(values), 3),
+        'p50': round(percentile(values, 50), 3),
+        'p95': round(percentile(values, 95), 3),
+        'p99': round(percentile(values, 99), 3),
+        'max': round(max(values), 3),
+    }
+
+
+# ----------------------------------------------------------------------------
+# Server memory
+# ----------------------------------------------------------------------------
+
+def find_server_pid():
+    """Best-effort lookup of a local Next.js server process"""
+    for pattern in ('next-server', 'next start', 'next dev'):
+        try:
+            out = subprocess.run(['pgrep', '-f', pattern], capture_output=True, text=True, check=False)
+        except FileNotFoundError:
+            return None
+        pids = [int(pid) for pid in out.stdout.split()]
+        if pids:
+            return min(pids)
+    return None
+
+
+def read_rss_kb(pid):
+    """Resident set size of a process in KB, or None if it cannot be read"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        out = subprocess.run(['ps', '-o', 'rss=', '-p', str(pid)], capture_output=True, text=True, check=False)
+        return int(out.stdout.strip()) if out.stdout.strip() else None
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+class ServerMemorySampler:
+    """
+    Samples server RSS on a background thread
+
+    Usage:
+        with ServerMemorySampler(pid) as sampler:
+            run_workload()
+        sampler.peak_mb
+    """
+
+    def __init__(self, pid=None, interval=0.25):
+        self.pid = pid or find_server_pid()
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._start = 0.0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        if self.pid is None:
+            return
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self._stop.clear()
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = read_rss_kb(self.pid)
+            if rss is not None:
+                self.samples.append((round(time.perf_counter() - self._start, 3), rss))
+            self._stop.wait(self.interval)
+
+    @property
+    def baseline_mb(self):
+        return round(self.samples[0][1] / 1024, 1) if self.samples else None
+
+    @property
+    def peak_mb(self):
+        return round(max(rss for _, rss in self.samples) / 1024, 1) if self.samples else None
+
+    def summary(self):
+        return {
+            'pid': self.pid,
+            'baseline_mb': self.baseline_mb,
+            'peak_mb': self.peak_mb,
+            'growth_mb': round(self.peak_mb - self.baseline_mb, 1) if self.samples else None,
+            'samples': len(self.samples),
+        }
+
+
+# ----------------------------------------------------------------------------
+# Reporting
+# ----------------------------------------------------------------------------
+
+def write_report(output_dir, name, report, label=None):
+    """Write a JSON report as <name>-<timestamp>.json and return its path"""
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    path = os.path.join(output_dir, f'{name}-{stamp}.json')
+    payload = {'tool': name, 'generated_at': datetime.now().isoformat(), 'label': label, **report}
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2, default=str)
+    print(f'\nReport written to {path}')
+    return path
+
+
+def print_table(rows, columns):
+    """Print a list of dicts as an aligned text table"""
+    if not rows:
+        print('(no rows)')
+        return
+    widths = {col: max(len(col), *(len(_fmt(row.get(col))) for row in rows)) for col in columns}
+    print('  '.join(col.ljust(widths[col]) for col in columns))
+    print('  '.join('-' * widths[col] for col in columns))
+    for row in rows:
+        print('  '.join(_fmt(row.get(col)).ljust(widths[col]) for col in columns))
+
+
+def _fmt(value):
+    if value is None:
+        return '-'
+    if isinstance(value, float):
+        return f'{value:,.3f}' if abs(value) < 1000 else f'{value:,.0f}'
+    return str(value)
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Dashboard stats and expiring-items benchmark
+
+Grows the inventory step by step and, at each size, measures what one
+dashboard load costs: GET /api/dashboard/stats (eight COUNT(*) queries in
+exact mode) plus the expiring-warranties/contracts/licenses widgets, fetched
+concurrently the way src/app/page.tsx does. For every size it reports:
+  - stats latency per count mode (exact, estimated, cached; see the route)
+    and the error of the estimated counts against the exact ones, before and
+    after ANALYZE
+  - whole-dashboard latency under N concurrent viewers
+  - EXPLAIN (ANALYZE, BUFFERS) of COUNT(*) on devices and the three expiring
+    queries: plan node, time and buffers touched
+  - freshness: after inserting a device, how long until each mode's count
+    reflects it (exact immediately; cached after up to DASHBOARD_STATS_TTL;
+    estimated once the relation grows a page or is analyzed)
+
+Growth is cumulative: each size appends rows to reach the target device count;
+people, contracts and software licenses grow in proportion. Seeded rows carry a
+perf-dash- tag and are removed at the end unless --keep is given.
+
+Usage:
+  python3 testing/perf/dashboard_benchmark.py --sizes 10000,100000,1000000
+  python3 testing/perf/dashboard_benchmark.py --sizes 50000 --viewers 1,25,100 --loads 5
+  python3 testing/perf/dashboard_benchmark.py --modes exact,estimated --skip-freshness
+  python3 testing/perf/dashboard_benchmark.py --cleanup
+"""
+import asyncio
+import random
+import time
+from datetime import date, timedelta
+
+from common import (
+    PERF_TAG,
+    ServerMemorySampler,
+    async_http_client,
+    base_parser,
+    connect,
+    copy_rows,
+    http_client,
+    int_list,
+    print_table,
+    session_login,
+    summarize,
+    timed,
+    write_report,
+)
+from fixtures import DEVICE_COLUMNS, PEOPLE_COLUMNS, device_rows, new_id, people_rows
+
+NAME_PREFIX = f'{PERF_TAG}dash-'
+STATS_ENDPOINT = '/api/dashboard/stats'
+WIDGETS = {
+    'warranties': '/api/dashboard/expiring-warranties',
+    'contracts': '/api/dashboard/expiring-contracts',
+    'licenses': '/api/dashboard/expiring-licenses',
+}
+MODES = ['exact', 'estimated', 'cached']
+STATS_TABLES = ['devices', 'people', 'locations', 'networks', 'software', 'saas_services', 'documents', 'contracts']
+
+CONTRACT_COLUMNS = ['id', 'contract_name', 'contract_type', 'start_date', 'end_date', 'cost']
+LICENSE_COLUMNS = ['id', 'license_key', 'license_type', 'purchase_date', 'expiration_date', 'seat_count', 'seats_used']
+
+# Same predicates as the expiring-* routes (kept in sync by hand)
+EXPLAIN_QUERIES = {
+    'count_devices': 'SELECT COUNT(*) FROM devices',
+    'expiring_warranties': """
+        SELECT d.*, (d.warranty_expiration - CURRENT_DATE) AS days_until_expiration FROM devices d
+        WHERE d.warranty_expiration IS NOT NULL AND d.warranty_expiration > CURRENT_DATE
+          AND d.warranty_expiration <= CURRENT_DATE + INTERVAL '1 day' * %(days)s
+        ORDER BY d.warranty_expiration ASC LIMIT 10""",
+    'expiring_contracts': """
+        SELECT c.*, co.company_name AS vendor FROM contracts c LEFT JOIN companies co ON c.company_id = co.id
+        WHERE c.end_date IS NOT NULL AND c.end_date > CURRENT_DATE
+          AND c.end_date <= CURRENT_DATE + INTERVAL '1 day' * %(days)s
+        ORDER BY c.end_date ASC LIMIT 10""",
+    'expiring_licenses': """
+        SELECT sl.*, s.product_name, c.company_name FROM software_licenses sl
+        LEFT JOIN software s ON sl.software_id = s.id LEFT JOIN companies c ON sl.purchased_from_id = c.id
+        WHERE sl.expiration_date IS NOT NULL AND sl.expiration_date > CURRENT_DATE
+          AND sl.expiration_date <= CURRENT_DATE + INTERVAL '1 day' * %(days)s
+        ORDER BY sl.expiration_date ASC LIMIT 10""",
+}
+
+
+# ----------------------------------------------------------------------------
+# Data
+# ----------------------------------------------------------------------------
+
+def contract_rows(start, count, rng):
+    today = date.today()
+    for n in range(start, start + count):
+        begin = today - timedelta(days=rng.randint(0, 1000))
+        yield (new_id(rng), f'{NAME_PREFIX}contract-{n:07d}', rng.choice(['support', 'service', 'maintenance']),
+               begin, begin + timedelta(days=rng.choice([365, 730, 1095])), rng.randint(100, 50000))
+
+
+def license_rows(start, count, rng):
+    today = date.today()
+    for n in range(start, start + count):
+        bought = today - timedelta(days=rng.randint(0, 1000))
+        seats = rng.choice([5, 10, 25, 100, 500])
+        yield (new_id(rng), f'{NAME_PREFIX}license-{n:07d}', rng.choice(['subscription', 'volume', 'site']),
+               bought, bought + timedelta(days=rng.choice([365, 730, 1095])), seats, rng.randint(0, seats))
+
+
+def grow(conn, target, have, args, rng):
+    """Append rows until the tagged device count reaches target; returns the new counts"""
+    plan = {
+        'devices': (target, DEVICE_COLUMNS, lambda s, c: device_rows(f'{NAME_PREFIX}dev-', s, c, rng)),
+        'people': (int(target * args.people_ratio), PEOPLE_COLUMNS,
+                   lambda s, c: people_rows(NAME_PREFIX, s, c, rng)),
+        'contracts': (int(target * args.contract_ratio), CONTRACT_COLUMNS, lambda s, c: contract_rows(s, c, rng)),
+        'software_licenses': (int(target * args.license_ratio), LICENSE_COLUMNS,
+                              lambda s, c: license_rows(s, c, rng)),
+    }
+    for table, (wanted, columns, rows) in plan.items():
+        if wanted > have.get(table, 0):
+            copy_rows(conn, table, columns, rows(have.get(table, 0), wanted - have.get(table, 0)))
+            have[table] = wanted
+    conn.commit()
+    return have
+
+
+def analyze(conn):
+    with conn.cursor() as cur:
+        for table in STATS_TABLES + ['software_licenses']:
+            cur.execute(f'ANALYZE {table}')
+    conn.commit()
+
+
+def cleanup(conn):
+    removed = {}
+    with conn.cursor() as cur:
+        for table, column in [('devices', 'hostname'), ('people', 'full_name'), ('contracts', 'contract_name'),
+                              ('software_licenses', 'license_key')]:
+            cur.execute(f'DELETE FROM {table} WHERE {column} LIKE %s', (f'{NAME_PREFIX}%',))
+            removed[table] = cur.rowcount
+    conn.commit()
+    return removed
+
+
+def explain(conn, days):
+    plans = {}
+    with conn.cursor() as cur:
+        for name, sql in EXPLAIN_QUERIES.items():
+            cur.execute(f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}', {'days': days})
+            plan = cur.fetchone()[0][0]
+            node = plan['Plan']
+            while node.get('Plans') and node['Node Type'] in ('Limit', 'Aggregate', 'Gather', 'Finalize Aggregate',
+                                                               'Gather Merge', 'Partial Aggregate', 'Sort',
+                                                               'Nested Loop', 'Hash Join', 'Merge Join'):
+                node = node['Plans'][0]
+            plans[name] = {
+                'scan': f"{node['Node Type']}" + (f" ({node['Index Name']})" if node.get('Index Name') else ''),
+                'execution_ms': round(plan['Execution Time'], 3),
+                'buffers': plan['Plan'].get('Shared Hit Blocks', 0) + plan['Plan'].get('Shared Read Blocks', 0),
+            }
+    return plans
+
+
+# ----------------------------------------------------------------------------
+# HTTP
+# ----------------------------------------------------------------------------
+
+def stats_latency(client, mode, requests):
+    """Latency of the stats route in one mode; the first call is reported separately (cache miss)"""
+    calls, first, body = [], None, None
+    for i in range(requests + 1):
+        with timed() as t:
+            response = client.get(STATS_ENDPOINT, params={'mode': mode})
+        if response.status_code != 200:
+            return {'error': response.status_code}
+        if response.headers.get('x-count-mode') != mode:
+            return {'error': f"server answered in {response.headers.get('x-count-mode') or 'exact (no mode support)'}"}
+        body = response.json()
+        if i == 0:
+            first = t['ms']
+        else:
+            calls.append(t['ms'])
+    return {'first_ms': round(first, 2), 'latency_ms': summarize(calls), 'counts': body}
+
+
+def estimate_error(exact, estimated):
+    errors = {}
+    for table in STATS_TABLES:
+        if exact.get(table):
+            errors[table] = round(abs(estimated.get(table, 0) - exact[table]) / exact[table] * 100, 2)
+    return {'max_pct': max(errors.values(), default=0.0), 'per_table_pct': errors}
+
+
+async def dashboard_load(client, mode, days):
+    """One viewer opening the dashboard: stats plus the three widgets, concurrently"""
+    async def get(path, params):
+        with timed() as t:
+            response = await client.get(path, params=params)
+        return path, response.status_code, t['ms']
+
+    with timed() as total:
+        results = await asyncio.gather(get(STATS_ENDPOINT, {'mode': mode}),
+                                       *(get(path, {'days': days, 'limit': 10}) for path in WIDGETS.values()))
+    return total['ms'], results
+
+
+async def viewers_sweep(args, token, mode, viewers, sampler):
+    async with async_http_client(args.base_url, args.api_token, token, max_connections=viewers * 4) as client:
+        async def viewer():
+            return [await dashboard_load(client, mode, args.days) for _ in range(args.loads)]
+
+        started = time.perf_counter()
+        loads = [load for loads in await asyncio.gather(*(viewer() for _ in range(viewers))) for load in loads]
+        elapsed = time.perf_counter() - started
+    per_endpoint = {}
+    errors = 0
+    for _, results in loads:
+        for path, status, ms in results:
+            per_endpoint.setdefault(path, []).append(ms)
+            errors += status != 200
+    return {
+        'viewers': viewers,
+        'mode': mode,
+        'dashboards': len(loads),
+        'dashboards_per_s': round(len(loads) / elapsed, 2),
+        'dashboard_ms': summarize([ms for ms, _ in loads]),
+        'endpoint_p95_ms': {path.rsplit('/', 1)[-1]: summarize(v)['p95'] for path, v in per_endpoint.items()},
+        'errors': errors,
+        'server_memory': sampler.summary(),
+    }
+
+
+def freshness(conn, client, modes, rng, timeout_s):
+    """Insert one device and poll each mode until its devices count includes it"""
+    results = {}
+    for mode in modes:
+        before = client.get(STATS_ENDPOINT, params={'mode': mode}).json()['devices']
+        row = next(device_rows(f'{NAME_PREFIX}fresh-{mode}-', rng.randint(0, 10 ** 6), 1, rng))
+        copy_rows(conn, 'devices', DEVICE_COLUMNS, [row])
+        conn.commit()
+        inserted = time.perf_counter()
+        visible = None
+        while time.perf_counter() - inserted < timeout_s:
+            if client.get(STATS_ENDPOINT, params={'mode': mode}).json()['devices'] > before:
+                visible = round(time.perf_counter() - inserted, 2)
+                break
+            time.sleep(0.25)
+        results[mode] = {'visible_after_s': visible, 'timeout_s': None if visible is not None else timeout_s}
+    return results
+
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+def main():
+    parser = base_parser(__doc__.split('\n')[1])
+    parser.add_argument('--sizes', type=int_list, default=int_list('10000,100000,500000'),
+                        help='Device counts to grow through (cumulative)')
+    parser.add_argument('--people-ratio', type=float, default=0.5, help='People rows per device')
+    parser.add_argument('--contract-ratio', type=float, default=0.02, help='Contracts per device')
+    parser.add_argument('--license-ratio', type=float, default=0.05, help='Software licenses per device')
+    parser.add_argument('--modes', default=','.join(MODES), help='Stats count modes to compare')
+    parser.add_argument('--viewers', type=int_list, default=int_list('1,10,50'), help='Concurrent dashboard viewers')
+    parser.add_argument('--loads', type=int, default=3, help='Dashboard loads per viewer')
+    parser.add_argument('--requests', type=int, default=10, help='Stats requests per mode')
+    parser.add_argument('--days', type=int, default=90, help='Expiring-items window (the widgets default)')
+    parser.add_argument('--freshness-timeout', type=float, default=90, help='Seconds to wait for a count to move')
+    parser.add_argument('--skip-freshness', action='store_true')
+    parser.add_argument('--seed', type=int, default=11)
+    parser.add_argument('--keep', action='store_true', help='Leave seeded rows in place')
+    parser.add_argument('--cleanup', action='store_true', help='Remove seeded rows and exit')
+    args = parser.parse_args()
+    modes = [m for m in args.modes.split(',') if m in MODES]
+    rng = random.Random(args.seed)
+
+    with connect(args.database_url) as conn:
+        removed = cleanup(conn)
+        if args.cleanup:
+            print(f'Removed {removed}')
+            return
+
+        token = session_login(args.base_url, args.email, args.password)
+        results, have = [], {}
+        with http_client(args.base_url, args.api_token, token, timeout=300) as client:
+            for size in args.sizes:
+                print(f'\n=== {size:,} tagged devices ===')
+                started = time.perf_counter()
+                grow(conn, size, have, args, rng)
+                print(f'  grown to {have} in {time.perf_counter() - started:.1f}s')
+
+                step = {'devices': size, 'seeded': dict(have), 'modes': {}}
+                for mode in modes:
+                    step['modes'][mode] = stats_latency(client, mode, args.requests)
+                exact = step['modes'].get('exact', {}).get('counts') or stats_latency(client, 'exact', 1)['counts']
+                if 'estimated' in modes and 'counts' in step['modes']['estimated']:
+                    step['estimate_error_stale'] = estimate_error(exact, step['modes']['estimated']['counts'])
+                analyze(conn)
+                if 'estimated' in modes:
+                    analyzed = stats_latency(client, 'estimated', 1)
+                    if 'counts' in analyzed:
+                        step['estimate_error_analyzed'] = estimate_error(exact, analyzed['counts'])
+                step['table_rows'] = exact
+                step['explain'] = explain(conn, args.days)
+
+                step['viewers'] = []
+                for n in args.viewers:
+                    for mode in modes:
+                        with ServerMemorySampler(args.server_pid) as sampler:
+                            step['viewers'].append(asyncio.run(viewers_sweep(args, token, mode, n, sampler)))
+                if not args.skip_freshness and size == args.sizes[-1]:
+                    step['freshness'] = freshness(conn, client, modes, rng, args.freshness_timeout)
+                results.append(step)
+
+        if not args.keep:
+            cleanup(conn)
+
+    print()
+    rows = []
+    for step in results:
+        for mode, stats in step['modes'].items():
+            rows.append({
+                'devices': step['devices'], 'mode': mode,
+                'first_ms': stats.get('first_ms'),
+                'p50_ms': stats.get('latency_ms', {}).get('p50'),
+                'p95_ms': stats.get('latency_ms', {}).get('p95'),
+                'est_err_stale_%': step.get('estimate_error_stale', {}).get('max_pct') if mode == 'estimated' else None,
+                'est_err_analyzed_%': (step.get('estimate_error_analyzed', {}).get('max_pct')
+                                       if mode == 'estimated' else None),
+                'error': stats.get('error'),
+            })
+    print_table(rows, ['devices', 'mode', 'first_ms', 'p50_ms', 'p95_ms', 'est_err_stale_%', 'est_err_analyzed_%',
+                       'error'])
+
+    print()
+    rows = [{'devices': step['devices'], 'viewers': v['viewers'], 'mode': v['mode'],
+             'dash_p50_ms': v['dashboard_ms']['p50'], 'dash_p95_ms': v['dashboard_ms']['p95'],
+             'dash_per_s': v['dashboards_per_s'], **{f'{k}_p95': ms for k, ms in v['endpoint_p95_ms'].items()},
+             'peak_mb': v['server_memory']['peak_mb'], 'errors': v['errors']}
+            for step in results for v in step['viewers']]
+    print_table(rows, ['devices', 'viewers', 'mode', 'dash_p50_ms', 'dash_p95_ms', 'dash_per_s', 'stats_p95',
+                       'expiring-warranties_p95', 'expiring-contracts_p95', 'expiring-licenses_p95', 'peak_mb',
+                       'errors'])
+
+    print()
+    print_table([{'devices': step['devices'], 'query': name, **plan}
+                 for step in results for name, plan in step['explain'].items()],
+                ['devices', 'query', 'scan', 'execution_ms', 'buffers'])
+
+    if results and results[-1].get('freshness'):
+        print('\nfreshness after one insert:')
+        for mode, fresh in results[-1]['freshness'].items():
+            if fresh['visible_after_s'] is None:
+                print(f"  {mode:<10} not visible within {fresh['timeout_s']}s")
+            else:
+                print(f"  {mode:<10} {fresh['visible_after_s']}s")
+
+    write_report(args.output_dir, 'dashboard-benchmark', {
+        'parameters': {k: v for k, v in vars(args).items() if k not in ('password', 'api_token', 'database_url')},
+        'sizes': results,
+    }, args.label)
+
+
+if __name__ == '__main__':
+    main()
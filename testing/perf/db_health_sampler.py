@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+Continuous database health sampler (TS-DB-036..045)
+
+Samples the pg_stat views behind the database health checks in
+testing/database-performance-tests.sql on an interval and keeps them in a
+compact local timeseries (SQLite; a series is only written when its value
+changes, plus a full keyframe every --keyframe-every samples). Counters are
+turned into per-interval rates and ratios, so a spike during a load test is
+visible instead of being averaged into the totals since server start.
+
+Metrics, by check:
+  036  index count on the key tables (an index dropped mid-run is an event)
+  037  table and total relation size
+  038  connections: total, active, idle, idle in transaction
+  039  commits/rollbacks per second, deadlocks, temp bytes, cache hit ratio
+  040  index block hit ratio (pg_statio_user_indexes)
+  041  active queries, lock waiters, longest running query
+  042  live/dead tuples and dead ratio per table
+  043  autovacuum/autoanalyze runs and time since the last autovacuum
+  044  seq vs index scans per table (index_scan_pct over the interval)
+  045  total/heap size ratio per table (the bloat estimate used by TS-DB-045)
+
+Alerts fire when a series enters and leaves breach of the thresholds the SQL
+comments state (connections < 20, index hit ratio > 90%), plus configurable
+defaults where the comments only say "minimal" or nothing (see --help).
+
+Load-test timeline: --run starts a command (any tool in testing/perf, k6, a
+UAT round) and records its start, exit and every output line as timeline
+events; --mark adds an event from another shell. The report lists each alert
+and metric spike with the timeline events that preceded it.
+
+Usage:
+  python3 testing/perf/db_health_sampler.py --interval 5 --run "python3 testing/perf/pool_stress.py"
+  python3 testing/perf/db_health_sampler.py --duration 3600 --db results/uat-round3.sqlite
+  python3 testing/perf/db_health_sampler.py --db results/uat-round3.sqlite --mark "UAT agent 2 start"
+  python3 testing/perf/db_health_sampler.py --db results/uat-round3.sqlite --report
+"""
+import math
+import os
+import shlex
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+from common import DEFAULT_OUTPUT_DIR, base_parser, connect, print_table, summarize, write_report
+
+KEY_TABLES = ['devices', 'companies', 'people', 'networks', 'ios']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (id INTEGER PRIMARY KEY, metric TEXT NOT NULL, scope TEXT NOT NULL,
+                                   UNIQUE (metric, scope));
+CREATE TABLE IF NOT EXISTS samples (ts REAL NOT NULL, series_id INTEGER NOT NULL, value REAL);
+CREATE INDEX IF NOT EXISTS samples_series_ts ON samples (series_id, ts);
+CREATE TABLE IF NOT EXISTS events (ts REAL NOT NULL, kind TEXT NOT NULL, text TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+"""
+
+DATABASE_SQL = """
+    SELECT numbackends, xact_commit, xact_rollback, blks_read, blks_hit, deadlocks, temp_bytes
+    FROM pg_stat_database WHERE datname = current_database()"""
+
+ACTIVITY_SQL = """
+    SELECT count(*),
+           count(*) FILTER (WHERE state = 'active'),
+           count(*) FILTER (WHERE state = 'idle'),
+           count(*) FILTER (WHERE state LIKE 'idle in transaction%'),
+           count(*) FILTER (WHERE wait_event_type = 'Lock'),
+           COALESCE(EXTRACT(EPOCH FROM max(now() - query_start) FILTER (WHERE state = 'active')), 0)
+    FROM pg_stat_activity
+    WHERE datname = current_database() AND pid <> pg_backend_pid()"""
+
+INDEX_IO_SQL = """
+    SELECT COALESCE(sum(idx_blks_hit), 0), COALESCE(sum(idx_blks_read), 0)
+    FROM pg_statio_user_indexes WHERE schemaname = current_schema()"""
+
+TABLES_SQL = """
+    SELECT t.relname, t.n_live_tup, t.n_dead_tup, t.seq_scan, t.seq_tup_read, COALESCE(t.idx_scan, 0),
+           t.autovacuum_count, t.autoanalyze_count,
+           EXTRACT(EPOCH FROM now() - t.last_autovacuum),
+           pg_relation_size(t.relid), pg_total_relation_size(t.relid)
+    FROM pg_stat_user_tables t WHERE t.schemaname = current_schema()"""
+
+INDEX_COUNT_SQL = """
+    SELECT tablename, count(*) FROM pg_indexes
+    WHERE schemaname = current_schema() AND tablename = ANY(%s) GROUP BY tablename"""
+
+
+# ----------------------------------------------------------------------------
+# Storage
+# ----------------------------------------------------------------------------
+
+class Timeseries:
+    """SQLite store that writes a series only when its value changes (plus periodic keyframes)"""
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.series = {(m, s): i for i, m, s in self.db.execute('SELECT id, metric, scope FROM series')}
+        self.last = {}
+        self.written = 0
+
+    def series_id(self, metric, scope):
+        key = (metric, scope)
+        if key not in self.series:
+            cur = self.db.execute('INSERT INTO series (metric, scope) VALUES (?, ?)', key)
+            self.series[key] = cur.lastrowid
+        return self.series[key]
+
+    def write(self, ts, values, keyframe):
+        with self.lock:
+            rows = []
+            for (metric, scope), value in values.items():
+                sid = self.series_id(metric, scope)
+                if value is not None and isinstance(value, float) and math.isnan(value):
+                    value = None
+                if keyframe or self.last.get(sid, object()) != value:
+                    rows.append((ts, sid, value))
+                    self.last[sid] = value
+            self.db.executemany('INSERT INTO samples (ts, series_id, value) VALUES (?, ?, ?)', rows)
+            self.db.commit()
+            self.written += len(rows)
+
+    def event(self, kind, text, ts=None):
+        with self.lock:
+            self.db.execute('INSERT INTO events (ts, kind, text) VALUES (?, ?, ?)', (ts or time.time(), kind, text))
+            self.db.commit()
+
+
+# ----------------------------------------------------------------------------
+# Sampling
+# ----------------------------------------------------------------------------
+
+def ratio(part, total):
+    return round(100.0 * part / total, 2) if total else None
+
+
+class Sampler:
+    """Reads the health views and turns counters into per-interval rates and ratios"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.previous = None
+        self.index_counts = None
+
+    def sample(self):
+        now = time.time()
+        with self.conn.cursor() as cur:
+            cur.execute(DATABASE_SQL)
+            backends, commits, rollbacks, blks_read, blks_hit, deadlocks, temp_bytes = cur.fetchone()
+            cur.execute(ACTIVITY_SQL)
+            total, active, idle, idle_tx, lock_waiters, longest = cur.fetchone()
+            cur.execute(INDEX_IO_SQL)
+            idx_hit, idx_read = cur.fetchone()
+            cur.execute(TABLES_SQL)
+            tables = {row[0]: row[1:] for row in cur.fetchall()}
+            cur.execute(INDEX_COUNT_SQL, (KEY_TABLES,))
+            index_counts = dict(cur.fetchall())
+
+        counters = {'commits': commits, 'rollbacks': rollbacks, 'blks_read': blks_read, 'blks_hit': blks_hit,
+                    'deadlocks': deadlocks, 'temp_bytes': temp_bytes, 'idx_hit': int(idx_hit),
+                    'idx_read': int(idx_read),
+                    'tables': {name: (row[2], row[3], row[4], row[5], row[6]) for name, row in tables.items()}}
+        values = {
+            ('connections_total', ''): total,
+            ('connections_active', ''): active,
+            ('connections_idle', ''): idle,
+            ('connections_idle_in_tx', ''): idle_tx,
+            ('lock_waiters', ''): lock_waiters,
+            ('longest_query_s', ''): round(float(longest), 2),
+            ('backends', ''): backends,
+        }
+        for name, count in index_counts.items():
+            values[('key_table_indexes', name)] = count
+        for name, (live, dead, *_rest, last_autovacuum_age, heap, total_size) in tables.items():
+            values[('live_tuples', name)] = live
+            values[('dead_tuples', name)] = dead
+            values[('dead_ratio', name)] = ratio(dead, live + dead)
+            values[('table_bytes', name)] = heap
+            values[('total_bytes', name)] = total_size
+            values[('bloat_ratio', name)] = ratio(total_size, heap)
+            values[('since_autovacuum_s', name)] = round(float(last_autovacuum_age)) if last_autovacuum_age else None
+
+        prev = self.previous
+        if prev:
+            elapsed = now - prev['ts']
+            delta = {k: counters[k] - prev[k] for k in counters if k != 'tables'}
+            values.update({
+                ('commits_per_s', ''): round(delta['commits'] / elapsed, 2),
+                ('rollbacks_per_s', ''): round(delta['rollbacks'] / elapsed, 2),
+                ('deadlocks', ''): delta['deadlocks'],
+                ('temp_bytes_per_s', ''): round(delta['temp_bytes'] / elapsed),
+                ('cache_hit_ratio', ''): ratio(delta['blks_hit'], delta['blks_hit'] + delta['blks_read']),
+                ('index_hit_ratio', ''): ratio(delta['idx_hit'], delta['idx_hit'] + delta['idx_read']),
+            })
+            for name, (seq, seq_read, idx, autovacuums, autoanalyzes) in counters['tables'].items():
+                before = prev['tables'].get(name)
+                if not before:
+                    continue
+                d_seq, d_read, d_idx = seq - before[0], seq_read - before[1], idx - before[2]
+                values[('seq_scans', name)] = d_seq
+                values[('seq_tup_read', name)] = d_read
+                values[('idx_scans', name)] = d_idx
+                values[('index_scan_pct', name)] = ratio(d_idx, d_seq + d_idx)
+                values[('autovacuums', name)] = autovacuums - before[3]
+                values[('autoanalyzes', name)] = autoanalyzes - before[4]
+        changed_indexes = (self.index_counts is not None and index_counts != self.index_counts)
+        self.index_counts = index_counts
+        self.previous = {'ts': now, **counters}
+        return now, values, changed_indexes
+
+
+# ----------------------------------------------------------------------------
+# Alerts
+# ----------------------------------------------------------------------------
+
+def thresholds(args):
+    """(metric, check id, test(value, values, scope) -> bool, description)"""
+    return [
+        ('connections_total', 'TS-DB-038', lambda v, *_: v >= args.max_connections,
+         f'connections >= {args.max_connections} (should be <20)'),
+        ('index_hit_ratio', 'TS-DB-040', lambda v, *_: v < args.min_index_hit,
+         f'index hit ratio < {args.min_index_hit}% (should be >90%)'),
+        ('cache_hit_ratio', 'TS-DB-039', lambda v, *_: v < args.min_cache_hit,
+         f'cache hit ratio < {args.min_cache_hit}%'),
+        ('longest_query_s', 'TS-DB-041', lambda v, *_: v > args.max_query_s,
+         f'a query has run > {args.max_query_s}s'),
+        ('dead_ratio', 'TS-DB-042',
+         lambda v, values, scope: v > args.max_dead_pct
+         and (values.get(('live_tuples', scope)) or 0) + (values.get(('dead_tuples', scope)) or 0) >= args.min_rows,
+         f'dead tuples > {args.max_dead_pct}% (should be minimal)'),
+        ('since_autovacuum_s', 'TS-DB-043',
+         lambda v, values, scope: (values.get(('dead_ratio', scope)) or 0) > args.max_dead_pct
+         and v > args.autovacuum_lag_min * 60,
+         f'dead ratio over threshold and no autovacuum for {args.autovacuum_lag_min} min'),
+        ('index_scan_pct', 'TS-DB-044',
+         lambda v, values, scope: v < args.min_index_scan_pct
+         and (values.get(('seq_tup_read', scope)) or 0) >= args.min_seq_tup_read,
+         f'index scans < {args.min_index_scan_pct}% of scans with heavy sequential reads'),
+        ('bloat_ratio', 'TS-DB-045', lambda v, *_: v > args.max_bloat_pct,
+         f'total/heap size > {args.max_bloat_pct}%'),
+        ('deadlocks', 'TS-DB-039', lambda v, *_: v > 0, 'deadlocks in the interval'),
+    ]
+
+
+class Alerter:
+    def __init__(self, store, rules, quiet=False):
+        self.store = store
+        self.rules = rules
+        self.active = {}
+        self.quiet = quiet
+
+    def evaluate(self, ts, values):
+        for metric, check, test, description in self.rules:
+            for (name, scope), value in values.items():
+                if name != metric or value is None:
+                    continue
+                key = (metric, scope)
+                breached = test(value, values, scope)
+                label = f"{check} {metric}{f'[{scope}]' if scope else ''}"
+                if breached and key not in self.active:
+                    self.active[key] = ts
+                    self.emit(ts, 'alert', f'{label} = {value}: {description}')
+                elif not breached and key in self.active:
+                    self.emit(ts, 'clear', f'{label} = {value} (after {ts - self.active.pop(key):.0f}s)')
+
+    def emit(self, ts, kind, text):
+        self.store.event(kind, text, ts)
+        if not self.quiet:
+            print(f'[{clock(ts)}] {kind.upper()} {text}', file=sys.stderr)
+
+
+# ----------------------------------------------------------------------------
+# Timeline
+# ----------------------------------------------------------------------------
+
+def run_command(store, command):
+    """Start the load-test command; its output lines become timeline events"""
+    proc = subprocess.Popen(command if isinstance(command, list) else shlex.split(command),
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+    store.event('run-start', command if isinstance(command, str) else ' '.join(command))
+
+    def pump():
+        for line in proc.stdout:
+            sys.stdout.write(line)
+            if line.strip():
+                store.event('output', line.rstrip()[:500])
+        proc.wait()
+        store.event('run-end', f'exit {proc.returncode}')
+
+    thread = threading.Thread(target=pump, daemon=True)
+    thread.start()
+    return proc, thread
+
+
+def report(store, args, since=0.0):
+    """Summaries per series plus alerts and spikes with the timeline events before them"""
+    db = store.db
+    events = db.execute('SELECT ts, kind, text FROM events WHERE ts >= ? ORDER BY ts', (since,)).fetchall()
+    timeline = [e for e in events if e[1] in ('mark', 'run-start', 'run-end', 'output')]
+
+    def context(ts):
+        before = [e for e in timeline if ts - args.correlate_s <= e[0] <= ts]
+        return [f'{clock(e[0])} {e[2]}' for e in before[-3:]]
+
+    summaries, spikes = [], []
+    span_end = db.execute('SELECT max(ts) FROM samples').fetchone()[0] or 0.0
+    for sid, metric, scope in db.execute('SELECT id, metric, scope FROM series ORDER BY metric, scope'):
+        points = [(ts, v) for ts, v in db.execute(
+            'SELECT ts, value FROM samples WHERE series_id = ? AND ts >= ? AND value IS NOT NULL ORDER BY ts',
+            (sid, since))]
+        if not points:
+            continue
+        values = [v for _, v in points]
+        stats = summarize(values)
+        # Points are stored on change, so weight each value by how long it held
+        ends = [ts for ts, _ in points[1:]] + [max(span_end, points[-1][0])]
+        held = [end - ts for (ts, _), end in zip(points, ends)]
+        if sum(held):
+            stats['mean'] = round(sum(v * w for (_, v), w in zip(points, held)) / sum(held), 3)
+        summaries.append({'metric': metric, 'scope': scope, **stats})
+        if len(values) >= 10 and metric.endswith(('_per_s', 'lock_waiters', 'longest_query_s', 'seq_tup_read')):
+            mean = sum(values) / len(values)
+            sd = math.sqrt(sum((v - mean) ** 2 for v in values) / len(values))
+            for ts, v in points:
+                if sd and v > mean + args.spike_sigma * sd:
+                    spikes.append({'ts': ts, 'metric': metric, 'scope': scope, 'value': v,
+                                   'mean': round(mean, 2), 'context': context(ts)})
+
+    alerts = [{'ts': ts, 'kind': kind, 'text': text, 'context': context(ts)}
+              for ts, kind, text in events if kind in ('alert', 'clear')]
+    span = db.execute('SELECT min(ts), max(ts), count(*) FROM samples WHERE ts >= ?', (since,)).fetchone()
+    return {'span': {'start': span[0], 'end': span[1], 'stored_points': span[2]},
+            'series': summaries, 'alerts': alerts, 'spikes': spikes[:args.max_spikes],
+            'timeline': [{'ts': ts, 'kind': kind, 'text': text} for ts, kind, text in events
+                         if kind in ('mark', 'run-start', 'run-end')]}
+
+
+def clock(ts):
+    return time.strftime('%H:%M:%S', time.localtime(ts))
+
+
+def print_report(result):
+    interesting = [s for s in result['series'] if s['metric'] in (
+        'connections_total', 'cache_hit_ratio', 'index_hit_ratio', 'commits_per_s', 'lock_waiters',
+        'longest_query_s', 'deadlocks') or (s['metric'] in ('dead_ratio', 'index_scan_pct') and s['count'] > 1)]
+    print_table(interesting, ['metric', 'scope', 'count', 'min', 'mean', 'p95', 'max'])
+    if result['alerts']:
+        print('\nAlerts:')
+        for alert in result['alerts']:
+            print(f"  {clock(alert['ts'])} {alert['kind'].upper():<5} {alert['text']}")
+            for line in alert['context']:
+                print(f'           after: {line}')
+    if result['spikes']:
+        print('\nSpikes:')
+        for spike in result['spikes']:
+            scope = f"[{spike['scope']}]" if spike['scope'] else ''
+            print(f"  {clock(spike['ts'])} {spike['metric']}{scope} = {spike['value']} (mean {spike['mean']})")
+            for line in spike['context']:
+                print(f'           after: {line}')
+
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+def main():
+    parser = base_parser(__doc__.split('\n')[1], http=False)
+    parser.add_argument('--db', default=os.path.join(DEFAULT_OUTPUT_DIR, 'db-health.sqlite'),
+                        help='SQLite timeseries file (appended to across runs)')
+    parser.add_argument('--interval', type=float, default=5, help='Seconds between samples')
+    parser.add_argument('--duration', type=float, default=0, help='Stop after this many seconds (0 = until Ctrl-C)')
+    parser.add_argument('--keyframe-every', type=int, default=60, help='Write every series every N samples')
+    parser.add_argument('--run', help='Load-test command to run while sampling; sampling stops when it exits')
+    parser.add_argument('--mark', help='Record a timeline marker in --db and exit')
+    parser.add_argument('--report', action='store_true', help='Summarize --db and exit')
+    parser.add_argument('--since-hours', type=float, help='With --report, only the last N hours')
+    parser.add_argument('--quiet', action='store_true', help='Do not print alerts as they fire')
+    parser.add_argument('--max-connections', type=int, default=20, help='TS-DB-038 threshold')
+    parser.add_argument('--min-index-hit', type=float, default=90, help='TS-DB-040 threshold (%%)')
+    parser.add_argument('--min-cache-hit', type=float, default=90, help='TS-DB-039 buffer cache hit ratio (%%)')
+    parser.add_argument('--max-query-s', type=float, default=5, help='TS-DB-041 longest active query')
+    parser.add_argument('--max-dead-pct', type=float, default=10, help='TS-DB-042 dead tuple ratio (%%)')
+    parser.add_argument('--min-rows', type=int, default=1000, help='Ignore dead ratios on smaller tables')
+    parser.add_argument('--autovacuum-lag-min', type=float, default=10, help='TS-DB-043 minutes without autovacuum')
+    parser.add_argument('--min-index-scan-pct', type=float, default=50, help='TS-DB-044 index scan share (%%)')
+    parser.add_argument('--min-seq-tup-read', type=int, default=100000,
+                        help='Sequential tuples read per interval before TS-DB-044 applies')
+    parser.add_argument('--max-bloat-pct', type=float, default=400, help='TS-DB-045 total/heap size ratio (%%)')
+    parser.add_argument('--correlate-s', type=float, default=60, help='Timeline window shown before alerts/spikes')
+    parser.add_argument('--spike-sigma', type=float, default=3, help='Standard deviations that make a spike')
+    parser.add_argument('--max-spikes', type=int, default=50)
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+    store = Timeseries(args.db)
+    if args.mark:
+        store.event('mark', args.mark)
+        return
+    if args.report:
+        result = report(store, args, time.time() - args.since_hours * 3600 if args.since_hours else 0.0)
+        print_report(result)
+        write_report(args.output_dir, 'db-health', result, args.label)
+        return
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    conn = connect(args.database_url, autocommit=True)
+    with conn.cursor() as cur:
+        cur.execute("SET application_name = 'moss-health-sampler'")
+    sampler = Sampler(conn)
+    alerter = Alerter(store, thresholds(args), args.quiet)
+    store.event('info', f'sampling every {args.interval}s')
+    proc = None
+    if args.run:
+        proc, _ = run_command(store, args.run)
+
+    started = time.time()
+    count = 0
+    try:
+        while not stop.is_set():
+            tick = time.time()
+            ts, values, indexes_changed = sampler.sample()
+            store.write(ts, values, keyframe=count % args.keyframe_every == 0)
+            if indexes_changed:
+                store.event('alert', f'TS-DB-036 index set on key tables changed: {sampler.index_counts}', ts)
+            alerter.evaluate(ts, values)
+            count += 1
+            if args.duration and time.time() - started >= args.duration:
+                break
+            if proc and proc.poll() is not None:
+                # One more sample after the run so its tail is captured
+                stop.wait(args.interval)
+                ts, values, _ = sampler.sample()
+                store.write(ts, values, keyframe=True)
+                alerter.evaluate(ts, values)
+                break
+            stop.wait(max(0.0, args.interval - (time.time() - tick)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if proc and proc.poll() is None:
+            proc.terminate()
+        store.event('info', f'stopped after {count} samples')
+        conn.close()
+
+    print(f'\n{count} samples, {store.written:,} points stored in {args.db}')
+    result = report(store, args, started - 1)
+    print_report(result)
+    write_report(args.output_dir, 'db-health', result, args.label)
+    if proc is not None:
+        sys.exit(proc.wait())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+/**
+ * Encryption Runner
+ * Drives src/lib/encryption.ts and src/lib/integrations/encryption.ts for encryption_rotation.py
+ *
+ * Usage:
+ *   npx ts-node --transpile-only --compiler-options '{"module":"commonjs","moduleResolution":"node"}' \
+ *     testing/perf/encryption-runner.ts
+ *
+ * Unlike the one-shot runners in this directory, this one stays up for a
+ * whole rotation: it reads one JSON request per line on stdin and answers
+ * with one JSON line on stdout, so every batch is encrypted by the real
+ * modules without paying ts-node startup per batch.
+ *
+ * Formats:
+ *   app          encrypt()/decrypt() from src/lib/encryption.ts, key from ENCRYPTION_KEY (base64)
+ *   integration  encryptCredentials()/decryptCredentials(), key from INTEGRATION_ENCRYPTION_KEY (hex)
+ *
+ * Both modules read their key from the environment on every call, so the
+ * runner switches keys by setting the variable before each operation.
+ */
+
+import { createInterface } from 'readline'
+import { decrypt, encrypt } from '../../src/lib/encryption'
+import { decryptCredentials, encryptCredentials } from '../../src/lib/integrations/encryption'
+
+type Format = 'app' | 'integration'
+
+interface Request {
+  op: 'bench' | 'encrypt' | 'rotate' | 'verify'
+  format: Format
+  key?: string
+  old_key?: string
+  new_key?: string
+  plaintexts?: string[]
+  ciphertexts?: string[]
+  sizes?: number[]
+  iterations?: number
+  seconds?: number
+}
+
+// stdout carries the protocol; library logging goes to stderr
+const log = console.error
+console.log = (...args: unknown[]) => log(...args)
+console.warn = (...args: unknown[]) => log(...args)
+
+function useKey(format: Format, key: string): void {
+  if (format === 'app') {
+    process.env.ENCRYPTION_KEY = key
+  } else {
+    process.env.INTEGRATION_ENCRYPTION_KEY = key
+  }
+}
+
+async function encryptWith(format: Format, key: string, plaintext: string): Promise<string> {
+  useKey(format, key)
+  if (format === 'app') {
+    return encrypt(plaintext)
+  }
+  const encrypted = encryptCredentials(JSON.parse(plaintext))
+  if (!encrypted) {
+    throw new Error('encryptCredentials failed')
+  }
+  return encrypted
+}
+
+/**
+ * Decrypt or return null; a wrong key is expected while probing already
+ * rotated rows, so decryptCredentials' error logging is muted for the call
+ */
+async function decryptWith(format: Format, key: string, ciphertext: string): Promise<string | null> {
+  useKey(format, key)
+  if (format === 'app') {
+    try {
+      return await decrypt(ciphertext)
+    } catch {
+      return null
+    }
+  }
+  console.error = () => undefined
+  try {
+    const credentials = decryptCredentials(ciphertext)
+    return credentials ? JSON.stringify(credentials) : null
+  } finally {
+    console.error = log
+  }
+}
+
+function elapsedUs(start: bigint): number {
+  return Number(process.hrtime.bigint() - start) / 1e3
+}
+
+function payload(size: number): string {
+  // Credential-shaped JSON padded to roughly `size` bytes
+  const base = { username: 'svc-perf', password: 'p'.repeat(24), api_key: '' }
+  base.api_key = 'k'.repeat(Math.max(0, size - JSON.stringify(base).length))
+  return JSON.stringify(base)
+}
+
+async function bench(request: Request) {
+  const key = request.key as string
+  const results = []
+  for (const size of request.sizes || [256]) {
+    const plaintext = payload(size)
+    const encryptUs: number[] = []
+    const decryptUs: number[] = []
+    const ciphertexts: string[] = []
+    const budgetMs = (request.seconds || 5) * 1000
+    let deadline = Date.now() + budgetMs
+    while (encryptUs.length < (request.iterations || 1000) && Date.now() < deadline) {
+      const start = process.hrtime.bigint()
+      ciphertexts.push(await encryptWith(request.format, key, plaintext))
+      encryptUs.push(elapsedUs(start))
+    }
+    deadline = Date.now() + budgetMs
+    for (const ciphertext of ciphertexts) {
+      if (Date.now() > deadline) break
+      const start = process.hrtime.bigint()
+      if ((await decryptWith(request.format, key, ciphertext)) !== plaintext) {
+        throw new Error(`Round trip failed for ${request.format} at ${size} bytes`)
+      }
+      decryptUs.push(elapsedUs(start))
+    }
+    results.push({
+      size,
+      plaintext_bytes: plaintext.length,
+      ciphertext_bytes: ciphertexts[0].length,
+      encrypt_us: encryptUs,
+      decrypt_us: decryptUs,
+    })
+  }
+  return { results }
+}
+
+async function encryptAll(request: Request) {
+  const start = process.hrtime.bigint()
+  const ciphertexts = []
+  for (const plaintext of request.plaintexts || []) {
+    ciphertexts.push(await encryptWith(request.format, request.key as string, plaintext))
+  }
+  return { ciphertexts, ms: elapsedUs(start) / 1e3 }
+}
+
+/**
+ * Re-encrypt each value from old_key to new_key. Values that only decrypt
+ * with new_key were rotated by an earlier (interrupted) pass and are left
+ * as they are, which is what makes passes resumable and repeatable.
+ */
+async function rotate(request: Request) {
+  const statuses: string[] = []
+  const ciphertexts: (string | null)[] = []
+  let decryptUs = 0
+  let encryptUs = 0
+  for (const ciphertext of request.ciphertexts || []) {
+    let start = process.hrtime.bigint()
+    const plaintext = await decryptWith(request.format, request.old_key as string, ciphertext)
+    decryptUs += elapsedUs(start)
+    if (plaintext === null) {
+      const current = await decryptWith(request.format, request.new_key as string, ciphertext)
+      statuses.push(current === null ? 'failed' : 'current')
+      ciphertexts.push(null)
+      continue
+    }
+    start = process.hrtime.bigint()
+    ciphertexts.push(await encryptWith(request.format, request.new_key as string, plaintext))
+    encryptUs += elapsedUs(start)
+    statuses.push('rotated')
+  }
+  return { ciphertexts, statuses, decrypt_ms: decryptUs / 1e3, encrypt_ms: encryptUs / 1e3 }
+}
+
+async function verify(request: Request) {
+  let ok = 0
+  let failed = 0
+  for (const ciphertext of request.ciphertexts || []) {
+    if ((await decryptWith(request.format, request.key as string, ciphertext)) === null) {
+      failed++
+    } else {
+      ok++
+    }
+  }
+  return { ok, failed }
+}
+
+const HANDLERS = { bench, encrypt: encryptAll, rotate, verify }
+
+async function main() {
+  process.stdout.write(JSON.stringify({ ready: true }) + '\n')
+  const lines = createInterface({ input: process.stdin, crlfDelay: Infinity })
+  for await (const line of lines) {
+    if (!line.trim()) continue
+    let response
+    try {
+      const request = JSON.parse(line) as Request
+      const handler = HANDLERS[request.op]
+      if (!handler) {
+        throw new Error(`Unknown op: ${request.op}`)
+      }
+      response = await handler(request)
+    } catch (error) {
+      response = { error: error instanceof Error ? error.message : String(error) }
+    }
+    process.stdout.write(JSON.stringify(response) + '\n')
+  }
+}
+
+main().catch((error) => {
+  console.error(error)
+  process.exit(1)
+})
@@ -0,0 +1,549 @@
+#!/usr/bin/env python3
+"""
+Credential encryption throughput and key-rotation driver
+
+Measures encrypt/decrypt throughput of both credential encryption modules,
+seeds tagged integration_configs rows with encrypted credentials and then
+re-encrypts them under a new key in batched, resumable passes while reader
+and writer probes run against the same table. Reports rows/sec per batch,
+how long each batch holds its row locks, and read/write latency before and
+during rotation, so rotation can be scheduled on large datasets.
+
+All crypto runs in the real TypeScript modules through encryption-runner.ts:
+  app          src/lib/encryption.ts (AES-256-GCM, key from ENCRYPTION_KEY or the
+               active encryption_keys row, migration 030). /api/admin/integrations
+               writes credentials_encrypted in this format.
+  integration  src/lib/integrations/encryption.ts (AES-256-GCM with a PBKDF2-SHA512
+               derived key, 100k iterations per call, INTEGRATION_ENCRYPTION_KEY).
+               The JAMF sync jobs read credentials_encrypted in this format.
+The two formats are not interchangeable: credentials saved through the admin
+API do not decrypt with decryptCredentials(). Rotate the format the rows hold.
+
+Each batch runs in one transaction: SELECT ... FOR UPDATE on the next
+--batch-size rows by id, re-encrypt, UPDATE, commit, checkpoint the last id.
+A value that no longer decrypts with the old key but does with the new one
+was rotated by an earlier pass and is skipped, so an interrupted run can be
+resumed with --resume and a full pass can safely be repeated to pick up rows
+written with the old key while rotation ran. The integration_configs
+updated_at trigger fires for every re-encrypted row.
+
+Scope is the perf-tagged rows unless --all-rows is given. For the app format
+the new key is stored inactive in encryption_keys; --activate (requires
+--all-rows) switches the active key once every row verifies. Servers cache the
+key in memory (encryption-key-manager.ts), so they must be restarted after
+activation; until then they cannot decrypt rows rotated to the new key.
+
+Usage:
+  python3 testing/perf/encryption_rotation.py --rows 100000 --batch-size 500 --readers 8 --writers 2
+  python3 testing/perf/encryption_rotation.py --format integration --rows 20000 --distinct 200
+  python3 testing/perf/encryption_rotation.py --rows 100000 --max-batches 50   # interrupt part way
+  python3 testing/perf/encryption_rotation.py --resume --skip-bench
+  python3 testing/perf/encryption_rotation.py --all-rows --activate --skip-bench --batch-size 200
+  python3 testing/perf/encryption_rotation.py --cleanup
+"""
+import base64
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from common import (
+    DEFAULT_OUTPUT_DIR,
+    NODE_RUNNER,
+    PERF_TAG,
+    REPO_ROOT,
+    base_parser,
+    connect,
+    copy_rows,
+    int_list,
+    print_table,
+    summarize,
+    write_report,
+)
+from fixtures import count_tagged, delete_tagged, new_id
+from integrity_audit import load_checkpoint, save_checkpoint
+
+RUNNER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'encryption-runner.ts')
+FORMATS = ('app', 'integration')
+KEY_DESCRIPTION = f'{PERF_TAG}rotation benchmark key'
+PENDING_DESCRIPTION = 'Rotation target key (pending activation)'
+INTEGRATION_COLUMNS = ['id', 'integration_type', 'name', 'is_enabled', 'config', 'credentials_encrypted']
+
+
+def generate_key(fmt):
+    """Key in the encoding each module expects: base64 (app) or 64 hex characters (integration)"""
+    raw = os.urandom(32)
+    return base64.b64encode(raw).decode() if fmt == 'app' else raw.hex()
+
+
+def check_key(fmt, key, flag):
+    try:
+        valid = len(base64.b64decode(key, validate=True) if fmt == 'app' else bytes.fromhex(key)) == 32
+    except ValueError:
+        valid = False
+    if not valid:
+        encoding = 'base64 of 32 bytes' if fmt == 'app' else '64 hex characters'
+        raise SystemExit(f'{flag} is not a valid {fmt} key ({encoding})')
+
+
+# ----------------------------------------------------------------------------
+# Node runner
+# ----------------------------------------------------------------------------
+
+class CryptoRunner:
+    """Long-lived encryption-runner.ts process speaking JSON lines"""
+
+    def __init__(self):
+        self.proc = subprocess.Popen(NODE_RUNNER + [RUNNER], cwd=REPO_ROOT, stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE, text=True, bufsize=1)
+        self._read()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.proc.stdin.close()
+        self.proc.wait(timeout=30)
+
+    def _read(self):
+        line = self.proc.stdout.readline()
+        if not line:
+            raise SystemExit(f'encryption-runner exited with {self.proc.wait()}')
+        response = json.loads(line)
+        if 'error' in response:
+            raise SystemExit(f"encryption-runner: {response['error']}")
+        return response
+
+    def call(self, op, fmt, **params):
+        self.proc.stdin.write(json.dumps({'op': op, 'format': fmt, **params}) + '\n')
+        self.proc.stdin.flush()
+        return self._read()
+
+
+# ----------------------------------------------------------------------------
+# Keys
+# ----------------------------------------------------------------------------
+
+def active_app_key(conn):
+    """The key the app would use: the active encryption_keys row, created like the key manager does"""
+    row = conn.execute('SELECT id, encryption_key FROM encryption_keys WHERE is_active = true LIMIT 1').fetchone()
+    if row:
+        return str(row[0]), row[1]
+    key = generate_key('app')
+    key_id = conn.execute(
+        'INSERT INTO encryption_keys (encryption_key, description, created_at) '
+        'VALUES (%s, %s, CURRENT_TIMESTAMP) RETURNING id',
+        (key, 'Auto-generated encryption key on first boot')).fetchone()[0]
+    conn.commit()
+    print('No active encryption key existed; generated one as encryption-key-manager.ts would on first use')
+    return str(key_id), key
+
+
+def resolve_keys(args, conn, checkpoint):
+    """Old and new key for this run, reusing the checkpoint's on --resume"""
+    keys = checkpoint.setdefault('keys', {})
+    if args.format == 'app':
+        if os.environ.get('ENCRYPTION_KEY') and not args.old_key:
+            if args.activate:
+                raise SystemExit('ENCRYPTION_KEY is set: the app ignores encryption_keys, rotate the env var instead')
+            args.old_key = os.environ['ENCRYPTION_KEY']
+        stored = 'SELECT encryption_key FROM encryption_keys WHERE id = %s'
+        if args.old_key:
+            old_key_id, old_key = None, args.old_key
+        elif keys.get('old_id'):
+            old_key_id = keys['old_id']
+            old_key = conn.execute(stored, (old_key_id,)).fetchone()[0]
+        else:
+            old_key_id, old_key = active_app_key(conn)
+        if keys.get('new_id'):
+            new_key_id = keys['new_id']
+            new_key = conn.execute(stored, (new_key_id,)).fetchone()[0]
+        else:
+            # Stored inactive up front so --activate and --resume can find it by id
+            new_key = args.new_key or generate_key('app')
+            new_key_id = str(conn.execute(
+                'INSERT INTO encryption_keys (encryption_key, description, is_active) VALUES (%s, %s, false) '
+                'RETURNING id', (new_key, PENDING_DESCRIPTION if args.all_rows else KEY_DESCRIPTION)).fetchone()[0])
+        conn.commit()
+        keys.update({'old_id': old_key_id, 'new_id': new_key_id})
+    else:
+        # INTEGRATION_ENCRYPTION_KEY lives only in the environment; synthetic keys for
+        # perf-tagged rows are kept in the checkpoint so the run can be resumed
+        old_key = args.old_key or os.environ.get('INTEGRATION_ENCRYPTION_KEY') or keys.get('old_key')
+        new_key = args.new_key or os.environ.get('INTEGRATION_ENCRYPTION_KEY_NEW') or keys.get('new_key')
+        if args.all_rows and not (old_key and new_key):
+            raise SystemExit('--all-rows with --format integration needs --old-key/--new-key '
+                             '(or INTEGRATION_ENCRYPTION_KEY / INTEGRATION_ENCRYPTION_KEY_NEW)')
+        old_key = old_key or generate_key('integration')
+        new_key = new_key or generate_key('integration')
+        if not args.all_rows:
+            keys.update({'old_key': old_key, 'new_key': new_key})
+    check_key(args.format, old_key, 'old key')
+    check_key(args.format, new_key, 'new key')
+    if old_key == new_key:
+        raise SystemExit('Old and new key are identical')
+    return old_key, new_key
+
+
+def activate(conn, keys):
+    """Make the new key the active encryption_keys row (migration 030 allows one active key)"""
+    with conn.transaction():
+        conn.execute('UPDATE encryption_keys SET is_active = false, rotated_at = CURRENT_TIMESTAMP, '
+                     'replaced_by_key_id = %s WHERE is_active = true', (keys['new_id'],))
+        conn.execute("UPDATE encryption_keys SET is_active = true, description = 'Rotated encryption key' "
+                     'WHERE id = %s', (keys['new_id'],))
+
+
+# ----------------------------------------------------------------------------
+# Throughput and seeding
+# ----------------------------------------------------------------------------
+
+def bench(runner, args):
+    rows = []
+    for fmt in FORMATS:
+        response = runner.call('bench', fmt, key=generate_key(fmt), sizes=args.bench_sizes,
+                               iterations=args.bench_iterations, seconds=args.bench_seconds)
+        for result in response['results']:
+            for op in ('encrypt', 'decrypt'):
+                samples = result[f'{op}_us']
+                stats = summarize(samples)
+                rows.append({
+                    'format': fmt,
+                    'op': op,
+                    'bytes': result['plaintext_bytes'],
+                    'stored_bytes': result['ciphertext_bytes'],
+                    'ops': len(samples),
+                    'ops_per_s': round(len(samples) / (sum(samples) / 1e6), 1) if samples else 0,
+                    'p50_us': stats['p50'],
+                    'p99_us': stats['p99'],
+                    'max_us': stats['max'],
+                })
+    return rows
+
+
+def credentials(rng, size):
+    record = {'username': f'svc-{rng.randrange(10 ** 6)}', 'password': '%032x' % rng.getrandbits(128)}
+    record['api_key'] = 'k' * max(0, size - len(json.dumps(record)) - 14)
+    return json.dumps(record)
+
+
+def seed(conn, runner, args, old_key, rng):
+    """
+    Tagged integration rows with credentials encrypted under the old key
+
+    Only --distinct values are actually encrypted (PBKDF2 makes the integration
+    format expensive) and reused across rows; rotation still decrypts and
+    re-encrypts every row.
+    """
+    removed = delete_tagged(conn, 'integration_configs', 'name', PERF_TAG)
+    if removed:
+        print(f'Removed {removed:,} previously seeded rows')
+    started = time.perf_counter()
+    plaintexts = [credentials(rng, args.payload_bytes) for _ in range(min(args.distinct, args.rows))]
+    encrypted = runner.call('encrypt', args.format, key=old_key, plaintexts=plaintexts)
+    config = json.dumps({'base_url': 'https://perf.invalid'})
+    rows = ((new_id(rng), 'perf', f'{PERF_TAG}enc-{n:08d}', False, config,
+             encrypted['ciphertexts'][n % len(plaintexts)]) for n in range(args.rows))
+    count = copy_rows(conn, 'integration_configs', INTEGRATION_COLUMNS, rows)
+    conn.commit()
+    conn.execute('ANALYZE integration_configs')
+    conn.commit()
+    return {'rows': count, 'distinct_values': len(plaintexts), 'encrypt_ms': round(encrypted['ms'], 1),
+            'seconds': round(time.perf_counter() - started, 2)}
+
+
+# ----------------------------------------------------------------------------
+# Concurrent probes
+# ----------------------------------------------------------------------------
+
+class Probes:
+    """
+    Reader and writer threads against integration_configs
+
+    Readers fetch credentials_encrypted by id the way the sync jobs do; MVCC
+    means they never wait on rotation locks, so their latency shows CPU and
+    I/O contention. Writers touch last_sync_at on perf-tagged rows the way a
+    sync run records its status, and block while a batch holds the row.
+    """
+
+    def __init__(self, database_url, read_ids, write_ids, readers, writers, pause_s):
+        self.database_url = database_url
+        self.read_ids = read_ids
+        self.write_ids = write_ids
+        self.readers = readers if read_ids else 0
+        self.writers = writers if write_ids else 0
+        self.pause_s = pause_s
+        self.samples = {'read': [], 'write': []}
+        self.errors = 0
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._stop.clear()
+        self.samples = {'read': [], 'write': []}
+        for kind, count in (('read', self.readers), ('write', self.writers)):
+            for n in range(count):
+                thread = threading.Thread(target=self._run, args=(kind, random.Random(n)), daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        return {kind: summarize(samples) for kind, samples in self.samples.items()}
+
+    def _run(self, kind, rng):
+        if kind == 'read':
+            sql, ids = 'SELECT credentials_encrypted FROM integration_configs WHERE id = %s', self.read_ids
+        else:
+            sql, ids = 'UPDATE integration_configs SET last_sync_at = CURRENT_TIMESTAMP WHERE id = %s', self.write_ids
+        with connect(self.database_url, autocommit=True) as conn:
+            while not self._stop.is_set():
+                began = time.perf_counter()
+                try:
+                    cur = conn.execute(sql, (rng.choice(ids),))
+                    if kind == 'read':
+                        cur.fetchall()
+                except Exception:
+                    self.errors += 1
+                    self._stop.wait(0.1)
+                    continue
+                self.samples[kind].append((time.perf_counter() - began) * 1000)
+                if self.pause_s:
+                    self._stop.wait(self.pause_s)
+
+
+def probe_ids(conn, args):
+    scope = '' if args.all_rows else 'AND name LIKE %(tag)s'
+    params = {'tag': f'{PERF_TAG}%', 'n': args.probe_rows}
+    read_ids = [str(row[0]) for row in conn.execute(
+        f'SELECT id FROM integration_configs WHERE credentials_encrypted IS NOT NULL {scope} '
+        'ORDER BY random() LIMIT %(n)s', params)]
+    write_ids = [str(row[0]) for row in conn.execute(
+        'SELECT id FROM integration_configs WHERE name LIKE %(tag)s ORDER BY random() LIMIT %(n)s', params)]
+    conn.commit()
+    return read_ids, write_ids
+
+
+# ----------------------------------------------------------------------------
+# Rotation
+# ----------------------------------------------------------------------------
+
+def rotate(conn, runner, args, old_key, new_key, checkpoint):
+    """Batched re-encryption from the checkpointed id onwards; yields per-batch stats"""
+    scope = '' if args.all_rows else 'AND name LIKE %(tag)s'
+    select = ('SELECT id, credentials_encrypted FROM integration_configs '
+              f'WHERE credentials_encrypted IS NOT NULL AND id > %(after)s::uuid {scope} '
+              'ORDER BY id LIMIT %(n)s FOR UPDATE')
+    state = checkpoint.setdefault('progress', {'after': '00000000-0000-0000-0000-000000000000', 'batches': 0,
+                                               'rotated': 0, 'current': 0, 'failed': 0, 'seconds': 0.0})
+    ran = 0
+    while True:
+        if args.max_batches and ran == args.max_batches:
+            return
+        began = time.perf_counter()
+        with conn.transaction():
+            rows = conn.execute(select, {'after': state['after'], 'n': args.batch_size,
+                                         'tag': f'{PERF_TAG}%'}).fetchall()
+            if not rows:
+                break
+            selected = time.perf_counter()
+            result = runner.call('rotate', args.format, old_key=old_key, new_key=new_key,
+                                 ciphertexts=[row[1] for row in rows])
+            crypto = time.perf_counter()
+            changed = [(str(row[0]), value) for row, value in zip(rows, result['ciphertexts']) if value]
+            if changed:
+                ids, values = zip(*changed)
+                conn.execute('UPDATE integration_configs c SET credentials_encrypted = v.value '
+                             'FROM unnest(%s::uuid[], %s::text[]) AS v(id, value) WHERE c.id = v.id',
+                             (list(ids), list(values)))
+            updated = time.perf_counter()
+        committed = time.perf_counter()
+        statuses = result['statuses']
+        batch = {
+            'batch': state['batches'],
+            'rows': len(rows),
+            'rotated': statuses.count('rotated'),
+            'current': statuses.count('current'),
+            'failed': statuses.count('failed'),
+            'select_ms': round((selected - began) * 1000, 1),
+            'decrypt_ms': round(result['decrypt_ms'], 1),
+            'encrypt_ms': round(result['encrypt_ms'], 1),
+            'update_ms': round((updated - crypto) * 1000, 1),
+            'lock_held_ms': round((committed - selected) * 1000, 1),
+            'rows_per_s': round(len(rows) / (committed - began), 1),
+        }
+        state['after'] = str(rows[-1][0])
+        state['batches'] += 1
+        ran += 1
+        for key in ('rotated', 'current', 'failed'):
+            state[key] += batch[key]
+        state['seconds'] = round(state['seconds'] + committed - began, 3)
+        save_checkpoint(args.checkpoint, checkpoint)
+        yield batch
+        if args.pause_ms:
+            time.sleep(args.pause_ms / 1000)
+    state['done'] = True
+    save_checkpoint(args.checkpoint, checkpoint)
+
+
+def verify(conn, runner, args, old_key, new_key):
+    scope = '' if args.all_rows else 'AND name LIKE %(tag)s'
+    values = [row[0] for row in conn.execute(
+        f'SELECT credentials_encrypted FROM integration_configs WHERE credentials_encrypted IS NOT NULL {scope} '
+        'ORDER BY random() LIMIT %(n)s', {'tag': f'{PERF_TAG}%', 'n': args.verify_sample})]
+    conn.commit()
+    return {
+        'sample': len(values),
+        'new_key': runner.call('verify', args.format, key=new_key, ciphertexts=values),
+        'old_key': runner.call('verify', args.format, key=old_key, ciphertexts=values),
+    }
+
+
+def main():
+    parser = base_parser(__doc__.split('\n')[1], http=False)
+    parser.add_argument('--format', choices=FORMATS, default='app', help='Which module encrypts the rows')
+    parser.add_argument('--rows', type=int, default=50000, help='Seeded integration rows')
+    parser.add_argument('--distinct', type=int, default=500, help='Distinct ciphertexts among seeded rows')
+    parser.add_argument('--payload-bytes', type=int, default=160, help='Seeded credential JSON size')
+    parser.add_argument('--bench-sizes', type=int_list, default=[64, 512, 4096], help='Benchmark payload sizes')
+    parser.add_argument('--bench-iterations', type=int, default=2000, help='Max operations per format and size')
+    parser.add_argument('--bench-seconds', type=float, default=5, help='Time budget per format, size and op')
+    parser.add_argument('--batch-size', type=int, default=500, help='Rows re-encrypted per transaction')
+    parser.add_argument('--pause-ms', type=float, default=0, help='Sleep between batches')
+    parser.add_argument('--max-batches', type=int, default=0, help='Stop after this many batches (0 = all)')
+    parser.add_argument('--checkpoint',
+                        default=os.path.join(DEFAULT_OUTPUT_DIR, 'encryption-rotation-checkpoint.json'))
+    parser.add_argument('--resume', action='store_true', help='Continue the rotation in --checkpoint')
+    parser.add_argument('--readers', type=int, default=4, help='Concurrent reader probe threads')
+    parser.add_argument('--writers', type=int, default=1, help='Concurrent writer probe threads (perf rows only)')
+    parser.add_argument('--probe-rows', type=int, default=2000, help='Rows the probes pick from')
+    parser.add_argument('--probe-pause-ms', type=float, default=2, help='Pause between probe queries')
+    parser.add_argument('--baseline-s', type=float, default=10, help='Probe time before rotation starts')
+    parser.add_argument('--verify-sample', type=int, default=500, help='Rows decrypted after rotation')
+    parser.add_argument('--old-key', help='Key the rows are encrypted with (default: active key / env)')
+    parser.add_argument('--new-key', help='Key to rotate to (default: generated)')
+    parser.add_argument('--all-rows', action='store_true', help='Rotate every integration_configs row')
+    parser.add_argument('--activate', action='store_true', help='Make the new key active afterwards (app format)')
+    parser.add_argument('--skip-bench', action='store_true', help='Skip the throughput benchmark')
+    parser.add_argument('--skip-seed', action='store_true', help='Rotate existing rows without reseeding')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--cleanup', action='store_true', help='Remove seeded rows and benchmark keys, then exit')
+    args = parser.parse_args()
+
+    conn = connect(args.database_url)
+    if args.cleanup:
+        rows = delete_tagged(conn, 'integration_configs', 'name', PERF_TAG)
+        keys = delete_tagged(conn, 'encryption_keys', 'description', PERF_TAG)
+        print(f'Removed {rows:,} integration rows and {keys} benchmark keys')
+        return
+    if args.activate and (args.format != 'app' or not args.all_rows):
+        raise SystemExit('--activate needs --format app and --all-rows (the active key protects every row)')
+
+    checkpoint = load_checkpoint(args.checkpoint) if args.resume else {}
+    if args.resume and not checkpoint:
+        raise SystemExit(f'No checkpoint at {args.checkpoint}')
+    if checkpoint and (checkpoint['format'], checkpoint['all_rows']) != (args.format, args.all_rows):
+        raise SystemExit(f"Checkpoint is for --format {checkpoint['format']}"
+                         f"{' --all-rows' if checkpoint['all_rows'] else ''}")
+    checkpoint.update({'format': args.format, 'all_rows': args.all_rows})
+    checkpoint.setdefault('started_at', time.strftime('%Y-%m-%dT%H:%M:%S'))
+    os.makedirs(os.path.dirname(os.path.abspath(args.checkpoint)), exist_ok=True)
+    rng = random.Random(args.seed)
+
+    report = {}
+    with CryptoRunner() as runner:
+        old_key, new_key = resolve_keys(args, conn, checkpoint)
+        save_checkpoint(args.checkpoint, checkpoint)
+
+        if not args.skip_bench:
+            print('Encrypt/decrypt throughput (single Node process):')
+            report['throughput'] = bench(runner, args)
+            print_table(report['throughput'], ['format', 'op', 'bytes', 'stored_bytes', 'ops', 'ops_per_s',
+                                               'p50_us', 'p99_us', 'max_us'])
+            print()
+
+        if not (args.resume or args.skip_seed or args.all_rows):
+            report['seed'] = seed(conn, runner, args, old_key, rng)
+            print(f"Seeded {report['seed']['rows']:,} rows ({report['seed']['distinct_values']} distinct values, "
+                  f"{report['seed']['seconds']}s)")
+        scoped = (conn.execute('SELECT count(*) FROM integration_configs WHERE credentials_encrypted IS NOT NULL')
+                  .fetchone()[0] if args.all_rows else count_tagged(conn, 'integration_configs', 'name', PERF_TAG))
+        conn.commit()
+        print(f'{scoped:,} rows in scope ({"all integration_configs" if args.all_rows else "perf-tagged"})')
+
+        read_ids, write_ids = probe_ids(conn, args)
+        probes = Probes(args.database_url, read_ids, write_ids, args.readers, args.writers,
+                        args.probe_pause_ms / 1000)
+        probes.start()
+        time.sleep(args.baseline_s)
+        baseline = probes.stop()
+
+        print(f'\nRotating {args.format} credentials in batches of {args.batch_size}...')
+        batches = []
+        probes.start()
+        try:
+            for batch in rotate(conn, runner, args, old_key, new_key, checkpoint):
+                batches.append(batch)
+                progress = checkpoint['progress']
+                print(f"  batch {batch['batch']:>5}  {batch['rows_per_s']:>8,.0f} rows/s  "
+                      f"lock {batch['lock_held_ms']:>7,.0f}ms  total {progress['rotated']:,} rotated")
+        except KeyboardInterrupt:
+            print(f'\nInterrupted; resume with --resume --checkpoint {args.checkpoint}')
+            sys.exit(130)
+        finally:
+            during = probes.stop()
+
+        progress = checkpoint['progress']
+        report['verify'] = verify(conn, runner, args, old_key, new_key)
+
+    rotated = sum(batch['rows'] for batch in batches)
+    seconds = sum(batch['lock_held_ms'] + batch['select_ms'] for batch in batches) / 1000
+    print()
+    print_table([{'phase': phase, 'probe': kind, **{k: stats[k] for k in ('count', 'p50', 'p95', 'p99', 'max')}}
+                 for phase, summary in (('baseline', baseline), ('rotation', during))
+                 for kind, stats in summary.items()], ['phase', 'probe', 'count', 'p50', 'p95', 'p99', 'max'])
+    if batches:
+        lock_ms = summarize([batch['lock_held_ms'] for batch in batches])
+        print(f'\nThis run: {rotated:,} rows in {len(batches)} batches, '
+              f'{rotated / seconds if seconds else 0:,.0f} rows/s, row locks held p50 {lock_ms["p50"]}ms '
+              f'max {lock_ms["max"]}ms per batch')
+    print(f"Overall: {progress['rotated']:,} rotated, {progress['current']:,} already current, "
+          f"{progress['failed']:,} undecryptable")
+    check = report['verify']
+    print(f"Verify: {check['new_key']['ok']}/{check['sample']} decrypt with the new key, "
+          f"{check['old_key']['ok']} still decrypt with the old key")
+
+    done = progress.get('done')
+    if not done:
+        print(f'\nStopped after --max-batches; resume with --resume --checkpoint {args.checkpoint}')
+    elif args.activate:
+        if progress['failed'] or check['new_key']['failed']:
+            print('\nNot activating: some rows do not decrypt with the new key')
+        else:
+            activate(conn, checkpoint['keys'])
+            print('\nNew key is active. Restart servers: they cache the old key until restart.')
+    if progress['failed']:
+        print(f"\nWarning: {progress['failed']:,} rows decrypt with neither key and were left unchanged")
+
+    write_report(args.output_dir, 'encryption-rotation', {
+        'parameters': {k: v for k, v in vars(args).items()
+                       if k not in ('password', 'api_token', 'database_url', 'old_key', 'new_key')},
+        **report,
+        'rows_in_scope': scoped,
+        'probes': {'baseline': baseline, 'rotation': during, 'errors': probes.errors},
+        'progress': progress,
+        'batches': batches,
+    }, args.label)
+    if done:
+        os.remove(args.checkpoint)
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
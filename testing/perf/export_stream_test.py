@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Streaming export verification for GET /api/export/[objectType]
+
+Consumes a full export incrementally and records time-to-first-byte, bytes/sec
+and server RSS over the run, then validates the CSV against the database:
+header, column count per row, row count and the exact set of IDs.
+
+The run FAILS (exit code 1) when the export looks buffered instead of streamed:
+  - the first body byte arrives after --max-ttfb-fraction of the total time, or
+  - server RSS grows by more than --max-rss-growth-mb during the export
+and also when any integrity check fails. The timing check is only meaningful
+for large exports (hundreds of thousands of rows); tiny exports finish in one
+chunk either way.
+
+Usage:
+  python3 testing/perf/export_stream_test.py --rows 500000
+  python3 testing/perf/export_stream_test.py --object-type devices --no-seed
+  python3 testing/perf/export_stream_test.py --cleanup
+"""
+import codecs
+import csv
+import random
+import sys
+import time
+
+from common import (
+    PERF_TAG,
+    ServerMemorySampler,
+    base_parser,
+    connect,
+    copy_rows,
+    http_client,
+    write_report,
+)
+from fixtures import DEVICE_COLUMNS, count_tagged, delete_tagged, device_rows
+
+NAME_PREFIX = f'{PERF_TAG}export-'
+
+# Object types served by EXPORT_CONFIGS in the route and their tables
+EXPORT_TABLES = {
+    'devices': 'devices',
+    'people': 'people',
+    'locations': 'locations',
+    'rooms': 'rooms',
+    'companies': 'companies',
+    'networks': 'networks',
+}
+
+
+def seed(conn, target, rng):
+    existing = count_tagged(conn, 'devices', 'hostname', NAME_PREFIX)
+    if existing < target:
+        print(f'Seeding {target - existing:,} devices...')
+        copy_rows(conn, 'devices', DEVICE_COLUMNS, device_rows(NAME_PREFIX, existing, target - existing, rng))
+        conn.commit()
+        with conn.cursor() as cur:
+            cur.execute('ANALYZE devices')
+        conn.commit()
+
+
+def database_ids(conn, table):
+    """All IDs in the table, read through a server-side cursor"""
+    ids = set()
+    with conn.cursor(name='perf_export_ids') as cur:
+        cur.itersize = 10000
+        cur.execute(f'SELECT id::text FROM {table}')
+        for (row_id,) in cur:
+            ids.add(row_id)
+    conn.commit()
+    return ids
+
+
+def text_lines(chunks, encoding='utf-8'):
+    """Split streamed byte chunks into lines (newline kept) for csv.reader"""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split('\n')
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def consume(client, object_type, sample_interval, sampler):
+    """Stream the export, parsing CSV as it arrives; returns metrics and parsed data"""
+    stats = {'bytes': 0, 'chunks': 0, 'timeline': []}
+    ids, bad_rows, header = [], [], None
+    start = time.perf_counter()
+    last_sample = start
+
+    with client.stream('GET', f'/api/export/{object_type}') as response:
+        stats['status'] = response.status_code
+        stats['headers_s'] = time.perf_counter() - start
+        if response.status_code != 200:
+            response.read()
+            stats['error'] = response.text[:500]
+            return stats, header, ids, bad_rows
+
+        def chunks():
+            nonlocal last_sample
+            for chunk in response.iter_bytes():
+                now = time.perf_counter()
+                if stats['chunks'] == 0:
+                    stats['first_byte_s'] = now - start
+                stats['chunks'] += 1
+                stats['bytes'] += len(chunk)
+                stats['wire_bytes'] = response.num_bytes_downloaded
+                if now - last_sample >= sample_interval:
+                    last_sample = now
+                    rss = sampler.samples[-1][1] if sampler.samples else None
+                    stats['timeline'].append({
+                        't': round(now - start, 2),
+                        'bytes': stats['bytes'],
+                        'rows': len(ids),
+                        'server_rss_mb': round(rss / 1024, 1) if rss else None,
+                    })
+                yield chunk
+
+        for line_number, row in enumerate(csv.reader(text_lines(chunks()))):
+            if header is None:
+                header = row
+                continue
+            if len(row) != len(header):
+                bad_rows.append({'line': line_number + 1, 'fields': len(row)})
+                continue
+            ids.append(row[0])
+
+    stats['total_s'] = time.perf_counter() - start
+    return stats, header, ids, bad_rows
+
+
+def main():
+    parser = base_parser(__doc__.split('\n')[1])
+    parser.add_argument('--object-type', default='devices', choices=sorted(EXPORT_TABLES),
+                        help='Export endpoint object type')
+    parser.add_argument('--rows', type=int, default=500000,
+                        help='Ensure at least this many tagged devices exist before exporting')
+    parser.add_argument('--no-seed', action='store_true', help='Export the table as it is')
+    parser.add_argument('--max-ttfb-fraction', type=float, default=0.25,
+                        help='Fail if the first byte arrives after this fraction of the total time')
+    parser.add_argument('--max-rss-growth-mb', type=float, default=256,
+                        help='Fail if server RSS grows by more than this during the export')
+    parser.add_argument('--sample-interval', type=float, default=0.5, help='Timeline sample interval (s)')
+    parser.add_argument('--seed', type=int, default=29, help='Random seed')
+    parser.add_argument('--keep', action='store_true', help='Leave seeded devices in place')
+    parser.add_argument('--cleanup', action='store_true', help='Remove seeded devices and exit')
+    args = parser.parse_args()
+
+    table = EXPORT_TABLES[args.object_type]
+    with connect(args.database_url) as conn:
+        if args.cleanup:
+            print(f"Removed {delete_tagged(conn, 'devices', 'hostname', NAME_PREFIX)} devices")
+            return
+        if not args.no_seed and args.object_type == 'devices':
+            seed(conn, args.rows, random.Random(args.seed))
+
+        expected_ids = database_ids(conn, table)
+        print(f'{table}: {len(expected_ids):,} rows in database')
+
+        with http_client(args.base_url, args.api_token, timeout=None) as client:
+            with ServerMemorySampler(args.server_pid, interval=args.sample_interval / 2) as sampler:
+                stats, header, ids, bad_rows = consume(client, args.object_type, args.sample_interval, sampler)
+
+        if not args.keep and not args.no_seed:
+            delete_tagged(conn, 'devices', 'hostname', NAME_PREFIX)
+
+    failures = []
+    if stats.get('status') != 200:
+        failures.append(f"HTTP {stats.get('status')}: {stats.get('error')}")
+    else:
+        first_byte = stats.get('first_byte_s', stats['total_s'])
+        ttfb_fraction = first_byte / stats['total_s'] if stats['total_s'] else 0
+        stats['ttfb_fraction'] = round(ttfb_fraction, 3)
+        stats['throughput_mb_s'] = round(stats['bytes'] / 1024 / 1024 / stats['total_s'], 2)
+        stats['rows_per_s'] = round(len(ids) / stats['total_s'])
+        if ttfb_fraction > args.max_ttfb_fraction:
+            failures.append(f'buffered: first byte at {first_byte:.2f}s of {stats["total_s"]:.2f}s '
+                            f'({ttfb_fraction:.0%} > {args.max_ttfb_fraction:.0%})')
+
+        memory = sampler.summary()
+        if memory['growth_mb'] is not None and memory['growth_mb'] > args.max_rss_growth_mb:
+            failures.append(f"buffered: server RSS grew {memory['growth_mb']}MB "
+                            f'(> {args.max_rss_growth_mb}MB)')
+
+        exported = set(ids)
+        if bad_rows:
+            failures.append(f'{len(bad_rows)} rows with a wrong column count (first: {bad_rows[0]})')
+        if len(ids) != len(exported):
+            failures.append(f'{len(ids) - len(exported)} duplicate IDs in export')
+        if len(ids) != len(expected_ids):
+            failures.append(f'row count {len(ids):,} != database {len(expected_ids):,}')
+        missing, extra = expected_ids - exported, exported - expected_ids
+        if missing or extra:
+            failures.append(f'{len(missing)} IDs missing, {len(extra)} unexpected IDs')
+        if not header or header[0] != 'ID':
+            failures.append(f'unexpected header: {header[:3] if header else header}')
+
+    memory = sampler.summary()
+    print(f"\nstatus={stats.get('status')} rows={len(ids):,} bytes={stats['bytes']:,}")
+    if 'first_byte_s' in stats:
+        print(f"headers={stats['headers_s']:.3f}s first_byte={stats['first_byte_s']:.3f}s "
+              f"total={stats['total_s']:.2f}s throughput={stats.get('throughput_mb_s')}MB/s "
+              f"rows/s={stats.get('rows_per_s')}")
+    print(f"server RSS baseline={memory['baseline_mb']}MB peak={memory['peak_mb']}MB growth={memory['growth_mb']}MB")
+    print('\nRESULT: ' + ('PASS' if not failures else 'FAIL'))
+    for failure in failures:
+        print(f'  - {failure}')
+
+    write_report(args.output_dir, 'export-stream-test', {
+        'object_type': args.object_type,
+        'database_rows': len(expected_ids),
+        'exported_rows': len(ids),
+        'transfer': {k: v for k, v in stats.items() if k != 'timeline'},
+        'timeline': stats['timeline'],
+        'server_memory': memory,
+        'server_rss_samples': sampler.samples,
+        'thresholds': {
+            'max_ttfb_fraction': args.max_ttfb_fraction,
+            'max_rss_growth_mb': args.max_rss_growth_mb,
+        },
+        'passed': not failures,
+        'failures': failures,
+    }, args.label)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
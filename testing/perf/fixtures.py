@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Synthetic inventory rows for the performance tools
+
+Generators yield tuples in the column order given by the matching *_COLUMNS
+constant so they can be passed straight to common.copy_rows(). Every row is
+tagged with a caller-supplied prefix (built from common.PERF_TAG) in its name
+column, which is what delete_tagged() matches on.
+"""
+import uuid
+from datetime import date, timedelta
+
+MANUFACTURERS = ['Dell', 'HP', 'Lenovo', 'Apple', 'Cisco', 'Juniper', 'Arista', 'Sony', 'Blackmagic']
+DEVICE_TYPES = ['computer', 'server', 'switch', 'router', 'printer', 'mobile', 'av_equipment']
+DEVICE_STATUSES = ['active', 'active', 'active', 'repair', 'storage', 'retired']
+OPERATING_SYSTEMS = ['Windows 11', 'macOS 14', 'Ubuntu 22.04', 'IOS-XE', 'Junos', None]
+DEPARTMENTS = ['Engineering', 'Production', 'Finance', 'IT', 'Operations', 'Sales']
+
+DEVICE_COLUMNS = [
+    'id', 'hostname', 'device_type', 'manufacturer', 'model', 'serial_number', 'asset_tag',
+    'purchase_date', 'warranty_expiration', 'status', 'operating_system', 'notes',
+]
+
+PEOPLE_COLUMNS = ['id', 'full_name', 'email', 'username', 'person_type', 'department', 'status']
+
+
+def new_id(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def device_rows(prefix, start, count, rng):
+    """Devices numbered start..start+count-1 with realistic field spread"""
+    today = date.today()
+    for n in range(start, start + count):
+        manufacturer = rng.choice(MANUFACTURERS)
+        purchased = today - timedelta(days=rng.randint(30, 2000))
+        yield (
+            new_id(rng),
+            f'{prefix}{n:07d}',
+            rng.choice(DEVICE_TYPES),
+            manufacturer,
+            f'{manufacturer[:3].upper()}-{rng.randint(100, 999)}',
+            f'SN{rng.getrandbits(40):010X}',
+            f'AT-{n:07d}',
+            purchased,
+            purchased + timedelta(days=rng.choice([365, 730, 1095, 1825])),
+            rng.choice(DEVICE_STATUSES),
+            rng.choice(OPERATING_SYSTEMS),
+            'Synthetic performance test device, "quoted", with commas' if n % 50 == 0 else None,
+        )
+
+
+def people_rows(prefix, start, count, rng):
+    for n in range(start, start + count):
+        yield (
+            new_id(rng),
+            f'{prefix}Person {n:07d}',
+            f'{prefix}{n:07d}@example.test',
+            f'{prefix}{n:07d}',
+            'employee',
+            rng.choice(DEPARTMENTS),
+            'active',
+        )
+
+
+def delete_tagged(conn, table, column, prefix):
+    """Delete rows whose name column starts with prefix; returns the row count"""
+    with conn.cursor() as cur:
+        cur.execute(f'DELETE FROM {table} WHERE {column} LIKE %s', (f'{prefix}%',))
+        count = cur.rowcount
+    conn.commit()
+    return count
+
+
+def count_tagged(conn, table, column, prefix):
+    with conn.cursor() as cur:
+        cur.execute(f'SELECT COUNT(*) FROM {table} WHERE {column} LIKE %s', (f'{prefix}%',))
+        return cur.fetchone()[0]
@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+"""
+Streaming referential-integrity auditor
+
+A production-safe replacement for the ad-hoc orphan counts in TS-DB-027
+(testing/database-performance-tests.sql). Keys are streamed through
+server-side cursors in batches and every check runs per batch, so memory stays
+bounded and each query touches at most --batch-size rows. Three kinds of check:
+
+  orphans      every single-column foreign key on the audited tables (read from
+               pg_constraint), including the license junction tables from
+               migration 004. Orphans normally cannot exist; they appear after
+               bulk loads with triggers disabled, NOT VALID constraints or
+               restores, so the enforcement state of each FK is reported too.
+  duplicates   ordered scans that compare neighbouring keys: devices.hostname
+               (the unique constraint from migration 010) and its
+               case-insensitive variant, serial numbers per manufacturer, asset
+               tags, MAC addresses, IPs per network, room names per location,
+               interface names per device and license keys.
+  consistency  cross-table rules: device/room/location agreement, IO room vs
+               device location, self and non-reciprocal IO connections, parent
+               device cycles, IPs on networks their IO does not carry, license
+               seat counters vs the migration 004 junctions, and legacy
+               license_people rows missing from person_software_licenses.
+
+Throttling: --max-rows-per-sec caps the scan rate, --pause-ms sleeps between
+batches, and a batch slower than --slow-batch-ms doubles the pause (halved
+again after fast batches). Check queries run with statement_timeout and
+lock_timeout set. Key scans reopen their cursor every --segment-rows rows so no
+snapshot is held for the whole audit; duplicate scans sort by the duplicate
+key and keep one cursor per check.
+
+Progress is checkpointed to --checkpoint after every batch (last key, counts,
+samples). --resume continues from it; completed checks are skipped. Every
+finding can also be streamed to --findings as JSON lines.
+
+Usage:
+  python3 testing/perf/integrity_audit.py
+  python3 testing/perf/integrity_audit.py --only orphans,duplicates --max-rows-per-sec 20000
+  python3 testing/perf/integrity_audit.py --resume --checkpoint results/audit-prod.json
+  python3 testing/perf/integrity_audit.py --list
+"""
+import json
+import os
+import sys
+import time
+
+from common import DEFAULT_OUTPUT_DIR, base_parser, connect, print_table, write_report
+
+AUDITED_TABLES = [
+    'devices', 'ios', 'io_tagged_networks', 'ip_addresses', 'rooms', 'software_licenses',
+    'person_software_licenses', 'group_software_licenses',
+    'license_people', 'license_saas_services', 'license_installed_applications',
+]
+
+# name: (table, key expression, description)
+DUPLICATE_CHECKS = {
+    'devices.hostname': ('devices', 'hostname', 'hostname must be unique (migration 010)'),
+    'devices.hostname_ci': ('devices', "lower(btrim(hostname))", 'hostnames equal ignoring case/whitespace'),
+    'devices.serial_number': ('devices', "lower(coalesce(manufacturer, '')) || '|' || serial_number",
+                              'serial number repeated for one manufacturer'),
+    'devices.asset_tag': ('devices', "NULLIF(btrim(asset_tag), '')", 'asset tag repeated'),
+    'ios.mac_address': ('ios', "NULLIF(lower(mac_address), '')", 'MAC address on more than one IO'),
+    'ios.interface_name': ('ios', "device_id::text || '|' || lower(interface_name)",
+                           'interface name repeated on one device'),
+    'ip_addresses.per_network': ('ip_addresses', "coalesce(network_id::text, '-') || '|' || ip_address",
+                                 'IP address assigned twice in one network'),
+    'rooms.name_per_location': ('rooms', "location_id::text || '|' || lower(room_name)",
+                                'room name repeated in one location'),
+    'software_licenses.license_key': ('software_licenses', "NULLIF(btrim(license_key), '')",
+                                      'license key recorded on more than one license'),
+}
+
+# name: (driving table, columns reported, joins/WHERE after "FROM <table> c" with {keys} where the batch
+# restriction goes, description, required columns)
+CONSISTENCY_CHECKS = {
+    'device_room_location': (
+        'devices', 'c.location_id, r.location_id AS room_location_id',
+        'JOIN rooms r ON r.id = c.room_id WHERE {keys} AND c.location_id IS DISTINCT FROM r.location_id',
+        "device location differs from its room's location", []),
+    'device_self_parent': (
+        'devices', 'c.parent_device_id', 'WHERE {keys} AND c.parent_device_id = c.id', 'device is its own parent', []),
+    'device_parent_cycle': (
+        'devices', 'cyc.depth',
+        """JOIN LATERAL (
+               WITH RECURSIVE up(id, depth) AS (
+                   SELECT c.parent_device_id, 1
+                   UNION ALL
+                   SELECT d.parent_device_id, up.depth + 1 FROM up JOIN devices d ON d.id = up.id
+                   WHERE up.id IS NOT NULL AND up.id <> c.id AND up.depth < 64
+               )
+               SELECT max(depth) AS depth FROM up WHERE id = c.id
+           ) cyc ON cyc.depth IS NOT NULL
+           WHERE {keys} AND c.parent_device_id IS NOT NULL AND c.parent_device_id <> c.id""",
+        'device is its own ancestor (parent chain loops)', []),
+    'io_room_location': (
+        'ios', 'd.location_id AS device_location_id, r.location_id AS room_location_id',
+        """JOIN devices d ON d.id = c.device_id JOIN rooms r ON r.id = c.room_id
+           WHERE {keys} AND d.location_id IS NOT NULL AND r.location_id <> d.location_id""",
+        "IO room is in a different location than its device", []),
+    'io_self_connection': (
+        'ios', 'c.connected_to_io_id', 'WHERE {keys} AND c.connected_to_io_id = c.id', 'IO connected to itself', []),
+    'io_connection_not_reciprocal': (
+        'ios', 'c.connected_to_io_id, o.connected_to_io_id AS peer_connected_to',
+        """JOIN ios o ON o.id = c.connected_to_io_id
+           WHERE {keys} AND o.connected_to_io_id IS NOT NULL AND o.connected_to_io_id <> c.id""",
+        'IO points at a peer that is connected elsewhere', []),
+    'ip_network_not_on_io': (
+        'ip_addresses', 'c.network_id, i.native_network_id',
+        """JOIN ios i ON i.id = c.io_id
+           WHERE {keys} AND c.network_id IS NOT NULL AND i.native_network_id IS DISTINCT FROM c.network_id
+             AND NOT EXISTS (SELECT 1 FROM io_tagged_networks t
+                             WHERE t.io_id = i.id AND t.network_id = c.network_id)""",
+        "IP's network is neither the IO's native nor a tagged network", []),
+    # Migration 004 keeps seats_assigned current with INSERT/DELETE triggers on the assignment tables and
+    # group_members; UPDATEs have no seat triggers, and bulk loads with triggers disabled or restores bypass them
+    'license_seats_assigned_drift': (
+        'software_licenses', 'c.seats_assigned, a.actual',
+        """CROSS JOIN LATERAL (
+               SELECT (SELECT COUNT(DISTINCT person_id) FROM person_software_licenses WHERE license_id = c.id)
+                    + (SELECT COUNT(gm.person_id) FROM group_software_licenses g
+                       JOIN group_members gm ON gm.group_id = g.group_id WHERE g.license_id = c.id) AS actual
+           ) a
+           WHERE {keys} AND c.seats_assigned IS DISTINCT FROM a.actual""",
+        'seats_assigned differs from the person + group-member assignments (migration 004 trigger)',
+        ['seats_assigned']),
+    'license_over_assigned': (
+        'software_licenses', 'c.seats_assigned, c.seats_purchased',
+        'WHERE {keys} AND c.seats_purchased IS NOT NULL AND c.seats_assigned > c.seats_purchased',
+        'more seats assigned than purchased', ['seats_assigned', 'seats_purchased']),
+    'license_seats_used_over_count': (
+        'software_licenses', 'c.seats_used, c.seat_count',
+        'WHERE {keys} AND c.seat_count IS NOT NULL AND c.seats_used > c.seat_count',
+        'seats_used exceeds seat_count', []),
+    'license_people_not_migrated': (
+        'license_people', 'c.person_id',
+        """WHERE {keys} AND NOT EXISTS (SELECT 1 FROM person_software_licenses p
+                             WHERE p.license_id = c.license_id AND p.person_id = c.person_id)""",
+        'legacy license_people row with no person_software_licenses assignment', []),
+}
+
+
+# ----------------------------------------------------------------------------
+# Catalog
+# ----------------------------------------------------------------------------
+
+def primary_key(conn, table):
+    """[(column, type)] of the table's primary key, in index order"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+               FROM pg_index i
+               JOIN LATERAL unnest(i.indkey) WITH ORDINALITY k(attnum, ord) ON true
+               JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+               WHERE i.indrelid = %s::regclass AND i.indisprimary
+               ORDER BY k.ord""",
+            (table,),
+        )
+        return cur.fetchall()
+
+
+def existing_tables(conn, tables):
+    with conn.cursor() as cur:
+        cur.execute('SELECT tablename FROM pg_tables WHERE schemaname = current_schema() AND tablename = ANY(%s)',
+                    (tables,))
+        return {row[0] for row in cur.fetchall()}
+
+
+def has_columns(conn, table, columns):
+    with conn.cursor() as cur:
+        cur.execute('SELECT COUNT(*) FROM information_schema.columns WHERE table_name = %s AND column_name = ANY(%s)',
+                    (table, columns))
+        return cur.fetchone()[0] == len(columns)
+
+
+def foreign_keys(conn, tables):
+    """Single-column FKs on the audited tables with their enforcement state"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """SELECT con.conname, con.conrelid::regclass::text, ca.attname,
+                      con.confrelid::regclass::text, pa.attname, con.convalidated,
+                      EXISTS (SELECT 1 FROM pg_trigger t WHERE t.tgconstraint = con.oid AND t.tgenabled = 'D')
+               FROM pg_constraint con
+               JOIN pg_attribute ca ON ca.attrelid = con.conrelid AND ca.attnum = con.conkey[1]
+               JOIN pg_attribute pa ON pa.attrelid = con.confrelid AND pa.attnum = con.confkey[1]
+               WHERE con.contype = 'f' AND array_length(con.conkey, 1) = 1
+                 AND con.conrelid::regclass::text = ANY(%s)
+               ORDER BY 2, 3""",
+            (tables,),
+        )
+        return [{'constraint': name, 'table': table, 'column': column, 'parent': parent,
+                 'parent_column': parent_column, 'validated': validated, 'triggers_disabled': disabled}
+                for name, table, column, parent, parent_column, validated, disabled in cur.fetchall()]
+
+
+def build_checks(conn, only):
+    tables = existing_tables(conn, AUDITED_TABLES + ['group_members'])
+    checks = []
+    if 'orphans' in only:
+        for fk in foreign_keys(conn, sorted(tables)):
+            checks.append({
+                'name': f"orphan:{fk['table']}.{fk['column']}", 'kind': 'orphans', 'table': fk['table'],
+                'columns': f"c.{fk['column']}",
+                'where': f"WHERE {{keys}} AND c.{fk['column']} IS NOT NULL AND NOT EXISTS "
+                         f"(SELECT 1 FROM {fk['parent']} p WHERE p.{fk['parent_column']} = c.{fk['column']})",
+                'description': f"{fk['column']} -> {fk['parent']}.{fk['parent_column']} ({fk['constraint']})",
+                'fk': fk,
+            })
+    if 'duplicates' in only:
+        for name, (table, expr, description) in DUPLICATE_CHECKS.items():
+            if table in tables:
+                checks.append({'name': f'duplicate:{name}', 'kind': 'duplicates', 'table': table, 'expr': expr,
+                               'description': description})
+    if 'consistency' in only:
+        for name, (table, columns, where, description, required) in CONSISTENCY_CHECKS.items():
+            if table in tables and (not required or has_columns(conn, table, required)):
+                checks.append({'name': f'consistency:{name}', 'kind': 'consistency', 'table': table,
+                               'columns': columns, 'where': where, 'description': description})
+    conn.commit()
+    return checks
+
+
+# ----------------------------------------------------------------------------
+# Streaming
+# ----------------------------------------------------------------------------
+
+class Throttle:
+    """Rate cap plus adaptive pause: slow batches double the pause, fast ones halve it"""
+
+    def __init__(self, max_rows_per_sec, pause_ms, slow_batch_ms):
+        self.max_rows_per_sec = max_rows_per_sec
+        self.base_pause = pause_ms / 1000
+        self.pause = self.base_pause
+        self.slow_batch_s = slow_batch_ms / 1000
+        self.started = time.perf_counter()
+        self.rows = 0
+        self.slept = 0.0
+
+    def after_batch(self, rows, batch_s):
+        self.rows += rows
+        if batch_s > self.slow_batch_s:
+            self.pause = min(max(self.pause * 2, 0.05), 10.0)
+        else:
+            self.pause = max(self.base_pause, self.pause / 2)
+        delay = self.pause
+        if self.max_rows_per_sec:
+            ahead = self.rows / self.max_rows_per_sec - (time.perf_counter() - self.started)
+            delay = max(delay, ahead)
+        if delay > 0:
+            time.sleep(delay)
+            self.slept += delay
+
+
+def key_batches(conn, table, pk, after, batch_size, segment_rows):
+    """Yield batches of primary-key tuples in key order, reopening the cursor every segment_rows rows"""
+    columns = ', '.join(name for name, _ in pk)
+    while True:
+        where = f'WHERE ({columns}) > ({", ".join(f"%s::{kind}" for _, kind in pk)})' if after else ''
+        read = 0
+        with conn.cursor(name=f'audit_{table}') as cur:
+            cur.execute(f'SELECT {columns} FROM {table} {where} ORDER BY {columns}', after or None)
+            while read < segment_rows:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                read += len(rows)
+                after = list(rows[-1])
+                yield rows
+        conn.commit()
+        if read < segment_rows:
+            return
+
+
+def batch_filter(pk):
+    """WHERE fragment restricting alias c to the keys in %(k0)s, %(k1)s, ..."""
+    if len(pk) == 1:
+        return f'c.{pk[0][0]} = ANY(%(k0)s::{pk[0][1]}[])'
+    columns = ', '.join(f'c.{name}' for name, _ in pk)
+    arrays = ', '.join(f'%(k{i})s::{kind}[]' for i, (_, kind) in enumerate(pk))
+    return f'({columns}) IN (SELECT * FROM unnest({arrays}))'
+
+
+def run_keyed_check(args, scan_conn, check_conn, check, state, throttle, emit):
+    """Orphan and consistency checks: stream driving keys, run the check restricted to each batch"""
+    pk = primary_key(scan_conn, check['table'])
+    scan_conn.commit()
+    where = check['where'].replace('{keys}', batch_filter(pk))
+    key_columns = ', '.join(f'c.{name}' for name, _ in pk)
+    sql = f"SELECT {key_columns}, {check['columns']} FROM {check['table']} c {where}"
+    names = [name for name, _ in pk]
+
+    for batch in key_batches(scan_conn, check['table'], pk, state.get('after'), args.batch_size, args.segment_rows):
+        started = time.perf_counter()
+        with check_conn.cursor() as cur:
+            cur.execute(sql, {f'k{i}': [row[i] for row in batch] for i in range(len(pk))})
+            described = [d.name for d in cur.description]
+            for row in cur.fetchall():
+                record = dict(zip(described, row))
+                emit(check, state, {'key': {n: record.pop(n) for n in names}, **record})
+        state['scanned'] += len(batch)
+        state['after'] = list(batch[-1])
+        throttle.after_batch(len(batch), time.perf_counter() - started)
+        yield
+
+
+def run_duplicate_check(args, scan_conn, check, state, throttle, emit):
+    """Ordered scan on the duplicate key; equal neighbours form a duplicate group"""
+    pk = primary_key(scan_conn, check['table'])
+    scan_conn.commit()
+    id_column = pk[0][0]
+    expr = check['expr']
+    where = f'WHERE ({expr}) IS NOT NULL'
+    params = None
+    if state.get('after') is not None:
+        where += f' AND ({expr}) > %s'
+        params = (state['after'],)
+    group_key, group, count = None, [], 0
+
+    def close_group():
+        if count > 1:
+            emit(check, state, {'value': group_key, 'count': count, 'ids': group})
+        # Only complete groups are checkpointed, so a resumed scan never splits one
+        state['after'] = group_key
+
+    with scan_conn.cursor(name=f'audit_dup_{check["table"]}') as cur:
+        cur.execute(f'SELECT {expr} AS k, {id_column} FROM {check["table"]} {where} ORDER BY 1, 2', params)
+        while True:
+            started = time.perf_counter()
+            rows = cur.fetchmany(args.batch_size)
+            if not rows:
+                break
+            for key, row_id in rows:
+                if key != group_key:
+                    if group_key is not None:
+                        close_group()
+                    group_key, group, count = key, [], 0
+                count += 1
+                if len(group) < args.samples:
+                    group.append(row_id)
+            state['scanned'] += len(rows)
+            throttle.after_batch(len(rows), time.perf_counter() - started)
+            yield
+    if group_key is not None:
+        close_group()
+    scan_conn.commit()
+    yield
+
+
+# ----------------------------------------------------------------------------
+# Checkpoint
+# ----------------------------------------------------------------------------
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, checkpoint):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(checkpoint, f, indent=2, default=str)
+    os.replace(tmp, path)
+
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+def main():
+    parser = base_parser(__doc__.split('\n')[1], http=False)
+    parser.add_argument('--only', default='orphans,duplicates,consistency',
+                        help='Check kinds to run (orphans, duplicates, consistency)')
+    parser.add_argument('--checks', help='Comma-separated check names (see --list) to restrict the run to')
+    parser.add_argument('--list', action='store_true', help='List the checks that would run and exit')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Keys per batch')
+    parser.add_argument('--segment-rows', type=int, default=200000,
+                        help='Rows read before a key-scan cursor is closed and reopened')
+    parser.add_argument('--max-rows-per-sec', type=int, default=0, help='Scan rate cap (0 = unlimited)')
+    parser.add_argument('--pause-ms', type=float, default=0, help='Minimum pause between batches')
+    parser.add_argument('--slow-batch-ms', type=float, default=500,
+                        help='Batches slower than this double the pause between batches')
+    parser.add_argument('--statement-timeout-ms', type=int, default=30000)
+    parser.add_argument('--lock-timeout-ms', type=int, default=1000)
+    parser.add_argument('--samples', type=int, default=20, help='Findings kept per check in the report')
+    parser.add_argument('--checkpoint', default=os.path.join(DEFAULT_OUTPUT_DIR, 'integrity-audit-checkpoint.json'))
+    parser.add_argument('--resume', action='store_true', help='Continue from --checkpoint')
+    parser.add_argument('--findings', help='Append every finding to this JSON-lines file')
+    parser.add_argument('--fail-on-findings', action='store_true', help='Exit 1 if anything is found')
+    args = parser.parse_args()
+    only = set(args.only.split(','))
+
+    scan_conn = connect(args.database_url)
+    check_conn = connect(args.database_url, autocommit=True)
+    for conn in (scan_conn, check_conn):
+        with conn.cursor() as cur:
+            cur.execute(f'SET statement_timeout = {int(args.statement_timeout_ms)}')
+            cur.execute(f'SET lock_timeout = {int(args.lock_timeout_ms)}')
+            cur.execute("SET application_name = 'moss-integrity-audit'")
+    scan_conn.commit()
+
+    checks = build_checks(scan_conn, only)
+    if args.checks:
+        wanted = set(args.checks.split(','))
+        checks = [c for c in checks if c['name'] in wanted or c['name'].split(':', 1)[1] in wanted]
+    if args.list:
+        print_table([{'check': c['name'], 'table': c['table'], 'description': c['description']} for c in checks],
+                    ['check', 'table', 'description'])
+        return
+
+    checkpoint = load_checkpoint(args.checkpoint) if args.resume else {}
+    checkpoint.setdefault('started_at', time.strftime('%Y-%m-%dT%H:%M:%S'))
+    states = checkpoint.setdefault('checks', {})
+    os.makedirs(os.path.dirname(os.path.abspath(args.checkpoint)), exist_ok=True)
+    findings_file = open(args.findings, 'a') if args.findings else None
+    throttle = Throttle(args.max_rows_per_sec, args.pause_ms, args.slow_batch_ms)
+
+    def emit(check, state, finding):
+        state['findings'] += 1
+        if len(state['samples']) < args.samples:
+            state['samples'].append(finding)
+        if findings_file:
+            findings_file.write(json.dumps({'check': check['name'], **finding}, default=str) + '\n')
+
+    enforcement = [c['fk'] for c in checks if 'fk' in c and (not c['fk']['validated'] or c['fk']['triggers_disabled'])]
+    try:
+        for check in checks:
+            state = states.setdefault(check['name'], {'scanned': 0, 'findings': 0, 'samples': [], 'done': False,
+                                                      'seconds': 0.0})
+            if state['done']:
+                print(f"{check['name']:<55} done (checkpoint)")
+                continue
+            print(f"{check['name']:<55} ", end='', flush=True)
+            started = time.perf_counter()
+            steps = (run_duplicate_check(args, scan_conn, check, state, throttle, emit)
+                     if check['kind'] == 'duplicates'
+                     else run_keyed_check(args, scan_conn, check_conn, check, state, throttle, emit))
+            last_save = 0.0
+            for _ in steps:
+                if time.perf_counter() - last_save > 1:
+                    state['seconds'] = round(state['seconds'] + time.perf_counter() - started, 3)
+                    started = time.perf_counter()
+                    save_checkpoint(args.checkpoint, checkpoint)
+                    last_save = time.perf_counter()
+            state['seconds'] = round(state['seconds'] + time.perf_counter() - started, 3)
+            state['done'] = True
+            save_checkpoint(args.checkpoint, checkpoint)
+            print(f"{state['scanned']:>12,} rows  {state['findings']:>8,} findings  {state['seconds']:.1f}s")
+    except KeyboardInterrupt:
+        save_checkpoint(args.checkpoint, checkpoint)
+        print(f'\nInterrupted; resume with --resume --checkpoint {args.checkpoint}')
+        sys.exit(130)
+    finally:
+        if findings_file:
+            findings_file.close()
+        scan_conn.close()
+        check_conn.close()
+
+    print()
+    rows = [{'check': name, 'rows': s['scanned'], 'findings': s['findings'], 'seconds': s['seconds'],
+             'rows_per_s': round(s['scanned'] / s['seconds']) if s['seconds'] else None}
+            for name, s in states.items()]
+    print_table(rows, ['check', 'rows', 'findings', 'seconds', 'rows_per_s'])
+    if enforcement:
+        print('\nForeign keys not fully enforced (orphans possible):')
+        for fk in enforcement:
+            state = 'NOT VALID' if not fk['validated'] else 'triggers disabled'
+            print(f"  {fk['table']}.{fk['column']} -> {fk['parent']} ({fk['constraint']}): {state}")
+    total = sum(s['findings'] for s in states.values())
+    print(f"\n{total:,} findings; throttle slept {throttle.slept:.1f}s")
+
+    write_report(args.output_dir, 'integrity-audit', {
+        'parameters': {k: v for k, v in vars(args).items() if k != 'database_url'},
+        'checks': states,
+        'unenforced_foreign_keys': enforcement,
+        'total_findings': total,
+    }, args.label)
+    if args.fail_on_findings and total:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
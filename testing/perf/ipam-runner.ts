@@ -0,0 +1,414 @@
+/**
+ * IPAM Runner
+ * Times src/lib/cidr-utils.ts the way the network routes use it for ipam_benchmark.py
+ *
+ * Usage:
+ *   npx ts-node --transpile-only --compiler-options '{"module":"commonjs","moduleResolution":"node"}' \
+ *     testing/perf/ipam-runner.ts <plan.json>
+ *
+ * The plan (written by ipam_benchmark.py) holds the network hierarchy, the
+ * addresses assigned in each leaf subnet as integers, and the sampled
+ * operations. Every operation runs two ways and the answers are compared:
+ *   current  cidr-utils.ts as the routes call it, over row objects shaped like
+ *            their query results: parseCIDRString() + isIPInNetwork() per row
+ *            (ip-addresses/conflicts), generateIPsInSubnet() + Set/Map lookups
+ *            (available-ips, utilization-summary, ip-utilization)
+ *   indexed  a binary radix trie over network prefixes plus sorted Uint32Array
+ *            address and owner arrays
+ *
+ * Structure memory is the growth of V8 heap plus ArrayBuffer memory, between
+ * forced GCs, while each approach builds its data from the plan's integers.
+ * Every row object, address string and trie node is allocated inside that
+ * window, so the figure is what the structure itself retains. Prints a single
+ * JSON line.
+ */
+
+import { readFileSync } from 'fs'
+import { setFlagsFromString } from 'v8'
+import { runInNewContext } from 'vm'
+import {
+  calculateCIDR,
+  generateIPsInSubnet,
+  isIPInNetwork,
+  parseCIDRString,
+} from '../../src/lib/cidr-utils'
+
+setFlagsFromString('--expose-gc')
+const gc = runInNewContext('gc') as () => void
+
+interface PlanNetwork {
+  id: string
+  cidr: string
+  start: number
+  prefix: number
+}
+
+interface Plan {
+  networks: PlanNetwork[]
+  assignments: Record<string, number[]> // network index -> assigned addresses
+  samples: {
+    containment: number[] // addresses
+    utilization: number[] // network indexes
+    next_free: number[]
+    allocation_map: number[]
+    overlap: [number, number][] // [start, prefix]
+    out_of_range: number[] // pass numbers; each pass checks every assignment
+  }
+  warmup: number
+}
+
+// Rows as SELECT ... FROM networks / ip_addresses hand them to the routes
+interface NetworkRow {
+  id: string
+  network_address: string
+}
+
+interface IPRow {
+  ip_address: string
+  network_id: string
+  type: string
+}
+
+// Same as the unexported helper in cidr-utils.ts; used to materialize row strings
+function intToIp(value: number): string {
+  return `${(value >>> 24) & 0xff}.${(value >>> 16) & 0xff}.${(value >>> 8) & 0xff}.${value & 0xff}`
+}
+
+function retainedBytes(): number {
+  gc()
+  gc()
+  const usage = process.memoryUsage()
+  return usage.heapUsed + usage.arrayBuffers
+}
+
+function build<T>(make: () => T): { value: T; bytes: number } {
+  const before = retainedBytes()
+  const value = make()
+  return { value, bytes: retainedBytes() - before }
+}
+
+class CurrentIpam {
+  networks: NetworkRow[]
+  ipsByNetwork = new Map<string, IPRow[]>()
+
+  constructor(plan: Plan) {
+    this.networks = plan.networks.map((net) => ({ id: net.id, network_address: net.cidr }))
+    for (const [index, addresses] of Object.entries(plan.assignments)) {
+      const id = plan.networks[Number(index)].id
+      this.ipsByNetwork.set(
+        id,
+        addresses.map((address) => ({ ip_address: intToIp(address), network_id: id, type: 'static' }))
+      )
+    }
+  }
+
+  containingNetwork(ip: string): string | null {
+    let best: string | null = null
+    let bestPrefix = -1
+    for (const row of this.networks) {
+      const parsed = parseCIDRString(row.network_address)
+      if (parsed && parsed.cidr > bestPrefix && isIPInNetwork(ip, parsed.ip, parsed.cidr)) {
+        best = row.id
+        bestPrefix = parsed.cidr
+      }
+    }
+    return best
+  }
+
+  // utilization-summary: count rows, generate the subnet for the host total
+  utilization(row: NetworkRow): [number, number] {
+    const parsed = parseCIDRString(row.network_address)!
+    const allIPs = generateIPsInSubnet(parsed.ip, parsed.cidr)
+    const rows = this.ipsByNetwork.get(row.id) || []
+    return [rows.filter((ip) => ip.type !== 'reserved').length, allIPs.length]
+  }
+
+  // available-ips: first address that is not allocated, the gateway or the broadcast
+  nextFree(row: NetworkRow): string | null {
+    const parsed = parseCIDRString(row.network_address)!
+    const allIPs = generateIPsInSubnet(parsed.ip, parsed.cidr)
+    const allocatedSet = new Set((this.ipsByNetwork.get(row.id) || []).map((ip) => ip.ip_address))
+    const gatewayIP = allIPs[0]
+    const broadcastIP = allIPs[allIPs.length - 1]
+    const available = allIPs
+      .filter((ip) => !allocatedSet.has(ip) && ip !== gatewayIP && ip !== broadcastIP)
+      .slice(0, 50)
+    return available.length > 0 ? available[0] : null
+  }
+
+  // ip-utilization: status per address, then counts per status
+  allocationMap(row: NetworkRow): [number, number, number] {
+    const parsed = parseCIDRString(row.network_address)!
+    const calculation = calculateCIDR(parsed.ip, parsed.cidr)
+    const allIPs = generateIPsInSubnet(calculation.networkAddress, parsed.cidr)
+    const allocatedIPMap = new Map<string, IPRow>()
+    for (const ip of this.ipsByNetwork.get(row.id) || []) {
+      allocatedIPMap.set(ip.ip_address, ip)
+    }
+    const statuses = allIPs.map((ip) => {
+      if (allocatedIPMap.has(ip)) return 'allocated'
+      if (ip === calculation.firstUsableIP || ip === calculation.lastUsableIP) return 'reserved'
+      return 'available'
+    })
+    return [
+      statuses.filter((status) => status === 'allocated').length,
+      statuses.filter((status) => status === 'reserved').length,
+      statuses.filter((status) => status === 'available').length,
+    ]
+  }
+
+  // Aligned blocks overlap exactly when one contains the other's network address
+  overlaps(cidr: string): string[] {
+    const candidate = parseCIDRString(cidr)!
+    const found: string[] = []
+    for (const row of this.networks) {
+      const parsed = parseCIDRString(row.network_address)
+      if (!parsed) continue
+      if (
+        isIPInNetwork(candidate.ip, parsed.ip, parsed.cidr) ||
+        isIPInNetwork(parsed.ip, candidate.ip, candidate.cidr)
+      ) {
+        found.push(row.id)
+      }
+    }
+    return found.sort()
+  }
+
+  // ip-addresses/conflicts: every assignment checked against its network's CIDR
+  outOfRange(): number {
+    let count = 0
+    for (const row of this.networks) {
+      for (const ip of this.ipsByNetwork.get(row.id) || []) {
+        const parsed = parseCIDRString(row.network_address)
+        if (parsed && !isIPInNetwork(ip.ip_address, parsed.ip, parsed.cidr)) {
+          count++
+        }
+      }
+    }
+    return count
+  }
+}
+
+class RadixNode {
+  zero: RadixNode | null = null
+  one: RadixNode | null = null
+  network = -1
+}
+
+class IndexedIpam {
+  root = new RadixNode()
+  ids: string[]
+  starts: Uint32Array
+  ends: Uint32Array
+  addresses: Uint32Array // sorted
+  owners: Uint32Array // network index of addresses[i]
+
+  constructor(plan: Plan) {
+    const count = plan.networks.length
+    this.ids = plan.networks.map((net) => net.id)
+    this.starts = new Uint32Array(count)
+    this.ends = new Uint32Array(count)
+    plan.networks.forEach((net, index) => {
+      this.starts[index] = net.start
+      this.ends[index] = net.start + 2 ** (32 - net.prefix) - 1
+      this.insert(net.start, net.prefix, index)
+    })
+
+    const pairs: [number, number][] = []
+    for (const [index, addresses] of Object.entries(plan.assignments)) {
+      for (const address of addresses) pairs.push([address, Number(index)])
+    }
+    pairs.sort((a, b) => a[0] - b[0])
+    this.addresses = Uint32Array.from(pairs, (pair) => pair[0])
+    this.owners = Uint32Array.from(pairs, (pair) => pair[1])
+  }
+
+  private insert(start: number, prefix: number, index: number): void {
+    let node = this.root
+    for (let bit = 0; bit < prefix; bit++) {
+      if ((start >>> (31 - bit)) & 1) {
+        node = node.one || (node.one = new RadixNode())
+      } else {
+        node = node.zero || (node.zero = new RadixNode())
+      }
+    }
+    node.network = index
+  }
+
+  private lowerBound(value: number): number {
+    let lo = 0
+    let hi = this.addresses.length
+    while (lo < hi) {
+      const mid = (lo + hi) >>> 1
+      if (this.addresses[mid] < value) lo = mid + 1
+      else hi = mid
+    }
+    return lo
+  }
+
+  private countIn(first: number, last: number): number {
+    return first > last ? 0 : this.lowerBound(last + 1) - this.lowerBound(first)
+  }
+
+  containingNetwork(address: number): string | null {
+    let node: RadixNode | null = this.root
+    let best = this.root.network
+    for (let bit = 0; bit < 32 && node; bit++) {
+      node = (address >>> (31 - bit)) & 1 ? node.one : node.zero
+      if (node && node.network >= 0) best = node.network
+    }
+    return best >= 0 ? this.ids[best] : null
+  }
+
+  utilization(index: number): [number, number] {
+    const first = this.starts[index] + 1
+    const last = this.ends[index] - 1
+    return [this.countIn(first, last), last - first + 1]
+  }
+
+  nextFree(index: number): string | null {
+    // available-ips skips the first usable (gateway) and last usable (broadcast) address
+    const last = this.ends[index] - 2
+    let candidate = this.starts[index] + 2
+    for (let i = this.lowerBound(candidate); candidate <= last; candidate++, i++) {
+      if (i >= this.addresses.length || this.addresses[i] !== candidate) return intToIp(candidate)
+    }
+    return null
+  }
+
+  allocationMap(index: number): [number, number, number] {
+    const first = this.starts[index] + 1
+    const last = this.ends[index] - 1
+    const allocated = this.countIn(first, last)
+    const reserved = 2 - this.countIn(first, first) - this.countIn(last, last)
+    return [allocated, reserved, last - first + 1 - allocated - reserved]
+  }
+
+  overlaps(start: number, prefix: number): string[] {
+    const found: number[] = []
+    let node: RadixNode | null = this.root
+    for (let bit = 0; bit < prefix && node; bit++) {
+      if (node.network >= 0) found.push(node.network)
+      node = (start >>> (31 - bit)) & 1 ? node.one : node.zero
+    }
+    // Everything at or below the candidate's prefix lies inside it
+    const stack = node ? [node] : []
+    while (stack.length) {
+      const current = stack.pop()!
+      if (current.network >= 0) found.push(current.network)
+      if (current.zero) stack.push(current.zero)
+      if (current.one) stack.push(current.one)
+    }
+    return found.map((index) => this.ids[index]).sort()
+  }
+
+  outOfRange(): number {
+    let count = 0
+    for (let i = 0; i < this.addresses.length; i++) {
+      const owner = this.owners[i]
+      if (this.addresses[i] < this.starts[owner] || this.addresses[i] > this.ends[owner]) count++
+    }
+    return count
+  }
+}
+
+interface OperationResult {
+  current_ms: number[]
+  indexed_ms: number[]
+  mismatches: number
+}
+
+function timeAll<S>(samples: S[], warmup: number, fn: (sample: S) => unknown) {
+  // Let V8 optimize the hot paths before recording
+  for (const sample of samples.slice(0, warmup)) fn(sample)
+  const latencies: number[] = []
+  const results: string[] = []
+  for (const sample of samples) {
+    const start = process.hrtime.bigint()
+    const result = fn(sample)
+    latencies.push(Number(process.hrtime.bigint() - start) / 1e6)
+    results.push(JSON.stringify(result))
+  }
+  return { latencies, results }
+}
+
+function compare<S>(
+  samples: S[],
+  warmup: number,
+  current: (sample: S) => unknown,
+  indexed: (sample: S) => unknown
+): OperationResult {
+  const a = timeAll(samples, warmup, current)
+  const b = timeAll(samples, warmup, indexed)
+  return {
+    current_ms: a.latencies,
+    indexed_ms: b.latencies,
+    mismatches: a.results.filter((result, i) => result !== b.results[i]).length,
+  }
+}
+
+function main() {
+  const planPath = process.argv[2]
+  if (!planPath) {
+    console.error('Usage: ipam-runner.ts <plan.json>')
+    process.exit(2)
+  }
+  const plan: Plan = JSON.parse(readFileSync(planPath, 'utf8'))
+  const { samples, warmup } = plan
+
+  const current = build(() => new CurrentIpam(plan))
+  const indexed = build(() => new IndexedIpam(plan))
+  const rows = current.value.networks
+
+  const operations: Record<string, OperationResult> = {
+    containment: compare(
+      samples.containment.map((address): [number, string] => [address, intToIp(address)]),
+      warmup,
+      ([, ip]) => current.value.containingNetwork(ip),
+      ([address]) => indexed.value.containingNetwork(address)
+    ),
+    utilization: compare(
+      samples.utilization,
+      warmup,
+      (index) => current.value.utilization(rows[index]),
+      (index) => indexed.value.utilization(index)
+    ),
+    next_free: compare(
+      samples.next_free,
+      warmup,
+      (index) => current.value.nextFree(rows[index]),
+      (index) => indexed.value.nextFree(index)
+    ),
+    allocation_map: compare(
+      samples.allocation_map,
+      warmup,
+      (index) => current.value.allocationMap(rows[index]),
+      (index) => indexed.value.allocationMap(index)
+    ),
+    overlap: compare(
+      samples.overlap.map(([start, prefix]): [number, number, string] => [
+        start,
+        prefix,
+        `${intToIp(start)}/${prefix}`,
+      ]),
+      warmup,
+      ([, , cidr]) => current.value.overlaps(cidr),
+      ([start, prefix]) => indexed.value.overlaps(start, prefix)
+    ),
+    out_of_range: compare(
+      samples.out_of_range,
+      Math.min(warmup, 1),
+      () => current.value.outOfRange(),
+      () => indexed.value.outOfRange()
+    ),
+  }
+
+  console.log(
+    JSON.stringify({
+      structures: { current_bytes: current.bytes, indexed_bytes: indexed.bytes },
+      operations,
+    })
+  )
+}
+
+main()
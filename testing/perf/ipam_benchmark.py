@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+IPAM scale benchmark: CIDR containment, utilization, next-free and overlap
+
+Generates a nested network hierarchy (supernet /16 -> aggregate /20 -> leaf
+subnets, mirroring parent_network_id from migration 012) and fills the leaf
+subnets with IP assignments. Each operation is timed in Node by
+ipam-runner.ts two ways:
+
+  current  - src/lib/cidr-utils.ts called the way the routes call it, over
+             row objects shaped like their query results: parseCIDRString() +
+             isIPInNetwork() per row (ip-addresses/conflicts, containment,
+             overlap), generateIPsInSubnet() + Set/Map lookups (available-ips,
+             utilization-summary, ip-utilization)
+  indexed  - a binary radix trie over network prefixes plus sorted Uint32Array
+             address/owner arrays
+
+Both approaches are checked against each other on every sampled operation.
+Structure memory is the V8 heap + ArrayBuffer growth, between forced GCs,
+while each approach builds its structures from the workload.
+
+--seed-database also loads the largest workload into networks/ip_addresses
+and reads it back through the IPAM endpoints on sampled leaf networks
+(available-ips, utilization-summary, ip-utilization, ip-addresses/conflicts),
+checking each answer against the workload and sampling server RSS.
+
+Usage:
+  python3 testing/perf/ipam_benchmark.py --assignments 10000,100000,300000
+  python3 testing/perf/ipam_benchmark.py --assignments 50000 --seed-database --endpoint-samples 100
+  python3 testing/perf/ipam_benchmark.py --cleanup
+"""
+import json
+import math
+import os
+import random
+import subprocess
+import tempfile
+import uuid
+
+from common import (
+    NODE_RUNNER,
+    PERF_TAG,
+    REPO_ROOT,
+    ServerMemorySampler,
+    base_parser,
+    connect,
+    copy_rows,
+    default_headers,
+    http_client,
+    int_list,
+    print_table,
+    summarize,
+    timed,
+    write_report,
+)
+
+NAME_PREFIX = f'{PERF_TAG}ipam-'
+RUNNER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ipam-runner.ts')
+OPERATIONS = ['containment', 'utilization', 'next_free', 'allocation_map', 'overlap', 'out_of_range']
+
+# Per-network IPAM routes; the expected answer for each is derived from the workload
+ENDPOINTS = {
+    'available-ips': '/api/networks/{id}/available-ips',
+    'utilization-summary': '/api/networks/{id}/utilization-summary',
+    'ip-utilization': '/api/networks/{id}/ip-utilization',
+    'conflicts': '/api/ip-addresses/conflicts?network_id={id}',
+}
+
+
+def int_to_ip(value):
+    return f'{(value >> 24) & 0xff}.{(value >> 16) & 0xff}.{(value >> 8) & 0xff}.{value & 0xff}'
+
+
+def subnet_mask_int(cidr):
+    return (~((1 << (32 - cidr)) - 1)) & 0xFFFFFFFF
+
+
+# ----------------------------------------------------------------------------
+# Workload generation
+# ----------------------------------------------------------------------------
+
+def generate_workload(target_assignments, leaf_prefix, aggregate_prefix, seed):
+    """
+    Build networks and assignments sized to roughly target_assignments
+
+    Returns (networks, assignments) where networks is a list of dicts with
+    id/name/cidr/parent_id/prefix/start and assignments maps network id to a
+    list of assigned addresses as integers.
+    """
+    rng = random.Random(seed)
+    usable = max(1, (1 << (32 - leaf_prefix)) - 2)
+    mean_fill = 0.6
+    leaves_needed = max(1, math.ceil(target_assignments / (usable * mean_fill)))
+    leaves_per_aggregate = 1 << (leaf_prefix - aggregate_prefix)
+    aggregates_per_supernet = 1 << (aggregate_prefix - 16)
+    aggregates_needed = math.ceil(leaves_needed / leaves_per_aggregate)
+    supernets_needed = math.ceil(aggregates_needed / aggregates_per_supernet)
+    if supernets_needed > 256:
+        raise SystemExit('Workload too large for 10.0.0.0/8; use a larger --leaf-prefix block')
+
+    networks = []
+    assignments = {}
+    remaining_leaves = leaves_needed
+    remaining_ips = target_assignments
+
+    def add_network(start, prefix, parent_id, kind):
+        net = {
+            'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            'name': f'{NAME_PREFIX}{kind}-{int_to_ip(start)}-{prefix}',
+            'cidr': f'{int_to_ip(start)}/{prefix}',
+            'parent_id': parent_id,
+            'prefix': prefix,
+            'start': start,
+            'kind': kind,
+        }
+        networks.append(net)
+        return net
+
+    for s in range(supernets_needed):
+        supernet = add_network((10 << 24) | (s << 16), 16, None, 'supernet')
+        for a in range(aggregates_per_supernet):
+            if remaining_leaves <= 0:
+                break
+            agg_start = supernet['start'] + (a << (32 - aggregate_prefix))
+            aggregate = add_network(agg_start, aggregate_prefix, supernet['id'], 'aggregate')
+            for leaf_index in range(leaves_per_aggregate):
+                if remaining_leaves <= 0:
+                    break
+                leaf_start = agg_start + (leaf_index << (32 - leaf_prefix))
+                leaf = add_network(leaf_start, leaf_prefix, aggregate['id'], 'leaf')
+                share = remaining_ips / remaining_leaves
+                remaining_leaves -= 1
+                fill = remaining_ips if remaining_leaves == 0 else int(share * rng.uniform(0.5, 1.5))
+                hosts = rng.sample(range(1, usable + 1), max(0, min(fill, usable)))
+                assignments[leaf['id']] = [leaf_start + h for h in hosts]
+                remaining_ips = max(0, remaining_ips - len(hosts))
+
+    return networks, assignments
+
+
+def build_plan(networks, assignments, args, rng):
+    """Runner input: the workload as integers plus the sampled operations"""
+    index = {net['id']: i for i, net in enumerate(networks)}
+    leaves = [i for i, net in enumerate(networks) if net['kind'] == 'leaf']
+    assigned_pool = [address for addresses in assignments.values() for address in addresses]
+    containment = [rng.choice(assigned_pool) for _ in range(args.ops // 2)]
+    containment += [(10 << 24) | rng.getrandbits(24) for _ in range(args.ops - len(containment))]
+    overlap = []
+    for _ in range(args.ops):
+        prefix = rng.choice([args.aggregate_prefix, args.leaf_prefix, min(30, args.leaf_prefix + 2)])
+        overlap.append([((10 << 24) | rng.getrandbits(24)) & subnet_mask_int(prefix), prefix])
+    return {
+        'networks': [{'id': n['id'], 'cidr': n['cidr'], 'start': n['start'], 'prefix': n['prefix']} for n in networks],
+        'assignments': {index[net_id]: addresses for net_id, addresses in assignments.items()},
+        'samples': {
+            'containment': containment,
+            'utilization': [rng.choice(leaves) for _ in range(args.ops)],
+            'next_free': [rng.choice(leaves) for _ in range(args.ops)],
+            'allocation_map': [rng.choice(leaves) for _ in range(args.ops)],
+            'overlap': overlap,
+            'out_of_range': list(range(args.scan_passes)),
+        },
+        'warmup': args.warmup,
+    }
+
+
+def run_runner(plan, timeout):
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump(plan, f)
+        plan_path = f.name
+    try:
+        proc = subprocess.run(NODE_RUNNER + [RUNNER, plan_path], cwd=REPO_ROOT, capture_output=True, text=True,
+                              timeout=timeout)
+    finally:
+        os.unlink(plan_path)
+    if proc.returncode != 0:
+        raise SystemExit(f'ipam-runner failed:\n{proc.stderr[-2000:]}')
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def benchmark_scale(target, args):
+    rng = random.Random(args.seed + target)
+    networks, assignments = generate_workload(target, args.leaf_prefix, args.aggregate_prefix, args.seed)
+    leaves = [net for net in networks if net['kind'] == 'leaf']
+    total_assignments = sum(len(addresses) for addresses in assignments.values())
+
+    result = run_runner(build_plan(networks, assignments, args, rng), args.timeout)
+
+    rows = []
+    for op_name in OPERATIONS:
+        op = result['operations'][op_name]
+        if op['mismatches']:
+            print(f"  WARNING: {op_name} results differ on {op['mismatches']}/{len(op['current_ms'])} samples")
+        for approach in ('current', 'indexed'):
+            stats = summarize(op[f'{approach}_ms'])
+            rows.append({
+                'assignments': total_assignments,
+                'networks': len(networks),
+                'operation': op_name,
+                'approach': approach,
+                'mean_ms': stats['mean'],
+                'p95_ms': stats['p95'],
+                'max_ms': stats['max'],
+                'mismatches': op['mismatches'],
+            })
+
+    structures = {
+        'current_mb': round(result['structures']['current_bytes'] / 1024 / 1024, 2),
+        'indexed_mb': round(result['structures']['indexed_bytes'] / 1024 / 1024, 2),
+    }
+    return {
+        'target_assignments': target,
+        'assignments': total_assignments,
+        'networks': len(networks),
+        'leaf_networks': len(leaves),
+        'structure_memory': structures,
+        'operations': rows,
+    }, networks, assignments
+
+
+# ----------------------------------------------------------------------------
+# Endpoints
+# ----------------------------------------------------------------------------
+
+def expected_answers(net, addresses):
+    """What each endpoint should report for a seeded leaf (no DHCP range, all static)"""
+    first = net['start'] + 1
+    last = net['start'] + (1 << (32 - net['prefix'])) - 2
+    assigned = set(addresses)
+    # available-ips skips the first usable (gateway) and last usable (broadcast) address
+    next_free = next((int_to_ip(a) for a in range(first + 1, last) if a not in assigned), None)
+    return {
+        'available-ips': next_free,
+        'utilization-summary': len(addresses),
+        'ip-utilization': len(addresses),
+        'conflicts': 0,
+    }
+
+
+def endpoint_answer(name, data):
+    if name == 'available-ips':
+        return data.get('next_available')
+    if name == 'utilization-summary':
+        return data.get('allocated')
+    if name == 'ip-utilization':
+        return (data.get('subnet_info') or {}).get('allocated_count')
+    return (data.get('summary') or {}).get('total_conflicts')
+
+
+def benchmark_endpoints(args, networks, assignments, rng):
+    """Read the seeded workload back through the IPAM routes"""
+    leaves = [net for net in networks if net['kind'] == 'leaf']
+    sample = [rng.choice(leaves) for _ in range(args.endpoint_samples)]
+    rows, details = [], {}
+    with http_client(args.base_url, args.api_token, timeout=300) as client:
+        for name, path in ENDPOINTS.items():
+            calls = []
+            with ServerMemorySampler(args.server_pid) as sampler:
+                for i, net in enumerate(sample):
+                    # Distinct client address per call keeps the per-IP+path rate limit out of the way
+                    headers = default_headers(args.api_token, ip_index=i)
+                    with timed() as t:
+                        response = client.get(path.format(id=net['id']), headers=headers)
+                    data = (response.json().get('data') or {}) if response.status_code == 200 else {}
+                    expected = expected_answers(net, assignments[net['id']])[name]
+                    calls.append({
+                        'status': response.status_code,
+                        'ms': t['ms'],
+                        'bytes': len(response.content),
+                        'match': response.status_code == 200 and endpoint_answer(name, data) == expected,
+                    })
+            ok = [c for c in calls if c['status'] == 200]
+            stats = summarize([c['ms'] for c in ok])
+            details[name] = {
+                'requests': len(calls),
+                'errors': len(calls) - len(ok),
+                'status_codes': sorted({c['status'] for c in calls}),
+                'latency_ms': stats,
+                'mismatches': sum(1 for c in ok if not c['match']),
+                'server_memory': sampler.summary(),
+            }
+            rows.append({
+                'endpoint': name,
+                'requests': len(calls),
+                'errors': len(calls) - len(ok),
+                'mean_ms': stats['mean'],
+                'p95_ms': stats['p95'],
+                'max_ms': stats['max'],
+                'kb': round(sum(c['bytes'] for c in ok) / len(ok) / 1024, 1) if ok else None,
+                'rss_growth_mb': details[name]['server_memory']['growth_mb'],
+                'mismatches': details[name]['mismatches'],
+            })
+
+        # Unfiltered scan: every ip_addresses row is checked against its network's CIDR in Node
+        scans = []
+        with ServerMemorySampler(args.server_pid) as sampler:
+            for i in range(args.scan_passes):
+                with timed() as t:
+                    response = client.get('/api/ip-addresses/conflicts', params={'type': 'out_of_range'},
+                                          headers=default_headers(args.api_token, ip_index=i))
+                scans.append({'status': response.status_code, 'ms': t['ms'], 'bytes': len(response.content)})
+        ok = [c for c in scans if c['status'] == 200]
+        stats = summarize([c['ms'] for c in ok])
+        details['conflicts-all'] = {'requests': len(scans), 'latency_ms': stats, 'server_memory': sampler.summary()}
+        rows.append({
+            'endpoint': 'conflicts-all (out_of_range)',
+            'requests': len(scans),
+            'errors': len(scans) - len(ok),
+            'mean_ms': stats['mean'],
+            'p95_ms': stats['p95'],
+            'max_ms': stats['max'],
+            'kb': round(ok[-1]['bytes'] / 1024, 1) if ok else None,
+            'rss_growth_mb': details['conflicts-all']['server_memory']['growth_mb'],
+            'mismatches': None,
+        })
+    return rows, details
+
+
+# ----------------------------------------------------------------------------
+# Database seeding
+# ----------------------------------------------------------------------------
+
+def seed_database(database_url, networks, assignments):
+    """Insert the synthetic hierarchy into networks/ip_addresses"""
+    with connect(database_url) as conn:
+        # Parents precede children in generation order, so COPY satisfies the FK
+        copy_rows(
+            conn,
+            'networks',
+            ['id', 'network_name', 'network_address', 'parent_network_id', 'network_type', 'description'],
+            ((n['id'], n['name'], n['cidr'], n['parent_id'], 'lan', 'IPAM benchmark data') for n in networks),
+        )
+        ip_rows = (
+            (net_id, int_to_ip(address), 'v4', 'static', f'{PERF_TAG}{int_to_ip(address).replace(".", "-")}')
+            for net_id, addresses in assignments.items()
+            for address in addresses
+        )
+        count = copy_rows(conn, 'ip_addresses', ['network_id', 'ip_address', 'ip_version', 'type', 'dns_name'], ip_rows)
+        conn.execute('ANALYZE networks')
+        conn.execute('ANALYZE ip_addresses')
+        conn.commit()
+    print(f'Seeded {len(networks)} networks and {count} ip_addresses')
+
+
+def cleanup_database(database_url):
+    with connect(database_url) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                'DELETE FROM ip_addresses WHERE network_id IN (SELECT id FROM networks WHERE network_name LIKE %s)',
+                (f'{NAME_PREFIX}%',),
+            )
+            ips = cur.rowcount
+            cur.execute('DELETE FROM networks WHERE network_name LIKE %s', (f'{NAME_PREFIX}%',))
+            nets = cur.rowcount
+        conn.commit()
+    print(f'Removed {nets} networks and {ips} ip_addresses')
+
+
+def main():
+    parser = base_parser(__doc__.split('\n')[1])
+    parser.add_argument('--assignments', type=int_list, default=int_list('10000,100000,300000'),
+                        help='Comma-separated assignment counts to sweep')
+    parser.add_argument('--leaf-prefix', type=int, default=24, help='Prefix length of leaf subnets (>= 24)')
+    parser.add_argument('--aggregate-prefix', type=int, default=20, help='Prefix length of aggregate networks')
+    parser.add_argument('--ops', type=int, default=200, help='Sampled operations per type and scale')
+    parser.add_argument('--scan-passes', type=int, default=3,
+                        help='Full out-of-range scans over every assignment (runner and conflicts endpoint)')
+    parser.add_argument('--warmup', type=int, default=20, help='Unrecorded samples per operation before timing')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the workload')
+    parser.add_argument('--timeout', type=int, default=1800, help='Seconds allowed per ipam-runner run')
+    parser.add_argument('--seed-database', action='store_true',
+                        help='Insert the largest workload into DATABASE_URL and benchmark the IPAM endpoints on it')
+    parser.add_argument('--endpoint-samples', type=int, default=50,
+                        help='Leaf networks requested per endpoint with --seed-database')
+    parser.add_argument('--cleanup', action='store_true', help='Remove seeded benchmark rows and exit')
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup_database(args.database_url)
+        return
+    if not 16 < args.aggregate_prefix <= args.leaf_prefix or not 24 <= args.leaf_prefix <= 30:
+        raise SystemExit('Require 16 < --aggregate-prefix <= --leaf-prefix and 24 <= --leaf-prefix <= 30')
+
+    results, all_rows, largest = [], [], None
+    for target in args.assignments:
+        print(f'\n=== {target:,} assignments ===')
+        result, networks, assignments = benchmark_scale(target, args)
+        results.append(result)
+        all_rows.extend(result['operations'])
+        print(f"  networks={result['networks']} leaves={result['leaf_networks']} "
+              f"structure current={result['structure_memory']['current_mb']}MB "
+              f"indexed={result['structure_memory']['indexed_mb']}MB")
+        largest = (networks, assignments)
+
+    print()
+    print_table(all_rows, ['assignments', 'operation', 'approach', 'mean_ms', 'p95_ms', 'max_ms', 'mismatches'])
+
+    endpoints = None
+    if args.seed_database and largest:
+        cleanup_database(args.database_url)
+        seed_database(args.database_url, *largest)
+        endpoint_rows, endpoints = benchmark_endpoints(args, *largest, random.Random(args.seed))
+        print()
+        print_table(endpoint_rows, ['endpoint', 'requests', 'errors', 'mean_ms', 'p95_ms', 'max_ms', 'kb',
+                                    'rss_growth_mb', 'mismatches'])
+        if any(row['mismatches'] for row in endpoint_rows):
+            print('WARNING: some endpoint answers differ from the seeded workload (see report)')
+
+    write_report(args.output_dir, 'ipam-benchmark', {
+        'parameters': {
+            'leaf_prefix': args.leaf_prefix,
+            'aggregate_prefix': args.aggregate_prefix,
+            'ops': args.ops,
+            'scan_passes': args.scan_passes,
+            'warmup': args.warmup,
+            'seed': args.seed,
+            'endpoint_samples': args.endpoint_samples if args.seed_database else None,
+        },
+        'scales': results,
+        'endpoints': endpoints,
+    }, args.label)
+
+
+if __name__ == '__main__':
+    main()
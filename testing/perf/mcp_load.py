@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+MCP server load generator
+
+Replays weighted tool-call mixes against POST /api/mcp as an MCP client
+(JSON-RPC 2.0 over streamable HTTP: initialize, then tools/call) at a given
+concurrency, for each inventory size in --inventory. Reports per tool:
+latency, throughput, errors and response size, so the growth of responses
+with inventory is visible.
+
+Audit overhead is measured two ways:
+  - from mcp_audit_log (migration 018/021): rows written per call and the
+    gap between client latency and the logged execution_time_ms, which is
+    taken before the audit INSERT and the oauth_clients lookup run
+  - directly: the route's audit INSERT replayed from --audit-writers
+    connections against a tagged OAuth client, at growing table sizes
+    (--audit-prefill), giving inserts/s and insert latency with the six
+    mcp_audit_log indexes in place
+
+The route currently answers 501 (SDK/App Router incompatibility, see the TODO
+in src/app/api/mcp/route.ts). The tool phase detects that and is skipped;
+--audit-only runs just the direct audit benchmark.
+
+Usage:
+  python3 testing/perf/mcp_load.py --mcp-token $TOKEN --inventory 1000,10000,100000 --concurrency 16
+  python3 testing/perf/mcp_load.py --mcp-token $TOKEN --mix search_devices=5,get_device_details=5
+  python3 testing/perf/mcp_load.py --audit-only --audit-prefill 0,1000000
+  python3 testing/perf/mcp_load.py --cleanup
+"""
+import asyncio
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from common import (
+    PERF_TAG,
+    async_http_client,
+    base_parser,
+    connect,
+    copy_rows,
+    int_list,
+    print_table,
+    summarize,
+    timed,
+    write_report,
+)
+from fixtures import DEVICE_COLUMNS, PEOPLE_COLUMNS, count_tagged, delete_tagged, device_rows, people_rows
+
+NAME_PREFIX = f'{PERF_TAG}mcp-'
+ENDPOINT = '/api/mcp'
+PROTOCOL_VERSION = '2025-03-26'
+
+DEFAULT_MIX = {
+    'search_devices': 35,
+    'get_device_details': 20,
+    'search_people': 15,
+    'search_licenses': 10,
+    'get_warranty_status': 10,
+    'get_network_topology': 10,
+}
+
+# Same statement as the finally block in handleMCPRequest()
+AUDIT_INSERT = """
+    INSERT INTO mcp_audit_log
+    (client_id, user_id, operation_type, operation_name, input_params, success, error_message,
+     execution_time_ms, ip_address, user_agent)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def tool_arguments(tool, device_ids, rng):
+    """Arguments for one call; searches match the tagged inventory"""
+    if tool == 'search_devices':
+        return {'search': NAME_PREFIX, 'limit': rng.choice([20, 50, 100])}
+    if tool == 'get_device_details':
+        return {'device_id': rng.choice(device_ids)}
+    if tool == 'search_people':
+        return {'search': NAME_PREFIX, 'limit': rng.choice([20, 100])}
+    if tool == 'search_licenses':
+        return {'limit': 100}
+    if tool == 'get_warranty_status':
+        return {'expiring_within_days': rng.choice([30, 90, 365]), 'limit': 100}
+    if tool == 'get_network_topology':
+        return {'limit': 500}
+    return {}
+
+
+# ----------------------------------------------------------------------------
+# Inventory
+# ----------------------------------------------------------------------------
+
+def seed_inventory(conn, size, rng):
+    """Grow the tagged inventory to size devices and size/5 people; returns device IDs"""
+    existing = count_tagged(conn, 'devices', 'hostname', NAME_PREFIX)
+    if existing < size:
+        copy_rows(conn, 'devices', DEVICE_COLUMNS, device_rows(NAME_PREFIX, existing, size - existing, rng))
+    people = count_tagged(conn, 'people', 'full_name', NAME_PREFIX)
+    if people < size // 5:
+        copy_rows(conn, 'people', PEOPLE_COLUMNS, people_rows(NAME_PREFIX, people, size // 5 - people, rng))
+    conn.commit()
+    with conn.cursor() as cur:
+        cur.execute('ANALYZE devices')
+        cur.execute('ANALYZE people')
+        cur.execute('SELECT id::text FROM devices WHERE hostname LIKE %s ORDER BY random() LIMIT 1000',
+                    (f'{NAME_PREFIX}%',))
+        return [row[0] for row in cur.fetchall()]
+
+
+def audit_rows(conn):
+    with conn.cursor() as cur:
+        cur.execute('SELECT count(*) FROM mcp_audit_log')
+        return cur.fetchone()[0]
+
+
+def logged_execution(conn, since):
+    """Per-operation execution_time_ms logged by the route since a timestamp"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT operation_name, count(*), avg(execution_time_ms), sum(octet_length(input_params::text))
+            FROM mcp_audit_log WHERE created_at >= %s GROUP BY operation_name
+        """, (since,))
+        return {name: {'rows': count, 'mean_execution_ms': float(mean or 0), 'input_bytes': int(size or 0)}
+                for name, count, mean, size in cur.fetchall()}
+
+
+# ----------------------------------------------------------------------------
+# MCP client
+# ----------------------------------------------------------------------------
+
+def decode_rpc(response):
+    """JSON-RPC payload from a JSON or text/event-stream response"""
+    if response.headers.get('content-type', '').startswith('text/event-stream'):
+        for line in response.text.splitlines():
+            if line.startswith('data:'):
+                return json.loads(line[5:])
+        return {}
+    return response.json()
+
+
+class MCPClient:
+    def __init__(self, client, token):
+        self.client = client
+        self.headers = {
+            'Authorization': f'Bearer {token}',
+            'Accept': 'application/json, text/event-stream',
+            'Content-Type': 'application/json',
+        }
+        self.ids = itertools.count(1)
+
+    async def rpc(self, method, params=None):
+        message = {'jsonrpc': '2.0', 'id': next(self.ids), 'method': method, 'params': params or {}}
+        response = await self.client.post(ENDPOINT, json=message, headers=self.headers)
+        session = response.headers.get('mcp-session-id')
+        if session:
+            self.headers['Mcp-Session-Id'] = session
+        return response
+
+    async def initialize(self):
+        response = await self.rpc('initialize', {
+            'protocolVersion': PROTOCOL_VERSION,
+            'capabilities': {},
+            'clientInfo': {'name': 'moss-perf-mcp-load', 'version': '1.0'},
+        })
+        if response.status_code == 200:
+            await self.client.post(ENDPOINT, headers=self.headers,
+                                   json={'jsonrpc': '2.0', 'method': 'notifications/initialized'})
+        return response
+
+
+async def preflight(base_url, token):
+    async with async_http_client(base_url) as client:
+        response = await MCPClient(client, token).initialize()
+        return response.status_code, response.text[:300]
+
+
+async def run_tools(args, token, device_ids, rng):
+    tools = list(args.mix)
+    weights = [args.mix[tool] for tool in tools]
+    calls = defaultdict(list)
+    deadline = time.perf_counter() + args.duration
+
+    async with async_http_client(args.base_url, max_connections=args.concurrency * 2, timeout=args.timeout) as client:
+        async def worker():
+            mcp = MCPClient(client, token)
+            await mcp.initialize()
+            while time.perf_counter() < deadline:
+                tool = rng.choices(tools, weights)[0]
+                arguments = tool_arguments(tool, device_ids, rng)
+                with timed() as t:
+                    try:
+                        response = await mcp.rpc('tools/call', {'name': tool, 'arguments': arguments})
+                        status = response.status_code
+                        payload = decode_rpc(response) if status == 200 else {}
+                        size = len(response.content)
+                    except Exception as e:  # noqa: BLE001 - failures are counted per tool
+                        status, payload, size = type(e).__name__, {}, 0
+                text = ''.join(c.get('text', '') for c in (payload.get('result') or {}).get('content', []))
+                calls[tool].append({
+                    'status': status,
+                    'ok': status == 200 and 'error' not in payload and not (payload.get('result') or {}).get('isError'),
+                    'ms': t['ms'],
+                    'bytes': size,
+                    'text_bytes': len(text),
+                })
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+    return calls, elapsed
+
+
+def tool_summary(calls, elapsed, logged):
+    summary = {}
+    for tool, results in sorted(calls.items()):
+        ok = [r for r in results if r['ok']]
+        latency = summarize([r['ms'] for r in ok])
+        server = logged.get(tool, {})
+        summary[tool] = {
+            'calls': len(results),
+            'errors': len(results) - len(ok),
+            'statuses': sorted({str(r['status']) for r in results}),
+            'throughput_rps': round(len(ok) / elapsed, 2),
+            'latency_ms': latency,
+            'response_bytes': summarize([r['bytes'] for r in ok]),
+            'result_text_bytes': summarize([r['text_bytes'] for r in ok]),
+            'audit_rows': server.get('rows', 0),
+            'logged_execution_ms': round(server.get('mean_execution_ms', 0), 1),
+            # What the client waited beyond the logged execution: audit INSERT, client lookup, transport
+            'post_execution_ms': round(latency['mean'] - server['mean_execution_ms'], 1) if server and ok else None,
+        }
+    return summary
+
+
+# ----------------------------------------------------------------------------
+# Direct audit write benchmark
+# ----------------------------------------------------------------------------
+
+def ensure_client(conn):
+    with conn.cursor() as cur:
+        cur.execute('SELECT id FROM oauth_clients WHERE client_id = %s', (f'{NAME_PREFIX}client',))
+        row = cur.fetchone()
+        if not row:
+            cur.execute("""
+                INSERT INTO oauth_clients (client_id, client_secret, client_name, redirect_uris, allowed_scopes)
+                VALUES (%s, 'not-a-secret', %s, ARRAY['http://localhost/callback'], ARRAY['mcp:tools'])
+                RETURNING id
+            """, (f'{NAME_PREFIX}client', f'{NAME_PREFIX}client'))
+            row = cur.fetchone()
+    conn.commit()
+    return row[0]
+
+
+def audit_params(client_id, rng):
+    tool = rng.choice(list(DEFAULT_MIX))
+    return (client_id, None, 'tool_call', tool, json.dumps({'name': tool, 'arguments': {'limit': 20}}),
+            True, None, rng.randint(2, 400), f'10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}', 'moss-perf-mcp-load')
+
+
+def prefill_audit(conn, client_id, target, rng):
+    with conn.cursor() as cur:
+        cur.execute('SELECT count(*) FROM mcp_audit_log WHERE client_id = %s', (client_id,))
+        existing = cur.fetchone()[0]
+    if existing < target:
+        columns = ['client_id', 'user_id', 'operation_type', 'operation_name', 'input_params', 'success',
+                   'error_message', 'execution_time_ms', 'ip_address', 'user_agent']
+        copy_rows(conn, 'mcp_audit_log', columns, (audit_params(client_id, rng) for _ in range(target - existing)))
+        conn.commit()
+        with conn.cursor() as cur:
+            cur.execute('ANALYZE mcp_audit_log')
+        conn.commit()
+
+
+def audit_write_benchmark(args, client_id, prefill, rng):
+    """Replay the route's audit INSERT from --audit-writers autocommit connections"""
+    per_writer = args.audit_inserts // args.audit_writers
+    latencies, lock = [], threading.Lock()
+
+    def writer(seed):
+        local_rng = random.Random(seed)
+        samples = []
+        with connect(args.database_url, autocommit=True) as conn, conn.cursor() as cur:
+            for _ in range(per_writer):
+                with timed() as t:
+                    cur.execute(AUDIT_INSERT, audit_params(client_id, local_rng))
+                samples.append(t['ms'])
+        with lock:
+            latencies.extend(samples)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.audit_writers) as pool:
+        list(pool.map(writer, [rng.random() for _ in range(args.audit_writers)]))
+    elapsed = time.perf_counter() - start
+    return {
+        'table_rows_before': prefill,
+        'writers': args.audit_writers,
+        'inserts': len(latencies),
+        'inserts_per_s': round(len(latencies) / elapsed, 1),
+        'latency_ms': summarize(latencies),
+    }
+
+
+def table_size(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_total_relation_size('mcp_audit_log'), pg_indexes_size('mcp_audit_log')")
+        total, indexes = cur.fetchone()
+    return {'total_mb': round(total / 1024 / 1024, 1), 'indexes_mb': round(indexes / 1024 / 1024, 1)}
+
+
+def cleanup(conn):
+    with conn.cursor() as cur:
+        # Audit rows cascade from the tagged OAuth client
+        cur.execute('DELETE FROM oauth_clients WHERE client_id = %s', (f'{NAME_PREFIX}client',))
+    conn.commit()
+    return delete_tagged(conn, 'devices', 'hostname', NAME_PREFIX), delete_tagged(conn, 'people', 'full_name', NAME_PREFIX)
+
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+def main():
+    parser = base_parser(__doc__.split('\n')[1])
+    parser.add_argument('--mcp-token', default=os.environ.get('MOSS_MCP_TOKEN'),
+                        help='OAuth access token with mcp:tools scope (env MOSS_MCP_TOKEN)')
+    parser.add_argument('--inventory', type=int_list, default=int_list('1000,10000,100000'),
+                        help='Comma-separated tagged device counts to sweep')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='Tool weights, e.g. search_devices=5,get_device_details=3')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent MCP clients')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds of tool calls per inventory size')
+    parser.add_argument('--timeout', type=float, default=60, help='Request timeout (s)')
+    parser.add_argument('--audit-only', action='store_true', help='Skip tool calls; run the direct audit benchmark')
+    parser.add_argument('--audit-prefill', type=int_list, default=int_list('0,100000,1000000'),
+                        help='mcp_audit_log sizes (tagged rows) for the direct audit benchmark')
+    parser.add_argument('--audit-writers', type=int, default=8, help='Concurrent audit writers')
+    parser.add_argument('--audit-inserts', type=int, default=8000, help='Audit inserts per prefill size')
+    parser.add_argument('--seed', type=int, default=34, help='Random seed')
+    parser.add_argument('--keep', action='store_true', help='Leave seeded inventory and audit rows in place')
+    parser.add_argument('--cleanup', action='store_true', help='Remove seeded rows and exit')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report = {'parameters': {k: v for k, v in vars(args).items()
+                             if k not in ('password', 'api_token', 'mcp_token', 'database_url')}}
+    with connect(args.database_url) as conn:
+        if args.cleanup:
+            devices, people = cleanup(conn)
+            print(f'Removed {devices} devices, {people} people and the tagged OAuth client')
+            return
+
+        if not args.audit_only:
+            if not args.mcp_token:
+                raise SystemExit('Tool calls need --mcp-token (or pass --audit-only)')
+            status, body = asyncio.run(preflight(args.base_url, args.mcp_token))
+            report['preflight'] = {'status': status, 'body': body}
+            if status != 200:
+                print(f'{ENDPOINT} initialize returned {status}: {body}')
+                print('Skipping tool calls; running the direct audit benchmark only')
+                args.audit_only = True
+
+        sizes = []
+        for size in ([] if args.audit_only else args.inventory):
+            device_ids = seed_inventory(conn, size, rng)
+            rows_before = audit_rows(conn)
+            with conn.cursor() as cur:
+                cur.execute('SELECT now()')
+                since = cur.fetchone()[0]
+            conn.commit()
+            calls, elapsed = asyncio.run(run_tools(args, args.mcp_token, device_ids, rng))
+            total_calls = sum(len(results) for results in calls.values())
+            audit_written = audit_rows(conn) - rows_before
+            sizes.append({
+                'inventory': size,
+                'elapsed_s': round(elapsed, 2),
+                'calls': total_calls,
+                'throughput_rps': round(total_calls / elapsed, 1),
+                'audit_rows_written': audit_written,
+                'audit_rows_per_call': round(audit_written / total_calls, 3) if total_calls else None,
+                'tools': tool_summary(calls, elapsed, logged_execution(conn, since)),
+            })
+            print(f'  inventory {size:>8,}: {total_calls} calls, {sizes[-1]["throughput_rps"]} calls/s, '
+                  f'{audit_written} audit rows')
+        report['inventory_sizes'] = sizes
+
+        client_id = ensure_client(conn)
+        audit = []
+        for prefill in args.audit_prefill:
+            prefill_audit(conn, client_id, prefill, rng)
+            result = audit_write_benchmark(args, client_id, prefill, rng)
+            result['table'] = table_size(conn)
+            audit.append(result)
+            print(f"  audit log {prefill:>9,} rows: {result['inserts_per_s']} inserts/s, "
+                  f"p95 {result['latency_ms']['p95']:.2f}ms")
+        report['audit_writes'] = audit
+        if not args.keep:
+            cleanup(conn)
+
+    if sizes:
+        rows = [{
+            'inventory': size['inventory'],
+            'tool': tool,
+            'calls': stats['calls'],
+            'errors': stats['errors'],
+            'rps': stats['throughput_rps'],
+            'p50_ms': stats['latency_ms']['p50'],
+            'p95_ms': stats['latency_ms']['p95'],
+            'resp_kb': round(stats['response_bytes']['mean'] / 1024, 1),
+            'resp_max_kb': round(stats['response_bytes']['max'] / 1024, 1),
+            'post_exec_ms': stats['post_execution_ms'],
+        } for size in sizes for tool, stats in size['tools'].items()]
+        print()
+        print_table(rows, ['inventory', 'tool', 'calls', 'errors', 'rps', 'p50_ms', 'p95_ms', 'resp_kb',
+                           'resp_max_kb', 'post_exec_ms'])
+    print()
+    print_table([{
+        'audit_rows': a['table_rows_before'],
+        'writers': a['writers'],
+        'inserts_s': a['inserts_per_s'],
+        'p50_ms': a['latency_ms']['p50'],
+        'p95_ms': a['latency_ms']['p95'],
+        'table_mb': a['table']['total_mb'],
+        'index_mb': a['table']['indexes_mb'],
+    } for a in audit], ['audit_rows', 'writers', 'inserts_s', 'p50_ms', 'p95_ms', 'table_mb', 'index_mb'])
+
+    write_report(args.output_dir, 'mcp-load', report, args.label)
+
+
+if __name__ == '__main__':
+    main()
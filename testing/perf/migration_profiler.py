@@ -0,0 +1,585 @@
+#!/usr/bin/env python3
+"""
+Migration runtime and lock profiler
+
+Applies the migrations/ chain to a scratch database that is scaled with
+synthetic inventory part way through the chain (after --seed-after, by
+default before 005_add_performance_indexes), so index builds and table
+rewrites run against realistic row counts. Each migration runs the way
+src/lib/migrate.ts runs it: the whole file in one transaction, so every lock
+is held until the file commits. Statements are timed individually.
+
+While a migration runs:
+  - its backend's relation locks are sampled from pg_locks (strongest mode
+    per table, when first taken; held until commit)
+  - read (SELECT) and write (UPDATE ... WHERE false) probes loop against
+    --probe-tables from separate connections; the longest probe wait per
+    table is how long the application would have stalled on it
+
+Statements are classified and flagged when they block writes or reads on
+large tables: plain CREATE INDEX (should be CONCURRENTLY), UNIQUE
+constraints built under ACCESS EXCLUSIVE, constraints validated inline
+(should be NOT VALID + VALIDATE), column type rewrites and SET NOT NULL.
+
+The scratch database is created next to the one in DATABASE_URL (the role
+needs CREATEDB) and dropped afterwards unless --keep is given.
+
+Usage:
+  python3 testing/perf/migration_profiler.py --scale 200000
+  python3 testing/perf/migration_profiler.py --scale 1000000 --seed-after 4 --markdown migration-costs.md
+  python3 testing/perf/migration_profiler.py --scale 50000 --only 005,011,014,027 --keep
+"""
+import os
+import re
+import threading
+import time
+from urllib.parse import urlparse, urlunparse
+
+from common import REPO_ROOT, base_parser, connect, print_table, write_report
+
+MIGRATIONS_DIR = os.path.join(REPO_ROOT, 'migrations')
+PROBE_TABLES = ['devices', 'people', 'ios', 'ip_addresses', 'networks', 'locations', 'rooms', 'companies']
+
+# Strongest first; what each table lock mode blocks for ordinary traffic
+LOCK_MODES = [
+    ('AccessExclusiveLock', 'reads+writes'),
+    ('ExclusiveLock', 'writes'),
+    ('ShareRowExclusiveLock', 'writes'),
+    ('ShareLock', 'writes'),
+    ('ShareUpdateExclusiveLock', 'none'),
+    ('RowExclusiveLock', 'none'),
+    ('RowShareLock', 'none'),
+    ('AccessShareLock', 'none'),
+]
+LOCK_RANK = {mode: rank for rank, (mode, _) in enumerate(LOCK_MODES)}
+LOCK_BLOCKS = dict(LOCK_MODES)
+
+NAME = r'(?:"?[\w]+"?\.)?"?([\w]+)"?'
+STATEMENT_KINDS = [
+    ('index_build', re.compile(r'^create\s+(?:unique\s+)?index\s+(?!concurrently)(?:if\s+not\s+exists\s+)?'
+                               r'[\w"]*\s*on\s+(?:only\s+)?' + NAME, re.I)),
+    ('index_concurrent', re.compile(r'^create\s+(?:unique\s+)?index\s+concurrently\b.*?\bon\s+' + NAME, re.I | re.S)),
+    ('unique_constraint', re.compile(r'^alter\s+table\s+(?:if\s+exists\s+)?(?:only\s+)?' + NAME +
+                                     r'.*\badd\s+(?:constraint\s+[\w"]+\s+)?(?:unique|primary\s+key)\b'
+                                     r'(?!.*\busing\s+index\b)', re.I | re.S)),
+    ('validated_constraint', re.compile(r'^alter\s+table\s+(?:if\s+exists\s+)?(?:only\s+)?' + NAME +
+                                        r'.*\badd\s+(?:constraint\s+[\w"]+\s+)?(?:foreign\s+key|check)\b'
+                                        r'(?!.*\bnot\s+valid\b)', re.I | re.S)),
+    ('type_rewrite', re.compile(r'^alter\s+table\s+(?:if\s+exists\s+)?(?:only\s+)?' + NAME +
+                                r'.*\balter\s+(?:column\s+)?[\w"]+\s+(?:set\s+data\s+)?type\b', re.I | re.S)),
+    ('set_not_null', re.compile(r'^alter\s+table\s+(?:if\s+exists\s+)?(?:only\s+)?' + NAME +
+                                r'.*\bset\s+not\s+null\b', re.I | re.S)),
+    ('alter_table', re.compile(r'^alter\s+table\s+(?:if\s+exists\s+)?(?:only\s+)?' + NAME, re.I)),
+    ('backfill', re.compile(r'^(?:update|delete\s+from)\s+(?:only\s+)?' + NAME, re.I)),
+    ('analyze', re.compile(r'^(?:analyze|vacuum)\b', re.I)),
+]
+ADVICE = {
+    'index_build': 'CREATE INDEX CONCURRENTLY in its own non-transactional migration (migrate.ts runs each file '
+                   'as one transaction, where CONCURRENTLY is not allowed)',
+    'unique_constraint': 'CREATE UNIQUE INDEX CONCURRENTLY, then ADD CONSTRAINT ... UNIQUE USING INDEX',
+    'validated_constraint': 'ADD CONSTRAINT ... NOT VALID, then VALIDATE CONSTRAINT in a later migration',
+    'type_rewrite': 'Add a new column, backfill in batches, then swap',
+    'set_not_null': 'ADD CHECK (col IS NOT NULL) NOT VALID, VALIDATE it, then SET NOT NULL (PostgreSQL 12+)',
+    'backfill': 'Backfill in batches outside the schema migration',
+}
+
+
+# ----------------------------------------------------------------------------
+# Migration files
+# ----------------------------------------------------------------------------
+
+def migration_files():
+    """(number, filename, path) sorted like getMigrationFiles() in migrate.ts"""
+    files = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = re.match(r'^(\d+)_.*\.sql$', filename)
+        if match:
+            files.append((int(match.group(1)), filename, os.path.join(MIGRATIONS_DIR, filename)))
+    files.sort()
+    return files
+
+
+def split_statements(sql):
+    """Split a migration into statements, respecting quotes, dollar quotes and comments"""
+    statements, current, i, n = [], [], 0, len(sql)
+    while i < n:
+        char = sql[i]
+        if sql.startswith('--', i):
+            end = sql.find('\n', i)
+            i = n if end == -1 else end
+            continue
+        if sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+            current.append(' ')
+            continue
+        if char in ("'", '"'):
+            end = i + 1
+            while end < n:
+                if sql[end] == char:
+                    if end + 1 < n and sql[end + 1] == char:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            current.append(sql[i:end + 1])
+            i = end + 1
+            continue
+        if char == '$':
+            match = re.match(r'\$([A-Za-z_]\w*)?\$', sql[i:])
+            if match:
+                tag = match.group(0)
+                end = sql.find(tag, i + len(tag))
+                end = n if end == -1 else end + len(tag)
+                current.append(sql[i:end])
+                i = end
+                continue
+        if char == ';':
+            statement = ''.join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+        else:
+            current.append(char)
+        i += 1
+    statement = ''.join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+
+def classify(statement):
+    flat = ' '.join(statement.split())
+    for kind, pattern in STATEMENT_KINDS:
+        match = pattern.search(flat)
+        if match:
+            return kind, (match.group(1) if match.groups() else None)
+    return 'other', None
+
+
+# ----------------------------------------------------------------------------
+# Scratch database and synthetic data
+# ----------------------------------------------------------------------------
+
+def scratch_url(database_url, name):
+    return urlunparse(urlparse(database_url)._replace(path=f'/{name}'))
+
+
+def recreate_database(database_url, name, drop_only=False):
+    with connect(database_url, autocommit=True) as conn:
+        conn.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+        if not drop_only:
+            conn.execute(f'CREATE DATABASE "{name}"')
+
+
+def seed_sql(scale):
+    """Core inventory at the schema of 001-004, sized relative to --scale devices"""
+    companies, locations = max(scale // 100, 10), max(scale // 500, 5)
+    rooms, people, networks = max(scale // 20, 10), max(scale // 2, 10), max(scale // 50, 5)
+    return [
+        ('companies', f"""
+            INSERT INTO companies (company_name, company_type)
+            SELECT 'perf-mig-co-' || g, (ARRAY['vendor','manufacturer','service_provider'])[1 + g % 3]
+            FROM generate_series(1, {companies}) g"""),
+        ('locations', f"""
+            INSERT INTO locations (company_id, location_name, location_type)
+            SELECT c.ids[1 + g % cardinality(c.ids)], 'perf-mig-loc-' || g,
+                   (ARRAY['office','datacenter','studio'])[1 + g % 3]
+            FROM generate_series(1, {locations}) g, (SELECT array_agg(id) ids FROM companies) c"""),
+        ('rooms', f"""
+            INSERT INTO rooms (location_id, room_name, room_type)
+            SELECT l.ids[1 + g % cardinality(l.ids)], 'perf-mig-room-' || g,
+                   (ARRAY['office','server_room','closet','studio'])[1 + g % 4]
+            FROM generate_series(1, {rooms}) g, (SELECT array_agg(id) ids FROM locations) l"""),
+        ('people', f"""
+            INSERT INTO people (company_id, location_id, full_name, email, username, person_type, department, status)
+            SELECT c.ids[1 + g % cardinality(c.ids)], l.ids[1 + g % cardinality(l.ids)],
+                   'perf-mig-person-' || g, 'perf-mig-' || g || '@example.test', 'perf-mig-' || g,
+                   (ARRAY['employee','employee','contractor'])[1 + g % 3],
+                   (ARRAY['Engineering','Production','IT','Finance'])[1 + g % 4],
+                   (ARRAY['active','active','active','inactive'])[1 + g % 4]
+            FROM generate_series(1, {people}) g, (SELECT array_agg(id) ids FROM companies) c,
+                 (SELECT array_agg(id) ids FROM locations) l"""),
+        ('devices', f"""
+            INSERT INTO devices (hostname, device_type, manufacturer, model, serial_number, asset_tag, status,
+                                 location_id, room_id, company_id, assigned_to_id, last_used_by_id,
+                                 purchase_date, warranty_expiration, operating_system)
+            SELECT 'perf-mig-' || lpad(g::text, 8, '0'),
+                   (ARRAY['computer','server','switch','router','printer','mobile','av_equipment'])[1 + g % 7],
+                   (ARRAY['Dell','HP','Lenovo','Apple','Cisco'])[1 + g % 5], 'M-' || (g % 300),
+                   'SN' || g, 'AT-' || g, (ARRAY['active','active','active','repair','storage','retired'])[1 + g % 6],
+                   l.ids[1 + g % cardinality(l.ids)], r.ids[1 + g % cardinality(r.ids)],
+                   c.ids[1 + g % cardinality(c.ids)], p.ids[1 + g % cardinality(p.ids)],
+                   CASE WHEN g % 3 = 0 THEN p.ids[1 + (g * 7) % cardinality(p.ids)] END,
+                   CURRENT_DATE - (g % 2000), CURRENT_DATE - (g % 2000) + 1095,
+                   (ARRAY['Windows 11','macOS 14','Ubuntu 22.04',NULL])[1 + g % 4]
+            FROM generate_series(1, {scale}) g, (SELECT array_agg(id) ids FROM locations) l,
+                 (SELECT array_agg(id) ids FROM rooms) r, (SELECT array_agg(id) ids FROM companies) c,
+                 (SELECT array_agg(id) ids FROM people) p"""),
+        ('networks', f"""
+            INSERT INTO networks (location_id, network_name, network_address, vlan_id, network_type)
+            SELECT l.ids[1 + g % cardinality(l.ids)], 'perf-mig-net-' || g,
+                   '10.' || (g / 256 % 256) || '.' || (g % 256) || '.0/24', g % 4094 + 1,
+                   (ARRAY['lan','management','production','guest'])[1 + g % 4]
+            FROM generate_series(1, {networks}) g, (SELECT array_agg(id) ids FROM locations) l"""),
+        ('ios', """
+            INSERT INTO ios (device_id, native_network_id, interface_name, interface_type, status, port_number)
+            SELECT d.id, n.ids[1 + (k + d.rn) % cardinality(n.ids)], 'eth' || k, 'ethernet', 'active', k::text
+            FROM (SELECT id, row_number() OVER () rn FROM devices) d, generate_series(0, 2) k,
+                 (SELECT array_agg(id) ids FROM networks) n"""),
+        ('ios connections', """
+            WITH numbered AS (SELECT id, row_number() OVER (ORDER BY id) rn FROM ios)
+            UPDATE ios SET connected_to_io_id = b.id
+            FROM numbered a JOIN numbered b ON b.rn = a.rn + 1
+            WHERE ios.id = a.id AND a.rn % 6 = 1"""),
+        ('ip_addresses', """
+            INSERT INTO ip_addresses (io_id, network_id, ip_address, ip_version, type)
+            SELECT io.id, io.native_network_id,
+                   '10.' || (rn / 65536 % 256) || '.' || (rn / 256 % 256) || '.' || (rn % 256), 'v4',
+                   (ARRAY['static','dhcp','reserved'])[1 + rn % 3]
+            FROM (SELECT id, native_network_id, row_number() OVER () rn FROM ios) io
+            WHERE rn % 3 <> 0"""),
+    ]
+
+
+def seed(conn, scale):
+    timings = {}
+    for table, sql in seed_sql(scale):
+        start = time.perf_counter()
+        with conn.cursor() as cur:
+            cur.execute(sql)
+        conn.commit()
+        timings[table] = round(time.perf_counter() - start, 2)
+        print(f'  seeded {table:<16} in {timings[table]}s')
+    conn.autocommit = True
+    conn.execute('ANALYZE')
+    conn.autocommit = False
+    return timings
+
+
+def table_rows(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT relname, GREATEST(reltuples, 0)::bigint, pg_total_relation_size(oid)
+            FROM pg_class WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace
+        """)
+        return {name: {'rows': rows, 'bytes': size} for name, rows, size in cur.fetchall()}
+
+
+# ----------------------------------------------------------------------------
+# Lock sampling and blocking probes
+# ----------------------------------------------------------------------------
+
+class LockSampler:
+    """Polls pg_locks for one backend; strongest table lock per relation and when it was first seen"""
+
+    def __init__(self, url, pid, interval):
+        self.url, self.pid, self.interval = url, pid, interval
+        self.locks = {}
+        self.waiting_peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._start = time.perf_counter()
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        with connect(self.url, autocommit=True) as conn, conn.cursor() as cur:
+            while not self._stop.is_set():
+                cur.execute("""
+                    SELECT c.relname, l.mode FROM pg_locks l JOIN pg_class c ON c.oid = l.relation
+                    WHERE l.pid = %s AND l.granted AND c.relkind IN ('r', 'p')
+                      AND c.relnamespace = 'public'::regnamespace
+                """, (self.pid,))
+                now = time.perf_counter() - self._start
+                for relname, mode in cur.fetchall():
+                    held = self.locks.get(relname)
+                    if held is None or LOCK_RANK.get(mode, 99) < LOCK_RANK.get(held['mode'], 99):
+                        self.locks[relname] = {'mode': mode, 'first_seen_s': round(now, 3)}
+                cur.execute("""
+                    SELECT count(*) FROM pg_stat_activity
+                    WHERE wait_event_type = 'Lock' AND %s = ANY(pg_blocking_pids(pid))
+                """, (self.pid,))
+                self.waiting_peak = max(self.waiting_peak, cur.fetchone()[0])
+                self._stop.wait(self.interval)
+
+
+class Probes:
+    """Loops read and write probes per table; probe latency while a migration holds locks is the stall"""
+
+    def __init__(self, url, tables, timeout_s):
+        self.url, self.tables, self.timeout_ms = url, tables, int(timeout_s * 1000)
+        self.samples = []  # (kind, table, start, end, error)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for table in self.tables:
+            for kind, sql in (('read', f'SELECT 1 FROM "{table}" LIMIT 1'),
+                              ('write', f'UPDATE "{table}" SET id = id WHERE false')):
+                thread = threading.Thread(target=self._run, args=(kind, table, sql), daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self, kind, table, sql):
+        with connect(self.url, autocommit=True) as conn:
+            conn.execute(f'SET statement_timeout = {self.timeout_ms}')
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                error = None
+                try:
+                    conn.execute(sql)
+                except Exception as e:  # noqa: BLE001 - missing tables and timeouts are recorded
+                    error = type(e).__name__
+                end = time.perf_counter()
+                with self._lock:
+                    self.samples.append((kind, table, start, end, error))
+                self._stop.wait(0.02 if error is None else 0.5)
+
+    def window(self, start, end):
+        """Longest probe wait per table/kind for probes overlapping [start, end]"""
+        worst = {}
+        with self._lock:
+            samples = [s for s in self.samples if s[3] >= start and s[2] <= end]
+        for kind, table, s_start, s_end, error in samples:
+            if error == 'UndefinedTable':
+                continue
+            key = (table, kind)
+            worst[key] = max(worst.get(key, 0.0), (s_end - s_start) * 1000)
+        return worst
+
+
+# ----------------------------------------------------------------------------
+# Profiling
+# ----------------------------------------------------------------------------
+
+class MigrationFailed(Exception):
+    def __init__(self, error, statement):
+        super().__init__(error)
+        self.error, self.statement = error, statement
+
+
+def run_migration(conn, path, rows):
+    """Run one file as a single transaction, timing each statement"""
+    with open(path) as f:
+        statements = split_statements(f.read())
+    results = []
+    with conn.cursor() as cur:
+        for statement in statements:
+            keyword = statement.split(None, 1)[0].upper()
+            if keyword in ('BEGIN', 'COMMIT', 'START', 'END'):
+                # The file already runs as one transaction
+                continue
+            kind, table = classify(statement)
+            start = time.perf_counter()
+            try:
+                cur.execute(statement)
+            except Exception as e:
+                conn.rollback()
+                raise MigrationFailed(f"{type(e).__name__}: {e}".strip(), ' '.join(statement.split())[:300]) from e
+            results.append({
+                'kind': kind,
+                'table': table,
+                'rows': rows.get(table, {}).get('rows') if table else None,
+                'ms': round((time.perf_counter() - start) * 1000, 1),
+                'sql': ' '.join(statement.split())[:160],
+            })
+    start = time.perf_counter()
+    conn.commit()
+    return results, round((time.perf_counter() - start) * 1000, 1)
+
+
+def flag(statement, rows_threshold, ms_threshold):
+    if statement['kind'] not in ADVICE:
+        return None
+    big = (statement['rows'] or 0) >= rows_threshold
+    slow = statement['ms'] >= ms_threshold
+    if statement['kind'] == 'backfill' and not slow:
+        return None
+    if not (big or slow):
+        return None
+    return ADVICE[statement['kind']]
+
+
+def profile(args, url, files):
+    migrations = []
+    seeded = {}
+    probes = Probes(url, args.probe_tables, args.probe_timeout)
+    probing = False
+    with connect(url) as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT pg_backend_pid()')
+            pid = cur.fetchone()[0]
+        conn.commit()
+        try:
+            for number, filename, path in files:
+                if not seeded and number > args.seed_after and args.scale:
+                    print(f'Seeding {args.scale:,} devices and related inventory...')
+                    seeded = seed(conn, args.scale)
+                if not probing and seeded:
+                    probes.start()
+                    probing = True
+                rows = table_rows(conn)
+                conn.commit()
+                selected = not args.only or number in args.only
+
+                start = time.perf_counter()
+                try:
+                    with LockSampler(url, pid, args.lock_interval) as sampler:
+                        statements, commit_ms = run_migration(conn, path, rows)
+                except MigrationFailed as e:
+                    # Later migrations depend on this one, so the chain stops here
+                    print(f'  {filename} FAILED: {e.error}')
+                    migrations.append({'number': number, 'file': filename, 'failed': e.error,
+                                       'statement': e.statement, 'seconds': 0, 'statements': [], 'locks': [],
+                                       'sessions_blocked_peak': 0, 'probe_wait_ms': {}, 'flags': []})
+                    break
+                end = time.perf_counter()
+                elapsed = end - start
+                if not selected:
+                    continue
+
+                blocked = probes.window(start, end) if probing else {}
+                locks = [{
+                    'table': table,
+                    'mode': lock['mode'],
+                    'blocks': LOCK_BLOCKS.get(lock['mode'], 'unknown'),
+                    'held_s': round(elapsed - lock['first_seen_s'], 3),
+                    'rows': rows.get(table, {}).get('rows'),
+                } for table, lock in sorted(sampler.locks.items())]
+                for statement in statements:
+                    statement['advice'] = flag(statement, args.rows_threshold, args.ms_threshold)
+                migration = {
+                    'number': number,
+                    'file': filename,
+                    'seconds': round(elapsed, 3),
+                    'commit_ms': commit_ms,
+                    'statements': statements,
+                    'locks': locks,
+                    'sessions_blocked_peak': sampler.waiting_peak,
+                    'probe_wait_ms': {f'{table}:{kind}': round(ms, 1) for (table, kind), ms in sorted(blocked.items())},
+                    'flags': [s for s in statements if s['advice']],
+                }
+                migrations.append(migration)
+                slowest = max(statements, key=lambda s: s['ms'], default=None)
+                print(f"  {filename:<48} {elapsed:>8.2f}s  {len(migration['flags'])} flags"
+                      + (f"  slowest {slowest['kind']} on {slowest['table']} {slowest['ms']:.0f}ms"
+                         if slowest and slowest['ms'] > 100 else ''))
+        finally:
+            if probing:
+                probes.stop()
+    return migrations, seeded
+
+
+def markdown(migrations, scale):
+    lines = ['# Migration Cost Report', '', f'Synthetic scale: {scale:,} devices', '',
+             '| Migration | Seconds | Tables locked (reads+writes / writes) | Worst read wait ms | '
+             'Worst write wait ms | Flags |',
+             '|---|---|---|---|---|---|']
+    for m in migrations:
+        full = sum(1 for lock in m['locks'] if lock['blocks'] == 'reads+writes')
+        writes = sum(1 for lock in m['locks'] if lock['blocks'] == 'writes')
+        reads = max([ms for key, ms in m['probe_wait_ms'].items() if key.endswith(':read')], default=0)
+        write = max([ms for key, ms in m['probe_wait_ms'].items() if key.endswith(':write')], default=0)
+        if m.get('failed'):
+            lines.append(f"| {m['file']} | FAILED: {m['failed'][:80]} | | | | |")
+            continue
+        lines.append(f"| {m['file']} | {m['seconds']:.2f} | {full} / {writes} | {reads:,.0f} | {write:,.0f} | "
+                     f"{len(m['flags'])} |")
+    lines += ['', '## Flagged statements', '']
+    for m in migrations:
+        for statement in m['flags']:
+            lines.append(f"- **{m['file']}** `{statement['kind']}` on `{statement['table']}` "
+                         f"({statement['rows'] or 0:,} rows, {statement['ms']:,.0f} ms): {statement['advice']}  ")
+            lines.append(f"  `{statement['sql'][:120]}`")
+    return '\n'.join(lines) + '\n'
+
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+def main():
+    parser = base_parser(__doc__.split('\n')[1], http=False)
+    parser.add_argument('--scale', type=int, default=100000, help='Synthetic devices (other tables scale with it)')
+    parser.add_argument('--seed-after', type=int, default=4, help='Seed once migrations up to this number ran')
+    parser.add_argument('--only', type=lambda text: {int(part) for part in text.split(',')},
+                        help='Only report these migration numbers (all still run), e.g. 005,011,014,027')
+    parser.add_argument('--scratch-db', default='moss_migration_profile', help='Scratch database name')
+    parser.add_argument('--probe-tables', type=lambda text: text.split(','), default=PROBE_TABLES,
+                        help='Tables probed for read/write stalls')
+    parser.add_argument('--probe-timeout', type=float, default=600, help='Probe statement timeout (s)')
+    parser.add_argument('--lock-interval', type=float, default=0.02, help='pg_locks polling interval (s)')
+    parser.add_argument('--rows-threshold', type=int, default=10000,
+                        help='Flag blocking statements on tables with at least this many rows')
+    parser.add_argument('--ms-threshold', type=float, default=500, help='Flag blocking statements slower than this')
+    parser.add_argument('--markdown', help='Also write the per-migration report as Markdown')
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch database')
+    args = parser.parse_args()
+
+    if not args.database_url:
+        raise SystemExit('DATABASE_URL is not set (pass --database-url or export DATABASE_URL)')
+    files = migration_files()
+    url = scratch_url(args.database_url, args.scratch_db)
+    print(f'Applying {len(files)} migrations to scratch database {args.scratch_db}')
+    recreate_database(args.database_url, args.scratch_db)
+    try:
+        migrations, seeded = profile(args, url, files)
+    finally:
+        if not args.keep:
+            recreate_database(args.database_url, args.scratch_db, drop_only=True)
+
+    rows = [{
+        'migration': m['file'][:44],
+        'seconds': m['seconds'],
+        'statements': len(m['statements']),
+        'locks_rw': sum(1 for lock in m['locks'] if lock['blocks'] == 'reads+writes'),
+        'locks_w': sum(1 for lock in m['locks'] if lock['blocks'] == 'writes'),
+        'max_read_wait_ms': max([ms for k, ms in m['probe_wait_ms'].items() if k.endswith(':read')], default=0),
+        'max_write_wait_ms': max([ms for k, ms in m['probe_wait_ms'].items() if k.endswith(':write')], default=0),
+        'flags': len(m['flags']),
+    } for m in migrations]
+    print()
+    print_table(rows, ['migration', 'seconds', 'statements', 'locks_rw', 'locks_w', 'max_read_wait_ms',
+                       'max_write_wait_ms', 'flags'])
+
+    for m in migrations:
+        if m.get('failed'):
+            print(f"\n{m['file']} failed: {m['failed']}\n  {m['statement']}")
+
+    flagged = [(m['file'], s) for m in migrations for s in m['flags']]
+    if flagged:
+        print(f'\n{len(flagged)} flagged statements:')
+        for filename, statement in sorted(flagged, key=lambda item: -item[1]['ms'])[:25]:
+            print(f"  {filename}: {statement['kind']} on {statement['table']} "
+                  f"({statement['rows'] or 0:,} rows, {statement['ms']:,.0f}ms) -> {statement['advice']}")
+
+    if args.markdown:
+        with open(args.markdown, 'w') as f:
+            f.write(markdown(migrations, args.scale))
+        print(f'\nMarkdown written to {args.markdown}')
+
+    write_report(args.output_dir, 'migration-profile', {
+        'parameters': {k: (sorted(v) if isinstance(v, set) else v) for k, v in vars(args).items()
+                       if k not in ('password', 'api_token', 'database_url')},
+        'seed_seconds': seeded,
+        'total_seconds': round(sum(m['seconds'] for m in migrations), 2),
+        'migrations': migrations,
+    }, args.label)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Database connection pool stress test
+
+Ramps client concurrency past the pg pool size (getPool() in src/lib/db.ts,
+max 20 / connectionTimeoutMillis 2000 unless DB_POOL_MAX and
+DB_POOL_CONNECTION_TIMEOUT_MS are set) and records, per concurrency level:
+  - throughput and client latency
+  - queueing delay for a pool client (acquire-wait histogram from
+    GET /api/admin/db/pool) and peak waiting requests
+  - acquisition timeouts and HTTP errors, to find where errors start
+
+Each level resets the server counters first, so every row describes that
+level alone. Requests go to a database-bound endpoint with cache-busting
+parameters so the in-memory API cache does not hide the pool.
+
+Usage:
+  python3 testing/perf/pool_stress.py --levels 5,10,20,30,40,60,80
+  python3 testing/perf/pool_stress.py --endpoint health --duration 20
+  python3 testing/perf/pool_stress.py --levels 10,20,40 --database-url $DATABASE_URL
+"""
+import asyncio
+import random
+import time
+from collections import Counter
+
+from common import (
+    async_http_client,
+    base_parser,
+    connect,
+    default_headers,
+    int_list,
+    print_table,
+    session_login,
+    summarize,
+    write_report,
+)
+
+POOL_ENDPOINT = '/api/admin/db/pool'
+
+# Endpoints that check out a pool client on every request
+ENDPOINTS = {
+    # list query + count query; a random search term bypasses the list cache
+    'devices': lambda rng: ('/api/devices', {'search': f'{rng.getrandbits(32):08x}', 'limit': 50}),
+    'people': lambda rng: ('/api/people', {'search': f'{rng.getrandbits(32):08x}', 'limit': 50}),
+    # a single SELECT 1; isolates pool behaviour from query cost
+    'health': lambda rng: ('/api/health/db', None),
+}
+
+
+def histogram_percentile(histogram, pct):
+    """Upper bound of the bucket holding the pct-th percentile (ms)"""
+    target = histogram['count'] * pct / 100
+    seen = 0
+    for bucket in histogram['buckets']:
+        seen += bucket['count']
+        if bucket['count'] and seen >= target:
+            return bucket['le'] if bucket['le'] != '+Inf' else histogram['maxMs']
+    return 0
+
+
+async def pool_telemetry(client, reset=False):
+    if reset:
+        response = await client.post(POOL_ENDPOINT, json={'action': 'reset_stats'})
+    else:
+        response = await client.get(POOL_ENDPOINT)
+    if response.status_code != 200:
+        raise SystemExit(f'{POOL_ENDPOINT} returned {response.status_code}: {response.text[:200]} '
+                         '(an admin session is required)')
+    return response.json()['data']
+
+
+def database_connections(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT count(*), count(*) FILTER (WHERE state = 'active') "
+                    'FROM pg_stat_activity WHERE datname = current_database()')
+        return cur.fetchone()
+
+
+async def sample_gauges(client, conn, stop, interval, timeline, start):
+    """Poll pool gauges (and server-side connections) while a level runs"""
+    while not stop.is_set():
+        data = await pool_telemetry(client)
+        sample = {'t': round(time.perf_counter() - start, 2), **data['gauges']}
+        if conn is not None:
+            sample['pg_connections'], sample['pg_active'] = await asyncio.to_thread(database_connections, conn)
+        timeline.append(sample)
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_level(client, concurrency, args, conn, rng):
+    await pool_telemetry(client, reset=True)
+    latencies, statuses, sequence = [], Counter(), [0]
+    deadline = time.perf_counter() + args.duration
+    stop = asyncio.Event()
+    timeline = []
+    start = time.perf_counter()
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            path, params = ENDPOINTS[args.endpoint](rng)
+            sequence[0] += 1
+            headers = default_headers(args.api_token, ip_index=sequence[0])
+            request_start = time.perf_counter()
+            try:
+                response = await client.get(path, params=params, headers=headers)
+                statuses[response.status_code] += 1
+                if response.status_code == 200:
+                    latencies.append((time.perf_counter() - request_start) * 1000)
+            except Exception as e:  # noqa: BLE001 - client-side failures are part of the result
+                statuses[type(e).__name__] += 1
+
+    sampler = asyncio.create_task(sample_gauges(client, conn, stop, args.sample_interval, timeline, start))
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await sampler
+    server = await pool_telemetry(client)
+
+    requests = sum(statuses.values())
+    ok = statuses.get(200, 0)
+    wait = server['acquireWaitMs']
+    return {
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 2),
+        'requests': requests,
+        'ok': ok,
+        'throughput_rps': round(ok / elapsed, 1),
+        'error_rate': round((requests - ok) / requests, 4) if requests else 0,
+        'statuses': {str(k): v for k, v in statuses.items()},
+        'latency_ms': summarize(latencies),
+        'pool': {
+            'config': server['config'],
+            'peaks': server['peaks'],
+            'acquisitions': server['acquisitions'],
+            'timeouts': server['timeouts'],
+            'errors': server['errors'],
+            'acquire_wait_mean_ms': round(wait['sumMs'] / wait['count'], 2) if wait['count'] else 0,
+            'acquire_wait_p95_ms': histogram_percentile(wait, 95),
+            'acquire_wait_p99_ms': histogram_percentile(wait, 99),
+            'acquire_wait_max_ms': wait['maxMs'],
+            'hold_mean_ms': round(server['holdMs']['sumMs'] / server['holdMs']['count'], 2)
+            if server['holdMs']['count'] else 0,
+            'acquire_wait_histogram': wait['buckets'],
+        },
+        'timeline': timeline,
+    }
+
+
+def conclusions(levels, args):
+    """Saturation point, error onset and the highest level that stayed healthy"""
+    if not levels:
+        return {}
+    pool = levels[0]['pool']['config']
+    budget = pool['connectionTimeoutMillis'] * args.wait_budget_fraction
+    best = max(levels, key=lambda level: level['throughput_rps'])
+    error_onset = next((level['concurrency'] for level in levels
+                        if level['pool']['timeouts'] or level['error_rate'] > args.max_error_rate), None)
+    healthy = [level['concurrency'] for level in levels
+               if not level['pool']['timeouts'] and level['error_rate'] <= args.max_error_rate
+               and level['pool']['acquire_wait_p95_ms'] <= budget]
+    saturation = None
+    for previous, level in zip(levels, levels[1:]):
+        if level['throughput_rps'] < previous['throughput_rps'] * (1 + args.min_gain):
+            saturation = previous['concurrency']
+            break
+    return {
+        'pool_max': pool['max'],
+        'connection_timeout_ms': pool['connectionTimeoutMillis'],
+        'peak_throughput_rps': best['throughput_rps'],
+        'peak_throughput_at': best['concurrency'],
+        'throughput_saturates_at': saturation,
+        'error_onset_at': error_onset,
+        'max_healthy_concurrency': max(healthy) if healthy else None,
+        'acquire_wait_budget_ms': budget,
+    }
+
+
+async def run(args, token):
+    rng = random.Random(args.seed)
+    conn = connect(args.database_url, autocommit=True) if args.database_url else None
+    levels = []
+    try:
+        async with async_http_client(args.base_url, args.api_token, token, max_connections=max(args.levels) + 4,
+                                     timeout=args.timeout) as client:
+            for concurrency in args.levels:
+                level = await run_level(client, concurrency, args, conn, rng)
+                levels.append(level)
+                print(f"  {concurrency:>4} clients: {level['throughput_rps']:>8} req/s  "
+                      f"p95 {level['latency_ms']['p95']:.0f}ms  "
+                      f"acquire p95 {level['pool']['acquire_wait_p95_ms']}ms  "
+                      f"timeouts {level['pool']['timeouts']}  errors {level['error_rate']:.1%}")
+                await asyncio.sleep(args.pause)
+        max_connections = None
+        if conn is not None:
+            with conn.cursor() as cur:
+                cur.execute('SHOW max_connections')
+                max_connections = int(cur.fetchone()[0])
+    finally:
+        if conn is not None:
+            conn.close()
+    return levels, max_connections
+
+
+def main():
+    parser = base_parser(__doc__.split('\n')[1])
+    parser.add_argument('--levels', type=int_list, default=int_list('5,10,15,20,25,30,40,60,80'),
+                        help='Comma-separated concurrency levels')
+    parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='devices', help='Endpoint to load')
+    parser.add_argument('--duration', type=float, default=15, help='Seconds per level')
+    parser.add_argument('--pause', type=float, default=3, help='Seconds to let the pool settle between levels')
+    parser.add_argument('--sample-interval', type=float, default=0.5, help='Gauge polling interval (s)')
+    parser.add_argument('--timeout', type=float, default=30, help='Client request timeout (s)')
+    parser.add_argument('--max-error-rate', type=float, default=0.0, help='Error rate still counted as healthy')
+    parser.add_argument('--wait-budget-fraction', type=float, default=0.25,
+                        help='Healthy if p95 acquire wait stays below this fraction of connectionTimeoutMillis')
+    parser.add_argument('--min-gain', type=float, default=0.05,
+                        help='Throughput gain below which the next level counts as saturated')
+    parser.add_argument('--seed', type=int, default=31, help='Random seed')
+    args = parser.parse_args()
+
+    token = session_login(args.base_url, args.email, args.password)
+    print(f'Ramping {args.endpoint} through {args.levels} clients, {args.duration:g}s each')
+    levels, max_connections = asyncio.run(run(args, token))
+    summary = conclusions(levels, args)
+    summary['postgres_max_connections'] = max_connections
+
+    rows = [{
+        'clients': level['concurrency'],
+        'rps': level['throughput_rps'],
+        'p50_ms': level['latency_ms']['p50'],
+        'p95_ms': level['latency_ms']['p95'],
+        'wait_mean': level['pool']['acquire_wait_mean_ms'],
+        'wait_p95': level['pool']['acquire_wait_p95_ms'],
+        'peak_in_use': level['pool']['peaks']['inUse'],
+        'peak_waiting': level['pool']['peaks']['waiting'],
+        'timeouts': level['pool']['timeouts'],
+        'error_rate': level['error_rate'],
+    } for level in levels]
+    print()
+    print_table(rows, ['clients', 'rps', 'p50_ms', 'p95_ms', 'wait_mean', 'wait_p95', 'peak_in_use',
+                       'peak_waiting', 'timeouts', 'error_rate'])
+    print()
+    for key, value in summary.items():
+        print(f'{key}: {value}')
+
+    write_report(args.output_dir, 'pool-stress', {
+        'parameters': {k: v for k, v in vars(args).items() if k not in ('password', 'api_token', 'database_url')},
+        'summary': summary,
+        'levels': levels,
+    }, args.label)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+/**
+ * Rate Limit Store Runner
+ * Drives src/lib/rateLimitMiddleware.ts in-process for rate_limit_harness.py
+ *
+ * Usage:
+ *   NODE_OPTIONS=--expose-gc npx ts-node --transpile-only \
+ *     --compiler-options '{"module":"commonjs","moduleResolution":"node"}' \
+ *     testing/perf/rate-limit-runner.ts <plan.json>
+ *
+ * For each store size in the plan the store is grown with distinct client
+ * identifiers (the ip:path keys the route limiter uses), then the runner
+ * samples the cost of a check against an existing key, a check that inserts
+ * a new key, the route limiter (applyRateLimit's createRateLimiter path) and
+ * one cleanup sweep. Heap is measured after a forced GC when --expose-gc is
+ * available. Prints a single JSON line with the raw samples (microseconds).
+ */
+
+import { readFileSync } from 'fs'
+import { NextRequest } from 'next/server'
+import {
+  RATE_LIMITS,
+  checkRateLimit,
+  cleanupRateLimitStore,
+  getRateLimitStoreStats,
+  rateLimiters,
+} from '../../src/lib/rateLimitMiddleware'
+
+interface Plan {
+  sizes: number[]
+  samples: number
+  path: string
+  seed: number
+}
+
+interface SizeResult {
+  size: number
+  entries: number
+  heap_used_mb: number
+  rss_mb: number
+  grow_ms: number
+  check_existing_us: number[]
+  check_new_us: number[]
+  route_limiter_us: number[]
+  route_limited: number
+  cleanup_ms: number
+}
+
+const gc = (globalThis as { gc?: () => void }).gc
+
+function ip(index: number): string {
+  return `10.${(index >> 16) & 0xff}.${(index >> 8) & 0xff}.${index & 0xff}`
+}
+
+// Identifiers beyond the 10.0.0.0/8 range stay distinct for very large stores
+function identifier(index: number, path: string): string {
+  return `${index >= 2 ** 24 ? `${index}.` : ''}${ip(index)}:${path}`
+}
+
+// Small deterministic PRNG so samples are repeatable for a given seed
+function random(seed: number): () => number {
+  let state = seed >>> 0
+  return () => {
+    state = (state * 1664525 + 1013904223) >>> 0
+    return state / 2 ** 32
+  }
+}
+
+function elapsedUs(start: bigint): number {
+  return Number(process.hrtime.bigint() - start) / 1e3
+}
+
+function memory(): { heap_used_mb: number; rss_mb: number } {
+  gc?.()
+  const usage = process.memoryUsage()
+  return {
+    heap_used_mb: Math.round((usage.heapUsed / 1024 / 1024) * 100) / 100,
+    rss_mb: Math.round((usage.rss / 1024 / 1024) * 100) / 100,
+  }
+}
+
+function check(id: string) {
+  return checkRateLimit({
+    identifier: id,
+    maxAttempts: RATE_LIMITS.api.max,
+    windowMs: RATE_LIMITS.api.windowMs,
+  })
+}
+
+async function runSize(plan: Plan, size: number, next: { index: number }): Promise<SizeResult> {
+  const rand = random(plan.seed + size)
+
+  const growStart = process.hrtime.bigint()
+  while (next.index < size) {
+    check(identifier(next.index++, plan.path))
+  }
+  const growMs = elapsedUs(growStart) / 1e3
+  const after = memory()
+
+  const result: SizeResult = {
+    size,
+    entries: getRateLimitStoreStats().entries,
+    ...after,
+    grow_ms: Math.round(growMs * 10) / 10,
+    check_existing_us: [],
+    check_new_us: [],
+    route_limiter_us: [],
+    route_limited: 0,
+    cleanup_ms: 0,
+  }
+
+  for (let i = 0; i < plan.samples && size > 0; i++) {
+    const id = identifier(Math.floor(rand() * size), plan.path)
+    const start = process.hrtime.bigint()
+    check(id)
+    result.check_existing_us.push(elapsedUs(start))
+  }
+
+  for (let i = 0; i < plan.samples; i++) {
+    const id = identifier(next.index++, plan.path)
+    const start = process.hrtime.bigint()
+    check(id)
+    result.check_new_us.push(elapsedUs(start))
+  }
+
+  for (let i = 0; i < plan.samples; i++) {
+    const request = new NextRequest(`http://localhost${plan.path}`, {
+      headers: { 'x-forwarded-for': ip(Math.floor(rand() * Math.max(size, 1))) },
+    })
+    const start = process.hrtime.bigint()
+    const limited = await rateLimiters.api(request)
+    result.route_limiter_us.push(elapsedUs(start))
+    if (limited) {
+      result.route_limited++
+    }
+  }
+
+  // Nothing has expired yet, so this is the pure scan the 5-minute timer pays
+  const sweepStart = process.hrtime.bigint()
+  cleanupRateLimitStore()
+  result.cleanup_ms = Math.round((elapsedUs(sweepStart) / 1e3) * 100) / 100
+
+  return result
+}
+
+/**
+ * Cost of a sweep that actually deletes: fill with entries that expire at once
+ */
+async function expiredSweep(
+  count: number
+): Promise<{ entries: number; removed: number; ms: number }> {
+  for (let i = 0; i < count; i++) {
+    checkRateLimit({ identifier: `expire:${ip(i)}`, maxAttempts: 1, windowMs: 1 })
+  }
+  await new Promise((resolve) => setTimeout(resolve, 5))
+  const entries = getRateLimitStoreStats().entries
+  const start = process.hrtime.bigint()
+  const removed = cleanupRateLimitStore()
+  return { entries, removed, ms: Math.round((elapsedUs(start) / 1e3) * 100) / 100 }
+}
+
+async function main() {
+  const [planPath] = process.argv.slice(2)
+  if (!planPath) {
+    console.error('Usage: rate-limit-runner.ts <plan.json>')
+    process.exit(2)
+  }
+
+  const plan = JSON.parse(readFileSync(planPath, 'utf8')) as Plan
+  const baseline = memory()
+
+  const next = { index: 0 }
+  const sizes: SizeResult[] = []
+  for (const size of [...plan.sizes].sort((a, b) => a - b)) {
+    sizes.push(await runSize(plan, size, next))
+  }
+  const expired = await expiredSweep(Math.max(...plan.sizes, 1))
+
+  console.log(JSON.stringify({ gc_available: Boolean(gc), baseline, sizes, expired }))
+  // The store's cleanup timer would otherwise keep the process alive
+  process.exit(0)
+}
+
+main().catch((error) => {
+  console.error(error)
+  process.exit(1)
+})
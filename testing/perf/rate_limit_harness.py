@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Rate limiter accuracy, overhead and memory harness
+
+Checks the limits in src/lib/rateLimitMiddleware.ts against RATE_LIMITS
+(parsed from the source) under concurrent bursts:
+  api     GET /api/devices?limit=0 from --identifiers client IPs; the route
+          limiter (applyRateLimit 'api') runs before validation, so allowed
+          requests end in a cheap 400 and the database is not involved
+  tokens  the same route from ONE client IP with --identifiers API tokens;
+          the limiter keys on IP + path, so the tokens share one bucket
+  auth    credentials sign-in attempts, keyed on IP + email (5 / 15 min)
+Each identifier sends --burst x its limit at once; the harness reports how
+many got through per identifier against the configured maximum, 429 header
+consistency, and latency of allowed vs limited responses.
+
+Store growth is measured twice: over HTTP (--spread distinct client IPs,
+server RSS sampled as identifiers accumulate) and in-process with
+rate-limit-runner.ts (--store-sizes entries: heap per entry, check latency
+against existing/new keys, route limiter latency and cleanup sweep time).
+
+Limits are 15-minute windows per key, so every run uses a fresh random
+address block (--ip-offset) instead of waiting for old keys to expire.
+
+Usage:
+  python3 testing/perf/rate_limit_harness.py --scenarios api,tokens,auth --identifiers 200 --concurrency 64
+  python3 testing/perf/rate_limit_harness.py --spread 100000 --store-sizes 0,100000,250000,500000
+  python3 testing/perf/rate_limit_harness.py --in-process-only --store-sizes 0,1000000
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import tempfile
+import time
+from collections import Counter
+
+from common import (
+    NODE_RUNNER,
+    REPO_ROOT,
+    ServerMemorySampler,
+    async_http_client,
+    base_parser,
+    client_ip,
+    int_list,
+    print_table,
+    summarize,
+    timed,
+    write_report,
+)
+
+RUNNER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rate-limit-runner.ts')
+LIMITER_SOURCE = os.path.join(REPO_ROOT, 'src', 'lib', 'rateLimitMiddleware.ts')
+PROBE_PATH = '/api/devices'
+SCENARIOS = ['api', 'tokens', 'auth']
+
+
+def read_rate_limits(path=LIMITER_SOURCE):
+    """RATE_LIMITS from the TypeScript source: {name: {'window_ms', 'max'}}"""
+    with open(path) as f:
+        source = f.read()
+    limits = {}
+    for name, window, maximum in re.findall(r'(\w+): \{\s*windowMs: ([\d\s*]+),[^\n]*\n\s*max: (\d+)', source):
+        limits[name] = {'window_ms': math.prod(int(part) for part in window.split('*')), 'max': int(maximum)}
+    return limits
+
+
+# ----------------------------------------------------------------------------
+# Bursts
+# ----------------------------------------------------------------------------
+
+def burst_requests(scenario, identifiers, per_identifier, ip_offset, run_id):
+    """(identifier, method, path, headers, json body) for one burst, interleaved across identifiers"""
+    requests = []
+    for n in range(per_identifier):
+        for i in range(identifiers):
+            if scenario == 'api':
+                headers = {'X-Forwarded-For': client_ip(ip_offset + i)}
+                requests.append((i, 'GET', f'{PROBE_PATH}?limit=0', headers, None))
+            elif scenario == 'tokens':
+                headers = {'X-Forwarded-For': client_ip(ip_offset),
+                           'Authorization': f'Bearer moss_perf_{run_id}_{i:05d}'}
+                requests.append((i, 'GET', f'{PROBE_PATH}?limit=0', headers, None))
+            else:
+                # Emails share 16 addresses; keys are ip:email, so each email is still its own bucket
+                body = {'email': f'perf-ratelimit-{run_id}-{i}@example.test', 'password': f'wrong-{n}'}
+                requests.append((i, 'POST', '/api/auth/callback/credentials',
+                                 {'X-Forwarded-For': client_ip(ip_offset + i % 16)}, body))
+    return requests
+
+
+async def fire(base_url, requests, concurrency, timeout):
+    results = []
+    queue = asyncio.Queue()
+    for item in requests:
+        queue.put_nowait(item)
+
+    async with async_http_client(base_url, max_connections=concurrency, timeout=timeout) as client:
+        async def worker():
+            while not queue.empty():
+                identifier, method, path, headers, body = queue.get_nowait()
+                with timed() as t:
+                    try:
+                        response = await client.request(method, path, headers=headers, json=body)
+                        status, limit_header = response.status_code, response.headers.get('x-ratelimit-limit')
+                        retry_after = response.headers.get('retry-after')
+                    except Exception as e:  # noqa: BLE001 - transport errors are reported, not fatal
+                        status, limit_header, retry_after = type(e).__name__, None, None
+                results.append({'identifier': identifier, 'status': status, 'ms': t['ms'],
+                                'limit_header': limit_header, 'retry_after': retry_after})
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+def burst_summary(scenario, results, elapsed, expected, identifiers, tolerance):
+    allowed = Counter()
+    for r in results:
+        if r['status'] != 429 and isinstance(r['status'], int):
+            allowed[r['identifier']] += 1
+    # Tokens all arrive from one IP: the limiter should see a single bucket
+    buckets = 1 if scenario == 'tokens' else identifiers
+    per_bucket = [sum(allowed.values())] if scenario == 'tokens' else [allowed[i] for i in range(identifiers)]
+    errors = [d for d in per_bucket if abs(d - expected) > tolerance]
+    limited = [r for r in results if r['status'] == 429]
+    return {
+        'requests': len(results),
+        'elapsed_s': round(elapsed, 2),
+        'rps': round(len(results) / elapsed, 1),
+        'buckets': buckets,
+        'expected_per_bucket': expected,
+        'allowed_per_bucket': summarize(per_bucket),
+        'buckets_over_limit': sum(1 for d in per_bucket if d > expected + tolerance),
+        'buckets_under_limit': sum(1 for d in per_bucket if d < expected - tolerance),
+        'accurate': not errors,
+        'limited': len(limited),
+        'statuses': dict(Counter(str(r['status']) for r in results)),
+        'limit_headers': sorted({r['limit_header'] for r in limited if r['limit_header']}),
+        'retry_after_s': summarize([float(r['retry_after']) for r in limited if r['retry_after']]),
+        'allowed_latency_ms': summarize([r['ms'] for r in results if r['status'] != 429]),
+        'limited_latency_ms': summarize([r['ms'] for r in limited]),
+    }
+
+
+# ----------------------------------------------------------------------------
+# Store growth over HTTP
+# ----------------------------------------------------------------------------
+
+async def spread(args, ip_offset):
+    """One request from each of --spread new client IPs, sampling server RSS per checkpoint"""
+    checkpoints = []
+    step = max(args.spread // 10, 1)
+    with ServerMemorySampler(args.server_pid) as sampler:
+        for start in range(0, args.spread, step):
+            batch = [(i, 'GET', f'{PROBE_PATH}?limit=0', {'X-Forwarded-For': client_ip(ip_offset + i)}, None)
+                     for i in range(start, min(start + step, args.spread))]
+            results, elapsed = await fire(args.base_url, batch, args.concurrency, args.timeout)
+            rss = sampler.samples[-1][1] if sampler.samples else None
+            checkpoints.append({
+                'identifiers': start + len(batch),
+                'rss_mb': round(rss / 1024, 1) if rss else None,
+                'rps': round(len(results) / elapsed, 1),
+                'p95_ms': summarize([r['ms'] for r in results])['p95'],
+                'limited': sum(1 for r in results if r['status'] == 429),
+            })
+            print(f"  spread {checkpoints[-1]['identifiers']:>8,} identifiers: rss {checkpoints[-1]['rss_mb']} MB, "
+                  f"p95 {checkpoints[-1]['p95_ms']:.1f}ms")
+    growth = None
+    measured = [c for c in checkpoints if c['rss_mb'] is not None]
+    if sampler.samples and measured:
+        growth = round((measured[-1]['rss_mb'] - sampler.baseline_mb) / measured[-1]['identifiers'] * 10000, 2)
+    return {'checkpoints': checkpoints, 'memory': sampler.summary(), 'rss_mb_per_10k_identifiers': growth}
+
+
+# ----------------------------------------------------------------------------
+# In-process store
+# ----------------------------------------------------------------------------
+
+def run_store(sizes, samples, seed, timeout=1800):
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump({'sizes': sizes, 'samples': samples, 'path': PROBE_PATH, 'seed': seed}, f)
+        plan_path = f.name
+    env = {**os.environ, 'NODE_OPTIONS': f"{os.environ.get('NODE_OPTIONS', '')} --expose-gc".strip()}
+    try:
+        proc = subprocess.run(NODE_RUNNER + [RUNNER, plan_path], cwd=REPO_ROOT, capture_output=True, text=True,
+                              timeout=timeout, env=env)
+    finally:
+        os.unlink(plan_path)
+    if proc.returncode != 0:
+        raise SystemExit(f'rate-limit-runner failed:\n{proc.stderr[-2000:]}')
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def store_summary(raw):
+    rows = []
+    first = raw['sizes'][0]
+    for size in raw['sizes']:
+        added = size['entries'] - first['entries']
+        rows.append({
+            'size': size['size'],
+            'entries': size['entries'],
+            'heap_mb': size['heap_used_mb'],
+            'rss_mb': size['rss_mb'],
+            'bytes_per_entry': round((size['heap_used_mb'] - first['heap_used_mb']) * 1024 * 1024 / added)
+            if added > 0 else None,
+            'grow_ms': size['grow_ms'],
+            'check_existing_us': summarize(size['check_existing_us']),
+            'check_new_us': summarize(size['check_new_us']),
+            'route_limiter_us': summarize(size['route_limiter_us']),
+            'route_limited': size['route_limited'],
+            'cleanup_scan_ms': size['cleanup_ms'],
+        })
+    return rows
+
+
+def advice(store_rows, expired, limits, project):
+    notes = []
+    sized = [row for row in store_rows if row['bytes_per_entry']]
+    if sized:
+        per_entry = sized[-1]['bytes_per_entry']
+        scan = store_rows[-1]['cleanup_scan_ms'] / max(store_rows[-1]['entries'], 1) * project
+        notes.append(f'~{per_entry} B per key: {project:,} live keys cost ~{per_entry * project / 1024 / 1024:,.0f} MB '
+                     f'and a ~{scan:,.0f} ms cleanup scan that blocks the event loop every 5 minutes')
+        window_min = limits.get('api', {}).get('window_ms', 900000) / 60000
+        notes.append(f'Keys live for the {window_min:.0f}-minute window plus up to 5 minutes before the sweep, '
+                     'and there is no size cap: a spray of spoofed X-Forwarded-For values grows the store unbounded')
+        if per_entry * project > 256 * 1024 * 1024 or scan > 50:
+            notes.append('Bound the store (LRU/max entries, or drop keys at zero remaining budget) or move it to '
+                         'Redis as suggested in rateLimitMiddleware.ts')
+    if expired['ms'] > 50:
+        notes.append(f"Sweeping {expired['removed']:,} expired keys took {expired['ms']} ms in one tick; "
+                     'incremental cleanup would avoid the pause')
+    notes.append('The store is per process: with N app instances each client gets N x the configured limit')
+    return notes
+
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+def main():
+    parser = base_parser(__doc__.split('\n')[1], database=False)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"Comma-separated bursts to run ({', '.join(SCENARIOS)}; empty for none)")
+    parser.add_argument('--identifiers', type=int, default=100, help='Client IPs / tokens / emails per burst')
+    parser.add_argument('--burst', type=float, default=1.5, help='Requests per identifier as a multiple of its limit')
+    parser.add_argument('--tolerance', type=int, default=0, help='Allowed deviation from the limit per bucket')
+    parser.add_argument('--concurrency', type=int, default=64, help='Concurrent requests')
+    parser.add_argument('--timeout', type=float, default=30, help='Request timeout (s)')
+    parser.add_argument('--spread', type=int, default=0, help='Distinct client IPs to add over HTTP (0 to skip)')
+    parser.add_argument('--store-sizes', type=int_list, default=int_list('0,10000,100000,250000,500000'),
+                        help='In-process store sizes (empty to skip)')
+    parser.add_argument('--samples', type=int, default=5000, help='In-process samples per measurement')
+    parser.add_argument('--project', type=int, default=1000000, help='Live keys to project memory/sweep cost for')
+    parser.add_argument('--in-process-only', action='store_true', help='Skip all HTTP phases')
+    parser.add_argument('--ip-offset', type=int, help='First client address index (default: random fresh block)')
+    parser.add_argument('--seed', type=int, default=35, help='Random seed')
+    args = parser.parse_args()
+
+    limits = read_rate_limits()
+    ip_offset = args.ip_offset if args.ip_offset is not None else random.randrange(0, 256 ** 3 - 10 ** 6)
+    run_id = f'{int(time.time()):x}'
+    scenarios = [] if args.in_process_only else [s for s in args.scenarios.split(',') if s]
+    report = {
+        'parameters': {k: v for k, v in vars(args).items() if k not in ('password', 'api_token')},
+        'ip_offset': ip_offset,
+        'rate_limits': limits,
+        'bursts': {},
+    }
+
+    rows = []
+    for scenario in scenarios:
+        config = limits['auth' if scenario == 'auth' else 'api']
+        per_identifier = math.ceil(config['max'] * args.burst)
+        requests = burst_requests(scenario, args.identifiers, per_identifier, ip_offset, run_id)
+        results, elapsed = asyncio.run(fire(args.base_url, requests, args.concurrency, args.timeout))
+        summary = burst_summary(scenario, results, elapsed, config['max'], args.identifiers, args.tolerance)
+        report['bursts'][scenario] = summary
+        rows.append({
+            'scenario': scenario,
+            'buckets': summary['buckets'],
+            'limit': config['max'],
+            'allowed_min': summary['allowed_per_bucket']['min'],
+            'allowed_max': summary['allowed_per_bucket']['max'],
+            'over': summary['buckets_over_limit'],
+            'under': summary['buckets_under_limit'],
+            'accurate': summary['accurate'],
+            'allowed_p50_ms': summary['allowed_latency_ms']['p50'],
+            'limited_p50_ms': summary['limited_latency_ms']['p50'],
+            'rps': summary['rps'],
+        })
+        ip_offset += args.identifiers
+    if rows:
+        print()
+        print_table(rows, ['scenario', 'buckets', 'limit', 'allowed_min', 'allowed_max', 'over', 'under', 'accurate',
+                           'allowed_p50_ms', 'limited_p50_ms', 'rps'])
+
+    if args.spread and not args.in_process_only:
+        report['spread'] = asyncio.run(spread(args, ip_offset))
+
+    if args.store_sizes:
+        raw = run_store(args.store_sizes, args.samples, args.seed)
+        store_rows = store_summary(raw)
+        report['store'] = {'gc_available': raw['gc_available'], 'baseline': raw['baseline'], 'sizes': store_rows,
+                           'expired_sweep': raw['expired']}
+        print()
+        print_table([{
+            'entries': row['entries'],
+            'heap_mb': row['heap_mb'],
+            'bytes_per_entry': row['bytes_per_entry'],
+            'existing_p50_us': row['check_existing_us']['p50'],
+            'new_p50_us': row['check_new_us']['p50'],
+            'route_p50_us': row['route_limiter_us']['p50'],
+            'route_p99_us': row['route_limiter_us']['p99'],
+            'cleanup_ms': row['cleanup_scan_ms'],
+        } for row in store_rows], ['entries', 'heap_mb', 'bytes_per_entry', 'existing_p50_us', 'new_p50_us',
+                                   'route_p50_us', 'route_p99_us', 'cleanup_ms'])
+        print(f"\nExpired sweep: {raw['expired']['removed']:,} keys removed in {raw['expired']['ms']} ms")
+        report['advice'] = advice(store_rows, raw['expired'], limits, args.project)
+        print()
+        for note in report['advice']:
+            print(f'- {note}')
+
+    write_report(args.output_dir, 'rate-limit', report, args.label)
+
+
+if __name__ == '__main__':
+    main()
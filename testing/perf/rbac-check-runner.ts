@@ -0,0 +1,246 @@
+/**
+ * RBAC Permission Check Runner
+ * Drives src/lib/rbac.ts in-process for rbac_benchmark.py
+ *
+ * Usage:
+ *   npx ts-node --transpile-only --compiler-options '{"module":"commonjs","moduleResolution":"node"}' \
+ *     testing/perf/rbac-check-runner.ts <plan.json>
+ *
+ * The plan (written by rbac_benchmark.py) lists the checks to run and the
+ * roles/permissions/users to churn. Every pool query issued while a check runs
+ * is counted, so each phase reports latency and queries per check. Prints a
+ * single JSON line with the raw per-check samples.
+ */
+
+import { readFileSync } from 'fs'
+import { closePool, getPool, query } from '../../src/lib/db'
+import {
+  checkPermission,
+  checkPermissionWithLocation,
+  clearPermissionCache,
+  invalidateRoleCache,
+  invalidateUserCache,
+} from '../../src/lib/rbac'
+import type { ObjectType, PermissionAction } from '../../src/types'
+
+interface Check {
+  userId: string
+  action: PermissionAction
+  objectType: ObjectType
+  objectId?: string
+  locationId?: string
+}
+
+interface ChurnPlan {
+  assignEvery: number
+  roleEvery: number
+  roles: string[]
+  permissions: { id: string; objectType: ObjectType; action: PermissionAction }[]
+  affectedUsers: Record<string, string[]>
+}
+
+interface Plan {
+  phases: ('cold' | 'warm' | 'churn')[]
+  checks: Check[]
+  churn: ChurnPlan
+  seed: number
+}
+
+interface PhaseResult {
+  latencies_ms: number[]
+  queries: number[]
+  outcomes: string // '1' granted / '0' denied per check, in plan order
+  errors: number
+  assignment_changes: number
+  role_changes: number
+  stale_checks: number
+  stale_grants: number
+  churn_ms: number[]
+}
+
+let queryCount = 0
+let counting = true
+
+function countQueries(): void {
+  const pool = getPool()
+  const poolQuery = pool.query.bind(pool) as (...args: unknown[]) => unknown
+  pool.query = ((...args: unknown[]) => {
+    if (counting) {
+      queryCount++
+    }
+    return poolQuery(...args)
+  }) as typeof pool.query
+}
+
+// Small deterministic PRNG so churn is repeatable for a given seed
+function random(seed: number): () => number {
+  let state = seed >>> 0
+  return () => {
+    state = (state * 1664525 + 1013904223) >>> 0
+    return state / 2 ** 32
+  }
+}
+
+async function runCheck(check: Check): Promise<boolean> {
+  const result = check.locationId
+    ? await checkPermissionWithLocation(
+        check.userId,
+        check.action,
+        check.objectType,
+        check.locationId,
+        check.objectId
+      )
+    : await checkPermission(check.userId, check.action, check.objectType, check.objectId)
+  return result.granted
+}
+
+/**
+ * Whether the database (not the cache) grants an action to a user
+ */
+async function grantedInDatabase(
+  userId: string,
+  objectType: ObjectType,
+  action: PermissionAction
+): Promise<boolean> {
+  const result = await query<{ granted: boolean }>(
+    `SELECT EXISTS (
+       SELECT 1
+       FROM role_assignments ra
+       JOIN role_hierarchy_permissions rhp ON rhp.role_id = ra.role_id
+       WHERE (ra.person_id = $1 OR ra.group_id IN (
+           SELECT group_id FROM group_members WHERE person_id = $1
+         ))
+         AND rhp.object_type = $2
+         AND rhp.action = $3
+     ) AS granted`,
+    [userId, objectType, action]
+  )
+  return result.rows[0].granted
+}
+
+async function changeAssignment(plan: Plan, rand: () => number): Promise<void> {
+  const userId = plan.checks[Math.floor(rand() * plan.checks.length)].userId
+  const roleId = plan.churn.roles[Math.floor(rand() * plan.churn.roles.length)]
+  await query(
+    `UPDATE role_assignments SET role_id = $2, updated_at = NOW()
+     WHERE id = (SELECT id FROM role_assignments WHERE person_id = $1 LIMIT 1)`,
+    [userId, roleId]
+  )
+  invalidateUserCache(userId)
+}
+
+async function changeRolePermission(
+  plan: Plan,
+  rand: () => number,
+  result: PhaseResult
+): Promise<void> {
+  const roleId = plan.churn.roles[Math.floor(rand() * plan.churn.roles.length)]
+  const permission = plan.churn.permissions[Math.floor(rand() * plan.churn.permissions.length)]
+
+  const removed = await query(
+    'DELETE FROM role_permissions WHERE role_id = $1 AND permission_id = $2',
+    [roleId, permission.id]
+  )
+  if (!removed.rowCount) {
+    await query('INSERT INTO role_permissions (role_id, permission_id) VALUES ($1, $2)', [
+      roleId,
+      permission.id,
+    ])
+  }
+  invalidateRoleCache(roleId)
+
+  // Users holding this role or a descendant may still see the old answer
+  for (const userId of (plan.churn.affectedUsers[roleId] || []).slice(0, 3)) {
+    const cached = await checkPermission(userId, permission.action, permission.objectType)
+    const actual = await grantedInDatabase(userId, permission.objectType, permission.action)
+    result.stale_checks++
+    if (cached.granted !== actual) {
+      result.stale_grants++
+    }
+  }
+}
+
+async function runPhase(plan: Plan, phase: 'cold' | 'warm' | 'churn'): Promise<PhaseResult> {
+  const rand = random(plan.seed)
+  const result: PhaseResult = {
+    latencies_ms: [],
+    queries: [],
+    outcomes: '',
+    errors: 0,
+    assignment_changes: 0,
+    role_changes: 0,
+    stale_checks: 0,
+    stale_grants: 0,
+    churn_ms: [],
+  }
+
+  clearPermissionCache()
+  if (phase !== 'cold') {
+    // Prime the cache with every user/check once
+    counting = false
+    for (const check of plan.checks) {
+      await runCheck(check)
+    }
+    counting = true
+  }
+
+  for (let i = 0; i < plan.checks.length; i++) {
+    if (phase === 'cold') {
+      clearPermissionCache()
+    }
+    if (phase === 'churn') {
+      const churnStart = process.hrtime.bigint()
+      counting = false
+      if (plan.churn.assignEvery && i % plan.churn.assignEvery === 0) {
+        await changeAssignment(plan, rand)
+        result.assignment_changes++
+      }
+      if (plan.churn.roleEvery && i % plan.churn.roleEvery === 0) {
+        await changeRolePermission(plan, rand, result)
+        result.role_changes++
+      }
+      counting = true
+      result.churn_ms.push(Number(process.hrtime.bigint() - churnStart) / 1e6)
+    }
+
+    const before = queryCount
+    const start = process.hrtime.bigint()
+    try {
+      result.outcomes += (await runCheck(plan.checks[i])) ? '1' : '0'
+    } catch {
+      result.outcomes += '0'
+      result.errors++
+    }
+    result.latencies_ms.push(Number(process.hrtime.bigint() - start) / 1e6)
+    result.queries.push(queryCount - before)
+  }
+
+  return result
+}
+
+async function main() {
+  const [planPath] = process.argv.slice(2)
+  if (!planPath) {
+    console.error('Usage: rbac-check-runner.ts <plan.json>')
+    process.exit(2)
+  }
+
+  const plan = JSON.parse(readFileSync(planPath, 'utf8')) as Plan
+  countQueries()
+
+  const phases: Record<string, PhaseResult> = {}
+  try {
+    for (const phase of plan.phases) {
+      phases[phase] = await runPhase(plan, phase)
+    }
+  } finally {
+    await closePool()
+  }
+
+  console.log(JSON.stringify({ phases }))
+}
+
+main().catch((error) => {
+  console.error(error)
+  process.exit(1)
+})
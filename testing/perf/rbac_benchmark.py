@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+RBAC permission-check benchmark
+
+Seeds thousands of users with role assignments on deep role-inheritance chains
+(roles.parent_role_id, migration 007), group-inherited roles, object-level
+permissions and location-scoped assignments, then drives checkPermission /
+checkPermissionWithLocation from src/lib/rbac.ts in a Node process
+(rbac-check-runner.ts) and measures, per chain depth:
+  cold   permission cache cleared before every check
+  warm   cache primed with every user first
+  churn  warm, with role-assignment changes (invalidateUserCache) and role
+         permission changes (invalidateRoleCache) interleaved with checks
+
+For every check the runner counts the pool queries it issued. Churn also
+compares cached answers with the database after each role change, which shows
+whether invalidateRoleCache reaches users and child roles that inherit it.
+Outcomes are compared with a Python model of the expected grants, so the
+10-level recursion cap in getRoleHierarchy/role_hierarchy_permissions shows up
+as missing inherited permissions on deeper chains.
+
+Usage:
+  python3 testing/perf/rbac_benchmark.py --users 5000 --depths 2,6,12
+  python3 testing/perf/rbac_benchmark.py --checks 20000 --active-users 2000 --assign-every 10
+  python3 testing/perf/rbac_benchmark.py --cleanup
+"""
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+
+from common import (
+    NODE_RUNNER,
+    PERF_TAG,
+    REPO_ROOT,
+    base_parser,
+    connect,
+    copy_rows,
+    int_list,
+    print_table,
+    summarize,
+    write_report,
+)
+from fixtures import PEOPLE_COLUMNS, new_id, people_rows
+
+NAME_PREFIX = f'{PERF_TAG}rbac-'
+RUNNER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rbac-check-runner.ts')
+ACTIONS = ['view', 'edit', 'delete', 'manage_permissions']
+# Recursion limit in the role_hierarchy_permissions view (rt.depth < 10)
+HIERARCHY_CAP = 10
+
+
+# ----------------------------------------------------------------------------
+# Seeding
+# ----------------------------------------------------------------------------
+
+def build_model(depth, args, rng):
+    """Generate all rows plus the in-memory model needed to predict grants"""
+    object_types = [f'perf_rbac_type_{k}' for k in range(args.object_types)]
+    permissions = [(new_id(rng), f'{NAME_PREFIX}{t}-{a}', t, a) for t in object_types for a in ACTIONS]
+    locations = [(new_id(rng), f'{NAME_PREFIX}loc-{i}', 'office') for i in range(args.locations)]
+
+    chains, roles, role_permissions = [], [], []
+    for c in range(args.chains):
+        chain, parent = [], None
+        for d in range(depth):
+            role_id = new_id(rng)
+            roles.append((role_id, f'{NAME_PREFIX}c{c}-d{d}', parent))
+            grants = rng.sample(permissions, min(args.perms_per_role, len(permissions)))
+            role_permissions += [(role_id, p[0]) for p in grants]
+            chain.append({'id': role_id, 'grants': {(p[2], p[3]) for p in grants}})
+            parent = role_id
+        chains.append(chain)
+
+    people = list(people_rows(NAME_PREFIX, 0, args.users, rng))
+    user_ids = [p[0] for p in people]
+    groups = [(new_id(rng), f'{NAME_PREFIX}group-{g}', 'custom') for g in range(max(1, args.users // 50))]
+    members = set()
+    for user_id in user_ids:
+        for group in rng.sample(groups, min(args.groups_per_user, len(groups))):
+            members.add((group[0], user_id))
+
+    def pick_role():
+        chain_index = rng.randrange(len(chains))
+        # Bias towards the deep end where inheritance is most expensive
+        role_index = depth - 1 - min(depth - 1, int(depth * rng.random() ** 2))
+        return chain_index, role_index
+
+    assignments, assignment_locations = [], []
+    user_roles = {user_id: [] for user_id in user_ids}
+    user_scopes = {user_id: set() for user_id in user_ids}
+    for user_id in user_ids:
+        for _ in range(args.assignments_per_user):
+            chain_index, role_index = pick_role()
+            assignment_id = new_id(rng)
+            scoped = rng.random() < args.location_scoped
+            assignments.append((assignment_id, chains[chain_index][role_index]['id'], user_id, None,
+                                'location' if scoped else 'global'))
+            user_roles[user_id].append((chain_index, role_index))
+            if scoped:
+                for location in rng.sample(locations, rng.randint(1, min(3, len(locations)))):
+                    assignment_locations.append((assignment_id, location[0]))
+                    user_scopes[user_id].add(location[0])
+    group_roles = {}
+    for group in groups:
+        chain_index, role_index = pick_role()
+        assignments.append((new_id(rng), chains[chain_index][role_index]['id'], None, group[0], 'global'))
+        group_roles[group[0]] = (chain_index, role_index)
+    for group_id, user_id in members:
+        user_roles[user_id].append(group_roles[group_id])
+
+    object_permissions, user_objects = [], {user_id: [] for user_id in user_ids}
+    for user_id in user_ids:
+        for _ in range(args.object_perms):
+            grant = (rng.choice(object_types), new_id(rng), rng.choice(ACTIONS))
+            object_permissions.append((new_id(rng), user_id, grant[0], grant[1], grant[2]))
+            user_objects[user_id].append(grant)
+
+    return {
+        'permissions': permissions, 'locations': locations, 'roles': roles, 'role_permissions': role_permissions,
+        'people': people, 'groups': groups, 'members': sorted(members), 'assignments': assignments,
+        'assignment_locations': assignment_locations, 'object_permissions': object_permissions,
+        'chains': chains, 'user_roles': user_roles, 'user_scopes': user_scopes, 'user_objects': user_objects,
+        'object_types': object_types,
+    }
+
+
+def seed(conn, model):
+    copy_rows(conn, 'locations', ['id', 'location_name', 'location_type'], model['locations'])
+    copy_rows(conn, 'permissions', ['id', 'permission_name', 'object_type', 'action'], model['permissions'])
+    # Roles arrive root-first, so each parent_role_id already exists
+    copy_rows(conn, 'roles', ['id', 'role_name', 'parent_role_id'], model['roles'])
+    copy_rows(conn, 'role_permissions', ['role_id', 'permission_id'], model['role_permissions'])
+    copy_rows(conn, 'people', PEOPLE_COLUMNS, model['people'])
+    copy_rows(conn, 'groups', ['id', 'group_name', 'group_type'], model['groups'])
+    copy_rows(conn, 'group_members', ['group_id', 'person_id'], model['members'])
+    copy_rows(conn, 'role_assignments', ['id', 'role_id', 'person_id', 'group_id', 'scope'], model['assignments'])
+    copy_rows(conn, 'role_assignment_locations', ['assignment_id', 'location_id'], model['assignment_locations'])
+    copy_rows(conn, 'object_permissions', ['id', 'person_id', 'object_type', 'object_id', 'permission_type'],
+              model['object_permissions'])
+    conn.commit()
+    with conn.cursor() as cur:
+        for table in ('roles', 'role_permissions', 'role_assignments', 'group_members', 'object_permissions'):
+            cur.execute(f'ANALYZE {table}')
+    conn.commit()
+
+
+def cleanup(conn):
+    with conn.cursor() as cur:
+        # Assignments, object permissions and memberships cascade from people/groups/roles
+        cur.execute('DELETE FROM people WHERE full_name LIKE %s', (f'{NAME_PREFIX}%',))
+        users = cur.rowcount
+        cur.execute('DELETE FROM groups WHERE group_name LIKE %s', (f'{NAME_PREFIX}%',))
+        cur.execute('DELETE FROM roles WHERE role_name LIKE %s', (f'{NAME_PREFIX}%',))
+        cur.execute('DELETE FROM permissions WHERE permission_name LIKE %s', (f'{NAME_PREFIX}%',))
+        cur.execute('DELETE FROM locations WHERE location_name LIKE %s', (f'{NAME_PREFIX}%',))
+    conn.commit()
+    return users
+
+
+# ----------------------------------------------------------------------------
+# Plan and expected outcomes
+# ----------------------------------------------------------------------------
+
+def role_grants(model, chain_index, role_index, capped):
+    """Permissions of a role plus its ancestors (optionally limited by the recursion cap)"""
+    chain = model['chains'][chain_index]
+    lowest = max(0, role_index - (HIERARCHY_CAP if capped else role_index))
+    grants = set()
+    for role in chain[lowest:role_index + 1]:
+        grants |= role['grants']
+    return grants
+
+
+def expected(model, check, capped):
+    grants = set()
+    for chain_index, role_index in model['user_roles'][check['userId']]:
+        grants |= role_grants(model, chain_index, role_index, capped)
+    granted = (check['objectType'], check['action']) in grants
+    if check.get('objectId'):
+        granted = granted or (check['objectType'], check['objectId'], check['action']) in model['user_objects'][check['userId']]
+    if granted and check.get('locationId'):
+        scopes = model['user_scopes'][check['userId']]
+        granted = not scopes or check['locationId'] in scopes
+    return granted
+
+
+def build_plan(model, args, rng):
+    users = [p[0] for p in model['people']]
+    active = rng.sample(users, min(args.active_users, len(users)))
+    checks = []
+    for _ in range(args.checks):
+        user_id = rng.choice(active)
+        check = {'userId': user_id, 'action': rng.choice(ACTIONS), 'objectType': rng.choice(model['object_types'])}
+        roll = rng.random()
+        if roll < 0.2 and model['user_objects'][user_id]:
+            if rng.random() < 0.5:
+                object_type, object_id, action = rng.choice(model['user_objects'][user_id])
+                check.update({'objectType': object_type, 'objectId': object_id, 'action': action})
+            else:
+                check['objectId'] = new_id(rng)
+        elif roll < 0.4:
+            check['locationId'] = rng.choice(model['locations'])[0]
+        checks.append(check)
+
+    affected = {}
+    for user_id in active:
+        for chain_index, role_index in model['user_roles'][user_id]:
+            for role in model['chains'][chain_index][:role_index + 1]:
+                bucket = affected.setdefault(role['id'], [])
+                if len(bucket) < 20 and user_id not in bucket:
+                    bucket.append(user_id)
+
+    return {
+        'phases': args.phases,
+        'checks': checks,
+        'seed': args.seed,
+        'churn': {
+            'assignEvery': args.assign_every,
+            'roleEvery': args.role_every,
+            'roles': [role[0] for role in model['roles']],
+            'permissions': [{'id': p[0], 'objectType': p[2], 'action': p[3]} for p in model['permissions']],
+            'affectedUsers': affected,
+        },
+    }
+
+
+def run_checks(plan, database_url, timeout):
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump(plan, f)
+        plan_path = f.name
+    try:
+        proc = subprocess.run(NODE_RUNNER + [RUNNER, plan_path], cwd=REPO_ROOT, capture_output=True, text=True,
+                              timeout=timeout, env={**os.environ, 'DATABASE_URL': database_url})
+    finally:
+        os.unlink(plan_path)
+    if proc.returncode != 0:
+        raise SystemExit(f'rbac-check-runner failed:\n{proc.stderr[-2000:]}')
+    return json.loads(proc.stdout.strip().splitlines()[-1])['phases']
+
+
+def phase_summary(name, phase, plan, model):
+    queries = phase['queries']
+    checks = plan['checks']
+    mismatches = capped = 0
+    # Churn changes the data underneath the model, so only cold/warm are compared
+    for check, outcome in zip(checks, phase['outcomes'] if name != 'churn' else ''):
+        granted = outcome == '1'
+        if granted != expected(model, check, capped=False):
+            mismatches += 1
+            if granted == expected(model, check, capped=True):
+                capped += 1
+    return {
+        'checks': len(queries),
+        'latency_ms': summarize(phase['latencies_ms']),
+        'queries_per_check': {
+            'mean': round(sum(queries) / len(queries), 2) if queries else 0,
+            'max': max(queries) if queries else 0,
+            'zero_query_share': round(sum(1 for q in queries if q == 0) / len(queries), 3) if queries else 0,
+        },
+        'granted': phase['outcomes'].count('1'),
+        'errors': phase['errors'],
+        'model_mismatches': mismatches,
+        'lost_to_depth_cap': capped,
+        'assignment_changes': phase['assignment_changes'],
+        'role_changes': phase['role_changes'],
+        'stale_checks': phase['stale_checks'],
+        'stale_grants': phase['stale_grants'],
+        'churn_ms': summarize(phase['churn_ms']),
+    }
+
+
+def main():
+    parser = base_parser(__doc__.split('\n')[1], http=False)
+    parser.add_argument('--users', type=int, default=5000, help='Seeded users')
+    parser.add_argument('--depths', type=int_list, default=int_list('2,6,12'),
+                        help='Comma-separated role chain depths to sweep')
+    parser.add_argument('--chains', type=int, default=40, help='Independent role chains')
+    parser.add_argument('--object-types', type=int, default=12, help='Synthetic object types')
+    parser.add_argument('--perms-per-role', type=int, default=3, help='Direct permissions per role')
+    parser.add_argument('--assignments-per-user', type=int, default=2, help='Direct role assignments per user')
+    parser.add_argument('--groups-per-user', type=int, default=1, help='Group memberships per user')
+    parser.add_argument('--location-scoped', type=float, default=0.2,
+                        help='Fraction of assignments scoped to locations')
+    parser.add_argument('--locations', type=int, default=20, help='Seeded locations')
+    parser.add_argument('--object-perms', type=int, default=5, help='Object-level permissions per user')
+    parser.add_argument('--checks', type=int, default=5000, help='Checks per phase')
+    parser.add_argument('--active-users', type=int, default=1000, help='Users the checks are spread over')
+    parser.add_argument('--phases', type=lambda s: s.split(','), default=['cold', 'warm', 'churn'],
+                        help='Comma-separated phases (cold, warm, churn)')
+    parser.add_argument('--assign-every', type=int, default=20, help='Churn: reassign a role every N checks')
+    parser.add_argument('--role-every', type=int, default=100, help='Churn: toggle a role permission every N checks')
+    parser.add_argument('--timeout', type=float, default=3600, help='Runner timeout per depth (s)')
+    parser.add_argument('--seed', type=int, default=33, help='Random seed')
+    parser.add_argument('--keep', action='store_true', help='Leave the last seeded data in place')
+    parser.add_argument('--cleanup', action='store_true', help='Remove seeded RBAC rows and exit')
+    args = parser.parse_args()
+
+    results = []
+    with connect(args.database_url) as conn:
+        removed = cleanup(conn)
+        if args.cleanup:
+            print(f'Removed {removed} benchmark users')
+            return
+
+        for depth in args.depths:
+            rng = random.Random(args.seed + depth)
+            model = build_model(depth, args, rng)
+            start = time.perf_counter()
+            seed(conn, model)
+            print(f'\n=== depth {depth}: {len(model["roles"])} roles, {args.users} users, '
+                  f'{len(model["assignments"])} assignments (seeded in {time.perf_counter() - start:.1f}s) ===')
+            plan = build_plan(model, args, rng)
+            phases = run_checks(plan, args.database_url, args.timeout)
+            summary = {name: phase_summary(name, phase, plan, model) for name, phase in phases.items()}
+            results.append({'depth': depth, 'roles': len(model['roles']), 'phases': summary})
+            if depth != args.depths[-1] or not args.keep:
+                cleanup(conn)
+
+    rows = []
+    for result in results:
+        for name, phase in result['phases'].items():
+            rows.append({
+                'depth': result['depth'],
+                'phase': name,
+                'p50_ms': phase['latency_ms']['p50'],
+                'p95_ms': phase['latency_ms']['p95'],
+                'p99_ms': phase['latency_ms']['p99'],
+                'queries': phase['queries_per_check']['mean'],
+                'max_q': phase['queries_per_check']['max'],
+                'no_query': phase['queries_per_check']['zero_query_share'],
+                'mismatch': phase['model_mismatches'],
+                'depth_cap': phase['lost_to_depth_cap'],
+                'stale': f"{phase['stale_grants']}/{phase['stale_checks']}" if phase['stale_checks'] else None,
+            })
+    print()
+    print_table(rows, ['depth', 'phase', 'p50_ms', 'p95_ms', 'p99_ms', 'queries', 'max_q', 'no_query',
+                       'mismatch', 'depth_cap', 'stale'])
+
+    write_report(args.output_dir, 'rbac-benchmark', {
+        'parameters': {k: v for k, v in vars(args).items() if k != 'database_url'},
+        'depths': results,
+    }, args.label)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+/**
+ * Report Export Renderer
+ * Runs one of the src/lib/reports exporters under Node for report_benchmark.py
+ *
+ * Usage:
+ *   npx ts-node --transpile-only --compiler-options '{"module":"commonjs","moduleResolution":"node"}' \
+ *     testing/perf/render-report-exports.ts <csv|xlsx|pdf> <rows.json>
+ *
+ * The input file holds { reportName, columns, rows }. Prints a single JSON line
+ * with render time, output size and peak RSS of this process.
+ */
+
+import { readFileSync } from 'fs'
+import { exportReportToCSV } from '../../src/lib/reports/csvExport'
+import { exportReportToExcel } from '../../src/lib/reports/excelExport'
+import { exportReportToPDF } from '../../src/lib/reports/pdfExport'
+
+interface RenderInput {
+  reportName: string
+  columns: string[]
+  rows: Record<string, unknown>[]
+}
+
+function render(format: string, input: RenderInput): Blob {
+  const { reportName, columns, rows } = input
+  switch (format) {
+    case 'csv':
+      return exportReportToCSV({ reportName, columns, data: rows })
+    case 'xlsx':
+      return exportReportToExcel({ reportName, columns, data: rows })
+    case 'pdf':
+      return exportReportToPDF({
+        reportName,
+        columns: columns.map((column) => ({ header: column, dataKey: column })),
+        data: rows,
+      })
+    default:
+      throw new Error(`Unknown export format: ${format}`)
+  }
+}
+
+function main() {
+  const [format, inputPath] = process.argv.slice(2)
+  if (!format || !inputPath) {
+    console.error('Usage: render-report-exports.ts <csv|xlsx|pdf> <rows.json>')
+    process.exit(2)
+  }
+
+  const input = JSON.parse(readFileSync(inputPath, 'utf8')) as RenderInput
+  const rssBefore = process.memoryUsage().rss
+
+  const start = process.hrtime.bigint()
+  const blob = render(format, input)
+  const renderMs = Number(process.hrtime.bigint() - start) / 1e6
+
+  console.log(
+    JSON.stringify({
+      format,
+      rows: input.rows.length,
+      render_ms: Math.round(renderMs * 10) / 10,
+      output_bytes: blob.size,
+      rss_before_mb: Math.round(rssBefore / 1024 / 102.4) / 10,
+      // maxRSS is reported in kilobytes
+      peak_rss_mb: Math.round(process.resourceUsage().maxRSS / 102.4) / 10,
+    })
+  )
+}
+
+main()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Custom report execution and export benchmark
+
+Seeds tagged devices at growing row counts, runs representative report
+definitions through POST /api/reports/execute (src/lib/reports/queryBuilder.ts)
+and renders each result set with the CSV, Excel and PDF exporters from
+src/lib/reports via render-report-exports.ts. Reports query time, rendering
+time, peak memory and output size per format so we can see which exporter
+needs a streaming mode.
+
+The query builder is single-table (no joins), so the "related" definition
+selects the foreign-key columns a join would resolve instead.
+
+Usage:
+  python3 testing/perf/report_benchmark.py --rows 1000,10000,100000
+  python3 testing/perf/report_benchmark.py --rows 5000 --formats csv,xlsx
+  python3 testing/perf/report_benchmark.py --cleanup
+"""
+import json
+import os
+import random
+import subprocess
+import tempfile
+
+from common import (
+    NODE_RUNNER,
+    PERF_TAG,
+    REPO_ROOT,
+    ServerMemorySampler,
+    base_parser,
+    connect,
+    copy_rows,
+    http_client,
+    int_list,
+    print_table,
+    timed,
+    write_report,
+)
+from fixtures import DEVICE_COLUMNS, count_tagged, delete_tagged, device_rows
+
+NAME_PREFIX = f'{PERF_TAG}report-'
+RENDERER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'render-report-exports.ts')
+
+DEVICE_FIELDS = [
+    'id', 'hostname', 'device_type', 'manufacturer', 'model', 'serial_number', 'asset_tag',
+    'purchase_date', 'warranty_expiration', 'install_date', 'status', 'operating_system',
+    'os_version', 'last_audit_date', 'notes', 'location_id', 'room_id', 'assigned_to_id',
+    'parent_device_id', 'created_at', 'updated_at',
+]
+
+# Restricts every definition to the seeded rows so row counts are controlled
+TAG_FILTER = {'type': 'condition', 'field': 'hostname', 'operator': 'starts_with', 'value': NAME_PREFIX}
+
+
+def report_definitions():
+    return {
+        'wide': {
+            'report_name': 'Perf wide device listing',
+            'object_type': 'device',
+            'fields': DEVICE_FIELDS,
+            'filters': TAG_FILTER,
+            'sorting': [{'field': 'manufacturer', 'direction': 'ASC'}, {'field': 'hostname', 'direction': 'ASC'}],
+        },
+        'filtered': {
+            'report_name': 'Perf filtered warranty report',
+            'object_type': 'device',
+            'fields': ['hostname', 'manufacturer', 'model', 'serial_number', 'status',
+                       'purchase_date', 'warranty_expiration', 'operating_system'],
+            'filters': {
+                'type': 'group',
+                'logicalOperator': 'AND',
+                'conditions': [
+                    TAG_FILTER,
+                    {'type': 'condition', 'field': 'status', 'operator': 'in_list', 'value': ['active', 'repair']},
+                    {
+                        'type': 'group',
+                        'logicalOperator': 'OR',
+                        'conditions': [
+                            {'type': 'condition', 'field': 'manufacturer', 'operator': 'contains', 'value': 'e'},
+                            {'type': 'condition', 'field': 'operating_system', 'operator': 'is_null'},
+                        ],
+                    },
+                ],
+            },
+            'sorting': [{'field': 'warranty_expiration', 'direction': 'ASC'}],
+        },
+        'grouped': {
+            'report_name': 'Perf grouped device summary',
+            'object_type': 'device',
+            'fields': ['manufacturer', 'device_type', 'status'],
+            'filters': TAG_FILTER,
+            'grouping': ['manufacturer', 'device_type', 'status'],
+            'aggregations': [
+                {'type': 'COUNT', 'field': '*', 'alias': 'device_count'},
+                {'type': 'MIN', 'field': 'purchase_date', 'alias': 'oldest_purchase'},
+                {'type': 'MAX', 'field': 'warranty_expiration', 'alias': 'latest_warranty'},
+            ],
+            'sorting': [{'field': 'manufacturer', 'direction': 'ASC'}],
+        },
+        'related': {
+            'report_name': 'Perf device relationships',
+            'object_type': 'device',
+            'fields': ['hostname', 'location_id', 'room_id', 'assigned_to_id', 'parent_device_id'],
+            'filters': TAG_FILTER,
+            'sorting': [{'field': 'hostname', 'direction': 'ASC'}],
+        },
+    }
+
+
+def grow_to(conn, target, rng):
+    """Top up the tagged devices to target rows"""
+    existing = count_tagged(conn, 'devices', 'hostname', NAME_PREFIX)
+    if existing > target:
+        delete_tagged(conn, 'devices', 'hostname', NAME_PREFIX)
+        existing = 0
+    if target > existing:
+        copy_rows(conn, 'devices', DEVICE_COLUMNS, device_rows(NAME_PREFIX, existing, target - existing, rng))
+        conn.commit()
+        with conn.cursor() as cur:
+            cur.execute('ANALYZE devices')
+        conn.commit()
+
+
+def execute(client, definition, pagination=None):
+    body = {'reportConfig': definition}
+    if pagination:
+        body['pagination'] = pagination
+    with timed() as t:
+        response = client.post('/api/reports/execute', json=body)
+        content = response.content
+    payload = json.loads(content) if content else {}
+    data = payload.get('data') or {}
+    return {
+        'status': response.status_code,
+        'error': payload.get('error') if response.status_code != 200 else None,
+        'client_ms': round(t['ms'], 1),
+        'server_exec_ms': data.get('executionTime'),
+        'rows': len(data.get('results') or []),
+        'total': (data.get('pagination') or {}).get('total'),
+        'response_mb': round(len(content) / 1024 / 1024, 3),
+        'results': data.get('results') or [],
+    }
+
+
+def render(format_name, report_name, rows, timeout):
+    """Run one exporter in a fresh Node process; returns its metrics"""
+    if not rows:
+        return {'format': format_name, 'skipped': 'no rows'}
+    columns = list(rows[0].keys())
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump({'reportName': report_name, 'columns': columns, 'rows': rows}, f)
+        input_path = f.name
+    try:
+        with timed() as t:
+            proc = subprocess.run(NODE_RUNNER + [RENDERER, format_name, input_path], cwd=REPO_ROOT,
+                                  capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'format': format_name, 'error': f'timed out after {timeout}s'}
+    finally:
+        os.unlink(input_path)
+    if proc.returncode != 0:
+        return {'format': format_name, 'error': proc.stderr.strip().splitlines()[-1:] or ['renderer failed']}
+    metrics = json.loads(proc.stdout.strip().splitlines()[-1])
+    metrics['process_ms'] = round(t['ms'], 1)
+    metrics['output_mb'] = round(metrics['output_bytes'] / 1024 / 1024, 3)
+    metrics['rss_growth_mb'] = round(metrics['peak_rss_mb'] - metrics['rss_before_mb'], 1)
+    return metrics
+
+
+def streaming_candidates(results, formats, budget_mb):
+    """Formats whose peak memory exceeds the budget or grows with row count"""
+    verdicts = {}
+    for fmt in formats:
+        points = [(r['rows'], r['exports'][fmt]['rss_growth_mb'])
+                  for r in results
+                  if r['definition'] == 'wide' and 'rss_growth_mb' in r['exports'].get(fmt, {})]
+        if len(points) < 1:
+            verdicts[fmt] = 'no data'
+            continue
+        points.sort()
+        per_10k = None
+        if len(points) > 1 and points[-1][0] > points[0][0]:
+            per_10k = (points[-1][1] - points[0][1]) / (points[-1][0] - points[0][0]) * 10000
+        over_budget = points[-1][1] > budget_mb
+        verdicts[fmt] = {
+            'largest_rows': points[-1][0],
+            'largest_growth_mb': points[-1][1],
+            'mb_per_10k_rows': round(per_10k, 2) if per_10k is not None else None,
+            'needs_streaming': over_budget or (per_10k is not None and per_10k > 10),
+        }
+    return verdicts
+
+
+def main():
+    parser = base_parser(__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int_list, default=int_list('1000,10000,50000'),
+                        help='Comma-separated seeded row counts to sweep')
+    parser.add_argument('--formats', default='csv,xlsx,pdf', help='Exporters to run')
+    parser.add_argument('--definitions', default=None,
+                        help='Subset of definitions (wide,filtered,grouped,related)')
+    parser.add_argument('--pdf-max-rows', type=int, default=20000,
+                        help='Skip PDF rendering above this many result rows')
+    parser.add_argument('--render-timeout', type=int, default=900, help='Seconds per exporter run')
+    parser.add_argument('--memory-budget-mb', type=float, default=512,
+                        help='Exporter RSS growth that marks a format for streaming')
+    parser.add_argument('--seed', type=int, default=11, help='Random seed')
+    parser.add_argument('--keep', action='store_true', help='Leave seeded devices in place')
+    parser.add_argument('--cleanup', action='store_true', help='Remove seeded devices and exit')
+    args = parser.parse_args()
+
+    formats = [f.strip() for f in args.formats.split(',') if f.strip()]
+    definitions = report_definitions()
+    if args.definitions:
+        definitions = {k: v for k, v in definitions.items() if k in args.definitions.split(',')}
+
+    with connect(args.database_url) as conn:
+        if args.cleanup:
+            print(f"Removed {delete_tagged(conn, 'devices', 'hostname', NAME_PREFIX)} devices")
+            return
+
+        rng = random.Random(args.seed)
+        results = []
+        with http_client(args.base_url, args.api_token, timeout=args.render_timeout) as client:
+            for target in sorted(args.rows):
+                grow_to(conn, target, rng)
+                print(f'\n=== {target:,} seeded devices ===')
+                for name, definition in definitions.items():
+                    with ServerMemorySampler(args.server_pid) as sampler:
+                        full = execute(client, definition)
+                    first_page = execute(client, definition, {'page': 1, 'pageSize': 1000})
+                    if full['status'] != 200:
+                        print(f"  {name}: HTTP {full['status']} {full['error']}")
+                    exports = {}
+                    for fmt in formats:
+                        if fmt == 'pdf' and full['rows'] > args.pdf_max_rows:
+                            exports[fmt] = {'format': fmt, 'skipped': f"{full['rows']} rows > --pdf-max-rows"}
+                            continue
+                        exports[fmt] = render(fmt, definition['report_name'], full['results'], args.render_timeout)
+                    results.append({
+                        'seeded_rows': target,
+                        'definition': name,
+                        'rows': full['rows'],
+                        'execute_full': {k: v for k, v in full.items() if k != 'results'},
+                        'execute_first_page': {k: v for k, v in first_page.items() if k != 'results'},
+                        'server_memory': sampler.summary(),
+                        'exports': exports,
+                    })
+
+        if not args.keep:
+            delete_tagged(conn, 'devices', 'hostname', NAME_PREFIX)
+
+    rows = []
+    for r in results:
+        row = {
+            'seeded': r['seeded_rows'],
+            'definition': r['definition'],
+            'rows': r['rows'],
+            'query_ms': r['execute_full']['client_ms'],
+            'exec_ms': r['execute_full']['server_exec_ms'],
+            'page_ms': r['execute_first_page']['client_ms'],
+            'resp_mb': r['execute_full']['response_mb'],
+        }
+        for fmt in formats:
+            metrics = r['exports'].get(fmt, {})
+            row[f'{fmt}_ms'] = metrics.get('render_ms')
+            row[f'{fmt}_mb'] = metrics.get('output_mb')
+            row[f'{fmt}_peak'] = metrics.get('peak_rss_mb')
+        rows.append(row)
+    print()
+    columns = ['seeded', 'definition', 'rows', 'query_ms', 'exec_ms', 'page_ms', 'resp_mb']
+    for fmt in formats:
+        columns += [f'{fmt}_ms', f'{fmt}_mb', f'{fmt}_peak']
+    print_table(rows, columns)
+
+    verdicts = streaming_candidates(results, formats, args.memory_budget_mb)
+    print('\nStreaming candidates (wide listing):')
+    for fmt, verdict in verdicts.items():
+        print(f'  {fmt}: {verdict}')
+
+    write_report(args.output_dir, 'report-benchmark', {
+        'parameters': {
+            'rows': args.rows,
+            'formats': formats,
+            'definitions': definitions,
+            'pdf_max_rows': args.pdf_max_rows,
+            'memory_budget_mb': args.memory_budget_mb,
+        },
+        'results': results,
+        'streaming_candidates': verdicts,
+    }, args.label)
+
+
+if __name__ == '__main__':
+    main()
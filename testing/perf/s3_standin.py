@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Minimal S3-compatible stand-in for storage benchmarks
+
+Serves path-style PutObject, GetObject, HeadObject and DeleteObject (and
+CreateBucket) from a local directory so S3StorageAdapter can be exercised
+without MinIO or AWS. Request signatures and presigned-URL parameters are
+accepted but not verified. Bodies are written to disk as they arrive, including
+aws-chunked uploads from newer SDK versions, so the stand-in is rarely the
+bottleneck; per-request timings are kept for the benchmark and served as JSON
+from GET /_standin/stats.
+
+Not a general S3 implementation: no listing, multipart uploads, ranges or
+versioning.
+
+Usage:
+  python3 testing/perf/s3_standin.py --port 9000 --root /tmp/moss-s3
+  (storage.s3_endpoint = http://localhost:9000; storage.s3_bucket, storage.s3_region,
+   storage.s3_access_key and storage.s3_secret_key may be any values)
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+CHUNK = 1024 * 1024
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'moss-s3-standin'
+
+    def log_message(self, *args):
+        pass
+
+    # ------------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------------
+
+    def _target(self):
+        parts = unquote(urlsplit(self.path).path).lstrip('/').split('/', 1)
+        bucket = parts[0]
+        key = parts[1] if len(parts) > 1 else ''
+        if '..' in key.split('/'):
+            return bucket, None, None
+        return bucket, key, os.path.join(self.server.root, bucket, key) if key else None
+
+    def _reply(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _error(self, status, code):
+        body = f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code></Error>'.encode()
+        self._reply(status, body, {'Content-Type': 'application/xml'})
+
+    def _body_chunks(self):
+        """Yield the request body, undoing chunked transfer and aws-chunked content encoding"""
+        if 'chunked' in self.headers.get('Transfer-Encoding', ''):
+            raw = self._http_chunks()
+        else:
+            raw = self._fixed_chunks(int(self.headers.get('Content-Length', 0)))
+        if 'aws-chunked' in self.headers.get('Content-Encoding', '') or 'STREAMING' in self.headers.get(
+                'x-amz-content-sha256', ''):
+            yield from self._aws_chunks(raw)
+        else:
+            yield from raw
+
+    def _fixed_chunks(self, length):
+        while length > 0:
+            data = self.rfile.read(min(CHUNK, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+    def _http_chunks(self):
+        while True:
+            size = int(self.rfile.readline().split(b';')[0].strip() or b'0', 16)
+            if size == 0:
+                while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                    pass
+                return
+            yield from self._fixed_chunks(size)
+            self.rfile.readline()
+
+    @staticmethod
+    def _aws_chunks(raw):
+        """Decode '<hex>[;chunk-signature=..]\\r\\n<data>\\r\\n' frames; trailers after the 0 frame are dropped"""
+        buffer = b''
+        source = iter(raw)
+        while True:
+            while b'\r\n' not in buffer:
+                more = next(source, b'')
+                if not more:
+                    return
+                buffer += more
+            line, buffer = buffer.split(b'\r\n', 1)
+            size = int(line.split(b';')[0] or b'0', 16)
+            if size == 0:
+                return
+            while len(buffer) < size + 2:
+                more = next(source, b'')
+                if not more:
+                    yield buffer[:size]
+                    return
+                buffer += more
+            yield buffer[:size]
+            buffer = buffer[size + 2:]
+
+    def _record(self, op, nbytes, started, first_byte=None):
+        entry = {'op': op, 'bytes': nbytes, 'ms': round((time.perf_counter() - started) * 1000, 2)}
+        if first_byte is not None:
+            entry['first_byte_ms'] = round((first_byte - started) * 1000, 2)
+        with self.server.lock:
+            self.server.requests.append(entry)
+
+    # ------------------------------------------------------------------------
+    # Verbs
+    # ------------------------------------------------------------------------
+
+    def do_PUT(self):
+        started = time.perf_counter()
+        bucket, key, path = self._target()
+        if key is None:
+            return self._error(400, 'InvalidObjectName')
+        if not key:
+            os.makedirs(os.path.join(self.server.root, bucket), exist_ok=True)
+            for _ in self._body_chunks():
+                pass
+            return self._reply(200)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        digest, nbytes, first_byte = hashlib.md5(), 0, None
+        with open(path + '.part', 'wb') as out:
+            for data in self._body_chunks():
+                first_byte = first_byte or time.perf_counter()
+                digest.update(data)
+                out.write(data)
+                nbytes += len(data)
+        os.replace(path + '.part', path)
+        with open(path + '.type', 'w') as meta:
+            meta.write(self.headers.get('Content-Type', 'application/octet-stream'))
+        self._record('put', nbytes, started, first_byte)
+        self._reply(200, headers={'ETag': f'"{digest.hexdigest()}"'})
+
+    def do_GET(self):
+        if urlsplit(self.path).path == '/_standin/stats':
+            with self.server.lock:
+                body = json.dumps(self.server.requests).encode()
+                if 'reset' in urlsplit(self.path).query:
+                    self.server.requests = []
+            return self._reply(200, body, {'Content-Type': 'application/json'})
+        started = time.perf_counter()
+        _, key, path = self._target()
+        if not key or not os.path.isfile(path):
+            return self._error(404, 'NoSuchKey')
+        size = os.path.getsize(path)
+        content_type = 'application/octet-stream'
+        if os.path.exists(path + '.type'):
+            with open(path + '.type') as meta:
+                content_type = meta.read()
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        first_byte = None
+        if self.command == 'GET':
+            with open(path, 'rb') as source:
+                while data := source.read(CHUNK):
+                    first_byte = first_byte or time.perf_counter()
+                    self.wfile.write(data)
+            self._record('get', size, started, first_byte)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_DELETE(self):
+        _, key, path = self._target()
+        if key and path:
+            for suffix in ('', '.type'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        self._reply(204)
+
+
+def start_standin(root, host='127.0.0.1', port=0):
+    """Serve the stand-in on a background thread; returns the server (server.endpoint is its URL)"""
+    server = ThreadingHTTPServer((host, port), StandinHandler)
+    server.daemon_threads = True
+    server.root = root
+    server.requests = []
+    server.lock = threading.Lock()
+    server.endpoint = f'http://{host}:{server.server_address[1]}'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--root', default='/tmp/moss-s3-standin', help='Directory objects are stored under')
+    parser.add_argument('--clear', action='store_true', help='Empty --root before starting')
+    args = parser.parse_args()
+    if args.clear:
+        shutil.rmtree(args.root, ignore_errors=True)
+    os.makedirs(args.root, exist_ok=True)
+    server = start_standin(args.root, args.host, args.port)
+    print(f'S3 stand-in on {server.endpoint}, objects under {args.root} (Ctrl-C to stop)')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+Saved-filter and URL-state list query replay
+
+Collects the filter/sort combinations users actually persist and replays
+each one as the list API call the list pages make, then ranks them by
+latency and by query plan so the filters that need an index stand out.
+
+Filter sources:
+  - saved_filters rows (migration 025): filter_config {search, filters, sort_by, sort_order}
+  - --urls: shared list links in the urlStateManager.ts format
+    (/devices?sort=hostname:asc&search=x&filter_status=active), one per line
+  - --synthetic N: tagged saved filters over devices/people generated from the
+    filter and sort keys their list routes accept
+
+Each filter becomes GET /api/<object_type>?sort_by=..&sort_order=..&search=..&<filters>
+like the list pages build it. List responses are cached for 30s per
+parameter set, so repeats walk pages 1..--repeat to stay uncached.
+
+Plans come from the SQL the routes really ran: start the server with
+SLOW_QUERY_MS=-1 and SLOW_QUERY_LOG=<file> (src/lib/slowQueryLog.ts) and pass
+the same file as --sql-log. Statements logged for the route during a replay
+are bound back to the filter's values ($n next to a filtered column gets its
+value, ILIKE gets %value%, search columns get %search%, LIMIT/OFFSET the page)
+and run under EXPLAIN ANALYZE. Statements that cannot be bound fall back to
+EXPLAIN (GENERIC_PLAN) (PostgreSQL 16+). Each plan is classified as
+composite_index (an index from migrations 014/027), index or seq_scan on the
+listed table, with sorts noted, and seq scans get an index suggestion.
+
+Usage:
+  SLOW_QUERY_MS=-1 SLOW_QUERY_LOG=/tmp/moss-sql.jsonl npm run dev
+  python3 testing/perf/saved_filter_replay.py --sql-log /tmp/moss-sql.jsonl --seed-devices 200000 --seed-people 50000
+  python3 testing/perf/saved_filter_replay.py --sql-log /tmp/moss-sql.jsonl --synthetic 60 --repeat 5 --top 20
+  python3 testing/perf/saved_filter_replay.py --urls shared-links.txt --skip-saved
+  python3 testing/perf/saved_filter_replay.py --cleanup
+"""
+import json
+import os
+import random
+import re
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+from common import (
+    PERF_TAG,
+    REPO_ROOT,
+    base_parser,
+    connect,
+    copy_rows,
+    http_client,
+    print_table,
+    session_login,
+    summarize,
+    write_report,
+)
+from fixtures import (
+    DEPARTMENTS,
+    DEVICE_COLUMNS,
+    DEVICE_STATUSES,
+    DEVICE_TYPES,
+    MANUFACTURERS,
+    PEOPLE_COLUMNS,
+    delete_tagged,
+    device_rows,
+    people_rows,
+)
+
+COMPOSITE_MIGRATIONS = ['014_add_composite_indexes.sql', '027_performance_indexes.sql']
+INDEX_DEF = re.compile(r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+NOT\s+EXISTS\s+)?(\w+)\s+'
+                       r'ON\s+(\w+)\s*(?:USING\s+\w+\s*)?\(([^)]*)\)', re.I)
+
+# Filter and sort keys accepted by the list routes (DeviceQuerySchema, ListPeopleQuerySchema)
+SYNTHETIC = {
+    'devices': {
+        'filters': {'device_type': DEVICE_TYPES, 'status': sorted(set(DEVICE_STATUSES)),
+                    'manufacturer': MANUFACTURERS},
+        'sort_by': ['hostname', 'device_type', 'manufacturer', 'serial_number', 'status', 'purchase_date',
+                    'warranty_expiration', 'created_at'],
+        'search': [PERF_TAG, 'Dell', '0042'],
+    },
+    'people': {
+        'filters': {'person_type': ['employee', 'contractor'], 'department': DEPARTMENTS,
+                    'status': ['active', 'inactive']},
+        'sort_by': ['full_name', 'email', 'department', 'status', 'created_at'],
+        'search': [PERF_TAG, 'Person 00', 'example.test'],
+    },
+}
+
+COLUMN_PARAM = re.compile(r'(?:\w+\.)?(\w+)\s+(=|<>|!=|>=|<=|>|<|NOT\s+ILIKE|ILIKE|NOT\s+LIKE|LIKE)\s+\$(\d+)\b', re.I)
+PAGING_PARAM = re.compile(r'\b(LIMIT|OFFSET)\s+\$(\d+)\b', re.I)
+PLACEHOLDER = re.compile(r'\$(\d+)\b')
+
+
+# ----------------------------------------------------------------------------
+# Filter sources
+# ----------------------------------------------------------------------------
+
+def api_path(object_type):
+    return '/api/' + object_type.replace('_', '-')
+
+
+def saved_filters(conn, object_types):
+    rows = conn.execute(
+        'SELECT id, filter_name, object_type, filter_config, is_public, use_count FROM saved_filters '
+        'WHERE %(types)s::text[] IS NULL OR object_type = ANY(%(types)s::text[]) '
+        'ORDER BY use_count DESC, created_at',
+        {'types': object_types}).fetchall()
+    conn.commit()
+    return [{
+        'source': 'saved',
+        'id': str(row[0]),
+        'name': row[1],
+        'object_type': row[2],
+        'config': row[3] or {},
+        'public': row[4],
+        'use_count': row[5],
+    } for row in rows]
+
+
+def url_filters(path):
+    """Parse shared list links the way parseViewStateFromURL() does"""
+    filters = []
+    with open(path) as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = urlsplit(line)
+            object_type = parts.path.strip('/').split('/')[0].replace('-', '_')
+            config = {'filters': {}}
+            for key, value in parse_qsl(parts.query):
+                if key == 'sort':
+                    sort_by, _, sort_order = value.partition(':')
+                    config.update({'sort_by': sort_by, 'sort_order': sort_order or 'asc'})
+                elif key == 'search':
+                    config['search'] = value
+                elif key.startswith('filter_') and value:
+                    config['filters'][key[len('filter_'):]] = value
+            filters.append({'source': 'url', 'id': f'{os.path.basename(path)}:{n}', 'name': line[:60],
+                            'object_type': object_type, 'config': config})
+    return filters
+
+
+def synthetic_config(rng, object_type):
+    spec = SYNTHETIC[object_type]
+    keys = rng.sample(sorted(spec['filters']), rng.choice([0, 1, 1, 2]))
+    config = {'filters': {key: rng.choice(spec['filters'][key]) for key in keys},
+              'sort_by': rng.choice(spec['sort_by']), 'sort_order': rng.choice(['asc', 'desc'])}
+    if rng.random() < 0.35:
+        config['search'] = rng.choice(spec['search'])
+    return config
+
+
+def create_synthetic(conn, count, rng):
+    """Tagged public saved filters owned by the first user"""
+    owner = conn.execute('SELECT id FROM users ORDER BY created_at LIMIT 1').fetchone()
+    if not owner:
+        raise SystemExit('--synthetic needs at least one user to own the saved filters')
+    delete_tagged(conn, 'saved_filters', 'filter_name', PERF_TAG)
+    with conn.cursor() as cur:
+        for n in range(count):
+            object_type = rng.choice(sorted(SYNTHETIC))
+            cur.execute(
+                'INSERT INTO saved_filters (user_id, filter_name, object_type, filter_config, is_public, use_count) '
+                'VALUES (%s, %s, %s, %s, true, %s)',
+                (owner[0], f'{PERF_TAG}filter-{n:04d}', object_type,
+                 json.dumps(synthetic_config(rng, object_type)), rng.randint(0, 500)))
+    conn.commit()
+
+
+def seed(conn, args, rng):
+    for table, column, columns, rows, count in (
+            ('devices', 'hostname', DEVICE_COLUMNS, device_rows, args.seed_devices),
+            ('people', 'full_name', PEOPLE_COLUMNS, people_rows, args.seed_people)):
+        if not count:
+            continue
+        delete_tagged(conn, table, column, PERF_TAG)
+        started = time.perf_counter()
+        copy_rows(conn, table, columns, rows(PERF_TAG, 0, count, rng))
+        conn.commit()
+        conn.execute(f'ANALYZE {table}')
+        conn.commit()
+        print(f'Seeded {count:,} {table} in {time.perf_counter() - started:.1f}s')
+
+
+def list_params(config, page, limit):
+    params = {'page': page, 'limit': limit}
+    if config.get('sort_by'):
+        params['sort_by'] = config['sort_by']
+        params['sort_order'] = config.get('sort_order') or 'asc'
+    if config.get('search'):
+        params['search'] = config['search']
+    params.update({key: value for key, value in (config.get('filters') or {}).items() if value not in (None, '')})
+    return params
+
+
+# ----------------------------------------------------------------------------
+# SQL capture and plans
+# ----------------------------------------------------------------------------
+
+class SqlLog:
+    """Follows the SLOW_QUERY_LOG file the server appends to"""
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = os.path.getsize(path) if os.path.exists(path) else 0
+
+    def mark(self):
+        self.offset = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def records_for(self, route, wait_s):
+        """Records for route written since mark(); appends are async, so poll briefly"""
+        deadline = time.perf_counter() + wait_s
+        while True:
+            records = []
+            if os.path.exists(self.path):
+                with open(self.path) as f:
+                    f.seek(self.offset)
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue
+                        if record.get('route') == route:
+                            records.append(record)
+            if records or time.perf_counter() > deadline:
+                return records
+            time.sleep(0.05)
+
+
+def composite_indexes():
+    indexes = {}
+    for filename in COMPOSITE_MIGRATIONS:
+        with open(os.path.join(REPO_ROOT, 'migrations', filename)) as f:
+            for name, table, columns in INDEX_DEF.findall(f.read()):
+                indexes[name] = {'table': table, 'columns': [c.split()[0] for c in columns.split(',')],
+                                 'migration': filename[:3]}
+    return indexes
+
+
+def bind(sql, config, limit, offset):
+    """Psycopg statement and parameters for a logged $n statement, or None if a placeholder is unknown"""
+    filters = config.get('filters') or {}
+    values = {}
+    for column, op, n in COLUMN_PARAM.findall(sql):
+        like = 'LIKE' in op.upper()
+        if column in filters:
+            values[n] = f'%{filters[column]}%' if like else filters[column]
+        elif like and config.get('search'):
+            values[n] = f"%{config['search']}%"
+    for keyword, n in PAGING_PARAM.findall(sql):
+        values[n] = limit if keyword.upper() == 'LIMIT' else offset
+    if set(PLACEHOLDER.findall(sql)) - set(values):
+        return None
+    statement = PLACEHOLDER.sub(lambda m: f'%(p{m.group(1)})s', sql.replace('%', '%%'))
+    return statement, {f'p{n}': value for n, value in values.items()}
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def classify(plan, table, composites):
+    """Access path on the listed table plus sort details"""
+    nodes = list(plan_nodes(plan['Plan']))
+    scans = [node for node in nodes if node.get('Relation Name') == table]
+    indexes = {node['Index Name'] for node in nodes if node.get('Index Name')
+               and (node.get('Relation Name') in (table, None))}
+    if any(node['Node Type'] == 'Seq Scan' for node in scans):
+        access = 'seq_scan'
+    elif indexes & set(composites):
+        access = 'composite_index'
+    elif indexes:
+        access = 'index'
+    else:
+        access = scans[0]['Node Type'].lower().replace(' ', '_') if scans else 'other'
+    sorts = [node for node in nodes if node['Node Type'] in ('Sort', 'Incremental Sort')]
+    removed = sum(node.get('Rows Removed by Filter', 0) for node in scans)
+    return {
+        'access': access,
+        'indexes': sorted(indexes),
+        'sort': sorts[0].get('Sort Method', sorts[0]['Node Type']) if sorts else None,
+        'rows_removed_by_filter': removed,
+        'execution_ms': round(plan['Execution Time'], 3) if 'Execution Time' in plan else None,
+    }
+
+
+def explain(conn, sql, config, limit, offset, timeout_ms):
+    bound = bind(sql, config, limit, offset)
+    with conn.cursor() as cur:
+        cur.execute(f'SET LOCAL statement_timeout = {int(timeout_ms)}')
+        if bound:
+            statement, params = bound
+            cur.execute(f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}', params)
+        else:
+            cur.execute(f"EXPLAIN (GENERIC_PLAN, FORMAT JSON) {sql.replace('%', '%%')}")
+        plan = cur.fetchone()[0][0]
+    conn.rollback()
+    return plan, bool(bound)
+
+
+def suggestion(table, config, composites):
+    """Index that would serve the filter: equality columns first, then the sort column"""
+    filters = [key for key, value in (config.get('filters') or {}).items() if value not in (None, '')]
+    for name, index in composites.items():
+        if index['table'] == table and index['columns'][0] in filters:
+            return f'{name} could serve this; check its partial-index WHERE and column order'
+    columns = filters + [c for c in [config.get('sort_by')] if c and c not in filters]
+    text = f"CREATE INDEX ON {table} ({', '.join(columns)})" if columns else None
+    if config.get('search'):
+        hint = 'search uses ILIKE %term%, which needs a pg_trgm GIN index'
+        text = f'{text}; {hint}' if text else hint
+    return text
+
+
+# ----------------------------------------------------------------------------
+# Replay
+# ----------------------------------------------------------------------------
+
+def replay(client, conn, sql_log, entry, args, composites):
+    path = api_path(entry['object_type'])
+    table = entry['object_type']
+    timings, statuses, total, statements = [], [], None, []
+    for page in range(1, args.repeat + 1):
+        if sql_log and page == 1:
+            sql_log.mark()
+        began = time.perf_counter()
+        response = client.get(path, params=list_params(entry['config'], page, args.limit))
+        timings.append((time.perf_counter() - began) * 1000)
+        statuses.append(response.status_code)
+        if response.status_code != 200:
+            break
+        if page == 1:
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            data = body.get('data', body)
+            pagination = data.get('pagination', {}) if isinstance(data, dict) else {}
+            total = pagination.get('total')
+            if sql_log:
+                statements = sql_log.records_for(path, args.log_wait)
+    result = {
+        'source': entry['source'],
+        'filter': entry['name'],
+        'object_type': table,
+        'config': entry['config'],
+        'use_count': entry.get('use_count'),
+        'status': statuses[-1],
+        'total': total,
+        'latency_ms': summarize(timings),
+        'first_ms': round(timings[0], 1),
+        'plans': [],
+    }
+    seen = set()
+    for record in statements:
+        if record['fingerprint'] in seen:
+            continue
+        seen.add(record['fingerprint'])
+        try:
+            plan, bound = explain(conn, record['sql'], entry['config'], args.limit, 0, args.explain_timeout)
+        except Exception as exc:
+            conn.rollback()
+            result['plans'].append({'sql': record['sql'], 'error': str(exc).strip().splitlines()[0]})
+            continue
+        is_count = record['sql'].lower().startswith('select count')
+        result['plans'].append({'sql': record['sql'], 'bound': bound, 'count': is_count,
+                                **classify(plan, table, composites)})
+    main_plans = [p for p in result['plans'] if 'access' in p and not p['count']] or \
+        [p for p in result['plans'] if 'access' in p]
+    if main_plans:
+        result['access'] = main_plans[0]['access']
+        result['sort'] = main_plans[0]['sort']
+        if result['access'] == 'seq_scan':
+            result['suggestion'] = suggestion(table, entry['config'], composites)
+    return result
+
+
+def describe(config):
+    parts = [f'{k}={v}' for k, v in (config.get('filters') or {}).items()]
+    if config.get('search'):
+        parts.append(f"search={config['search']}")
+    if config.get('sort_by'):
+        parts.append(f"sort={config['sort_by']}:{config.get('sort_order') or 'asc'}")
+    return ' '.join(parts) or '(none)'
+
+
+def main():
+    parser = base_parser(__doc__.split('\n')[1])
+    parser.add_argument('--sql-log', default=os.environ.get('SLOW_QUERY_LOG'),
+                        help='SLOW_QUERY_LOG file of a server started with SLOW_QUERY_MS=-1 (enables EXPLAIN)')
+    parser.add_argument('--urls', help='File of shared list links (urlStateManager format), one per line')
+    parser.add_argument('--skip-saved', action='store_true', help='Do not replay rows from saved_filters')
+    parser.add_argument('--synthetic', type=int, default=0, help='Create this many tagged saved filters first')
+    parser.add_argument('--object-types', type=lambda text: text.split(','), help='Only these object types')
+    parser.add_argument('--seed-devices', type=int, default=0, help='Tagged devices to seed before replaying')
+    parser.add_argument('--seed-people', type=int, default=0, help='Tagged people to seed before replaying')
+    parser.add_argument('--repeat', type=int, default=3, help='Requests per filter (pages 1..N)')
+    parser.add_argument('--limit', type=int, default=50, help='Page size, as the list pages use')
+    parser.add_argument('--log-wait', type=float, default=1.0, help='Seconds to wait for SQL log records')
+    parser.add_argument('--explain-timeout', type=float, default=30000, help='EXPLAIN ANALYZE timeout (ms)')
+    parser.add_argument('--top', type=int, default=25, help='Filters shown in the ranking')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--cleanup', action='store_true', help='Remove tagged filters, devices and people, then exit')
+    args = parser.parse_args()
+
+    conn = connect(args.database_url)
+    if args.cleanup:
+        for table, column in (('saved_filters', 'filter_name'), ('devices', 'hostname'), ('people', 'full_name')):
+            print(f'Removed {delete_tagged(conn, table, column, PERF_TAG):,} rows from {table}')
+        return
+
+    rng = random.Random(args.seed)
+    seed(conn, args, rng)
+    if args.synthetic:
+        create_synthetic(conn, args.synthetic, rng)
+    entries = [] if args.skip_saved else saved_filters(conn, args.object_types)
+    if args.urls:
+        entries += [e for e in url_filters(args.urls)
+                    if not args.object_types or e['object_type'] in args.object_types]
+    if not entries:
+        raise SystemExit('No filters to replay: save some, pass --urls or use --synthetic N')
+
+    sql_log = SqlLog(args.sql_log) if args.sql_log else None
+    if not sql_log:
+        print('No --sql-log: ranking by latency only (start the server with SLOW_QUERY_MS=-1 SLOW_QUERY_LOG=...)')
+    composites = composite_indexes()
+    token = session_login(args.base_url, args.email, args.password) if args.email else None
+
+    results = []
+    print(f'Replaying {len(entries)} filters ({args.repeat} pages each)...')
+    with http_client(args.base_url, args.api_token, token, timeout=120) as client:
+        for n, entry in enumerate(entries, 1):
+            result = replay(client, conn, sql_log, entry, args, composites)
+            results.append(result)
+            print(f"  [{n}/{len(entries)}] {entry['object_type']:<14} {result['latency_ms']['p50']:>9.1f}ms "
+                  f"{result.get('access', '-'):<16} {describe(entry['config'])[:70]}")
+    if sql_log and not any(result['plans'] for result in results):
+        print(f'\nWarning: no SQL records for the replayed routes in {args.sql_log}; '
+              'is the server running with SLOW_QUERY_MS=-1 and that SLOW_QUERY_LOG?')
+
+    ranked = sorted(results, key=lambda r: -r['latency_ms']['p50'])
+    print()
+    print_table([{
+        'object_type': r['object_type'],
+        'filter': describe(r['config'])[:60],
+        'status': r['status'],
+        'total': r['total'],
+        'p50_ms': r['latency_ms']['p50'],
+        'max_ms': r['latency_ms']['max'],
+        'access': r.get('access'),
+        'sort': r.get('sort'),
+        'uses': r.get('use_count'),
+    } for r in ranked[:args.top]], ['object_type', 'filter', 'status', 'total', 'p50_ms', 'max_ms', 'access',
+                                    'sort', 'uses'])
+
+    by_access = {}
+    for r in results:
+        by_access.setdefault(r.get('access', 'unknown'), []).append(r['latency_ms']['p50'])
+    print()
+    print_table([{'access': access, 'filters': len(values), **{k: summarize(values)[k] for k in ('p50', 'p95', 'max')}}
+                 for access, values in sorted(by_access.items())], ['access', 'filters', 'p50', 'p95', 'max'])
+
+    needing = [r for r in ranked if r.get('suggestion')]
+    if needing:
+        print(f'\n{len(needing)} filters scan their table sequentially:')
+        for r in needing[:args.top]:
+            print(f"  {r['object_type']}: {describe(r['config'])}\n    -> {r['suggestion']}")
+
+    write_report(args.output_dir, 'saved-filter-replay', {
+        'parameters': {k: v for k, v in vars(args).items() if k not in ('password', 'api_token', 'database_url')},
+        'composite_indexes': composites,
+        'by_access': {access: summarize(values) for access, values in by_access.items()},
+        'filters': ranked,
+    }, args.label)
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
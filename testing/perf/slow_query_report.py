@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Slow query log aggregator
+
+Reads the structured slow-query records written by src/lib/slowQueryLog.ts
+(either "[slow-query] {...}" lines in server/container logs or the JSON lines
+file named by SLOW_QUERY_LOG), normalizes each statement, groups by
+fingerprint and ranks the hot spots of a run:
+  count, total/mean/p95/max duration, mean rows, and the routes that spent
+  the most time in each query.
+
+Normalization is done here as well (not only trusted from the record) so logs
+from older builds and hand-edited statements still group together.
+
+Usage:
+  python3 testing/perf/slow_query_report.py server.log
+  docker compose logs app | python3 testing/perf/slow_query_report.py -
+  python3 testing/perf/slow_query_report.py slow.jsonl --since 2025-10-12T10:00 --top 20 --markdown hotspots.md
+"""
+import hashlib
+import json
+import re
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from common import base_parser, percentile, print_table, write_report
+
+MARKER = '[slow-query]'
+
+_NORMALIZE = [
+    (re.compile(r'--[^\n]*'), ' '),
+    (re.compile(r'/\*.*?\*/', re.S), ' '),
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\$\d+'), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)'), '(?+)'),
+    (re.compile(r'(\(\?\+\)\s*,\s*)+\(\?\+\)'), '(?+)+'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def normalize_sql(text):
+    """Same shape reduction as normalizeSql() in slowQueryLog.ts"""
+    for pattern, replacement in _NORMALIZE:
+        text = pattern.sub(replacement, text)
+    return text.strip().lower()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def parse_time(value):
+    """ISO timestamp; one without an offset (e.g. --since 2025-10-12T10:00) is taken as UTC"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def read_records(paths):
+    """Yield slow-query dicts from log files ('-' for stdin), skipping other lines"""
+    for path in paths:
+        stream = sys.stdin if path == '-' else open(path, errors='replace')
+        try:
+            for line in stream:
+                if MARKER in line:
+                    line = line.split(MARKER, 1)[1]
+                elif '"slow_query"' not in line:
+                    continue
+                start = line.find('{')
+                if start == -1:
+                    continue
+                try:
+                    record = json.loads(line[start:])
+                except json.JSONDecodeError:
+                    continue
+                if record.get('type') == 'slow_query' and record.get('sql'):
+                    yield record
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def aggregate(records, since=None, until=None, route_filter=None):
+    groups = defaultdict(lambda: {'durations': [], 'rows': [], 'routes': defaultdict(list), 'first': None,
+                                  'last': None, 'sql': None})
+    window = [None, None]
+    for record in records:
+        timestamp = parse_time(record['timestamp']) if record.get('timestamp') else None
+        if timestamp and ((since and timestamp < since) or (until and timestamp > until)):
+            continue
+        route = record.get('route') or '(unknown)'
+        if route_filter and route_filter not in route:
+            continue
+        normalized = normalize_sql(record['sql'])
+        group = groups[fingerprint(normalized)]
+        group['sql'] = normalized
+        group['durations'].append(float(record['durationMs']))
+        if record.get('rows') is not None:
+            group['rows'].append(record['rows'])
+        group['routes'][route].append(float(record['durationMs']))
+        if timestamp:
+            group['first'] = min(group['first'] or timestamp, timestamp)
+            group['last'] = max(group['last'] or timestamp, timestamp)
+            window[0] = min(window[0] or timestamp, timestamp)
+            window[1] = max(window[1] or timestamp, timestamp)
+
+    results = []
+    for key, group in groups.items():
+        durations = group['durations']
+        routes = sorted(group['routes'].items(), key=lambda item: -sum(item[1]))
+        results.append({
+            'fingerprint': key,
+            'count': len(durations),
+            'total_ms': round(sum(durations), 1),
+            'mean_ms': round(sum(durations) / len(durations), 1),
+            'p95_ms': round(percentile(durations, 95), 1),
+            'max_ms': round(max(durations), 1),
+            'mean_rows': round(sum(group['rows']) / len(group['rows']), 1) if group['rows'] else None,
+            'routes': [{'route': route, 'count': len(times), 'total_ms': round(sum(times), 1)}
+                       for route, times in routes],
+            'first_seen': group['first'],
+            'last_seen': group['last'],
+            'sql': group['sql'],
+        })
+    return results, window
+
+
+def markdown(results, window, top):
+    lines = ['# Slow Query Hot Spots', '']
+    if window[0]:
+        lines += [f'Window: {window[0].isoformat()} to {window[1].isoformat()}', '']
+    lines += ['| # | Count | Total ms | Mean ms | p95 ms | Worst route | Query |',
+              '|---|-------|----------|---------|--------|-------------|-------|']
+    for rank, result in enumerate(results[:top], 1):
+        worst = result['routes'][0]['route'] if result['routes'] else '-'
+        sql = result['sql'][:120].replace('|', '\\|')
+        lines.append(f"| {rank} | {result['count']} | {result['total_ms']:,.0f} | {result['mean_ms']:,.1f} | "
+                     f"{result['p95_ms']:,.1f} | `{worst}` | `{sql}` |")
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = base_parser(__doc__.split('\n')[1], database=False, http=False)
+    parser.add_argument('logs', nargs='+', help="Log files with slow-query records ('-' reads stdin)")
+    parser.add_argument('--since', type=parse_time, help='Only records at or after this ISO timestamp')
+    parser.add_argument('--until', type=parse_time, help='Only records at or before this ISO timestamp')
+    parser.add_argument('--route', help='Only records whose route contains this text')
+    parser.add_argument('--sort', choices=['total', 'mean', 'p95', 'count', 'max'], default='total',
+                        help='Ranking key')
+    parser.add_argument('--top', type=int, default=15, help='Rows to print')
+    parser.add_argument('--markdown', help='Also write the ranking as a Markdown table (e.g. for UAT reports)')
+    args = parser.parse_args()
+
+    results, window = aggregate(read_records(args.logs), args.since, args.until, args.route)
+    sort_key = 'count' if args.sort == 'count' else f'{args.sort}_ms'
+    results.sort(key=lambda result: -result[sort_key])
+    if not results:
+        print('No slow-query records found')
+        return
+
+    total = sum(result['total_ms'] for result in results)
+    print(f"{sum(r['count'] for r in results)} slow queries, {len(results)} fingerprints, "
+          f'{total / 1000:,.1f}s total')
+    rows = [{
+        'fingerprint': result['fingerprint'],
+        'count': result['count'],
+        'total_ms': result['total_ms'],
+        'share': f"{result['total_ms'] / total:.1%}",
+        'mean_ms': result['mean_ms'],
+        'p95_ms': result['p95_ms'],
+        'max_ms': result['max_ms'],
+        'rows': result['mean_rows'],
+        'worst_route': result['routes'][0]['route'] if result['routes'] else None,
+        'sql': result['sql'][:70],
+    } for result in results[:args.top]]
+    print()
+    print_table(rows, ['fingerprint', 'count', 'total_ms', 'share', 'mean_ms', 'p95_ms', 'max_ms', 'rows',
+                       'worst_route', 'sql'])
+
+    if args.markdown:
+        with open(args.markdown, 'w') as f:
+            f.write(markdown(results, window, args.top))
+        print(f'\nMarkdown written to {args.markdown}')
+
+    write_report(args.output_dir, 'slow-query-report', {
+        'sources': args.logs,
+        'window': window,
+        'sort': args.sort,
+        'fingerprints': results,
+    }, args.label)
+
+
+if __name__ == '__main__':
+    main()
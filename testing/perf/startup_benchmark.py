@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+Server cold-start and readiness benchmark
+
+Boots the production server the way a rollout or autoscaler does and times
+how long it takes to listen on its port and for /api/health to return 200
+(the Dockerfile HEALTHCHECK and docker-compose.yml healthcheck). Boot time is
+split into phases using the lines instrumentation.ts, src/lib/migrate.ts and
+src/lib/db.ts already log:
+
+  runtime_boot      process start -> [Instrumentation] register() called
+  module_import     register() -> [Migration] Starting auto-migration (imports migrate.ts, pg)
+  pool_connect      [DB] Creating new pool -> first SELECT 1 answered, incl. retry backoff
+  migration_check   schema_migrations ensured, migration lock taken, applied list read
+  migration_apply   pending migrations run (close to zero on a migrated database)
+  listen_to_healthy port accepting -> first 200 from /api/health (route load + pool query)
+
+After the server is healthy each --paths entry is requested --repeat times;
+the first request minus the median of the rest is its compile/warm-up cost.
+
+Cold runs boot against a freshly created scratch database, so autoMigrate
+applies the whole migrations/ chain (first deploy, new environment). Warm runs
+boot again against the already migrated database (ordinary restart, scale-out).
+The scratch database is created next to the one in DATABASE_URL (the role
+needs CREATEDB) and dropped afterwards unless --keep is given.
+
+Targets:
+  standalone  node .next/standalone/server.js (what the Dockerfile runs; needs a production build)
+  start       next start
+  dev         next dev (first-request compile dominates)
+  docker      docker run --network host <image>, against the local Postgres
+
+migrate.ts loads .env.local with override, so a DATABASE_URL there wins over
+the scratch database for the start/dev targets; cold runs check that the
+scratch database really was migrated and warn otherwise.
+
+Usage:
+  python3 testing/perf/startup_benchmark.py --target standalone --build
+  python3 testing/perf/startup_benchmark.py --target docker --image moss:perf --build --cold-runs 2 --warm-runs 5
+  python3 testing/perf/startup_benchmark.py --target dev --cold-runs 1 --warm-runs 2 --paths /api/health,/devices
+"""
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from common import (
+    REPO_ROOT,
+    base_parser,
+    connect,
+    http_client,
+    print_table,
+    read_rss_kb,
+    summarize,
+    write_report,
+)
+from migration_profiler import recreate_database, scratch_url
+
+# Health check start periods the deployment files give the server before failures count
+START_PERIODS_S = {'Dockerfile': 40, 'docker-compose.yml': 60}
+DEFAULT_PATHS = ['/api/health', '/login', '/api/devices?limit=1', '/api/dashboard/stats']
+
+# First matching log line per marker (ANSI colours stripped)
+MARKERS = [
+    ('register', re.compile(r'\[Instrumentation\] register\(\) called')),
+    ('migrate_start', re.compile(r'\[Migration\] Starting auto-migration')),
+    ('pool_created', re.compile(r'\[DB\] Creating new pool')),
+    ('db_connected', re.compile(r'^Starting database migrations')),
+    ('migrations_listed', re.compile(r'Found \d+ migration file')),
+    ('migrate_done', re.compile(r'\[Migration\] Auto-migration (?:completed|failed|disabled)')),
+    ('migrate_failed', re.compile(r'\[Migration\] Auto-migration failed')),
+    ('next_ready', re.compile(r'Ready in \d|Listening on|started server on', re.I)),
+]
+PENDING = re.compile(r'Running (\d+) pending migration')
+ANSI = re.compile(r'\x1b\[[0-9;]*[A-Za-z]')
+
+PHASES = [
+    ('runtime_boot', None, 'register'),
+    ('module_import', 'register', 'migrate_start'),
+    ('pool_connect', 'pool_created', 'db_connected'),
+    ('migration_check', 'db_connected', 'migrations_listed'),
+    ('migration_apply', 'migrations_listed', 'migrate_done'),
+]
+CONTAINER_NAME = 'moss-startup-perf'
+
+
+# ----------------------------------------------------------------------------
+# Server process
+# ----------------------------------------------------------------------------
+
+def server_command(args, database_url):
+    """Command, working directory and environment for one boot of the target"""
+    env = {
+        **os.environ,
+        'DATABASE_URL': database_url,
+        'PORT': str(args.port),
+        'HOSTNAME': args.host,
+        'NEXT_TELEMETRY_DISABLED': '1',
+        'NEXTAUTH_URL': f'http://{args.host}:{args.port}',
+        'NEXTAUTH_SECRET': os.environ.get('NEXTAUTH_SECRET', 'perf-startup-benchmark-secret'),
+    }
+    if args.target == 'dev':
+        return ['npx', 'next', 'dev', '-p', str(args.port), '-H', args.host], REPO_ROOT, env
+    env['NODE_ENV'] = 'production'
+    if args.target == 'start':
+        return ['npx', 'next', 'start', '-p', str(args.port), '-H', args.host], REPO_ROOT, env
+    if args.target == 'standalone':
+        return ['node', 'server.js'], os.path.join(REPO_ROOT, '.next', 'standalone'), env
+    command = ['docker', 'run', '--rm', '--name', CONTAINER_NAME, '--network', 'host']
+    for key in ('DATABASE_URL', 'PORT', 'HOSTNAME', 'NEXTAUTH_URL', 'NEXTAUTH_SECRET'):
+        command += ['-e', f'{key}={env[key]}']
+    return command + [args.image], REPO_ROOT, env
+
+
+def build(args):
+    """Produce the artifact the target boots from; returns build seconds"""
+    if args.target == 'docker':
+        command = ['docker', 'build', '-t', args.image, '.']
+    else:
+        command = ['npm', 'run', 'build']
+    print(f"Building: {' '.join(command)}")
+    started = time.perf_counter()
+    proc = subprocess.run(command, cwd=REPO_ROOT, capture_output=True, text=True,
+                          env={**os.environ, 'NODE_ENV': 'production', 'NEXT_TELEMETRY_DISABLED': '1'})
+    if proc.returncode != 0:
+        raise SystemExit(f'Build failed:\n{(proc.stdout + proc.stderr)[-3000:]}')
+    return round(time.perf_counter() - started, 1)
+
+
+def prepare_standalone():
+    """The standalone bundle has no migrations/; link it in like the Dockerfile copies it"""
+    root = os.path.join(REPO_ROOT, '.next', 'standalone')
+    if not os.path.exists(os.path.join(root, 'server.js')):
+        raise SystemExit('.next/standalone/server.js not found: run a production build first (or pass --build)')
+    migrations = os.path.join(root, 'migrations')
+    if not os.path.exists(migrations):
+        os.symlink(os.path.join(REPO_ROOT, 'migrations'), migrations)
+
+
+def port_in_use(host, port):
+    try:
+        with socket.create_connection((host, port), timeout=0.2):
+            return True
+    except OSError:
+        return False
+
+
+class ServerLog:
+    """Reads the server's combined output and timestamps the phase markers"""
+
+    def __init__(self, proc, started):
+        self.proc = proc
+        self.started = started
+        self.events = {}
+        self.pending = None
+        self.lines = []
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        for raw in self.proc.stdout:
+            at = time.perf_counter() - self.started
+            line = ANSI.sub('', raw).strip()
+            self.lines.append((round(at, 3), line))
+            for name, pattern in MARKERS:
+                if name not in self.events and pattern.search(line):
+                    self.events[name] = at
+            match = PENDING.search(line)
+            if match and self.pending is None:
+                self.pending = int(match.group(1))
+
+    def join(self, timeout=5.0):
+        self._thread.join(timeout)
+
+
+def stop_server(proc, target):
+    if target == 'docker':
+        subprocess.run(['docker', 'rm', '-f', CONTAINER_NAME], capture_output=True, check=False)
+    if proc.poll() is None:
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            os.killpg(proc.pid, signal.SIGKILL)
+            proc.wait()
+        except ProcessLookupError:
+            pass
+
+
+# ----------------------------------------------------------------------------
+# Measurements
+# ----------------------------------------------------------------------------
+
+def wait_listen(args, proc, started):
+    deadline = started + args.timeout
+    while time.perf_counter() < deadline and proc.poll() is None:
+        if port_in_use(args.host, args.port):
+            return time.perf_counter() - started
+        time.sleep(args.poll_ms / 1000)
+    return None
+
+
+def wait_healthy(args, client, proc, started):
+    import httpx
+
+    deadline = started + args.timeout
+    result = {'first_response_s': None, 'healthy_s': None, 'attempts': 0, 'last_status': None}
+    while time.perf_counter() < deadline and proc.poll() is None:
+        result['attempts'] += 1
+        try:
+            response = client.get('/api/health')
+        except httpx.TransportError:
+            time.sleep(args.poll_ms / 1000)
+            continue
+        at = time.perf_counter() - started
+        result['last_status'] = response.status_code
+        if result['first_response_s'] is None:
+            result['first_response_s'] = round(at, 3)
+        if response.status_code == 200:
+            result['healthy_s'] = round(at, 3)
+            break
+        time.sleep(args.poll_ms / 1000)
+    return result
+
+
+def warm_up(args, client):
+    """First request per path vs the median of the repeats that follow"""
+    import httpx
+
+    rows = []
+    for path in args.paths:
+        timings, status = [], None
+        for _ in range(args.repeat):
+            began = time.perf_counter()
+            try:
+                status = client.get(path).status_code
+            except httpx.HTTPError as exc:
+                status = type(exc).__name__
+            timings.append((time.perf_counter() - began) * 1000)
+        rest = sorted(timings[1:])
+        settled = rest[len(rest) // 2] if rest else None
+        rows.append({
+            'path': path,
+            'status': status,
+            'first_ms': round(timings[0], 1),
+            'settled_ms': round(settled, 1) if settled is not None else None,
+            'warmup_ms': round(timings[0] - settled, 1) if settled is not None else None,
+        })
+    return rows
+
+
+def phases(events, listen_s, healthy_s):
+    result = {}
+    for name, start, end in PHASES:
+        begin = 0.0 if start is None else events.get(start)
+        finish = events.get(end)
+        result[name] = round(finish - begin, 3) if begin is not None and finish is not None else None
+    result['listen_to_healthy'] = round(healthy_s - listen_s, 3) if listen_s and healthy_s else None
+    return result
+
+
+def migrations_recorded(database_url):
+    import psycopg
+
+    with connect(database_url, autocommit=True) as conn:
+        try:
+            return conn.execute('SELECT count(*) FROM schema_migrations').fetchone()[0]
+        except psycopg.errors.UndefinedTable:
+            return 0
+
+
+def boot(args, kind, index, database_url):
+    command, cwd, env = server_command(args, database_url)
+    if port_in_use(args.host, args.port):
+        raise SystemExit(f'{args.host}:{args.port} is already in use; stop that server or pass --port')
+    started = time.perf_counter()
+    proc = subprocess.Popen(command, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            text=True, errors='replace', bufsize=1, start_new_session=True)
+    log = ServerLog(proc, started)
+    run = {'kind': kind, 'run': index}
+    try:
+        listen_s = wait_listen(args, proc, started)
+        with http_client(f'http://{args.host}:{args.port}', args.api_token, timeout=args.request_timeout) as client:
+            health = wait_healthy(args, client, proc, started) if listen_s else {'healthy_s': None}
+            if health['healthy_s'] is not None:
+                run['warmup'] = warm_up(args, client)
+        rss = read_rss_kb(proc.pid) if args.target != 'docker' else None
+    finally:
+        stop_server(proc, args.target)
+        log.join()
+
+    run.update({
+        'listen_s': round(listen_s, 3) if listen_s else None,
+        **health,
+        'pending_migrations': log.pending or 0,
+        'migration_failed': 'migrate_failed' in log.events,
+        'events_s': {name: round(at, 3) for name, at in sorted(log.events.items(), key=lambda item: item[1])},
+        'phases_s': phases(log.events, listen_s, health['healthy_s']),
+        'rss_mb': round(rss / 1024, 1) if rss else None,
+        'exit_code': proc.returncode,
+    })
+    if health['healthy_s'] is None or run['migration_failed']:
+        run['log_tail'] = [line for _, line in log.lines[-40:]]
+    return run
+
+
+# ----------------------------------------------------------------------------
+# Reporting
+# ----------------------------------------------------------------------------
+
+def compare(runs):
+    """Per metric summaries for cold vs warm boots"""
+    metrics = ['listen_s', 'healthy_s'] + [name for name, _, _ in PHASES] + ['listen_to_healthy']
+    rows = []
+    for metric in metrics:
+        row = {'metric': metric}
+        for kind in ('cold', 'warm'):
+            values = [run.get(metric, run['phases_s'].get(metric)) for run in runs if run['kind'] == kind]
+            values = [value for value in values if value is not None]
+            stats = summarize(values)
+            row[f'{kind}_p50'] = stats.get('p50')
+            row[f'{kind}_max'] = stats.get('max')
+        rows.append(row)
+    return rows
+
+
+def warmup_summary(runs):
+    rows = []
+    paths = [entry['path'] for run in runs for entry in run.get('warmup', [])]
+    for path in dict.fromkeys(paths):
+        row = {'path': path}
+        for kind in ('cold', 'warm'):
+            entries = [entry for run in runs if run['kind'] == kind
+                       for entry in run.get('warmup', []) if entry['path'] == path]
+            row[f'{kind}_first_ms'] = summarize([entry['first_ms'] for entry in entries]).get('p50')
+            row[f'{kind}_warmup_ms'] = summarize([entry['warmup_ms'] for entry in entries
+                                                  if entry['warmup_ms'] is not None]).get('p50')
+            if entries:
+                row['status'] = entries[-1]['status']
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = base_parser(__doc__.split('\n')[1], http=False)
+    parser.add_argument('--target', choices=['standalone', 'start', 'dev', 'docker'], default='standalone',
+                        help='How the server is started')
+    parser.add_argument('--image', default='moss:perf', help='Image for --target docker')
+    parser.add_argument('--build', action='store_true', help='Run npm run build / docker build first')
+    parser.add_argument('--cold-runs', type=int, default=2, help='Boots against a fresh database')
+    parser.add_argument('--warm-runs', type=int, default=3, help='Boots against the migrated database')
+    parser.add_argument('--host', default='127.0.0.1', help='Address the server binds and is probed on')
+    parser.add_argument('--port', type=int, default=3100, help='Port for the benchmarked server')
+    parser.add_argument('--api-token', default=os.environ.get('MOSS_API_TOKEN'),
+                        help='Bearer token sent with warm-up requests (env MOSS_API_TOKEN)')
+    parser.add_argument('--paths', type=lambda text: text.split(','), default=DEFAULT_PATHS,
+                        help='Paths requested after the server is healthy')
+    parser.add_argument('--repeat', type=int, default=5, help='Requests per warm-up path')
+    parser.add_argument('--timeout', type=float, default=180, help='Give up on a boot after this many seconds')
+    parser.add_argument('--request-timeout', type=float, default=30, help='Per-request timeout (s)')
+    parser.add_argument('--poll-ms', type=float, default=50, help='Listen/health polling interval')
+    parser.add_argument('--scratch-db', default='moss_startup_perf', help='Scratch database name')
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch database')
+    args = parser.parse_args()
+
+    if not args.database_url:
+        raise SystemExit('DATABASE_URL is not set (pass --database-url or export DATABASE_URL)')
+    build_s = build(args) if args.build else None
+    if args.target == 'standalone':
+        prepare_standalone()
+
+    url = scratch_url(args.database_url, args.scratch_db)
+    if args.target == 'docker' and args.host not in ('127.0.0.1', 'localhost', '0.0.0.0'):
+        print(f'Warning: docker runs with --network host; {args.host} must be an address of this machine')
+
+    runs, warnings = [], []
+    try:
+        plan = [('cold', i) for i in range(args.cold_runs)] + [('warm', i) for i in range(args.warm_runs)]
+        if args.warm_runs and not args.cold_runs:
+            plan.insert(0, ('prime', 0))
+        for kind, index in plan:
+            if kind in ('cold', 'prime'):
+                recreate_database(args.database_url, args.scratch_db)
+            run = boot(args, kind, index, url)
+            if kind in ('cold', 'prime') and migrations_recorded(url) == 0:
+                warnings.append(f'{kind} run {index}: scratch database was not migrated; '
+                                'check DATABASE_URL in .env.local (migrate.ts loads it with override)')
+            print(f"{kind} #{index}: listen {run['listen_s']}s, healthy {run['healthy_s']}s, "
+                  f"{run['pending_migrations']} migrations applied")
+            if kind != 'prime':
+                runs.append(run)
+    finally:
+        if not args.keep:
+            recreate_database(args.database_url, args.scratch_db, drop_only=True)
+
+    print()
+    print_table(compare(runs), ['metric', 'cold_p50', 'cold_max', 'warm_p50', 'warm_max'])
+    print()
+    warmup = warmup_summary(runs)
+    print_table(warmup, ['path', 'status', 'cold_first_ms', 'cold_warmup_ms', 'warm_first_ms', 'warm_warmup_ms'])
+
+    failed = [run for run in runs if run['healthy_s'] is None]
+    for run in failed:
+        print(f"\n{run['kind']} #{run['run']} never became healthy (last status {run.get('last_status')}):")
+        print('\n'.join(f'  {line}' for line in run.get('log_tail', [])))
+    for run in runs:
+        if run['migration_failed']:
+            warnings.append(f"{run['kind']} run {run['run']}: autoMigrate failed, the server started anyway")
+    healthy = [run['healthy_s'] for run in runs if run['healthy_s'] is not None]
+    for source, period in START_PERIODS_S.items():
+        if healthy and max(healthy) > period:
+            warnings.append(f'slowest boot took {max(healthy)}s to become healthy, over the {period}s '
+                            f'health check start period in {source}')
+    for warning in warnings:
+        print(f'\nWarning: {warning}')
+
+    write_report(args.output_dir, 'startup-benchmark', {
+        'parameters': {k: v for k, v in vars(args).items() if k not in ('password', 'api_token', 'database_url')},
+        'build_s': build_s,
+        'comparison': compare(runs),
+        'warmup': warmup,
+        'warnings': warnings,
+        'runs': runs,
+    }, args.label)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
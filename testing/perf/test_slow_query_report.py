@@ -0,0 +1,30 @@
+"""
+Tests for slow_query_report.py time filtering
+
+Run with: python3 -m pytest testing/perf/test_slow_query_report.py
+"""
+from datetime import timezone
+
+from slow_query_report import aggregate, parse_time
+
+
+def record(timestamp, duration=120.0):
+    return {'type': 'slow_query', 'timestamp': timestamp, 'sql': 'SELECT * FROM devices WHERE id = $1',
+            'durationMs': duration, 'route': '/api/devices'}
+
+
+def test_naive_time_is_utc():
+    assert parse_time('2025-10-12T10:00') == parse_time('2025-10-12T10:00:00Z')
+    assert parse_time('2025-10-12T10:00').tzinfo == timezone.utc
+
+
+def test_offset_time_is_kept():
+    assert parse_time('2025-10-12T12:00+02:00') == parse_time('2025-10-12T10:00:00Z')
+
+
+def test_naive_since_and_until_filter_aware_records():
+    records = [record('2025-10-12T09:59:59.000Z'), record('2025-10-12T10:30:00.000Z'),
+               record('2025-10-12T11:00:01.000Z')]
+    results, window = aggregate(records, since=parse_time('2025-10-12T10:00'), until=parse_time('2025-10-12T11:00'))
+    assert [group['count'] for group in results] == [1]
+    assert window[0] == window[1] == parse_time('2025-10-12T10:30:00Z')
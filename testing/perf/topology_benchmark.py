@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Network topology endpoint scalability benchmark
+
+Seeds a synthetic topology for each graph size, then times
+GET /api/topology/network for the full graph and for location/device filtered
+subgraphs. Reports latency, payload size and server RSS so we can see where
+topology rendering needs pagination, subgraph extraction or caching.
+
+Topology shape (per core group):
+  chassis (device_type=chassis)
+    -> --modules-per-chassis modules (device_type=module, parent_device_id=chassis)
+  --access-per-core access switches, uplinked to module ports
+    -> --fanout endpoints per access switch (computers/servers)
+
+Every link is an ios row whose connected_to_io_id points at the far port
+(the column indexed by migration 023_topology_index.sql).
+
+Usage:
+  python3 testing/perf/topology_benchmark.py --nodes 1000,10000,100000
+  python3 testing/perf/topology_benchmark.py --nodes 5000 --fanout 48 --bidirectional
+  python3 testing/perf/topology_benchmark.py --cleanup
+"""
+import json
+import random
+import time
+
+from common import (
+    PERF_TAG,
+    ServerMemorySampler,
+    base_parser,
+    connect,
+    copy_rows,
+    http_client,
+    int_list,
+    print_table,
+    session_login,
+    summarize,
+    timed,
+    write_report,
+)
+from fixtures import new_id
+
+NAME_PREFIX = f'{PERF_TAG}topo-'
+ENDPOINT = '/api/topology/network'
+
+
+def generate_topology(node_count, args, rng):
+    """Return (locations, networks, devices, ios) row lists for node_count devices"""
+    locations = [(new_id(rng), f'{NAME_PREFIX}site-{i}', 'datacenter') for i in range(args.locations)]
+    networks = [(new_id(rng), f'{NAME_PREFIX}vlan-{i}', loc[0], 100 + i) for i, loc in enumerate(locations)]
+    devices, ios = [], []
+    counts = {'chassis': 0, 'module': 0, 'switch': 0, 'endpoint': 0}
+
+    def add_device(kind, device_type, location_index, parent_id=None):
+        device_id = new_id(rng)
+        number = counts[kind]
+        counts[kind] += 1
+        devices.append((device_id, parent_id, locations[location_index][0],
+                        f'{NAME_PREFIX}{kind}-{number}', device_type, 'active'))
+        return device_id
+
+    def add_io(device_id, name, interface_type, network_id=None, connected_to=None):
+        io_id = new_id(rng)
+        ios.append([io_id, device_id, name, interface_type, network_id, connected_to, '10G' if interface_type == 'fiber_optic' else '1G'])
+        return io_id
+
+    def connect_ports(local_io, remote_io):
+        local_io[5] = remote_io[0]
+        if args.bidirectional:
+            remote_io[5] = local_io[0]
+
+    group = 0
+    while len(devices) < node_count:
+        location_index = group % len(locations)
+        network_id = networks[location_index][0]
+        chassis_id = add_device('chassis', 'chassis', location_index)
+        modules = [add_device('module', 'module', location_index, chassis_id)
+                   for _ in range(args.modules_per_chassis)]
+        for a in range(args.access_per_core):
+            if len(devices) >= node_count:
+                break
+            switch_id = add_device('switch', 'switch', location_index)
+            module_id = modules[a % len(modules)]
+            add_io(module_id, f'te-{a % len(modules)}/0/{a}', 'fiber_optic')
+            module_port = ios[-1]
+            add_io(switch_id, 'uplink-1', 'fiber_optic')
+            connect_ports(ios[-1], module_port)
+            for port in range(args.fanout):
+                if len(devices) >= node_count:
+                    break
+                endpoint_id = add_device('endpoint', 'server' if port % 8 == 0 else 'computer', location_index)
+                add_io(switch_id, f'ge-0/0/{port}', 'ethernet', network_id)
+                switch_port = ios[-1]
+                add_io(endpoint_id, 'eth0', 'ethernet', network_id)
+                connect_ports(ios[-1], switch_port)
+        group += 1
+
+    return locations, networks, devices[:node_count], ios, counts
+
+
+def seed(conn, topology):
+    locations, networks, devices, ios, _ = topology
+    device_ids = {row[0] for row in devices}
+    ios = [row for row in ios if row[1] in device_ids]
+    io_ids = {row[0] for row in ios}
+    copy_rows(conn, 'locations', ['id', 'location_name', 'location_type'], locations)
+    copy_rows(conn, 'networks', ['id', 'network_name', 'location_id', 'vlan_id'], networks)
+    copy_rows(conn, 'devices', ['id', 'parent_device_id', 'location_id', 'hostname', 'device_type', 'status'], devices)
+    # Load ports unconnected first, then link them, so the self-referencing FK holds
+    copy_rows(conn, 'ios', ['id', 'device_id', 'interface_name', 'interface_type', 'native_network_id', 'speed'],
+              (row[:5] + [row[6]] for row in ios))
+    links = [(row[5], row[0]) for row in ios if row[5] and row[5] in io_ids]
+    with conn.cursor() as cur:
+        cur.execute('CREATE TEMP TABLE perf_links (io_id UUID, target UUID) ON COMMIT DROP')
+        copy_rows(conn, 'perf_links', ['target', 'io_id'], links)
+        cur.execute('UPDATE ios SET connected_to_io_id = l.target FROM perf_links l WHERE ios.id = l.io_id')
+        conn.commit()
+        cur.execute('ANALYZE devices')
+        cur.execute('ANALYZE ios')
+    conn.commit()
+    return len(ios), len(links)
+
+
+def cleanup(conn):
+    with conn.cursor() as cur:
+        # ios cascade from devices; modules cascade from their chassis
+        cur.execute('DELETE FROM devices WHERE hostname LIKE %s', (f'{NAME_PREFIX}%',))
+        devices = cur.rowcount
+        cur.execute('DELETE FROM networks WHERE network_name LIKE %s', (f'{NAME_PREFIX}%',))
+        cur.execute('DELETE FROM locations WHERE location_name LIKE %s', (f'{NAME_PREFIX}%',))
+    conn.commit()
+    return devices
+
+
+def fetch(client, params):
+    """Single request; returns metrics for one call"""
+    with timed() as total:
+        response = client.get(ENDPOINT, params=params)
+        body = response.content
+    with timed() as parse:
+        payload = json.loads(body) if response.status_code == 200 else {}
+    data = payload.get('data') or {}
+    return {
+        'status': response.status_code,
+        'ms': total['ms'],
+        'parse_ms': parse['ms'],
+        'wire_bytes': response.num_bytes_downloaded,
+        'payload_bytes': len(body),
+        'nodes': len(data.get('nodes', [])),
+        'edges': len(data.get('edges', [])),
+    }
+
+
+def measure_variant(client, params, repeats, server_pid):
+    with ServerMemorySampler(server_pid) as sampler:
+        calls = [fetch(client, params) for _ in range(repeats)]
+    ok = [c for c in calls if c['status'] == 200]
+    latency = summarize([c['ms'] for c in ok])
+    return {
+        'requests': len(calls),
+        'errors': len(calls) - len(ok),
+        'status_codes': sorted({c['status'] for c in calls}),
+        'latency_ms': latency,
+        'cold_ms': round(calls[0]['ms'], 1),
+        'parse_ms': summarize([c['parse_ms'] for c in ok])['mean'],
+        'payload_mb': round(ok[-1]['payload_bytes'] / 1024 / 1024, 3) if ok else None,
+        'wire_mb': round(ok[-1]['wire_bytes'] / 1024 / 1024, 3) if ok else None,
+        'nodes': ok[-1]['nodes'] if ok else None,
+        'edges': ok[-1]['edges'] if ok else None,
+        'server_memory': sampler.summary(),
+    }
+
+
+def recommendations(full, filtered, args):
+    """Flag the mitigation each size calls for, based on the configured budgets"""
+    flags = []
+    if not full['latency_ms']['count']:
+        return ['endpoint failed']
+    over_latency = full['latency_ms']['p95'] > args.latency_budget_ms
+    over_payload = (full['payload_mb'] or 0) > args.payload_budget_mb
+    if over_payload:
+        flags.append('pagination')
+    if over_latency and filtered and filtered['latency_ms']['p95'] <= args.latency_budget_ms:
+        flags.append('subgraph extraction')
+    if over_latency:
+        flags.append('caching')
+    growth = full['server_memory'].get('growth_mb')
+    if growth is not None and growth > args.memory_budget_mb:
+        flags.append('server memory')
+    return flags or ['ok']
+
+
+def main():
+    parser = base_parser(__doc__.split('\n')[1])
+    parser.add_argument('--nodes', type=int_list, default=int_list('1000,10000,50000,100000'),
+                        help='Comma-separated device counts to sweep')
+    parser.add_argument('--fanout', type=int, default=24, help='Endpoints per access switch')
+    parser.add_argument('--access-per-core', type=int, default=16, help='Access switches per chassis')
+    parser.add_argument('--modules-per-chassis', type=int, default=4, help='Modules per chassis')
+    parser.add_argument('--locations', type=int, default=4, help='Locations the groups are spread over')
+    parser.add_argument('--bidirectional', action='store_true',
+                        help='Set connected_to_io_id on both ends of each link')
+    parser.add_argument('--requests', type=int, default=5, help='Requests per variant and size')
+    parser.add_argument('--latency-budget-ms', type=float, default=1000, help='p95 latency budget')
+    parser.add_argument('--payload-budget-mb', type=float, default=5, help='Response size budget')
+    parser.add_argument('--memory-budget-mb', type=float, default=200, help='Server RSS growth budget')
+    parser.add_argument('--seed', type=int, default=7, help='Random seed')
+    parser.add_argument('--keep', action='store_true', help='Leave the last topology in the database')
+    parser.add_argument('--cleanup', action='store_true', help='Remove seeded topology rows and exit')
+    args = parser.parse_args()
+
+    with connect(args.database_url) as conn:
+        removed = cleanup(conn)
+        if args.cleanup:
+            print(f'Removed {removed} benchmark devices')
+            return
+
+        token = session_login(args.base_url, args.email, args.password)
+        results = []
+        with http_client(args.base_url, args.api_token, token, timeout=600) as client:
+            for node_count in args.nodes:
+                print(f'\n=== {node_count:,} devices ===')
+                rng = random.Random(args.seed + node_count)
+                topology = generate_topology(node_count, args, rng)
+                start = time.perf_counter()
+                io_count, link_count = seed(conn, topology)
+                print(f'  seeded {node_count} devices, {io_count} ios, {link_count} links '
+                      f'in {time.perf_counter() - start:.1f}s  shape={topology[4]}')
+
+                location_id = topology[0][0][0]
+                chassis_id = next(row[0] for row in topology[2] if row[4] == 'chassis')
+                full = measure_variant(client, {}, args.requests, args.server_pid)
+                by_location = measure_variant(client, {'location_id': location_id}, args.requests, args.server_pid)
+                by_device = measure_variant(client, {'device_id': chassis_id}, args.requests, args.server_pid)
+                results.append({
+                    'devices': node_count,
+                    'ios': io_count,
+                    'links': link_count,
+                    'shape': topology[4],
+                    'full_graph': full,
+                    'location_subgraph': by_location,
+                    'device_subgraph': by_device,
+                    'needs': recommendations(full, by_location, args),
+                })
+                if node_count != args.nodes[-1] or not args.keep:
+                    cleanup(conn)
+
+    rows = []
+    for result in results:
+        for variant in ('full_graph', 'location_subgraph', 'device_subgraph'):
+            stats = result[variant]
+            rows.append({
+                'devices': result['devices'],
+                'variant': variant,
+                'p50_ms': stats['latency_ms']['p50'],
+                'p95_ms': stats['latency_ms']['p95'],
+                'cold_ms': stats['cold_ms'],
+                'payload_mb': stats['payload_mb'],
+                'nodes': stats['nodes'],
+                'edges': stats['edges'],
+                'rss_peak_mb': stats['server_memory']['peak_mb'],
+                'errors': stats['errors'],
+            })
+    print()
+    print_table(rows, ['devices', 'variant', 'p50_ms', 'p95_ms', 'cold_ms', 'payload_mb',
+                       'nodes', 'edges', 'rss_peak_mb', 'errors'])
+    print()
+    for result in results:
+        print(f"{result['devices']:>8,} devices: {', '.join(result['needs'])}")
+
+    write_report(args.output_dir, 'topology-benchmark', {
+        'parameters': {k: v for k, v in vars(args).items() if k not in ('password', 'api_token', 'database_url')},
+        'sizes': results,
+    }, args.label)
+
+
+if __name__ == '__main__':
+    main()
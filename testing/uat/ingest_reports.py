@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+"""
+Ingest historical UAT markdown reports into UAT.json
+
+Parses the prose result reports in testing/ (UAT-RESULTS-*.md including the
+-RETEST runs, FINAL-UAT-RESULTS-AGENT*.md and the round-2 summaries) into
+scenario results and defects with the test_results schema of UAT.json, so
+cross-round analytics can run over the whole history rather than the phase 1
+scenarios the update_*_results.py scripts recorded.
+
+Reports are parsed in a process pool (one file per task). Two layouts are
+recognised: per-test heading blocks ("### TC-DB-SCHEMA-001: ..." followed by
+**Status**/**Actual Result**/**Notes** fields) and result tables with a
+Test ID column. Defects come from "### DEF-...: title" blocks and defect
+tables. Timings ("Execution Time: 32 ms", "0.038s") become duration_ms.
+
+Results are merged deterministically (detailed reports before summaries,
+then by file name); a scenario reported twice for the same round and day is
+kept once, and anything already in UAT.json is skipped.
+
+Usage:
+  python3 testing/uat/ingest_reports.py                    # dry run: summary only
+  python3 testing/uat/ingest_reports.py --write            # merge into testing/UAT.json
+  python3 testing/uat/ingest_reports.py --jobs 8 --output history.json
+  python3 testing/uat/ingest_reports.py testing/UAT-RESULTS-DATABASE*.md --write
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from uatjson import DEFECT_RE, SCENARIO_RE, UAT_JSON, load, merge, normalize_status, parse_date, save
+
+TESTING_DIR = UAT_JSON.parent
+
+RESULT_GLOBS = ['UAT-RESULTS-*.md', 'FINAL-UAT-RESULTS-AGENT*.md']
+SUMMARY_FILES = ['FINAL-UAT-MASTER-RESULTS.md', 'FINAL-UAT-MASTER-RESULTS-ROUND2.md', 'AGENT4-ROUND2-INDEX.md',
+                 'ROUND2-EXECUTIVE-SUMMARY.md']
+
+TEXT_LIMIT = 500
+
+HEADING_RE = re.compile(r'^(#{2,5})\s+(.*)$')
+FIELD_RE = re.compile(r'^\s*(?:[-*]\s+)?\*\*([^*:]{1,40}?)\*\*\s*:\s*(.*)$')
+FIELD_ALT_RE = re.compile(r'^\s*(?:[-*]\s+)?\*\*([^*]{1,40}?):\*\*\s*(.*)$')
+DURATION_RE = re.compile(r'(?<![<>~\d.])(\d+(?:\.\d+)?)\s*(ms|s|sec|seconds)\b', re.I)
+
+SCENARIO_FIELDS = {
+    'actual_results': ['actual result', 'actual', 'result', 'results', 'actual behavior', 'conclusion', 'verified',
+                       'validation results', 'finding', 'findings'],
+    'notes': ['notes', 'note', 'analysis', 'observations', 'impact'],
+    'defect_id': ['defect', 'defect id', 'related defect'],
+    'duration': ['execution time', 'duration', 'time', 'response time', 'performance'],
+}
+DEFECT_FIELDS = {
+    'severity': ['severity'],
+    'scenario_id': ['test', 'test scenario', 'test id', 'scenario', 'related test', 'test case', 'found in'],
+    'expected_result': ['expected behavior', 'expected result', 'expected'],
+    'actual_result': ['actual behavior', 'actual result', 'actual', 'evidence', 'description'],
+    'root_cause': ['root cause', 'analysis', 'cause'],
+    'fix_required': ['fix required', 'remediation', 'recommendation', 'recommended fix', 'fix', 'suggested fix'],
+    'additional_notes': ['impact', 'notes', 'additional notes'],
+    'status': ['status'],
+    'source_defect': ['source'],
+}
+
+
+# ---------------------------------------------------------------------------
+# Text helpers
+# ---------------------------------------------------------------------------
+
+def clean(text, limit=TEXT_LIMIT):
+    """Flatten markdown to one line: drop code fences, emphasis and list markers"""
+    if not text:
+        return ''
+    text = re.sub(r'```.*?(```|$)', ' ', text, flags=re.S)
+    text = re.sub(r'^\s*(?:[-*]|\d+\.)\s+', '', text, flags=re.M)
+    text = text.replace('**', '').replace('__', '')
+    text = re.sub(r'\s+', ' ', text).strip(' -|')
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + '…'
+
+
+def duration_ms(text, unit_hint=None):
+    """Milliseconds from '32.022 ms', '0.038s' or a bare number under a '(ms)' header; bounds like '<1s' are ignored"""
+    if not text:
+        return None
+    m = DURATION_RE.search(text)
+    if m:
+        value = float(m.group(1))
+        return round(value if m.group(2).lower() == 'ms' else value * 1000, 3)
+    if unit_hint == 'ms':
+        m = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*', text)
+        if m:
+            return float(m.group(1))
+    return None
+
+
+def fields(lines):
+    """
+    **Key**: value fields of a block. A value continues on following lines
+    until the next field, heading or horizontal rule, so multi-line lists and
+    code blocks stay attached to their field.
+    """
+    out = {}
+    key = None
+    fenced = False
+    for line in lines:
+        if line.lstrip().startswith('```'):
+            fenced = not fenced
+        m = None if fenced else (FIELD_RE.match(line) or FIELD_ALT_RE.match(line))
+        if m:
+            key = m.group(1).strip().lower()
+            out.setdefault(key, [])
+            out[key].append(m.group(2))
+        elif not fenced and (HEADING_RE.match(line) or line.strip() == '---'):
+            key = None
+        elif key:
+            out[key].append(line)
+    return {k: '\n'.join(v).strip() for k, v in out.items()}
+
+
+def pick(found, names):
+    for name in names:
+        if found.get(name):
+            return found[name]
+    return None
+
+
+def numbered_steps(text):
+    steps = [re.sub(r'^\s*\d+\.\s+', '', line).strip() for line in (text or '').splitlines()
+             if re.match(r'^\s*\d+\.\s+', line)]
+    return [clean(step, 300) for step in steps]
+
+
+# ---------------------------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------------------------
+
+def report_round(name):
+    upper = name.upper()
+    if 'ROUND2' in upper:
+        return 'final-round2'
+    if upper.startswith(('FINAL-UAT', 'AGENT4')):
+        return 'final-round1'
+    if 'RETEST' in upper:
+        return 'uat-retest'
+    return 'uat'
+
+
+def header_info(lines):
+    """Report date and tester from the bold metadata lines at the top of a report"""
+    head = fields(lines[:20])
+    date = parse_date(pick(head, ['execution date', 'test date', 'date']))
+    if not date:
+        date = next((parse_date(line) for line in lines[:20] if parse_date(line)), None)
+    tester = pick(head, ['test agent', 'tester', 'agent'])
+    return date, clean(tester, 120) or None
+
+
+def heading_blocks(lines):
+    """(line_no, level, heading text, body lines) for headings naming a scenario or defect"""
+    headings = [(i, len(m.group(1)), m.group(2)) for i, line in enumerate(lines) for m in [HEADING_RE.match(line)]
+                if m]
+    for n, (i, level, text) in enumerate(headings):
+        if not (SCENARIO_RE.search(text) or DEFECT_RE.search(text)):
+            continue
+        end = len(lines)
+        for j, other_level, other_text in headings[n + 1:]:
+            if other_level <= level or SCENARIO_RE.match(other_text) or DEFECT_RE.match(other_text):
+                end = j
+                break
+        yield i + 1, level, text, lines[i + 1:end]
+
+
+def table_rows(lines):
+    """(line_no, {header: cell}) for every markdown table row"""
+    i = 0
+    while i < len(lines) - 1:
+        if lines[i].lstrip().startswith('|') and re.match(r'^\s*\|[\s:|-]+\|\s*$', lines[i + 1]):
+            headers = [h.strip().lower() for h in lines[i].strip().strip('|').split('|')]
+            i += 2
+            while i < len(lines) and lines[i].lstrip().startswith('|'):
+                cells = [c.strip() for c in lines[i].strip().strip('|').split('|')]
+                yield i + 1, dict(zip(headers, cells))
+                i += 1
+        else:
+            i += 1
+
+
+def scenario_from_heading(text, body):
+    heading_id = SCENARIO_RE.search(text)
+    if len(SCENARIO_RE.findall(text)) > 1:
+        return None  # range headings ("TC-INT-HIER-021 through TC-INT-HIER-015") summarise several tests
+    found = fields(body)
+    status = normalize_status(found.get('status') or found.get('result') or text)
+    if not status:
+        return None
+    defect = pick(found, SCENARIO_FIELDS['defect_id']) or ''
+    defect_ids = DEFECT_RE.findall(defect) or DEFECT_RE.findall(found.get('status', ''))
+    title = re.sub(r'^[:\s-]+', '', text[heading_id.end():])
+    return {
+        'scenario_id': re.sub(r'-RETEST$', '', heading_id.group(0)),
+        'status': status,
+        'title': clean(re.sub(r'\s*[✓✅❌⚠️⏭️]+\s*\w*$', '', title), 200),
+        'actual_results': clean(pick(found, SCENARIO_FIELDS['actual_results'])),
+        'notes': clean(pick(found, SCENARIO_FIELDS['notes'])),
+        'defect_id': defect_ids[0] if defect_ids else None,
+        'duration_ms': duration_ms(pick(found, SCENARIO_FIELDS['duration'])),
+    }
+
+
+def scenario_from_row(row):
+    ids = [(k, v) for k, v in row.items() if SCENARIO_RE.fullmatch(v.replace('*', '').strip())]
+    if not ids:
+        return None
+    id_column, scenario_id = ids[0]
+    status_columns = [k for k in row if 'status' in k or k in ('result', 'outcome')]
+    status = normalize_status(row[status_columns[-1]]) if status_columns else None
+    if not status:
+        return None
+    other = {k: v for k, v in row.items() if k != id_column and k not in status_columns}
+    time_columns = [k for k in other if 'time' in k or k in ('performance', 'metrics')]
+    title = next((other[k] for k in other if k in ('description', 'test name', 'test case', 'title', 'endpoint',
+                                                     'defect', 'expected behavior')), '')
+    notes = ' '.join(other[k] for k in other if k == 'notes' or 'assessment' in k)
+    actual = ' '.join(other[k] for k in other if k.startswith('actual') or k in time_columns)
+    defects = DEFECT_RE.findall(' '.join(row.values()))
+    return {
+        'scenario_id': re.sub(r'-RETEST$', '', scenario_id.replace('*', '').strip()),
+        'status': status,
+        'title': clean(title, 200),
+        'actual_results': clean(actual),
+        'notes': clean(notes),
+        'defect_id': defects[0] if defects else None,
+        'duration_ms': next((d for k in time_columns
+                             for d in [duration_ms(other[k], 'ms' if '(ms)' in k else None)] if d is not None),
+                            None),
+    }
+
+
+def defect_from_heading(text, body):
+    defect_id = DEFECT_RE.search(text).group(0)
+    found = fields(body)
+    title = re.sub(r'^[:\s-]+', '', text[text.index(defect_id) + len(defect_id):])
+    severity = found.get('severity') or (re.search(r'\((CRITICAL|HIGH|MEDIUM|LOW)\)', title, re.I) or [None, None])[1]
+    title = re.sub(r'\s*\((CRITICAL|HIGH|MEDIUM|LOW)\)\s*$', '', title, flags=re.I)
+    scenario = SCENARIO_RE.search(pick(found, DEFECT_FIELDS['scenario_id']) or '')
+    steps = numbered_steps(pick(found, ['steps to reproduce', 'steps', 'reproduction steps']))
+    defect = {
+        'defect_id': defect_id,
+        'scenario_id': scenario.group(0) if scenario else None,
+        'severity': (clean(severity, 40).split()[0].lower() if severity else None),
+        'title': clean(title, 200),
+        'steps_to_reproduce': steps,
+    }
+    for key in ('expected_result', 'actual_result', 'root_cause', 'fix_required', 'additional_notes', 'status'):
+        defect[key] = clean(pick(found, DEFECT_FIELDS[key]))
+    related = DEFECT_RE.findall(found.get('source', ''))
+    if related:
+        defect['related_defects'] = related
+    return defect
+
+
+def defect_from_row(row):
+    ids = [v for v in row.values() if DEFECT_RE.fullmatch(v.replace('*', '').strip())]
+    if not ids or not row.get('severity'):
+        return None
+    return {
+        'defect_id': ids[0].replace('*', '').strip(),
+        'scenario_id': next((m.group(0) for v in row.values() for m in [SCENARIO_RE.search(v)] if m), None),
+        'severity': clean(row['severity'], 40).split()[0].lower() if clean(row['severity']) else None,
+        'title': clean(row.get('title') or row.get('description') or row.get('defect') or '', 200),
+        'steps_to_reproduce': [],
+        'status': clean(row.get('status', '')),
+    }
+
+
+def parse_report(path):
+    """Parse one report; runs in a worker process"""
+    started = time.perf_counter()
+    path = Path(path)
+    lines = path.read_text(encoding='utf-8', errors='replace').splitlines()
+    date, tester = header_info(lines)
+    scenarios = {}
+    defects = {}
+
+    def add(bucket, key, entry, line_no):
+        entry = {k: v for k, v in entry.items() if v not in (None, '', [])}
+        entry['line'] = line_no
+        if key in bucket:
+            # Detailed blocks and tables describe the same test: fill gaps, keep the first status
+            for k, v in entry.items():
+                bucket[key].setdefault(k, v)
+        else:
+            bucket[key] = entry
+
+    for line_no, _, text, body in heading_blocks(lines):
+        if SCENARIO_RE.match(text.lstrip('✓✅❌⚠️⏭️ ')):
+            entry = scenario_from_heading(text, body)
+            if entry:
+                add(scenarios, entry['scenario_id'], entry, line_no)
+        elif DEFECT_RE.search(text):
+            entry = defect_from_heading(text, body)
+            add(defects, entry['defect_id'], entry, line_no)
+
+    for line_no, row in table_rows(lines):
+        entry = scenario_from_row(row)
+        if entry:
+            add(scenarios, entry['scenario_id'], entry, line_no)
+            continue
+        entry = defect_from_row(row)
+        if entry:
+            add(defects, entry['defect_id'], entry, line_no)
+
+    rnd = report_round(path.name)
+    source = os.path.relpath(path, TESTING_DIR.parent)
+    results = []
+    for entry in scenarios.values():
+        entry.update({'execution_date': date, 'round': rnd, 'source': f"{source}:{entry.pop('line')}"})
+        if tester:
+            entry['tester'] = tester
+        entry.setdefault('actual_results', '')
+        entry.setdefault('notes', '')
+        results.append(entry)
+    for entry in defects.values():
+        entry.update({'round': rnd, 'source': f"{source}:{entry.pop('line')}"})
+
+    return {
+        'source': source,
+        'summary': path.name in SUMMARY_FILES,
+        'round': rnd,
+        'date': date,
+        'tester': tester,
+        'lines': len(lines),
+        'scenarios': results,
+        'defects': list(defects.values()),
+        'parse_ms': round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Merge
+# ---------------------------------------------------------------------------
+
+SCENARIO_ORDER = ['scenario_id', 'status', 'execution_date', 'actual_results', 'notes', 'defect_id', 'title',
+                  'duration_ms', 'round', 'tester', 'source']
+
+
+def ordered(entry, order):
+    return {k: entry[k] for k in order if k in entry} | {k: v for k, v in entry.items() if k not in order}
+
+
+def combine(reports):
+    """Deduplicate across reports: detailed reports first, then summaries, each by file name"""
+    scenarios = {}
+    defects = {}
+    duplicates = 0
+    for report in sorted(reports, key=lambda r: (r['summary'], r['source'])):
+        for entry in report['scenarios']:
+            key = (entry['scenario_id'], entry.get('execution_date'), entry['round'])
+            if key in scenarios:
+                duplicates += 1
+                for k, v in entry.items():
+                    scenarios[key].setdefault(k, v)
+            else:
+                scenarios[key] = entry
+        for entry in report['defects']:
+            if entry['defect_id'] in defects:
+                duplicates += 1
+                for k, v in entry.items():
+                    defects[entry['defect_id']].setdefault(k, v)
+            else:
+                defects[entry['defect_id']] = entry
+
+    round_order = {'uat': 0, 'uat-retest': 1, 'final-round1': 2, 'final-round2': 3}
+    scenario_list = sorted(scenarios.values(),
+                           key=lambda e: (e.get('execution_date') or '', round_order[e['round']], e['scenario_id']))
+    defect_list = sorted(defects.values(), key=lambda d: (round_order[d['round']], d['defect_id']))
+    return [ordered(e, SCENARIO_ORDER) for e in scenario_list], defect_list, duplicates
+
+
+def history(scenarios, existing):
+    """First and latest status per scenario across rounds (phase 1 entries in UAT.json count as round 0)"""
+    runs = defaultdict(list)
+    for entry in (e for e in existing if e.get('round') is None):
+        runs[entry['scenario_id']].append(((entry.get('execution_date') or '')[:10], -1, entry['status']))
+    round_order = {'uat': 0, 'uat-retest': 1, 'final-round1': 2, 'final-round2': 3}
+    for entry in scenarios:
+        runs[entry['scenario_id']].append(((entry.get('execution_date') or ''), round_order[entry['round']],
+                                           entry['status']))
+    transitions = Counter()
+    for results in runs.values():
+        if len(results) > 1:
+            results.sort()
+            transitions[f'{results[0][2]} -> {results[-1][2]}'] += 1
+    return {'scenarios': len(runs), 'multi_round': sum(len(r) > 1 for r in runs.values()),
+            'transitions': dict(transitions.most_common())}
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def default_inputs():
+    paths = [p for pattern in RESULT_GLOBS for p in TESTING_DIR.glob(pattern)]
+    paths += [TESTING_DIR / name for name in SUMMARY_FILES if (TESTING_DIR / name).exists()]
+    return sorted(set(paths))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('reports', nargs='*', help='Report files (default: all UAT result reports in testing/)')
+    parser.add_argument('--uat-json', default=str(UAT_JSON), help='UAT.json to deduplicate against / update')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='Parser processes')
+    parser.add_argument('--write', action='store_true', help='Merge new results and defects into UAT.json')
+    parser.add_argument('--output', help='Also write the ingested results (after dedupe) to this JSON file')
+    args = parser.parse_args()
+
+    paths = [Path(p).resolve() for p in args.reports] or default_inputs()
+    if not paths:
+        sys.exit('No reports found')
+
+    workers = max(1, min(args.jobs, len(paths)))
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        reports = list(pool.map(parse_report, paths))
+    scenarios, defects, duplicates = combine(reports)
+    elapsed = time.perf_counter() - started
+
+    data = load(args.uat_json)
+    existing = data.get('test_results', {}).get('scenarios_tested', [])
+    before = len(existing)
+    counts = merge(data, scenarios, defects)
+
+    print(f'{len(paths)} reports parsed in {elapsed:.2f}s with {workers} processes')
+    print(f"{'report':<58} {'round':<13} {'date':<11} {'scenarios':>9} {'defects':>7} {'parse ms':>9}")
+    for report in sorted(reports, key=lambda r: r['source']):
+        print(f"{report['source']:<58} {report['round']:<13} {report['date'] or '-':<11} "
+              f"{len(report['scenarios']):>9} {len(report['defects']):>7} {report['parse_ms']:>9}")
+
+    by_round = defaultdict(Counter)
+    for entry in scenarios:
+        by_round[entry['round']][entry['status']] += 1
+    print('\nstatus by round (after dedupe)')
+    for rnd, statuses in by_round.items():
+        print(f"  {rnd:<13} " + '  '.join(f'{s.lower()} {n}' for s, n in sorted(statuses.items())))
+
+    timed = [e for e in scenarios if 'duration_ms' in e]
+    summary = history(scenarios, existing[:before])
+    print(f'\n{len(scenarios)} scenario results ({duplicates} duplicates across reports merged), '
+          f'{len(timed)} with timings, {len(defects)} defects')
+    print(f"UAT.json: {before} existing results; {counts['added']} new, {counts['skipped']} already present; "
+          f"defects {counts['defects_added']} new, {counts['defects_skipped']} already present")
+    print(f"history: {summary['scenarios']} distinct scenarios, {summary['multi_round']} seen in more than one round")
+    for transition, n in list(summary['transitions'].items())[:10]:
+        print(f'  {transition:<22} {n}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'sources': [{k: v for k, v in r.items() if k not in ('scenarios', 'defects')} for r in reports],
+                       'scenarios_tested': scenarios, 'defects': defects, 'history': summary}, f, indent=2)
+        print(f'wrote {args.output}')
+    if args.write:
+        save(data, args.uat_json)
+        print(f'updated {args.uat_json}')
+    else:
+        print('dry run: pass --write to update UAT.json')
+
+
+if __name__ == '__main__':
+    main()
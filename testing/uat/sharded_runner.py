@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+"""
+Sharded multi-process UAT executor
+
+Runs UAT work across worker processes instead of one sequential shell:
+  perf       the load-testing cases of agent4-test-suite.sh (TS-PERF-001..020),
+             ported to the Python API client with shard-local fixtures so any
+             case can run in any shard
+  scenarios  the UAT.json test suites, each executed by --scenario-cmd
+             (scenarios inside a suite stay together and in order, since later
+             scenarios depend on earlier ones)
+
+Units are assigned to shards longest-first by estimated time (the
+estimated_time of each scenario, the declared cost of each perf case, or the
+timings observed in an earlier run via --estimates). Each shard writes its own
+partition (results/<run>/shard-N.jsonl). The merge step reads the partitions,
+orders results by plan order rather than completion order, and writes them into
+UAT.json (--write), replacing results of the same round and day. A straggler
+report compares each shard's estimated and actual time.
+
+--scenario-cmd is a shell template with {scenario_id}, {suite_id} and {shard};
+the command also gets MOSS_BASE_URL, MOSS_UAT_SHARD and MOSS_UAT_PREFIX (a
+per-shard name prefix for test data). Exit status 0 is PASSED, 77 SKIPPED,
+anything else FAILED; if the last line of stdout is a JSON object, its status,
+actual_results and notes are used instead.
+
+Synthetic records are named with a perf-uat-<run>-s<N>- prefix.
+
+Usage:
+  python3 testing/uat/sharded_runner.py --plan --shards 4
+  python3 testing/uat/sharded_runner.py --shards 4 --base-url http://localhost:3001
+  python3 testing/uat/sharded_runner.py --units perf,scenarios --scenario-cmd './uat-agent.sh {scenario_id}'
+  python3 testing/uat/sharded_runner.py --merge testing/uat/results/20251019-101500 --write
+  python3 testing/uat/sharded_runner.py --shards 6 --estimates testing/uat/results/20251019-101500/timings.json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from uatjson import UAT_JSON, load, merge, normalize_status, save
+
+REPO_ROOT = UAT_JSON.parents[1]
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+sys.path.insert(0, str(REPO_ROOT / 'clients' / 'python'))
+from moss_client import MossAPIError, MossClient  # noqa: E402
+
+# Requests per simulated client address; the API limiter allows 100 per IP + path per 15 minutes
+REQUESTS_PER_ADDRESS = 90
+SKIP_EXIT_CODE = 77
+
+
+# ---------------------------------------------------------------------------
+# Work units
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Unit:
+    unit_id: str
+    kind: str  # 'perf' | 'suite'
+    estimate_s: float
+    order: int
+    scenarios: list = field(default_factory=list)  # [(scenario_id, title)]
+
+
+def parse_estimate(text):
+    """Seconds from '3 minutes', '90 seconds', '1 hour'"""
+    m = re.match(r'\s*(\d+(?:\.\d+)?)\s*(second|sec|s|minute|min|m|hour|h)', text or '', re.I)
+    if not m:
+        return 60.0
+    unit = m.group(2).lower()
+    scale = 3600 if unit.startswith('h') else 60 if unit.startswith('m') else 1
+    return float(m.group(1)) * scale
+
+
+def build_units(kinds, uat_data, observed):
+    units = []
+    if 'perf' in kinds:
+        for case in PERF_CASES:
+            units.append(Unit(case.case_id, 'perf', observed.get(case.case_id, case.estimate_s), len(units),
+                              [(case.case_id, case.title)]))
+    if 'scenarios' in kinds:
+        for suite in uat_data.get('test_suites', []):
+            scenarios = [(s['scenario_id'], s.get('scenario_name', '')) for s in suite.get('scenarios', [])]
+            estimate = sum(observed.get(s['scenario_id'], parse_estimate(s.get('estimated_time')))
+                           for s in suite.get('scenarios', []))
+            units.append(Unit(suite['suite_id'], 'suite', estimate, len(units), scenarios))
+    return units
+
+
+def assign(units, shards):
+    """Longest-processing-time-first: each unit goes to the currently lightest shard"""
+    plan = [[] for _ in range(shards)]
+    loads = [0.0] * shards
+    for unit in sorted(units, key=lambda u: (-u.estimate_s, u.order)):
+        k = min(range(shards), key=lambda i: (loads[i], i))
+        plan[k].append(unit)
+        loads[k] += unit.estimate_s
+    for shard in plan:
+        shard.sort(key=lambda u: u.order)
+    return plan, loads
+
+
+# ---------------------------------------------------------------------------
+# Perf cases (ported from agent4-test-suite.sh)
+# ---------------------------------------------------------------------------
+
+@dataclass
+class PerfCase:
+    case_id: str
+    title: str
+    estimate_s: float
+    run: object
+
+
+class ShardContext:
+    """Per-shard clients and lazily created fixtures, so cases do not depend on shard placement"""
+
+    def __init__(self, config, shard):
+        self.config = config
+        self.shard = shard
+        self.prefix = f"perf-uat-{config['run_id']}-s{shard}-"
+        self._clients = {}
+        self._requests = 0
+        self._lock = threading.Lock()
+        self._company_id = None
+        self._devices = []
+
+    def client(self):
+        """A pooled client whose X-Forwarded-For changes every REQUESTS_PER_ADDRESS requests"""
+        with self._lock:
+            slot = self._requests // REQUESTS_PER_ADDRESS
+            self._requests += 1
+            if slot not in self._clients:
+                address = f'10.{100 + self.shard % 100}.{slot // 250}.{slot % 250 + 1}'
+                self._clients[slot] = MossClient(self.config['base_url'], api_token=self.config['api_token'],
+                                                 headers={'X-Forwarded-For': address}, max_retries=0)
+            return self._clients[slot]
+
+    def close(self):
+        for client in self._clients.values():
+            client.close()
+
+    def company_id(self):
+        if not self._company_id:
+            company = self.client().create('companies', {'company_name': f'{self.prefix}company',
+                                                         'company_type': 'own_organization'})
+            self._company_id = company['id']
+        return self._company_id
+
+    def device_ids(self, count=1):
+        while len(self._devices) < count:
+            self.create_device(len(self._devices) + 1)
+        return self._devices[:count]
+
+    def create_device(self, i):
+        device = self.client().create('devices', {'hostname': f'{self.prefix}device-{i}', 'device_type': 'computer',
+                                                  'company_id': self.company_id(), 'status': 'active'})
+        self._devices.append(device['id'])
+        return device
+
+    def timed_get(self, resource, **params):
+        started = time.perf_counter()
+        rows = self.client().list(resource, **params)
+        return (time.perf_counter() - started) * 1000, rows
+
+
+def create_many(ctx, count, make):
+    ok = 0
+    for i in range(1, count + 1):
+        try:
+            make(i)
+            ok += 1
+        except MossAPIError:
+            pass
+    return ok
+
+
+def latency_case(resource, threshold_ms, **params):
+    def run(ctx):
+        ctx.device_ids(1)
+        ms, rows = ctx.timed_get(resource, **params)
+        return ('PASS' if ms < threshold_ms else 'FAIL'), f'Duration: {ms:.0f}ms (<{threshold_ms}ms), {len(rows)} rows'
+    return run
+
+
+def case_company(ctx):
+    return 'PASS', f'Company ID: {ctx.company_id()}'
+
+
+def case_devices(ctx):
+    started = time.perf_counter()
+    existing = len(ctx._devices)
+    ok = create_many(ctx, 500 - existing, lambda i: ctx.create_device(existing + i)) + existing
+    seconds = time.perf_counter() - started
+    return ('PASS' if ok >= 475 else 'FAIL'), f'Created: {ok}, Failed: {500 - ok}, Duration: {seconds:.1f}s'
+
+
+def case_people(ctx):
+    ok = create_many(ctx, 100, lambda i: ctx.client().create('people', {
+        'full_name': f'{ctx.prefix}person-{i}', 'person_type': 'employee',
+        'email': f'{ctx.prefix}person-{i}@loadtest.com', 'company_id': ctx.company_id()}))
+    return ('PASS' if ok >= 95 else 'FAIL'), f'Created: {ok}'
+
+
+def case_networks(ctx):
+    ok = create_many(ctx, 50, lambda i: ctx.client().create('networks', {
+        'network_name': f'{ctx.prefix}vlan-{100 + i}', 'vlan_id': 100 + i, 'company_id': ctx.company_id()}))
+    return ('PASS' if ok >= 45 else 'FAIL'), f'Created: {ok}'
+
+
+def case_bulk_update(ctx):
+    device_id = ctx.device_ids(1)[0]
+    started = time.perf_counter()
+    for i in range(10):
+        ctx.client().update('devices', device_id, {'notes': f'Updated {datetime.now().isoformat()} #{i}'})
+    ms = (time.perf_counter() - started) * 1000
+    return ('PASS' if ms < 5000 else 'FAIL'), f'10 updates in {ms:.0f}ms'
+
+
+def case_concurrent_reads(ctx):
+    ctx.device_ids(1)
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        timings = list(pool.map(lambda _: ctx.timed_get('devices', page_size=50)[0], range(20)))
+    worst = max(timings)
+    summary = f'20 reads, 10 concurrent: median {statistics.median(timings):.0f}ms, max {worst:.0f}ms'
+    return ('PASS' if worst < 2000 else 'FAIL'), summary
+
+
+def case_large_result(ctx):
+    ms, rows = ctx.timed_get('devices', page_size=100)
+    return ('PASS' if rows and ms < 2000 else 'FAIL'), f'{len(rows)} rows in {ms:.0f}ms'
+
+
+def case_consistency(ctx):
+    timings = sorted(ctx.timed_get('devices', page_size=50)[0] for _ in range(20))
+    median, p95 = statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+    return ('PASS' if p95 <= max(3 * median, 200) else 'FAIL'), f'median {median:.0f}ms, p95 {p95:.0f}ms'
+
+
+def case_tagged_rows(ctx):
+    rows = ctx.client().list('devices', page_size=100, search=ctx.prefix)
+    return 'PASS', f'{len(rows)} shard devices tagged {ctx.prefix}* ready for cleanup'
+
+
+def case_detail(ctx):
+    device_id = ctx.device_ids(1)[0]
+    started = time.perf_counter()
+    ctx.client().get('devices', device_id)
+    ms = (time.perf_counter() - started) * 1000
+    return ('PASS' if ms < 2000 else 'FAIL'), f'Duration: {ms:.0f}ms (<2000ms)'
+
+
+def case_search(ctx):
+    ctx.device_ids(1)
+    ms, rows = ctx.timed_get('devices', search=f'{ctx.prefix}device-1', page_size=50)
+    return ('PASS' if ms < 1000 and rows else 'FAIL'), f'Duration: {ms:.0f}ms (<1000ms), {len(rows)} matches'
+
+
+PERF_CASES = [
+    PerfCase('TS-PERF-001', 'Create test company', 2, case_company),
+    PerfCase('TS-PERF-002', 'Create 500 devices via API', 150, case_devices),
+    PerfCase('TS-PERF-007', 'List devices query performance', 2, latency_case('devices', 2000, page_size=50)),
+    PerfCase('TS-PERF-008', 'Get device detail query performance', 2, case_detail),
+    PerfCase('TS-PERF-009', 'Search query performance', 2, case_search),
+    # page is 0-based in the client: page=1 is the second page, as in the shell suite
+    PerfCase('TS-PERF-010', 'Pagination query performance', 2, latency_case('devices', 2000, page=1, page_size=50)),
+    PerfCase('TS-PERF-011', 'Create 100 people records', 30, case_people),
+    PerfCase('TS-PERF-012', 'Create 50 network records', 15, case_networks),
+    PerfCase('TS-PERF-013', 'People list query performance', 2, latency_case('people', 2000, page_size=50)),
+    PerfCase('TS-PERF-014', 'Networks list query performance', 2, latency_case('networks', 2000, page_size=50)),
+    PerfCase('TS-PERF-015', 'Companies list query performance', 2, latency_case('companies', 2000, page_size=50)),
+    PerfCase('TS-PERF-016', 'Bulk update performance', 5, case_bulk_update),
+    PerfCase('TS-PERF-017', 'Concurrent read performance', 5, case_concurrent_reads),
+    PerfCase('TS-PERF-018', 'Large result set handling', 2, case_large_result),
+    PerfCase('TS-PERF-019', 'API response time consistency', 5, case_consistency),
+    PerfCase('TS-PERF-020', 'Load test cleanup preparation', 2, case_tagged_rows),
+]
+
+
+PERF_BY_ID = {case.case_id: case for case in PERF_CASES}
+
+
+# ---------------------------------------------------------------------------
+# Shard execution
+# ---------------------------------------------------------------------------
+
+def run_scenario(config, shard, prefix, suite_id, scenario_id):
+    command = config['scenario_cmd'].format(scenario_id=scenario_id, suite_id=suite_id, shard=shard)
+    env = dict(os.environ, MOSS_BASE_URL=config['base_url'], MOSS_UAT_SHARD=str(shard), MOSS_UAT_PREFIX=prefix)
+    proc = subprocess.run(command, shell=True, capture_output=True, text=True, env=env, cwd=REPO_ROOT,
+                          timeout=config['scenario_timeout'])
+    lines = proc.stdout.strip().splitlines()
+    try:
+        reported = json.loads(lines[-1]) if lines else {}
+    except ValueError:
+        reported = {}
+    if not isinstance(reported, dict):
+        reported = {}
+    status = normalize_status(reported.get('status')) or (
+        'PASSED' if proc.returncode == 0 else 'SKIPPED' if proc.returncode == SKIP_EXIT_CODE else 'FAILED')
+    actual = reported.get('actual_results') or '\n'.join(lines[-5:])
+    notes = reported.get('notes') or (proc.stderr.strip().splitlines() or [''])[-1]
+    return status, actual, notes
+
+
+def run_shard(config, shard, units):
+    """Worker process: run a shard's units in order, appending one JSON line per result to its partition"""
+    ctx = ShardContext(config, shard)
+    partition = Path(config['run_dir']) / f'shard-{shard}.jsonl'
+    started = time.time()
+    with open(partition, 'w') as out:
+        for unit in units:
+            for position, (scenario_id, title) in enumerate(unit.scenarios):
+                t0 = time.perf_counter()
+                try:
+                    if unit.kind == 'perf':
+                        status, actual = PERF_BY_ID[scenario_id].run(ctx)
+                        notes = ''
+                    else:
+                        status, actual, notes = run_scenario(config, shard, ctx.prefix, unit.unit_id, scenario_id)
+                except Exception as exc:  # noqa: BLE001 - a broken case must not take down the shard
+                    status, actual, notes = 'FAILED', '', f'{type(exc).__name__}: {exc}'
+                out.write(json.dumps({
+                    'scenario_id': scenario_id, 'unit_id': unit.unit_id, 'order': unit.order, 'position': position,
+                    'status': normalize_status(status), 'title': title, 'actual_results': actual, 'notes': notes,
+                    'execution_date': datetime.now().isoformat(timespec='seconds'),
+                    'duration_ms': round((time.perf_counter() - t0) * 1000, 1), 'shard': shard,
+                }) + '\n')
+                out.flush()
+    ctx.close()
+    return {'shard': shard, 'started': started, 'finished': time.time()}
+
+
+# ---------------------------------------------------------------------------
+# Merge and straggler report
+# ---------------------------------------------------------------------------
+
+def read_partitions(run_dir):
+    results = []
+    for path in sorted(Path(run_dir).glob('shard-*.jsonl')):
+        with open(path) as f:
+            results.extend(json.loads(line) for line in f if line.strip())
+    # Plan order, then the order inside a unit; never completion order
+    return sorted(results, key=lambda r: (r['order'], r['position']))
+
+
+def to_uat_entries(results, round_label):
+    return [{'scenario_id': r['scenario_id'], 'status': r['status'], 'execution_date': r['execution_date'],
+             'actual_results': r['actual_results'] or '', 'notes': r['notes'] or '', 'title': r['title'],
+             'duration_ms': r['duration_ms'], 'round': round_label, 'tester': f"sharded_runner shard {r['shard']}",
+             'source': f"shard-{r['shard']}"} for r in results]
+
+
+def straggler_report(manifest, results):
+    shards = {s['shard']: s for s in manifest['shards']}
+    for s in shards.values():
+        s['actual_s'] = 0.0
+        s['results'] = 0
+    for r in results:
+        shards[r['shard']]['actual_s'] += r['duration_ms'] / 1000
+        shards[r['shard']]['results'] += 1
+    for timing in manifest.get('timings', []):
+        shards[timing['shard']]['wall_s'] = round(timing['finished'] - timing['started'], 2)
+
+    walls = [s.get('wall_s', s['actual_s']) for s in shards.values()]
+    makespan = max(walls) if walls else 0
+    mean = statistics.mean(walls) if walls else 0
+    units = {}
+    for r in results:
+        units.setdefault(r['unit_id'], [r['unit_id'], 0.0])[1] += r['duration_ms'] / 1000
+    estimates = {u['unit_id']: u['estimate_s'] for s in manifest['shards'] for u in s['units']}
+    overruns = sorted(((uid, estimates.get(uid, 0), actual) for uid, actual in units.values()
+                       if actual > estimates.get(uid, 0)), key=lambda u: u[2] - u[1], reverse=True)
+    return {
+        'makespan_s': round(makespan, 2),
+        'mean_shard_s': round(mean, 2),
+        'imbalance': round(makespan / mean, 3) if mean else None,
+        'idle_s': round(sum(makespan - w for w in walls), 2),
+        'shards': [{'shard': k, 'units': len(s['units']), 'estimated_s': round(s['estimated_s'], 1),
+                    'actual_s': round(s['actual_s'], 2), 'wall_s': s.get('wall_s'), 'results': s['results'],
+                    'straggler': bool(walls) and s.get('wall_s', s['actual_s']) == makespan and len(walls) > 1}
+                   for k, s in sorted(shards.items())],
+        'unit_overruns': [{'unit_id': uid, 'estimated_s': round(est, 1), 'actual_s': round(act, 2)}
+                          for uid, est, act in overruns[:10]],
+    }
+
+
+def observed_timings(results):
+    """Per-scenario seconds from a run, usable as --estimates for the next one"""
+    return {r['scenario_id']: round(r['duration_ms'] / 1000, 2) for r in results}
+
+
+def print_report(report):
+    print(f"\nmakespan {report['makespan_s']}s, mean shard {report['mean_shard_s']}s, "
+          f"imbalance {report['imbalance']}x, idle shard-time {report['idle_s']}s")
+    print(f"{'shard':>5} {'units':>5} {'est s':>8} {'actual s':>9} {'wall s':>8} {'results':>7}")
+    for s in report['shards']:
+        print(f"{s['shard']:>5} {s['units']:>5} {s['estimated_s']:>8} {s['actual_s']:>9} {s['wall_s'] or '-':>8} "
+              f"{s['results']:>7}{'  <- straggler' if s['straggler'] else ''}")
+    if not report['unit_overruns']:
+        print('no unit exceeded its estimate')
+    else:
+        print('largest estimate overruns:')
+        for u in report['unit_overruns'][:5]:
+            print(f"  {u['unit_id']:<14} estimated {u['estimated_s']}s, took {u['actual_s']}s")
+
+
+def merge_run(run_dir, args):
+    run_dir = Path(run_dir)
+    manifest = json.loads((run_dir / 'manifest.json').read_text())
+    results = read_partitions(run_dir)
+    report = straggler_report(manifest, results)
+    (run_dir / 'report.json').write_text(json.dumps(report, indent=2))
+    (run_dir / 'timings.json').write_text(json.dumps(observed_timings(results), indent=2))
+
+    counts = {}
+    for r in results:
+        counts[r['status']] = counts.get(r['status'], 0) + 1
+    print(f"{len(results)} results from {len(manifest['shards'])} partitions: "
+          + ', '.join(f'{k.lower()} {v}' for k, v in sorted(counts.items())))
+    print_report(report)
+
+    data = load(args.uat_json)
+    merged = merge(data, to_uat_entries(results, manifest['round']), [], replace=True)
+    if args.write:
+        save(data, args.uat_json)
+        print(f"\nUAT.json: {merged['added']} added, {merged['replaced']} replaced ({args.uat_json})")
+    else:
+        print(f"\nUAT.json: would add {merged['added']}, replace {merged['replaced']}; pass --write to update")
+    print(f'partitions and report: {run_dir}')
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--base-url', default=os.environ.get('MOSS_BASE_URL', 'http://localhost:3001'))
+    parser.add_argument('--api-token', default=os.environ.get('MOSS_API_TOKEN'))
+    parser.add_argument('--shards', type=int, default=4, help='Worker processes')
+    parser.add_argument('--units', default='perf', help='Comma-separated: perf, scenarios')
+    parser.add_argument('--only', help='Comma-separated unit ids (TS-PERF-002, TS-004, ...)')
+    parser.add_argument('--scenario-cmd', help='Command template that executes one UAT.json scenario')
+    parser.add_argument('--scenario-timeout', type=float, default=1800, help='Seconds per scenario command')
+    parser.add_argument('--estimates', help='timings.json from an earlier run; overrides declared estimates')
+    parser.add_argument('--round', default='sharded', help='round label written to UAT.json entries')
+    parser.add_argument('--plan', action='store_true', help='Print the shard plan and exit')
+    parser.add_argument('--merge', metavar='RUN_DIR', help='Only merge existing partitions from RUN_DIR')
+    parser.add_argument('--write', action='store_true', help='Write merged results into UAT.json')
+    parser.add_argument('--uat-json', default=str(UAT_JSON))
+    args = parser.parse_args()
+
+    if args.merge:
+        merge_run(args.merge, args)
+        return
+
+    kinds = {k.strip() for k in args.units.split(',') if k.strip()}
+    if 'scenarios' in kinds and not args.scenario_cmd and not args.plan:
+        parser.error('--units scenarios needs --scenario-cmd (UAT.json scenarios are not automated here)')
+    observed = json.loads(Path(args.estimates).read_text()) if args.estimates else {}
+    units = build_units(kinds, load(args.uat_json), observed)
+    if args.only:
+        wanted = set(args.only.split(','))
+        units = [u for u in units if u.unit_id in wanted]
+    if not units:
+        sys.exit('Nothing to run')
+
+    shards = max(1, min(args.shards, len(units)))
+    plan, loads = assign(units, shards)
+    total = sum(loads)
+    print(f'{len(units)} units, {total / 60:.1f} min estimated sequential, {shards} shards, '
+          f'predicted makespan {max(loads) / 60:.1f} min (imbalance {max(loads) / (total / shards):.2f}x)')
+    for k, shard in enumerate(plan):
+        print(f"  shard {k}: {loads[k]:>7.0f}s  {' '.join(u.unit_id for u in shard)}")
+    if args.plan:
+        return
+
+    run_id = datetime.now().strftime('%Y%m%d-%H%M%S')
+    run_dir = RESULTS_DIR / run_id
+    run_dir.mkdir(parents=True)
+    config = {'base_url': args.base_url, 'api_token': args.api_token, 'scenario_cmd': args.scenario_cmd,
+              'scenario_timeout': args.scenario_timeout, 'run_dir': str(run_dir), 'run_id': run_id.replace('-', '')}
+    manifest = {
+        'run_id': run_id, 'round': args.round, 'base_url': args.base_url, 'units': sorted(kinds),
+        'shards': [{'shard': k, 'estimated_s': loads[k],
+                    'units': [{'unit_id': u.unit_id, 'kind': u.kind, 'estimate_s': u.estimate_s} for u in shard]}
+                   for k, shard in enumerate(plan)],
+    }
+    (run_dir / 'manifest.json').write_text(json.dumps(manifest, indent=2))
+
+    with ProcessPoolExecutor(max_workers=shards) as pool:
+        futures = [pool.submit(run_shard, config, k, shard) for k, shard in enumerate(plan)]
+        manifest['timings'] = [f.result() for f in futures]
+    (run_dir / 'manifest.json').write_text(json.dumps(manifest, indent=2))
+    merge_run(run_dir, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Shared helpers for reading and merging results into testing/UAT.json.
+
+`test_results.scenarios_tested` entries keep the schema written by the
+update_*_results.py scripts (scenario_id, status, execution_date,
+actual_results, notes, optional defect_id). Tools in this package add
+optional keys: title, round, source, tester, duration_ms.
+"""
+import json
+import re
+from datetime import datetime
+from pathlib import Path
+
+UAT_JSON = Path(__file__).resolve().parents[1] / 'UAT.json'
+
+STATUSES = ('PASSED', 'FAILED', 'BLOCKED', 'PARTIAL', 'SKIPPED')
+
+SCENARIO_RE = re.compile(r'\b(?:TS|TC)-[A-Z0-9]+(?:-[A-Z0-9]+)*[a-z]?\b')
+DEFECT_RE = re.compile(r'\bDEF-[A-Z0-9]+(?:-[A-Z0-9]+)*\b')
+
+# Earliest match wins, so "PASS (previously FAIL)" is PASSED
+_STATUS_WORDS = [
+    (re.compile(r'\bPARTIAL', re.I), 'PARTIAL'),
+    (re.compile(r'\bBLOCKED\b', re.I), 'BLOCKED'),
+    (re.compile(r'\b(?:SKIP(?:PED)?|NOT (?:TESTED|EXECUTED|RUN)|N/A)\b', re.I), 'SKIPPED'),
+    (re.compile(r'\bFAIL(?:ED|S|URE)?\b', re.I), 'FAILED'),
+    (re.compile(r'\bPASS(?:ED|ES)?\b', re.I), 'PASSED'),
+]
+_STATUS_MARKS = [('⏭', 'SKIPPED'), ('❌', 'FAILED'), ('✗', 'FAILED'), ('✅', 'PASSED'), ('✓', 'PASSED'),
+                 ('⚠', 'PARTIAL')]
+
+
+def normalize_status(text):
+    """Map free-form status text ("✅ PASS", "⚠️ **BLOCKED**", "FAIL") to a STATUSES value, or None"""
+    if not text:
+        return None
+    hits = [(m.start(), status) for pattern, status in _STATUS_WORDS for m in [pattern.search(text)] if m]
+    if hits:
+        return min(hits)[1]
+    for mark, status in _STATUS_MARKS:
+        if mark in text:
+            return status
+    return None
+
+
+def parse_date(text):
+    """ISO date (YYYY-MM-DD) from '2025-10-11', '2025-10-11 (Re-test)' or 'October 12, 2025'"""
+    if not text:
+        return None
+    m = re.search(r'\d{4}-\d{2}-\d{2}', text)
+    if m:
+        return m.group(0)
+    m = re.search(r'([A-Z][a-z]+ \d{1,2}, \d{4})', text)
+    if m:
+        try:
+            return datetime.strptime(m.group(1), '%B %d, %Y').date().isoformat()
+        except ValueError:
+            return None
+    return None
+
+
+def result_key(entry):
+    """Identity of one scenario result: the same scenario on the same day in the same round"""
+    return entry['scenario_id'], (entry.get('execution_date') or '')[:10], entry.get('round')
+
+
+def load(path=UAT_JSON):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(data, path=UAT_JSON):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def test_results(data):
+    """The test_results section, created with the same defaults as update_uat_results.py"""
+    return data.setdefault('test_results', {
+        'execution_date': datetime.now().isoformat(),
+        'tester': 'Automated Testing',
+        'test_environment': 'http://localhost:3001',
+        'scenarios_tested': [],
+        'defects': [],
+    })
+
+
+def merge(data, scenarios, defects, replace=False):
+    """
+    Add scenario results and defects to UAT.json data, skipping ones already present.
+
+    Existing entries without a `round` (the phase 1 results) match on scenario and day alone.
+    With replace=True an existing result with the same key is overwritten instead
+    (used when re-running a round). Returns counts of added/replaced/skipped rows.
+    """
+    section = test_results(data)
+    existing = section.setdefault('scenarios_tested', [])
+    index = {}
+    for i, entry in enumerate(existing):
+        index[result_key(entry)] = i
+        if entry.get('round') is None:
+            index[result_key(entry)[:2]] = i
+    counts = {'added': 0, 'replaced': 0, 'skipped': 0, 'defects_added': 0, 'defects_skipped': 0}
+
+    for entry in scenarios:
+        key = result_key(entry)
+        i = index.get(key, index.get(key[:2]))
+        if i is None:
+            index[key] = len(existing)
+            existing.append(entry)
+            counts['added'] += 1
+        elif replace:
+            existing[i] = entry
+            counts['replaced'] += 1
+        else:
+            counts['skipped'] += 1
+
+    known = {d.get('defect_id') for d in section.setdefault('defects', [])}
+    for defect in defects:
+        if defect['defect_id'] in known:
+            counts['defects_skipped'] += 1
+            continue
+        known.add(defect['defect_id'])
+        section['defects'].append(defect)
+        counts['defects_added'] += 1
+    return counts